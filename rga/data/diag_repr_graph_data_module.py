@@ -1,4 +1,4 @@
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from argparse import ArgumentError, ArgumentParser
 from operator import itemgetter
 
@@ -11,6 +11,7 @@ from rga.data.adj_matrix_data_module import (
 )
 from rga.util.adjmatrix.diagonal_block_representation import (
     adj_matrix_to_diagonal_block_representation,
+    calculate_bandwidth_in_blocks,
     calculate_num_blocks,
 )
 from rga import util
@@ -29,9 +30,15 @@ class DiagonalRepresentationGraphDataModule(AdjMatrixDataModule):
         block_size: int,
         subgraph_scheduler_name: str = None,
         subgraph_scheduler_params: dict = None,
+        max_bandwidth: int = 0,
         **kwargs
     ):
         self.block_size = block_size
+        self.max_bandwidth = max_bandwidth
+        if max_bandwidth and subgraph_scheduler_name is not None:
+            raise ValueError(
+                "`max_bandwidth` can't be combined with a subgraph scheduler, as the subgraphs are cut out of the whole representation"
+            )
 
         super().__init__(**kwargs)
 
@@ -87,43 +94,55 @@ class DiagonalRepresentationGraphDataModule(AdjMatrixDataModule):
 
     def prepare_data(self, *args, **kwargs):
         super().prepare_data(*args, **kwargs)
-        self.train_dataset = self.adjust_batch_representation(self.train_dataset)
+        # Training on the truncated graphs would teach the model to leave out their far edges, so they are dropped,
+        # while the evaluation datasets keep all their graphs, with the edges beyond `max_bandwidth` truncated
+        self.train_dataset = self.adjust_batch_representation(
+            self.train_dataset, "train", drop_truncated=True
+        )
         self.val_datasets = [
-            self.adjust_batch_representation(d) for d in self.val_datasets
+            self.adjust_batch_representation(d, f"val {i}")
+            for i, d in enumerate(self.val_datasets)
         ]
         self.test_datasets = [
-            self.adjust_batch_representation(d) for d in self.test_datasets
+            self.adjust_batch_representation(d, f"test {i}")
+            for i, d in enumerate(self.test_datasets)
         ]
 
     def adjust_batch_representation(
-        self, batch: List[Tuple[torch.Tensor, int]]
-    ) -> List[Tuple[torch.Tensor, torch.Tensor, int]]:
+        self,
+        batch: List[Tuple[torch.Tensor, int]],
+        dataset_name: str = "",
+        drop_truncated: bool = False,
+    ) -> List[Tuple]:
 
         diag_block_represented_batch = []
+        num_truncated = 0
         for graph_info_set in batch:
             graph_info = graph_info_set[0] if self.use_labels else graph_info_set
-            matrix = graph_info[0]
-            num_nodes = graph_info[1]
-            diag_block_graph = adj_matrix_to_diagonal_block_representation(
-                util.to_dense_if_not(matrix), num_nodes, self.block_size, pad_value=-1
-            )
-            adj_matrix_mask = torch.tril(
-                torch.ones((num_nodes, num_nodes)), diagonal=-1
-            )[:, :, None]
-            diag_block_mask = adj_matrix_to_diagonal_block_representation(
-                adj_matrix_mask, num_nodes, self.block_size
-            )
-
-            processed_example = (
-                util.to_sparse_if_not(diag_block_graph),
-                diag_block_mask,
-                num_nodes,
+            matrix = util.to_dense_if_not(graph_info[0])
+            num_diagonals = None
+            if self.max_bandwidth:
+                bandwidth = calculate_bandwidth_in_blocks(
+                    matrix, graph_info[1], self.block_size
+                )
+                if bandwidth > self.max_bandwidth:
+                    num_truncated += 1
+                    if drop_truncated:
+                        continue
+                num_diagonals = min(bandwidth, self.max_bandwidth)
+            processed_example = diagonal_block_example(
+                matrix, graph_info[1], self.block_size, num_diagonals
             )
             if self.use_labels:
                 processed_example = (processed_example, graph_info_set[1])
 
             diag_block_represented_batch.append(processed_example)
 
+        if num_truncated:
+            print(
+                f"{'Dropped' if drop_truncated else 'Truncated'} {num_truncated} of {len(batch)} graphs of dataset "
+                f"{dataset_name} with a bandwidth over the `max_bandwidth` of {self.max_bandwidth} blocks"
+            )
         return diag_block_represented_batch
 
     def train_dataloader(self, **kwargs):
@@ -217,32 +236,12 @@ class DiagonalRepresentationGraphDataModule(AdjMatrixDataModule):
         return splitted_graphs, splitted_graph_masks, splitted_graphs_sizes
 
     def collate_graph_batch(self, batch):
-        # As part of the collation graph diag_repr and masks are padded. The graph masks 0.0 paddings
-        # represent the end of the graphs.
-
-        graphs = torch.nn.utils.rnn.pad_sequence(
-            [
-                util.to_dense_if_not(g[0][0])
-                if self.use_labels
-                else util.to_dense_if_not(g[0])
-                for g in batch
-            ],
-            batch_first=True,
-            padding_value=0.0,
-        )
-        graph_masks = torch.nn.utils.rnn.pad_sequence(
-            [g[0][1] if self.use_labels else g[1] for g in batch],
-            batch_first=True,
-            padding_value=0.0,
-        )
-        num_nodes = torch.tensor([g[0][2] if self.use_labels else g[2] for g in batch])
-
         if self.use_labels:
             labels = torch.LongTensor([g[1] for g in batch])
-            return (graphs, graph_masks, num_nodes, labels)
+            return (*collate_diagonal_block_examples([g[0] for g in batch]), labels)
 
         else:
-            return (graphs, graph_masks, num_nodes)
+            return collate_diagonal_block_examples(batch)
 
     @classmethod
     def add_model_specific_args(cls, parent_parser: ArgumentParser):
@@ -304,5 +303,67 @@ class DiagonalRepresentationGraphDataModule(AdjMatrixDataModule):
             )
         except ArgumentError:
             pass
+        try:  # may collide with an autoencoder module, but that's fine
+            parser.add_argument(
+                "--max_bandwidth",
+                dest="max_bandwidth",
+                default=0,
+                type=int,
+                metavar="NUM_BLOCKS",
+                help="keep only the block diagonals of each graph up to its furthest edge, at most NUM_BLOCKS, \
+                    in the graph representation, which bounds the work of the recursions to O(num_nodes * NUM_BLOCKS); \
+                    fits BFS ordered graphs, the graphs with edges further away are dropped from the training dataset \
+                    and truncated in the evaluation datasets; 0 keeps all the diagonals",
+            )
+        except ArgumentError:
+            pass
 
         return parent_parser
+
+
+def diagonal_block_example(
+    matrix: torch.Tensor,
+    num_nodes: int,
+    block_size: int,
+    num_diagonals: Optional[int] = None,
+) -> Tuple:
+    """
+    Returns the (sparse diagonal block graph, diagonal block mask, number of nodes) example of an adjacency matrix
+    of shape [y, x, edge_size]. With `num_diagonals`, usually the graph's bandwidth capped by `max_bandwidth`,
+    the representation is truncated to that many block diagonals, the edges outside of them are dropped,
+    and the number is appended to the example. The matrix is modified in place.
+    """
+    diag_block_graph = adj_matrix_to_diagonal_block_representation(
+        matrix, num_nodes, block_size, pad_value=-1, num_diagonals=num_diagonals
+    )
+    adj_matrix_mask = torch.tril(
+        torch.ones((num_nodes, num_nodes)), diagonal=-1
+    )[:, :, None]
+    diag_block_mask = adj_matrix_to_diagonal_block_representation(
+        adj_matrix_mask, num_nodes, block_size, num_diagonals=num_diagonals
+    )
+    example = (util.to_sparse_if_not(diag_block_graph), diag_block_mask, num_nodes)
+    if num_diagonals is not None:
+        return (*example, num_diagonals)
+    return example
+
+
+def collate_diagonal_block_examples(examples: List[Tuple]) -> Tuple:
+    # As part of the collation graph diag_repr and masks are padded. The graph masks 0.0 paddings
+    # represent the end of the graphs.
+    graphs = torch.nn.utils.rnn.pad_sequence(
+        [util.to_dense_if_not(g[0]) for g in examples],
+        batch_first=True,
+        padding_value=0.0,
+    )
+    graph_masks = torch.nn.utils.rnn.pad_sequence(
+        [g[1] for g in examples],
+        batch_first=True,
+        padding_value=0.0,
+    )
+    num_nodes = torch.tensor([g[2] for g in examples])
+    if len(examples[0]) > 3:
+        # the numbers of the kept diagonals of the truncated representations, see `diagonal_block_example`
+        num_diagonals = torch.tensor([g[3] for g in examples])
+        return (graphs, graph_masks, num_nodes, num_diagonals)
+    return (graphs, graph_masks, num_nodes)
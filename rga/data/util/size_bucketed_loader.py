@@ -0,0 +1,86 @@
+from typing import Iterator, List, Optional, Tuple
+
+from torch import Tensor
+
+from rga.data.diag_repr_graph_data_module import (
+    collate_diagonal_block_examples,
+    diagonal_block_example,
+)
+from rga.data.util.pickled_data import load_pickled_data
+from rga.util import adjmatrix
+from rga.util.adjmatrix.diagonal_block_representation import (
+    calculate_bandwidth_in_blocks,
+)
+
+# graph indices in the dataset, their lower triangle adjacency matrices of shape [y, x, 1] and the model input
+SizeBucketedBatch = Tuple[List[int], List[Tensor], Tuple[Tensor, ...]]
+
+
+def load_pickled_test_graphs(path: str, dataset_idx: int = 0) -> List:
+    """
+    Returns the graphs of a test dataset of a pickled dataset, as saved, before their preparation for the autoencoder.
+    """
+    _, _, test_datasets = load_pickled_data(path, False)
+    return test_datasets[dataset_idx]
+
+
+def size_bucketed_batches(num_nodes: List[int], batch_size: int) -> List[List[int]]:
+    """
+    Returns the indices of the graphs split into batches of graphs of similar sizes, so that the batches are padded
+    as little as possible. The graphs of the same size keep their order.
+    """
+    order = sorted(range(len(num_nodes)), key=lambda i: num_nodes[i])
+    return [order[i : i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+class SizeBucketedGraphLoader:
+    """
+    Iterates over the batches of the model inputs of the graphs, prepared like in
+    `DiagonalRepresentationGraphDataModule` one batch at a time, as they are consumed, in the order of
+    `size_bucketed_batches`. Each graph keeps the block diagonals up to its own bandwidth, the edges of the graphs
+    wider than `max_bandwidth` are truncated, as the model can't represent them.
+    """
+
+    def __init__(
+        self,
+        graphs: List,
+        block_size: int,
+        batch_size: int,
+        bfs: bool = False,
+        max_bandwidth: int = 0,
+    ):
+        self.graphs = graphs
+        self.block_size = block_size
+        self.bfs = bfs
+        self.max_bandwidth = max_bandwidth
+        self.batches = size_bucketed_batches([g.shape[0] for g in graphs], batch_size)
+
+    def __len__(self) -> int:
+        return len(self.batches)
+
+    def prepare_graph(self, graph) -> Tensor:
+        if self.bfs:
+            graph = adjmatrix.bfs_ordering(graph)
+        return adjmatrix.minimize_adj_matrix(graph)
+
+    def num_diagonals(self, adj_matrix: Tensor) -> Optional[int]:
+        if not self.max_bandwidth:
+            return None
+        bandwidth = calculate_bandwidth_in_blocks(
+            adj_matrix, adj_matrix.shape[0], self.block_size
+        )
+        return min(bandwidth, self.max_bandwidth)
+
+    def __iter__(self) -> Iterator[SizeBucketedBatch]:
+        for indices in self.batches:
+            adj_matrices = [self.prepare_graph(self.graphs[i]) for i in indices]
+            examples = [
+                diagonal_block_example(
+                    adj_matrix.clone(),
+                    adj_matrix.shape[0],
+                    self.block_size,
+                    self.num_diagonals(adj_matrix),
+                )
+                for adj_matrix in adj_matrices
+            ]
+            yield indices, adj_matrices, collate_diagonal_block_examples(examples)
@@ -0,0 +1,30 @@
+import argparse
+
+from rga.experiments.experiment import Experiment
+from rga.util import load_model
+
+
+class DistillationExperiment(Experiment):
+    """
+    Experiment training a `DistilledRecursiveGraphAutoencoder`. The graph format arguments default to the
+    teacher's, as the teacher outputs are only comparable on graphs in the format it was trained on.
+    """
+
+    teacher_data_args = ["block_size", "edge_size", "bfs", "max_bandwidth"]
+
+    def create_parser(self):
+        parser = super().create_parser()
+
+        teacher_parser = argparse.ArgumentParser(add_help=False)
+        teacher_parser.add_argument("--teacher_hparams_path", type=str)
+        teacher_args, _ = teacher_parser.parse_known_args()
+        if teacher_args.teacher_hparams_path is not None:
+            teacher_hparams = load_model.load_hparams(teacher_args.teacher_hparams_path)
+            parser.set_defaults(
+                **{
+                    name: teacher_hparams[name]
+                    for name in self.teacher_data_args
+                    if name in teacher_hparams
+                }
+            )
+        return parser
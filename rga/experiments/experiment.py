@@ -12,6 +12,7 @@ from pytorch_lightning.callbacks import LearningRateMonitor
 from rga.data import BaseDataModule, data_module
 from rga.models.base import BaseModel
 from rga import util
+from rga.util.callbacks import HostSyncMonitor
 from rga.util.early_stopping import (
     EarlyStoppingBase,
     ProgressiveSubgraphTrainingEarlyStopping,
@@ -96,6 +97,9 @@ class Experiment:
             lr_monitor = LearningRateMonitor(logging_interval="step")
             trainer.callbacks.append(lr_monitor)
 
+        if args.host_sync_monitor:
+            trainer.callbacks.append(HostSyncMonitor())
+
         steps_per_epoch = util.divide_int_round_up(
             len(self.data_module.train_dataset), self.data_module.batch_size
         )
@@ -235,6 +239,13 @@ class Experiment:
             default=False,
             help="Enable learning rate monitor",
         )
+        parser.add_argument(
+            "--host_sync_monitor",
+            dest="host_sync_monitor",
+            type=bool,
+            default=False,
+            help="Log the number of device to host synchronizations per training step",
+        )
         parser.add_argument(
             "--load_from_checkpoint_path",
             dest="load_from_checkpoint_path",
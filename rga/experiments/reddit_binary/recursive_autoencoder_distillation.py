@@ -0,0 +1,74 @@
+from argparse import ArgumentParser
+
+from rga.experiments.distillation import DistillationExperiment
+from rga.experiments.decorators import add_graphloader_args
+from rga.data import (
+    DiagonalRepresentationGraphDataModule,
+    RealGraphLoader,
+)
+from rga.models.distilled_autoencoder import DistilledRecursiveGraphAutoencoder
+
+
+class ExperimentModel(DistilledRecursiveGraphAutoencoder):
+    @staticmethod
+    def add_model_specific_args(parent_parser: ArgumentParser):
+        parser = DistilledRecursiveGraphAutoencoder.add_model_specific_args(
+            parent_parser
+        )
+        parser.set_defaults(
+            loss_function="BCEWithLogits",
+            mask_loss_function="BCEWithLogits",
+            mask_loss_weight=0.5,
+            diagonal_embeddings_loss_weight=0.2,
+            recall_to_precision_bias=0.03,
+            embedding_distillation_weight=1.0,
+            logits_distillation_weight=0.5,
+            reconstruction_loss_weight=1.0,
+            gradient_clip_val=1.0,
+            optimizer="AdamWAMSGrad",
+            learning_rate=0.0003,
+            lr_monitor=True,
+            lr_scheduler_name="none",
+            # the teacher outputs are cached per graph, so the graphs should not change between the epochs
+            subgraph_scheduler_name="none",
+            batch_size=2,
+            accumulate_grad_batches=16,
+            # about a quarter of the widths of the teacher in `recursive_autoencoder_training.py`
+            embedding_size=432,
+            encoder_hidden_layer_sizes=[1024],
+            encoder_activation_function="ELU",
+            decoder_hidden_layer_sizes=[1536],
+            decoder_activation_function="ELU",
+            metrics=[
+                "EdgeAccuracy",
+                "EdgePrecision",
+                "EdgeRecall",
+                "EdgeF1",
+                "MaskPrecision",
+                "MaskRecall",
+                "MaxGraphSize",
+                "MeanDistillationLoss",
+            ],
+            max_epochs=10000,
+            check_val_every_n_epoch=1,
+            metric_update_interval=3,
+            early_stopping=False,
+            num_dataset_graph_permutations=1,
+            dataset_name="REDDIT-BINARY",
+        )
+        return parser
+
+
+@add_graphloader_args
+class ExperimentDataModule(DiagonalRepresentationGraphDataModule):
+    graphloader_class = RealGraphLoader
+
+
+if __name__ == "__main__":
+    DistillationExperiment(ExperimentModel, ExperimentDataModule).run()
+
+# python -m rga.experiments.reddit_binary.recursive_autoencoder_distillation \
+#     --teacher_hparams_path=<teacher run>/hparams.yaml \
+#     --teacher_checkpoint_path=<teacher run>/checkpoints/<best>.ckpt \
+#     --datasets_dir=/rga/datasets \
+#     --gpus=1
@@ -1,50 +1,84 @@
+from typing import Dict, Iterable, List, Tuple
+
 import torch
-import torchmetrics
+from torch import Tensor
+
+
+def confusion_counts(target: List[Tensor], predicted: List[Tensor]) -> Tensor:
+    """
+    Returns the per graph edge confusion counts of shape [num_graphs, target, predicted],
+    i.e. [[TN, FP], [FN, TP]] for each graph.
+
+    The graphs are flattened, packed into a single tensor and counted in one pass. If a prediction is shorter
+    or longer than its target, the missing part of either one is treated as non-existing edges.
+    """
+    target_sizes = graph_num_values(target)
+    predicted_sizes = graph_num_values(predicted)
+    num_graphs = len(target)
+    pair_sizes = torch.maximum(target_sizes, predicted_sizes)
+    pair_offsets = pair_sizes.cumsum(0) - pair_sizes
+
+    packed_target = pack_into_pairs(target, target_sizes, pair_offsets, pair_sizes)
+    packed_predicted = pack_into_pairs(
+        predicted, predicted_sizes, pair_offsets, pair_sizes
+    )
+    graph_indices = torch.repeat_interleave(torch.arange(num_graphs), pair_sizes)
+
+    counts = torch.bincount(
+        graph_indices * 4 + packed_target * 2 + packed_predicted,
+        minlength=num_graphs * 4,
+    )
+    return counts.view(num_graphs, 2, 2)
+
+
+def pack_into_pairs(
+    graphs: List[Tensor], sizes: Tensor, pair_offsets: Tensor, pair_sizes: Tensor
+) -> Tensor:
+    """
+    Concatenates flattened graphs, placing each one at the start of its target-prediction pair's slot.
+    """
+    packed = torch.zeros(int(pair_sizes.sum()), dtype=torch.long)
+    if len(graphs) == 0 or sizes.sum() == 0:
+        return packed
+    values = (torch.cat([g.flatten() for g in graphs]) > 0.5).long()
+    position_in_graph = torch.arange(len(values)) - torch.repeat_interleave(
+        sizes.cumsum(0) - sizes, sizes
+    )
+    packed[torch.repeat_interleave(pair_offsets, sizes) + position_in_graph] = values
+    return packed
+
+
+def graph_sizes(graphs: List[Tensor]) -> Tensor:
+    return torch.tensor([g.shape[0] for g in graphs], dtype=torch.long)
+
+
+def graph_num_values(graphs: List[Tensor]) -> Tensor:
+    return torch.tensor([g.numel() for g in graphs], dtype=torch.long)
 
-from rga.util import adjmatrix
 
+def num_diagonals_from_sizes(sizes: Tensor) -> Tensor:
+    """
+    Vectorized `block_count_to_num_block_diagonals` for the diagonal representation lengths.
+    """
+    return ((torch.sqrt(sizes.double() * 8 + 1) - 1) / 2).long()
 
-def metric(
-    target,
-    predicted,
-    func,
-    weight_power=1,
-):
-    metric_func = func(num_classes=2, average=None)
 
-    metrics = []
-    weights = []
-    for target_graph, predicted_graph in zip(target, predicted):
-        target_graph_size = adjmatrix.block_count_to_num_block_diagonals(
-            target_graph.shape[0]
-        )
+def precision(counts: Tensor) -> Tensor:
+    return torch.nan_to_num(counts[:, 1, 1] / counts[:, :, 1].sum(dim=1), nan=0.0)
 
-        target_graph = target_graph.flatten()
-        predicted_graph = predicted_graph.flatten()
 
-        if target_graph.shape[0] != predicted_graph.shape[0]:
-            new_size = max([target_graph.shape[0], predicted_graph.shape[0]])
-            target_graph = torch.nn.functional.pad(
-                target_graph, [0, new_size - target_graph.shape[0]]
-            )
-            predicted_graph = torch.nn.functional.pad(
-                predicted_graph, [0, new_size - predicted_graph.shape[0]]
-            )
+def recall(counts: Tensor) -> Tensor:
+    return torch.nan_to_num(counts[:, 1, 1] / counts[:, 1, :].sum(dim=1), nan=0.0)
 
-        precision_value = metric_func(predicted_graph, target_graph)[1]
-        if precision_value != precision_value:
-            precision_value = 0
 
-        metrics.append(precision_value)
+def accuracy(counts: Tensor) -> Tensor:
+    correct = counts[:, 0, 0] + counts[:, 1, 1]
+    return torch.nan_to_num(correct / counts.flatten(start_dim=1).sum(dim=1), nan=0.0)
 
-        weight = target_graph_size ** (weight_power)
-        if weight_power == 2:
-            weight /= 2
-        weights.append(torch.tensor(weight))
 
-    metrics = torch.stack(metrics)
-    weights = torch.stack(weights)
-    return (metrics * weights).sum() / weights.sum()
+def weighted_mean(values: Tensor, target_sizes: Tensor, weight_power: int) -> Tensor:
+    weights = num_diagonals_from_sizes(target_sizes).double() ** weight_power
+    return (values.double() * weights).sum() / weights.sum()
 
 
 def f1(precision, recall):
@@ -53,21 +87,17 @@ def f1(precision, recall):
     return 2 / (1 / precision + 1 / recall)
 
 
-def mean_size_error(target, predicted):
-    target_sizes = torch.tensor([el.shape[0] for el in target])
-    predicted_sizes = torch.tensor([el.shape[0] for el in predicted])
+def mean_size_error(target_sizes: Tensor, predicted_sizes: Tensor) -> Tensor:
     return ((target_sizes - predicted_sizes).abs() / target_sizes).mean()
 
 
-def size_accuracy(target, predicted):
-    target_sizes = torch.tensor([el.shape[0] for el in target])
-    predicted_sizes = torch.tensor([el.shape[0] for el in predicted])
-    return (target_sizes == predicted_sizes).sum() / len(target)
+def size_accuracy(target_sizes: Tensor, predicted_sizes: Tensor) -> Tensor:
+    return (target_sizes == predicted_sizes).sum() / len(target_sizes)
 
 
-def num_node_error_on_size_error(target, predicted):
-    target_sizes = torch.tensor([el.shape[0] for el in target])
-    predicted_sizes = torch.tensor([el.shape[0] for el in predicted])
+def num_node_error_on_size_error(
+    target_sizes: Tensor, predicted_sizes: Tensor
+) -> Tensor:
     indices_size_error = target_sizes != predicted_sizes
     target_sizes = target_sizes[indices_size_error]
     predicted_sizes = predicted_sizes[indices_size_error]
@@ -75,9 +105,9 @@ def num_node_error_on_size_error(target, predicted):
     return size_differences.float().mean()
 
 
-def mean_size_error_on_size_error(target, predicted):
-    target_sizes = torch.tensor([el.shape[0] for el in target])
-    predicted_sizes = torch.tensor([el.shape[0] for el in predicted])
+def mean_size_error_on_size_error(
+    target_sizes: Tensor, predicted_sizes: Tensor
+) -> Tensor:
     indices_size_error = target_sizes != predicted_sizes
     target_sizes = target_sizes[indices_size_error]
     predicted_sizes = predicted_sizes[indices_size_error]
@@ -85,44 +115,63 @@ def mean_size_error_on_size_error(target, predicted):
     return (size_differences / target_sizes).mean()
 
 
-def calculate_metrics(target, predictions):
-    precision_values = []
-    recall_values = []
-    accuracy_values = []
+def calculate_metrics(target, predictions) -> Dict[str, float]:
+    return metrics_from_counts(
+        confusion_counts(target, predictions),
+        graph_sizes(target),
+        graph_sizes(predictions),
+    )
+
+
+def calculate_metrics_from_chunks(
+    chunks: Iterable[Tuple[List[Tensor], List[Tensor]]],
+) -> Dict[str, float]:
+    """
+    `calculate_metrics` of a dataset given as a stream of (targets, predictions) chunks, keeping only the counts
+    and sizes of the graphs of the consumed chunks.
+    """
+    counts, target_sizes, predicted_sizes = [], [], []
+    for target, predictions in chunks:
+        counts.append(confusion_counts(target, predictions))
+        target_sizes.append(graph_sizes(target))
+        predicted_sizes.append(graph_sizes(predictions))
+    return metrics_from_counts(
+        torch.cat(counts), torch.cat(target_sizes), torch.cat(predicted_sizes)
+    )
+
+
+def metrics_from_counts(
+    counts: Tensor, target_sizes: Tensor, predicted_sizes: Tensor
+) -> Dict[str, float]:
+    """
+    Calculates all metrics from the per graph confusion counts and sizes. Counts and sizes of
+    separately evaluated parts of a dataset may simply be concatenated before calling this.
+    """
+    precision_values = precision(counts)
+    recall_values = recall(counts)
+    accuracy_values = accuracy(counts)
+
+    metrics = {}
     for weight_power in [0, 1, 2]:
-        precision_values.append(
-            metric(
-                target, predictions, torchmetrics.Precision, weight_power=weight_power
-            )
-        )
-        recall_values.append(
-            metric(target, predictions, torchmetrics.Recall, weight_power=weight_power)
-        )
-        accuracy_values.append(
-            metric(
-                target, predictions, torchmetrics.Accuracy, weight_power=weight_power
-            )
-        )
-
-    return {
-        "Accuracy_w0": accuracy_values[0].item(),
-        "Precision_w0": precision_values[0].item(),
-        "Recall_w0": recall_values[0].item(),
-        "F1_w0": f1(precision_values[0].item(), recall_values[0]).item(),
-        "Accuracy_w1": accuracy_values[1].item(),
-        "Precision_w1": precision_values[1].item(),
-        "Recall_w1": recall_values[1].item(),
-        "F1_w1": f1(precision_values[1].item(), recall_values[1]).item(),
-        "Accuracy_w2": accuracy_values[2].item(),
-        "Precision_w2": precision_values[2].item(),
-        "Recall_w2": recall_values[2].item(),
-        "F1_w2": f1(precision_values[2].item(), recall_values[2].item()),
-        "Size accuracy": size_accuracy(target, predictions).item(),
-        "Mean size error": mean_size_error(target, predictions).item(),
-        "Num node error on size error": num_node_error_on_size_error(
-            target, predictions
-        ).item(),
-        "Mean size error on size error": mean_size_error_on_size_error(
-            target, predictions
-        ).item(),
-    }
+        weighted_precision = weighted_mean(precision_values, target_sizes, weight_power)
+        weighted_recall = weighted_mean(recall_values, target_sizes, weight_power)
+        metrics[f"Accuracy_w{weight_power}"] = weighted_mean(
+            accuracy_values, target_sizes, weight_power
+        ).item()
+        metrics[f"Precision_w{weight_power}"] = weighted_precision.item()
+        metrics[f"Recall_w{weight_power}"] = weighted_recall.item()
+        metrics[f"F1_w{weight_power}"] = f1(weighted_precision, weighted_recall).item()
+
+    metrics.update(
+        {
+            "Size accuracy": size_accuracy(target_sizes, predicted_sizes).item(),
+            "Mean size error": mean_size_error(target_sizes, predicted_sizes).item(),
+            "Num node error on size error": num_node_error_on_size_error(
+                target_sizes, predicted_sizes
+            ).item(),
+            "Mean size error on size error": mean_size_error_on_size_error(
+                target_sizes, predicted_sizes
+            ).item(),
+        }
+    )
+    return metrics
@@ -5,14 +5,29 @@ import torch
 from torch import Tensor
 import torchmetrics
 
+from rga.util.async_draw import AsyncGraphRenderer
 from rga.util.draw import draw_diag_repr_graph
+from rga.util.generate_graphs import remove_batch_block_padding
 
 
 class GraphDrawer(torchmetrics.Metric):
+    """
+    Draws the last predicted and target graphs every `log_every_epochs` epochs.
+
+    By default the drawing is done by a background process shared by all drawers with the same
+    rendering settings, which drops frames if it falls behind. Large graphs may be capped to their first `max_rendered_nodes` nodes
+    and drawn with a cheaper `layout`, see `rga.util.draw.LAYOUTS`.
+    """
+
     label = "graph_drawer"
     alt_logging = True
     log_every_epochs = 100
     num_graphs = 1
+    async_rendering = True
+    max_queued_frames = 4
+    max_rendered_nodes = None
+    layout = "spring"
+    _renderers = {}
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -51,32 +66,49 @@ class GraphDrawer(torchmetrics.Metric):
         self.draw_graph(name, epoch)
 
     def draw_graph(self, name: str, epoch: int):
+        frame = []
+        # the padding of all the drawn graphs is removed at once
+        predicted_edges, edges_block_counts = remove_batch_block_padding(
+            self.last_predicted_edges.detach().cpu()
+        )
+        predicted_masks, mask_block_counts = remove_batch_block_padding(
+            self.last_predicted_mask.detach().cpu()
+        )
+        predicted_edges = torch.sigmoid(predicted_edges)
+        predicted_masks = torch.sigmoid(predicted_masks)
         for i in range(self.num_graphs):
-            predicted_edges, predicted_mask = self.remove_padding(
-                torch.sigmoid(self.last_predicted_edges[i]),
-                torch.sigmoid(self.last_predicted_mask[i]),
-                0.0,
-            )
             pred_g, pred_num_nodes = self.clean_raw_diag_repr_graph(
-                predicted_edges, predicted_mask
+                predicted_edges[i, : edges_block_counts[i]],
+                predicted_masks[i, : mask_block_counts[i]],
             )
-            draw_diag_repr_graph(pred_g, pred_num_nodes, f"{name}_{epoch}_{i}_pred")
+            frame.append((pred_g, pred_num_nodes, f"{name}_{epoch}_{i}_pred"))
+            # cloned, so that the rest of the batch is not sent along with the view
+            frame.append(
+                (
+                    self.last_target_edges[i].detach().cpu().clone(),
+                    int(self.last_target_num_nodes[i]),
+                    f"{name}_{epoch}_{i}_target",
+                )
+            )
+
+        if self.async_rendering:
+            self.get_renderer().submit(frame)
+            return
+        for g, num_nodes, graph_name in frame:
             draw_diag_repr_graph(
-                self.last_target_edges[i].cpu().detach(),
-                self.last_target_num_nodes[i].cpu().detach(),
-                f"{name}_{epoch}_{i}_target",
+                g,
+                num_nodes,
+                graph_name,
+                max_num_nodes=self.max_rendered_nodes,
+                layout=self.layout,
             )
 
-    def remove_padding(self, edges, mask, padding_v) -> Tuple[Tensor, Tensor]:
-        edges = edges.cpu().detach()
-        mask = mask.cpu().detach()
-        proper_mask_indices = mask != padding_v
-        mask_shape = mask.shape[1:]
-        mask = mask[proper_mask_indices]
-        mask = torch.reshape(mask, (-1, *mask_shape))
-        edges = edges[proper_mask_indices]
-        edges = torch.reshape(edges, (-1, *mask_shape))
-        return edges, mask
+    @classmethod
+    def get_renderer(cls) -> AsyncGraphRenderer:
+        config = (cls.max_queued_frames, cls.max_rendered_nodes, cls.layout)
+        if config not in GraphDrawer._renderers:
+            GraphDrawer._renderers[config] = AsyncGraphRenderer(*config)
+        return GraphDrawer._renderers[config]
 
     def clean_raw_diag_repr_graph(
         self, edges: Tensor, mask: Tensor
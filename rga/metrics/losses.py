@@ -2,45 +2,51 @@ import torch
 import torchmetrics
 
 
-class MeanReconstructionLoss(torchmetrics.MeanMetric):
-    label = "loss_reconstruction"
+class MeanLoss(torchmetrics.Metric):
+    """
+    Mean of a loss value over the epoch.
+
+    The loss is accumulated on its device. Unlike `torchmetrics.MeanMetric`, the updates do not check the values
+    for NaNs, so that no host synchronization happens before the metric is computed at logging time.
+    """
+
+    label = "loss"
+    loss_name = None
 
-    def update(
-        self,
-        loss_reconstruction: torch.Tensor,
-        **kwargs,
-    ):
-        super().update(loss_reconstruction.item())
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.add_state("loss_sum", default=torch.zeros(1), dist_reduce_fx="sum")
+        self.add_state("num_updates", default=torch.zeros(1), dist_reduce_fx="sum")
 
+    def update(self, **kwargs):
+        loss = kwargs[self.loss_name]
+        self.loss_sum += loss.detach().sum().float()
+        self.num_updates += 1
 
-class MeanEmbeddingsLoss(torchmetrics.MeanMetric):
+    def compute(self) -> torch.Tensor:
+        return self.loss_sum / self.num_updates
+
+
+class MeanReconstructionLoss(MeanLoss):
+    label = "loss_reconstruction"
+    loss_name = "loss_reconstruction"
+
+
+class MeanEmbeddingsLoss(MeanLoss):
     label = "loss_embeddings"
+    loss_name = "loss_embeddings"
 
-    def update(
-        self,
-        loss_embeddings: torch.Tensor,
-        **kwargs,
-    ):
-        super().update(loss_embeddings.item())
 
+class MeanDistillationLoss(MeanLoss):
+    label = "loss_distillation"
+    loss_name = "loss_distillation"
 
-class MeanKLDLoss(torchmetrics.MeanMetric):
-    label = "loss_kld"
 
-    def update(
-        self,
-        loss_kld: torch.Tensor,
-        **kwargs,
-    ):
-        super().update(loss_kld.item())
+class MeanKLDLoss(MeanLoss):
+    label = "loss_kld"
+    loss_name = "loss_kld"
 
 
-class MeanClassificationLoss(torchmetrics.MeanMetric):
+class MeanClassificationLoss(MeanLoss):
     label = "loss_classifiaction"
-
-    def update(
-        self,
-        loss_classification: torch.Tensor,
-        **kwargs,
-    ):
-        super().update(loss_classification.item())
+    loss_name = "loss_classification"
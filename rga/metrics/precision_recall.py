@@ -1,271 +1,243 @@
-from typing import List, Tuple
+from abc import ABC, abstractmethod
+from typing import Tuple
 import torch
 from torch.functional import Tensor
 import torchmetrics
 
 from rga.util.adjmatrix.diagonal_block_representation import (
     calculate_num_blocks,
+    block_count_to_num_block_diagonals,
 )
-from rga.models.utils.calc import torch_bincount
 
 
-class EdgeMetric(torchmetrics.Metric):
+class EdgeConfusionMetric(torchmetrics.Metric):
+    """
+    Base of the edge classification metrics weighted by the size of the graphs.
+
+    All edge metrics are derived from a per graph size confusion tensor of shape
+    [num_size_classes, target, predicted], where the size class of a graph is its number of blocks.
+    The tensor is accumulated over an epoch. Its size is fixed, as required to sum it across processes,
+    to `num_size_classes`, which must exceed the number of blocks of the largest graph.
+    Per size metric values are averaged with the weight `size ^ (2 - weight_power) * graph_count`.
+    """
+
     label = "edge_metric"
-    metric_class = None
     weight_power = 1
+    num_size_classes = 4096
 
-    def __init__(self, **kwargs):
+    def __init__(self, num_size_classes: int = None, **kwargs):
         super().__init__(**kwargs)
-        self.metric = self.metric_class(num_classes=2, average=None, **kwargs)
-
-        self.add_state("metrics", default=[], dist_reduce_fx="cat")
-        self.add_state("weights", default=[], dist_reduce_fx="cat")
-        self.metric_type_label = self.get_generic_metric_label()
-
-    def get_generic_metric_label(self) -> str:
-        """
-        Returns a label with just the type of metric.
-        ex. edge_torchmetrics.Precision
-        """
-        return "edge_" + self.metric_class.__name__
+        if num_size_classes is not None:
+            self.num_size_classes = num_size_classes
+        self.add_state(
+            "confusion",
+            default=torch.zeros((self.num_size_classes, 2, 2), dtype=torch.long),
+            dist_reduce_fx="sum",
+        )
+        self.add_state(
+            "graph_counts",
+            default=torch.zeros(self.num_size_classes, dtype=torch.long),
+            dist_reduce_fx="sum",
+        )
 
     def update(
         self,
         edges_predicted: torch.Tensor,
         edges_target: torch.Tensor,
         num_nodes: torch.Tensor,
-        shared_metric_state: dict = None,
+        max_bandwidth: int = 0,
         **kwargs,
     ):
-        if (
-            isinstance(shared_metric_state, dict)
-            and self.metric_type_label in shared_metric_state
-        ):
-            self.metric.reset()
-            self.metrics = shared_metric_state[self.metric_type_label]
-            self.calc_weights_only(edges_predicted, num_nodes)
-            shared_metric_state[self.label + "_weights"] = self.weights
-            return
-
-        new_metrics, new_weights = calc_egde_metric(
-            edges_predicted, edges_target, num_nodes, self.metric, self.weight_power
-        )
-        self.metrics.extend(new_metrics)
-        self.weights.extend(new_weights)
-
-        if isinstance(shared_metric_state, dict):
-            shared_metric_state[self.metric_type_label] = self.metrics
-            shared_metric_state[self.label + "_weights"] = self.weights
+        num_size_classes = max_num_size_classes(edges_target, max_bandwidth)
+        if num_size_classes > self.num_size_classes:
+            raise ValueError(
+                f"a batch with up to {num_size_classes} size classes exceeds the `num_size_classes` "
+                f"of {self.num_size_classes} of {type(self).__name__}, increase it"
+            )
 
-    def calc_weights_only(self, edges_predicted, num_nodes):
-        edges_predicted = torch.sigmoid(edges_predicted).round().int()
+        confusion, graph_counts = calc_edge_confusion(
+            edges_predicted, edges_target, num_nodes, self.num_size_classes
+        )
+        self.confusion += confusion
+        self.graph_counts += graph_counts
 
-        block_size = edges_predicted.shape[2] if len(edges_predicted.shape) == 5 else 1
-        if block_size != 1:
-            num_blocks = calculate_num_blocks(num_nodes, block_size)
-        else:
-            num_blocks = num_nodes
+    def size_weights(self) -> Tensor:
+        sizes = torch.arange(
+            self.graph_counts.shape[0], device=self.graph_counts.device
+        )
+        return sizes.double().pow(2 - self.weight_power) * self.graph_counts
 
-        graph_counts_per_size = torch_bincount(num_blocks)
 
-        for index, count in enumerate(graph_counts_per_size):
-            if count != 0:
-                self.weights.append(
-                    pow(index * block_size, 2 - self.weight_power) * count
-                )
+class EdgeMetric(EdgeConfusionMetric, ABC):
+    """
+    Edge metric computed for each size class from its confusion matrix, see `EdgeConfusionMetric`.
+    """
 
     def compute(self) -> torch.Tensor:
-        metrics = (
-            torch.stack(self.metrics)
-            if isinstance(self.metrics, list)
-            else self.metrics
-        )
-        weights = (
-            torch.stack(self.weights)
-            if isinstance(self.weights, list)
-            else self.weights
+        return weighted_mean(
+            self.metric_from_confusion(self.confusion),
+            self.size_weights(),
         )
-        return (metrics * weights).sum() / weights.sum()
 
+    @staticmethod
+    @abstractmethod
+    def metric_from_confusion(confusion: Tensor) -> Tensor:
+        pass
+
+
+def max_num_size_classes(edges_target: Tensor, max_bandwidth: int = 0) -> int:
+    """
+    Returns an upper limit of the number of size classes (graph sizes in blocks) present in a batch.
+    It is derived from the padded batch shape only, so that no device synchronization is needed.
+    With a block size of 1 the size class is the number of nodes, hence the extra class.
+    """
+    return (
+        block_count_to_num_block_diagonals(edges_target.shape[1], max_bandwidth or None)
+        + 2
+    )
 
-def calc_egde_metric(
+
+def calc_edge_confusion(
     edges_predicted: torch.Tensor,
     edges_target: torch.Tensor,
     num_nodes: torch.Tensor,
-    metric: torchmetrics.Metric,
-    weight_power: float,
-) -> Tuple[List[Tensor], List[Tensor]]:
+    num_size_classes: int,
+) -> Tuple[Tensor, Tensor]:
     """
-    Returns per graph metric and weight values calculated based on the metric passed.
+    Returns the edge confusion tensor of shape [num_size_classes, target, predicted] and the graph
+    counts per size class. Both are counted in a single vectorized pass over the whole batch.
+    The padding of the target (negative values) is treated as a non-existing edge.
     """
-    edges_predicted = torch.sigmoid(edges_predicted).round().int()
-    edges_target = torch.clamp(edges_target.int(), min=0)
+    edges_predicted = (edges_predicted > 0).long()
+    edges_target = (edges_target > 0).long()
 
     block_size = edges_predicted.shape[2] if len(edges_predicted.shape) == 5 else 1
     if block_size != 1:
         num_blocks = calculate_num_blocks(num_nodes, block_size)
     else:
         num_blocks = num_nodes
+    num_blocks = num_blocks.long().to(edges_predicted.device)
+
+    confusion_indices = (
+        num_blocks.view(-1, *[1] * (edges_target.ndim - 1)) * 4
+        + edges_target * 2
+        + edges_predicted
+    )
+    confusion = torch.zeros(
+        num_size_classes * 4, dtype=torch.long, device=edges_predicted.device
+    )
+    confusion.scatter_add_(
+        0,
+        confusion_indices.flatten(),
+        torch.ones(1, dtype=torch.long, device=edges_predicted.device).expand(
+            confusion_indices.numel()
+        ),
+    )
 
-    graph_counts_per_size = torch_bincount(num_blocks)
+    graph_counts = torch.zeros(
+        num_size_classes, dtype=torch.long, device=edges_predicted.device
+    )
+    graph_counts.scatter_add_(0, num_blocks, torch.ones_like(num_blocks))
 
-    metric_values = []
-    weights = []
+    return confusion.view(num_size_classes, 2, 2), graph_counts
 
-    for index, count in enumerate(graph_counts_per_size):
-        if count != 0:
-            mask = num_blocks == index
-            predicted = edges_predicted[mask].flatten()
-            target = edges_target[mask].flatten()
 
-            current_metric = metric(predicted, target)[1]
-            metric.reset()
-            if current_metric != current_metric:
-                current_metric = torch.zeros(1, device=predicted.device)[0]
+def precision_from_confusion(confusion: Tensor) -> Tensor:
+    true_positives = confusion[..., 1, 1].double()
+    predicted_positives = confusion[..., :, 1].sum(dim=-1).double()
+    return torch.nan_to_num(true_positives / predicted_positives, nan=0.0)
 
-            metric_values.append(current_metric)
 
-            weights.append(pow(index * block_size, 2 - weight_power) * count)
+def recall_from_confusion(confusion: Tensor) -> Tensor:
+    true_positives = confusion[..., 1, 1].double()
+    target_positives = confusion[..., 1, :].sum(dim=-1).double()
+    return torch.nan_to_num(true_positives / target_positives, nan=0.0)
 
-    return metric_values, weights
+
+def accuracy_from_confusion(confusion: Tensor) -> Tensor:
+    correct = (confusion[..., 0, 0] + confusion[..., 1, 1]).double()
+    total = confusion.flatten(start_dim=-2).sum(dim=-1).double()
+    return torch.nan_to_num(correct / total, nan=0.0)
+
+
+def weighted_mean(values: Tensor, weights: Tensor) -> Tensor:
+    return ((values * weights).sum() / weights.sum()).float()
+
+
+def f1(precision: Tensor, recall: Tensor) -> Tensor:
+    if precision <= 0 or recall <= 0:
+        return torch.zeros_like(precision)
+    return 2 / (1 / precision + 1 / recall)
 
 
 class EdgePrecision(EdgeMetric):
     label = "edge_precision"
-    metric_class = torchmetrics.Precision
+    metric_from_confusion = staticmethod(precision_from_confusion)
 
 
-class EdgeRecall(EdgePrecision):
+class EdgeRecall(EdgeMetric):
     label = "edge_recall"
-    metric_class = torchmetrics.Recall
+    metric_from_confusion = staticmethod(recall_from_confusion)
+
+
+class EdgeAccuracyWeighted(EdgeMetric):
+    label = "edge_accuracy_weighted"
+    metric_from_confusion = staticmethod(accuracy_from_confusion)
 
 
-class EdgePrecisionNonWeighted(EdgeMetric):
+class EdgePrecisionNonWeighted(EdgePrecision):
     weight_power = 0
     label = "edge_precision_non_weighted"
-    metric_class = torchmetrics.Precision
 
 
-class EdgeRecallNonWeighted(EdgePrecision):
+class EdgeRecallNonWeighted(EdgeRecall):
     weight_power = 0
     label = "edge_recall_non_weighted"
-    metric_class = torchmetrics.Recall
 
 
-class EdgePrecisionSquareWeighted(EdgeMetric):
+class EdgeAccuracyNonWeighted(EdgeAccuracyWeighted):
+    weight_power = 0
+    label = "edge_accuracy_non_weighted"
+
+
+class EdgePrecisionSquareWeighted(EdgePrecision):
     weight_power = 2
     label = "edge_precision_square_weighted"
-    metric_class = torchmetrics.Precision
 
 
-class EdgeRecallSquareWeighted(EdgePrecision):
+class EdgeRecallSquareWeighted(EdgeRecall):
     weight_power = 2
     label = "edge_recall_square_weighted"
-    metric_class = torchmetrics.Recall
 
 
-class EdgeF1(torchmetrics.Metric):
+class EdgeAccuracySquareWeighted(EdgeAccuracyWeighted):
+    weight_power = 2
+    label = "edge_accuracy_square_weighted"
+
+
+class EdgeF1(EdgeConfusionMetric):
     """
     Measures the F_1 score of edge classification.
     https://en.wikipedia.org/wiki/F-score
     """
 
     label = "edge_f1"
-    weight_power = 1
 
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.add_state("precision_metrics", default=[], dist_reduce_fx="cat")
-        self.add_state("precision_weights", default=[], dist_reduce_fx="cat")
-        self.add_state("recall_metrics", default=[], dist_reduce_fx="cat")
-        self.add_state("recall_weights", default=[], dist_reduce_fx="cat")
-
-        self.precision_metric = torchmetrics.Precision(num_classes=2, average=None)
-        self.recall_metric = torchmetrics.Recall(num_classes=2, average=None)
-        self.shared_precision_metrics_label = (
-            "edge_" + self.precision_metric.__class__.__name__
-        )
-        self.shared_recall_metrics_label = (
-            "edge_" + self.recall_metric.__class__.__name__
-        )
-        self.shared_precision_weights_label = EdgePrecision.label + "_weights"
-        self.shared_recall_weights_label = EdgeRecall.label + "_weights"
+    def compute(self) -> torch.Tensor:
+        weights = self.size_weights()
+        precision = weighted_mean(precision_from_confusion(self.confusion), weights)
+        recall = weighted_mean(recall_from_confusion(self.confusion), weights)
+        return f1(precision, recall)
 
-    def update(
-        self,
-        edges_predicted: torch.Tensor,
-        edges_target: torch.Tensor,
-        num_nodes: torch.Tensor,
-        shared_metric_state: dict = None,
-        **kwargs,
-    ):
-        self.precision_metrics, self.precision_weights = self._update_metric(
-            self.shared_precision_metrics_label,
-            self.shared_precision_weights_label,
-            self.precision_metric,
-            self.precision_metrics,
-            self.precision_weights,
-            edges_predicted,
-            edges_target,
-            num_nodes,
-            shared_metric_state,
-        )
-        self.recall_metrics, self.recall_weights = self._update_metric(
-            self.shared_recall_metrics_label,
-            self.shared_recall_weights_label,
-            self.recall_metric,
-            self.recall_metrics,
-            self.recall_weights,
-            edges_predicted,
-            edges_target,
-            num_nodes,
-            shared_metric_state,
-        )
 
-    def _update_metric(
-        self,
-        shared_metrics_label: str,
-        shared_weights_label: str,
-        metric: torchmetrics.Metric,
-        metrics: list,
-        weights: list,
-        edges_predicted: torch.Tensor,
-        edges_target: torch.Tensor,
-        num_nodes: torch.Tensor,
-        shared_metric_state: dict = None,
-    ) -> Tuple[list, list]:
-        if (
-            isinstance(shared_metric_state, dict)
-            and shared_metrics_label in shared_metric_state
-            and shared_weights_label in shared_metric_state
-        ):
-            metrics = shared_metric_state[shared_metrics_label]
-            weights = shared_metric_state[shared_weights_label]
-        else:
-            new_prec_metrics, new_prec_weights = calc_egde_metric(
-                edges_predicted,
-                edges_target,
-                num_nodes,
-                metric,
-                self.weight_power,
-            )
-            metrics.extend(new_prec_metrics)
-            weights.extend(new_prec_weights)
-            if isinstance(shared_metric_state, dict):
-                shared_metric_state[shared_metrics_label] = metrics
-        return metrics, weights
+class EdgeF1NonWeighted(EdgeF1):
+    weight_power = 0
+    label = "edge_f1_non_weighted"
 
-    def compute(self) -> torch.Tensor:
-        precision = self._compute_metric(self.precision_metrics, self.precision_weights)
-        recall = self._compute_metric(self.recall_metrics, self.recall_weights)
-        if precision <= 0 or recall <= 0:
-            return torch.tensor([0.0], device=self.device)
-        return 2 / (1 / precision + 1 / recall)
-
-    def _compute_metric(self, metrics: list, weights: list) -> Tensor:
-        stacked_metrics = torch.stack(metrics) if isinstance(metrics, list) else metrics
-        stacked_weights = torch.stack(weights) if isinstance(weights, list) else weights
-        return (stacked_metrics * stacked_weights).sum() / stacked_weights.sum()
+
+class EdgeF1SquareWeighted(EdgeF1):
+    weight_power = 2
+    label = "edge_f1_square_weighted"
 
 
 class MaskPrecision(torchmetrics.Precision):
@@ -1,9 +1,9 @@
 from argparse import ArgumentParser
-from typing import Callable, List, Tuple
+from typing import Callable, List, Optional, Tuple
 import math
 
 import torch
-from torch import Tensor
+from torch import nn, Tensor
 
 from rga.models.base import BaseModel
 from rga.models.autoencoder_components import GraphEncoder, GraphDecoder
@@ -13,6 +13,7 @@ from rga.models.utils.getters import get_loss
 
 from rga.util.adjmatrix.diagonal_block_representation import (
     calculate_num_blocks,
+    block_count_to_num_block_diagonals,
 )
 from rga.models.utils.calc import torch_bincount
 
@@ -26,6 +27,8 @@ class GraphAutoencoder(BaseModel):
         mask_loss_weight=None,
         diagonal_embeddings_loss_weight: int = 0,
         weight_power_level: float = 1,
+        sync_free_training: bool = False,
+        max_bandwidth: int = 0,
         **kwargs,
     ):
         super(GraphAutoencoder, self).__init__(loss_function=loss_function, **kwargs)
@@ -38,9 +41,37 @@ class GraphAutoencoder(BaseModel):
         self.diagonal_embeddings_loss_weight = diagonal_embeddings_loss_weight
         self.weight_power_level = weight_power_level
 
+        self.sync_free_training = sync_free_training
+        self.max_bandwidth = max_bandwidth
+
+    def transfer_batch_to_device(self, batch, device, dataloader_idx: int = 0):
+        if not self.sync_free_training:
+            return super().transfer_batch_to_device(batch, device, dataloader_idx)
+        # The numbers of nodes only drive the host-side planning of the recursion loops,
+        # so they are kept on the host to avoid reading them back from the device.
+        num_nodes = batch[2]
+        batch = super().transfer_batch_to_device(batch, device, dataloader_idx)
+        return (*batch[:2], num_nodes, *batch[3:])
+
+    def num_diagonals_batch(self, batch) -> Optional[Tensor]:
+        """
+        Returns the numbers of the kept block diagonals of the graphs of a batch of a model trained with
+        `max_bandwidth`, see `diagonal_block_example`, or None.
+        """
+        return batch[3] if self.max_bandwidth and len(batch) > 3 else None
+
     def step(self, batch, metrics: List[Callable] = []) -> Tensor:
         y_pred, diagonal_embeddings_norm = self(batch)
+        return self.calc_loss(batch, y_pred, diagonal_embeddings_norm, metrics)
 
+    def calc_loss(
+        self,
+        batch,
+        y_pred,
+        diagonal_embeddings_norm: Tensor,
+        metrics: List[Callable] = [],
+        **metric_kwargs,
+    ) -> Tensor:
         y_edge, y_mask, y_pred_edge, y_pred_mask = self.adjust_y_to_prediction(
             batch, y_pred
         )
@@ -53,7 +84,11 @@ class GraphAutoencoder(BaseModel):
         )
         loss = loss_reconstruction + loss_embeddings
 
-        shared_metric_state = {}
+        max_bandwidth = self.max_bandwidth
+        num_diagonals_batch = self.num_diagonals_batch(batch)
+        if num_diagonals_batch is not None:
+            # the narrowest graph spreads the blocks of the padded batch over the most size classes
+            max_bandwidth = int(num_diagonals_batch.min())
         for metric in metrics:
             metric.update(
                 edges_predicted=y_pred_edge,
@@ -61,9 +96,10 @@ class GraphAutoencoder(BaseModel):
                 mask_predicted=y_pred_mask,
                 mask_target=y_mask,
                 num_nodes=batch[2],
+                max_bandwidth=max_bandwidth,
                 loss_reconstruction=loss_reconstruction,
                 loss_embeddings=loss_embeddings,
-                shared_metric_state=shared_metric_state,
+                **metric_kwargs,
             )
 
         return loss
@@ -71,6 +107,11 @@ class GraphAutoencoder(BaseModel):
     def calc_reconstruction_loss(
         self, y_edge, y_mask, y_pred_edge, y_pred_mask, num_nodes
     ) -> Tensor:
+        if self.sync_free_training:
+            return self.calc_reconstruction_loss_sync_free(
+                y_edge, y_mask, y_pred_edge, y_pred_mask, num_nodes
+            )
+
         block_size = y_edge.shape[2] if len(y_edge.shape) == 5 else 1
         if block_size != 1:
             num_blocks = calculate_num_blocks(num_nodes, block_size)
@@ -160,6 +201,82 @@ class GraphAutoencoder(BaseModel):
             + ((losses_mask / weights_mask) if weights_mask else 0)
         )
 
+    def calc_reconstruction_loss_sync_free(
+        self, y_edge, y_mask, y_pred_edge, y_pred_mask, num_nodes
+    ) -> Tensor:
+        """
+        Vectorized equivalent of `calc_reconstruction_loss`, which evaluates no tensor conditions on the host.
+        The per size class means are built from per graph sums of the elementwise losses.
+        """
+        block_size = y_edge.shape[2] if len(y_edge.shape) == 5 else 1
+        if block_size != 1:
+            num_blocks = calculate_num_blocks(num_nodes, block_size)
+        else:
+            num_blocks = num_nodes
+        num_blocks = num_blocks.long().to(y_edge.device)
+        num_size_classes = (
+            block_count_to_num_block_diagonals(
+                y_edge.shape[1], self.max_bandwidth or None
+            )
+            + 2
+        )
+
+        mask = y_pred_mask > float("-inf")
+        edge_mask = mask.expand_as(y_pred_edge)
+        y_edge = torch.clamp(y_edge, min=0)
+        y_mask = torch.clamp(y_mask, min=0)
+        y_edge_1_mask = (y_edge == 1) & edge_mask
+        y_edge_0_mask = (y_edge != 1) & edge_mask
+
+        # The padding is zeroed, as an elementwise loss of `-inf` would turn into a NaN when masked out.
+        y_pred_edge = torch.where(edge_mask, y_pred_edge, torch.zeros_like(y_pred_edge))
+        y_pred_mask = torch.where(mask, y_pred_mask, torch.zeros_like(y_pred_mask))
+
+        def size_class_sums(values: Tensor) -> Tensor:
+            per_graph_sums = values.flatten(start_dim=1).sum(dim=1)
+            return torch.zeros(
+                num_size_classes, dtype=per_graph_sums.dtype, device=y_edge.device
+            ).scatter_add(0, num_blocks, per_graph_sums)
+
+        losses_edge_1 = size_class_sums(
+            elementwise_loss(self.edge_1_loss_function, y_pred_edge, y_edge)
+            * y_edge_1_mask
+        )
+        losses_edge_0 = size_class_sums(
+            elementwise_loss(self.edge_0_loss_function, y_pred_edge, y_edge)
+            * y_edge_0_mask
+        )
+        losses_mask = size_class_sums(
+            elementwise_loss(self.mask_loss_function, y_pred_mask, y_mask) * mask
+        )
+        counts_edge_1 = size_class_sums(y_edge_1_mask.float())
+        counts_edge_0 = size_class_sums(y_edge_0_mask.float())
+        counts_mask = size_class_sums(mask.float())
+        counts_edge = counts_edge_0 + counts_edge_1
+
+        graph_counts_per_size = size_class_sums(
+            torch.ones_like(num_blocks[:, None]).float()
+        )
+        sizes = torch.arange(num_size_classes, device=y_edge.device) * block_size
+        weights = sizes.float().pow(2 - self.weight_power_level) * graph_counts_per_size
+        weights = torch.where(
+            graph_counts_per_size > 0, weights, torch.zeros_like(weights)
+        )
+
+        # weight * mean loss of a size class, with the edge weights split by the 0/1 proportions
+        weighted_loss_edge_0 = weights * losses_edge_0 / counts_edge.clamp(min=1)
+        weighted_loss_edge_1 = weights * losses_edge_1 / counts_edge.clamp(min=1)
+        weighted_loss_mask = weights * losses_mask / counts_mask.clamp(min=1)
+        weights_edge_0 = (weights * counts_edge_0 / counts_edge.clamp(min=1)).sum()
+        weights_edge_1 = (weights * counts_edge_1 / counts_edge.clamp(min=1)).sum()
+        weights_mask = weights.sum()
+
+        return (
+            weighted_loss_edge_0.sum() / nonzero_or_one(weights_edge_0)
+            + weighted_loss_edge_1.sum() / nonzero_or_one(weights_edge_1)
+            + weighted_loss_mask.sum() / nonzero_or_one(weights_mask)
+        )[None]
+
     @classmethod
     def add_model_specific_args(cls, parent_parser: ArgumentParser):
         parent_parser = BaseModel.add_model_specific_args(parent_parser=parent_parser)
@@ -236,6 +353,8 @@ class RecursiveGraphAutoencoder(GraphAutoencoder):
         reconstructed_graph_diagonals, diagonal_embeddings_norm = self.decoder(
             graph_encoding_batch=graph_embeddings,
             max_number_of_nodes=max_num_nodes_in_graph_batch,
+            num_nodes_batch=num_nodes_batch,
+            num_diagonals_batch=self.num_diagonals_batch(batch),
         )
 
         return reconstructed_graph_diagonals, diagonal_embeddings_norm
@@ -269,6 +388,22 @@ class RecursiveGraphAutoencoder(GraphAutoencoder):
         return parser
 
 
+def elementwise_loss(loss_function: nn.Module, input: Tensor, target: Tensor) -> Tensor:
+    """
+    Evaluates a loss module without its reduction, keeping its configured weights.
+    """
+    reduction = loss_function.reduction
+    loss_function.reduction = "none"
+    try:
+        return loss_function(input, target)
+    finally:
+        loss_function.reduction = reduction
+
+
+def nonzero_or_one(t: Tensor) -> Tensor:
+    return torch.where(t != 0, t, torch.ones_like(t))
+
+
 def equalize_dim_by_padding(
     t1: Tensor, t2: Tensor, dim: int, padding_value_1, padding_value_2
 ) -> Tuple[Tensor, Tensor]:
@@ -1,5 +1,8 @@
+import itertools
+from collections import defaultdict
 from argparse import ArgumentParser, ArgumentError
-from typing import Callable, List, Tuple
+from functools import partial
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
 
 import torch
 from torch import nn, Tensor
@@ -12,29 +15,68 @@ from rga.models.utils.layers import (
     sequential_from_layer_sizes,
 )
 from rga.models.utils.getters import get_activation_function
+from rga.models.utils.precision import (
+    bf16_autocast,
+    check_bf16_autocast_available,
+    full_precision,
+)
+from rga.models.utils.compiled import BucketedCompiledStep
+from rga.models.utils.checkpoint import (
+    checkpoint_segment,
+    should_checkpoint,
+    split_into_segments,
+)
 from rga.util.adjmatrix.diagonal_block_representation import (
+    calculate_first_diagonal_length,
     calculate_num_blocks,
+    calculate_num_omitted_blocks,
 )
 
 from rga.models.utils.calc import torch_bincount
 
 
 class GraphEncoder(BaseModel):
+    # value of the upper triangle of the adjacency matrices and of the padding in the input blocks
+    pad_value = -1
+
     def __init__(
         self,
         edge_encoder_class: nn.Module,
         embedding_size: int,
         edge_size: int,
         block_size: int,
+        recursion_checkpoint_every: int = 0,
+        bf16_autocast: bool = False,
+        zero_cone_memoization: bool = False,
+        max_bandwidth: int = 0,
+        compiled_recursion: bool = False,
+        compiled_recursion_backend: str = "inductor",
         **kwargs,
     ):
         self.embedding_size = embedding_size
         self.edge_size = edge_size
         self.block_size = block_size
+        self.recursion_checkpoint_every = recursion_checkpoint_every
+        self.zero_cone_memoization = zero_cone_memoization
+        check_banded_recursion_args(
+            max_bandwidth,
+            recursion_checkpoint_every,
+            zero_cone_memoization=zero_cone_memoization,
+        )
+        self.max_bandwidth = max_bandwidth
+        if bf16_autocast:
+            check_bf16_autocast_available()
+        self.bf16_autocast = bf16_autocast
         super(GraphEncoder, self).__init__(**kwargs)
         self.edge_encoder = edge_encoder_class(
             embedding_size, edge_size, block_size, **kwargs
         )
+        check_compiled_recursion_args(compiled_recursion, bf16_autocast)
+        self.compiled_edge_encoder = (
+            BucketedCompiledStep(self.edge_encoder, backend=compiled_recursion_backend)
+            if compiled_recursion
+            else None
+        )
 
     def forward(self, input_batch: Tensor) -> Tensor:
         """
@@ -59,6 +101,12 @@ class GraphEncoder(BaseModel):
         diagonal_repr_graphs_batch = input_batch[0]
         diagonal_repr_graphs_batch.requires_grad = True
         num_nodes_batch = input_batch[2]
+        if self.max_bandwidth:
+            # the numbers of the kept diagonals of the graphs follow the numbers of nodes, see `diagonal_block_example`
+            num_diagonals_batch = input_batch[3] if len(input_batch) > 3 else None
+            return self.forward_banded(
+                diagonal_repr_graphs_batch, num_nodes_batch, num_diagonals_batch
+            )
         num_blocks_batch = calculate_num_blocks(num_nodes_batch, self.block_size)
 
         sorted_num_blocks_batch, ordered_indices = num_blocks_batch.sort(
@@ -83,17 +131,247 @@ class GraphEncoder(BaseModel):
             device=diagonal_repr_graphs_batch.device,
         )
 
+        # The recursion steps are planned upfront, each described by the number of graphs
+        # to add in it and the bounds of its diagonal.
+        steps = []
         for diagonal_offset in range(max_num_blocks):
+            diag_length = first_diag_length - diagonal_offset
+            diag_left_pos = diag_right_pos - diag_length
+            steps.append(
+                (
+                    int(graph_counts_per_size[max_num_blocks - diagonal_offset]),
+                    diag_left_pos,
+                    diag_right_pos,
+                )
+            )
+            diag_right_pos = diag_left_pos
+
+        zero_cone_embeddings = None
+        if self.zero_cone_memoization:
+            steps, paddings, num_levels = self.plan_zero_cones(
+                steps, diagonal_repr_graphs_batch, num_nodes_batch[ordered_indices]
+            )
+            zero_cone_embeddings = self.zero_cone_embeddings(
+                paddings, num_levels, diagonal_repr_graphs_batch.device
+            )
+        else:
+            steps = [(*step, None) for step in steps]
+
+        for segment_steps in split_into_segments(
+            steps, self.recursion_checkpoint_every
+        ):
+            encode_segment = partial(self.encode_diagonals, segment_steps)
+            if should_checkpoint(self.recursion_checkpoint_every):
+                prev_embedding = checkpoint_segment(
+                    encode_segment,
+                    prev_embedding,
+                    diagonal_repr_graphs_batch,
+                    zero_cone_embeddings,
+                )
+            else:
+                prev_embedding = encode_segment(
+                    prev_embedding, diagonal_repr_graphs_batch, zero_cone_embeddings
+                )
+
+        # Reorder back to the original batch order and skip the no longer needed second dimension.
+        return prev_embedding[indices_in_original_batch_order, 0, :]
+
+    def forward_banded(
+        self,
+        diagonal_repr_graphs_batch: Tensor,
+        num_nodes_batch: Tensor,
+        num_diagonals_batch: Optional[Tensor] = None,
+    ) -> Tensor:
+        """
+        Equivalent of `forward` for the graphs represented with only their `num_diagonals_batch` diagonals
+        closest to the main one, `max_bandwidth` for all of them by default.
+
+        The kept diagonals are encoded as in `forward`, from the main one up to the furthest one, which leaves
+        a row of embeddings below the omitted, empty far region of each graph. Instead of recursing over
+        the far region, its rows are reduced in O(row length), see `reduce_far_region`. The graphs within
+        their kept diagonals are encoded up to a single embedding, the same as in `forward`.
+        """
+        device = diagonal_repr_graphs_batch.device
+        num_blocks_batch = calculate_num_blocks(num_nodes_batch, self.block_size).long()
+        if num_diagonals_batch is None:
+            num_diagonals_batch = torch.full_like(num_blocks_batch, self.max_bandwidth)
+        sorted_num_blocks_batch, ordered_indices = num_blocks_batch.sort(
+            descending=True
+        )
+        _, indices_in_original_batch_order = ordered_indices.sort()
+        diagonal_repr_graphs_batch = diagonal_repr_graphs_batch[ordered_indices]
+        sorted_num_diagonals_batch = num_diagonals_batch.to(ordered_indices.device)[
+            ordered_indices
+        ]
+        first_diagonal_lengths = calculate_first_diagonal_length(
+            sorted_num_blocks_batch, sorted_num_diagonals_batch
+        )
+        num_omitted_blocks = calculate_num_omitted_blocks(
+            sorted_num_blocks_batch, sorted_num_diagonals_batch
+        ).to(device)
+
+        # The graphs are ordered from the largest, so they start in the batch order, but they finish
+        # after their own numbers of diagonals, so the batch positions of the graphs in progress are tracked.
+        num_blocks = sorted_num_blocks_batch.tolist()
+        first_diagonal_lengths = first_diagonal_lengths.tolist()
+        num_started = 0
+        in_progress = []
+        prev_embedding = torch.zeros((0, 0, self.embedding_size), device=device)
+        far_region_rows = [None] * len(num_blocks)
+        for diag_length in range(num_blocks[0], 0, -1):
+            num_graphs_to_add = 0
+            while (
+                num_started + num_graphs_to_add < len(num_blocks)
+                and num_blocks[num_started + num_graphs_to_add] == diag_length
+            ):
+                num_graphs_to_add += 1
+            new_graph_init_tokens = torch.zeros(
+                (num_graphs_to_add, diag_length + 1, self.embedding_size),
+                requires_grad=True,
+                device=device,
+            )
+            if len(prev_embedding) == 0:
+                prev_embedding = new_graph_init_tokens[:0]
+            prev_embedding = torch.cat([prev_embedding, new_graph_init_tokens])
+            in_progress.extend(range(num_started, num_started + num_graphs_to_add))
+            num_started += num_graphs_to_add
+            if len(prev_embedding) == 0:
+                continue
+
+            # the diagonals of each graph start where its representation is truncated
+            positions = torch.tensor(in_progress, device=device)
+            diagonal_starts = (
+                diag_length * (diag_length - 1) // 2 - num_omitted_blocks[positions]
+            )
+            diagonal_indices = diagonal_starts[:, None] + torch.arange(
+                diag_length, device=device
+            )
+            current_diagonal = diagonal_repr_graphs_batch[
+                positions[:, None], diagonal_indices
+            ]
+
+            edge_encoder = self.compiled_edge_encoder or self.edge_encoder
+            with bf16_autocast(self.bf16_autocast, device):
+                prev_embedding = edge_encoder(
+                    current_diagonal, prev_embedding[:, :-1], prev_embedding[:, 1:]
+                )
+
+            finished = [first_diagonal_lengths[p] == diag_length for p in in_progress]
+            if not any(finished):
+                continue
+            for position, row, is_finished in zip(
+                in_progress, prev_embedding.unbind(0), finished
+            ):
+                if is_finished:
+                    far_region_rows[position] = row
+            prev_embedding = prev_embedding[
+                torch.tensor([not f for f in finished], device=device)
+            ]
+            in_progress = [p for p, f in zip(in_progress, finished) if not f]
+
+        graph_embeddings = self.reduce_far_region(
+            torch.nn.utils.rnn.pad_sequence(far_region_rows, batch_first=True),
+            torch.tensor(first_diagonal_lengths, device=device),
+        )
+        return graph_embeddings[indices_in_original_batch_order]
+
+    def forward_streaming(
+        self,
+        diagonals: Iterable[Tensor],
+        num_nodes: int,
+        level_callback: Optional[Callable[[Tensor], None]] = None,
+        num_diagonals: Optional[int] = None,
+    ) -> Tensor:
+        """
+        Encodes a single graph given its block diagonals one at a time, from the main one outwards, e.g. generated
+        from an edge list by `EdgeListDiagonalBlocks`, without ever materializing its whole representation.
+        Only the current diagonal and a single row of embeddings are kept, O(num_blocks x embedding_size).
+        With `max_bandwidth`, only the kept diagonals are consumed and the far region is reduced as in `forward_banded`.
+
+        :param level_callback: optionally called with the embeddings of each level of the recursion, [1, length, embedding]
+        :param num_diagonals: number of the kept diagonals of the graph, `max_bandwidth` by default
+        :return:
+            Graph embedding Tensor of dimensions [embedding_size]
+        """
+        device = next(self.parameters()).device
+        num_blocks = int(calculate_num_blocks(torch.tensor(num_nodes), self.block_size))
+        if num_diagonals is None:
+            num_diagonals = self.max_bandwidth or num_blocks
+        num_diagonals = min(num_diagonals, num_blocks)
+
+        prev_embedding = torch.zeros(
+            (1, num_blocks + 1, self.embedding_size), device=device
+        )
+        for diagonal in itertools.islice(diagonals, num_diagonals):
+            with bf16_autocast(self.bf16_autocast, device):
+                prev_embedding = self.edge_encoder(
+                    diagonal[None].to(device),
+                    prev_embedding[:, :-1],
+                    prev_embedding[:, 1:],
+                )
+            if level_callback is not None:
+                level_callback(prev_embedding)
+
+        if prev_embedding.shape[1] != num_blocks - num_diagonals + 1:
+            raise ValueError(
+                f"expected {num_diagonals} diagonals of a graph of {num_nodes} nodes"
+            )
+        if num_diagonals < num_blocks:
+            prev_embedding = self.reduce_far_region(
+                prev_embedding,
+                torch.tensor([num_blocks - num_diagonals + 1], device=device),
+            )[:, None]
+        return prev_embedding[0, 0]
+
+    def reduce_far_region(self, rows: Tensor, row_lengths: Tensor) -> Tensor:
+        """
+        Reduces the padded rows of embeddings below the far regions of the graphs to single embeddings,
+        merging the pairs of neighbouring embeddings with the edge encoder given empty blocks, until one is left.
+        """
+        while rows.shape[1] > 1:
+            rows = F.pad(rows, (0, 0, 0, rows.shape[1] % 2))
+            embeddings_left, embeddings_right = rows[:, 0::2], rows[:, 1::2]
+            empty_blocks = rows.new_zeros(
+                (
+                    *embeddings_left.shape[:2],
+                    self.block_size,
+                    self.block_size,
+                    self.edge_size,
+                )
+            )
+            with bf16_autocast(self.bf16_autocast, rows.device):
+                merged = self.edge_encoder(
+                    empty_blocks, embeddings_left, embeddings_right
+                )
+            # the last embedding of a row of an odd length has no pair, so it is carried over as is
+            carried = (row_lengths % 2 == 1)[:, None] & (
+                torch.arange(merged.shape[1], device=rows.device)
+                == (row_lengths // 2)[:, None]
+            )
+            rows = torch.where(carried[..., None], embeddings_left, merged)
+            row_lengths = (row_lengths + 1) // 2
+        return rows[:, 0]
+
+    def encode_diagonals(
+        self,
+        steps: List[Tuple[int, int, int, Optional[Tuple]]],
+        prev_embedding: Tensor,
+        diagonal_repr_graphs_batch: Tensor,
+        zero_cone_embeddings: Optional[Tensor] = None,
+    ) -> Tensor:
+        for (
+            graphs_to_add_in_curr_diag,
+            diag_left_pos,
+            diag_right_pos,
+            zero_cones,
+        ) in steps:
             # Some graphs from the input batch may have been too small for the previous diagonal.
             # Check if they should be added now and init their embeddings.
-            graphs_to_add_in_curr_diag = graph_counts_per_size[
-                max_num_blocks - diagonal_offset
-            ]
             if graphs_to_add_in_curr_diag != 0:
                 new_graph_init_tokens = torch.zeros(
                     (
                         graphs_to_add_in_curr_diag,
-                        max_num_blocks + 1 - diagonal_offset,
+                        prev_embedding.shape[1],
                         self.embedding_size,
                     ),
                     requires_grad=True,
@@ -101,8 +379,6 @@ class GraphEncoder(BaseModel):
                 )
                 prev_embedding = torch.cat([prev_embedding, new_graph_init_tokens])
 
-            diag_length = first_diag_length - diagonal_offset
-            diag_left_pos = diag_right_pos - diag_length
             current_diagonal = diagonal_repr_graphs_batch[
                 : prev_embedding.shape[0], diag_left_pos:diag_right_pos, :
             ]
@@ -110,15 +386,183 @@ class GraphEncoder(BaseModel):
             embeddings_left = prev_embedding[:, :-1, :]
             embeddings_right = prev_embedding[:, 1:, :]
 
-            new_embedding = self.edge_encoder(
-                current_diagonal, embeddings_left, embeddings_right
+            edge_encoder = self.compiled_edge_encoder or self.edge_encoder
+            with bf16_autocast(self.bf16_autocast, prev_embedding.device):
+                if zero_cones is None:
+                    prev_embedding = edge_encoder(
+                        current_diagonal, embeddings_left, embeddings_right
+                    )
+                else:
+                    prev_embedding = self.encode_nonzero_cones(
+                        zero_cones,
+                        zero_cone_embeddings,
+                        current_diagonal,
+                        embeddings_left,
+                        embeddings_right,
+                    )
+        return prev_embedding
+
+    def plan_zero_cones(
+        self,
+        steps: List[Tuple[int, int, int]],
+        diagonal_repr_graphs_batch: Tensor,
+        num_nodes_batch: Tensor,
+    ) -> Tuple[List[Tuple[int, int, int, Optional[Tuple]]], Tensor, int]:
+        """
+        Adds to each recursion step the positions with nonzero cones, the indices of the graphs' paddings and their
+        depths in their pyramids, or None if there are no zero cones in the step. Returns also the paddings and
+        the number of depths for which the zero cone embeddings are needed.
+
+        The embedding at a position depends only on its input block and on the two embeddings below it, i.e. on
+        the blocks of its cone, and the graphs start from zero init tokens. A zero cone contains no edges, so its
+        blocks are equal to the ones of an empty graph with the same padding, see `empty_blocks`. All positions
+        with zero cones at the same depth of graphs with the same padding have thus the same embedding,
+        see `zero_cone_embeddings`.
+        """
+        diagonal_repr_graphs_batch = diagonal_repr_graphs_batch.detach()
+        device = diagonal_repr_graphs_batch.device
+        empty_blocks = self.empty_blocks(device)
+        paddings, padding_indices = ((1 - num_nodes_batch) % self.block_size).unique(
+            return_inverse=True
+        )
+        paddings, padding_indices = paddings.to(device), padding_indices.to(device)
+
+        cones = torch.zeros(
+            (0, steps[0][2] - steps[0][1] + 1), dtype=torch.bool, device=device
+        )
+        steps_cones, steps_depths = [], []
+        first_steps = []
+        for i, (graphs_to_add_in_curr_diag, diag_left_pos, diag_right_pos) in enumerate(
+            steps
+        ):
+            first_steps.extend([i] * graphs_to_add_in_curr_diag)
+            depths = (i - torch.tensor(first_steps)).to(device)
+            num_graphs = len(first_steps)
+
+            expected_blocks = empty_blocks[
+                paddings[padding_indices[:num_graphs]],
+                depths.clamp(max=len(empty_blocks[0]) - 1),
+            ]
+            nonzero_blocks = (
+                diagonal_repr_graphs_batch[:num_graphs, diag_left_pos:diag_right_pos]
+                != expected_blocks[:, None]
+            )
+            cones = torch.cat(
+                [cones, cones.new_zeros((graphs_to_add_in_curr_diag, cones.shape[1]))]
+            )
+            cones = (
+                nonzero_blocks.flatten(start_dim=2).any(dim=-1)
+                | cones[:, :-1]
+                | cones[:, 1:]
             )
-            prev_embedding = new_embedding
+            steps_cones.append(cones)
+            steps_depths.append(depths)
+        # a single transfer of all the cones to the host, to plan the steps
+        host_steps_cones = (
+            torch.cat([c.flatten() for c in steps_cones])
+            .cpu()
+            .split([c.numel() for c in steps_cones])
+        )
 
-            diag_right_pos = diag_left_pos
+        steps_positions = []
+        num_levels = 0
+        for i, (host_cones, depths) in enumerate(zip(host_steps_cones, steps_depths)):
+            host_cones = host_cones.view(len(depths), -1)
+            if host_cones.all():
+                steps_positions.append(None)
+                continue
+            steps_positions.append(torch.stack(host_cones.nonzero(as_tuple=True)))
+            # the graphs are ordered from the deepest
+            first_graph_with_zero_cones = int((~host_cones).any(dim=1).int().argmax())
+            num_levels = max(
+                num_levels, i - first_steps[first_graph_with_zero_cones] + 1
+            )
+        # and a single transfer of the positions with nonzero cones back to the device
+        positions = [p for p in steps_positions if p is not None]
+        device_positions = iter(
+            torch.cat(positions, dim=1)
+            .to(device)
+            .split([p.shape[1] for p in positions], dim=1)
+            if positions
+            else []
+        )
 
-        # Reorder back to the original batch order and skip the no longer needed second dimension.
-        return prev_embedding[indices_in_original_batch_order, 0, :]
+        planned_steps = []
+        for step, step_positions, depths in zip(steps, steps_positions, steps_depths):
+            zero_cones = None
+            if step_positions is not None:
+                zero_cones = (
+                    next(device_positions).unbind(),
+                    padding_indices[: len(depths)],
+                    depths,
+                )
+            planned_steps.append((*step, zero_cones))
+        return planned_steps, paddings, num_levels
+
+    def empty_blocks(self, device: torch.device) -> Tensor:
+        """
+        Returns the blocks of a graph without edges, with a shape like [padding, depth, block_size, block_size, edge_size].
+
+        The adjacency matrix is padded at the top to a multiple of the block size, which shifts its padded upper
+        triangle down by the padding size, into the first diagonal's blocks and, for paddings over 1, into the second
+        diagonal's. The blocks of the further diagonals are all zeros.
+        """
+        offsets = torch.arange(self.block_size, device=device)
+        paddings = offsets[:, None, None, None]
+        depths = torch.arange(3, device=device)[None, :, None, None]
+        x_minus_y = offsets[None, None, None, :] - offsets[None, None, :, None]
+        upper_triangle = x_minus_y - depths * self.block_size > -paddings
+        return torch.where(
+            upper_triangle, torch.tensor(float(self.pad_value), device=device), 0.0
+        )[..., None].expand(-1, -1, -1, -1, self.edge_size)
+
+    def zero_cone_embeddings(
+        self, paddings: Tensor, num_levels: int, device: torch.device
+    ) -> Tensor:
+        """
+        Returns the embeddings of positions with zero cones, with a shape like [padding, depth, embedding_size].
+        """
+        empty_blocks = self.empty_blocks(device)[paddings][:, :, None]
+        embedding = torch.zeros((len(paddings), 1, self.embedding_size), device=device)
+        embeddings = [embedding[:, :0]]
+        for depth in range(num_levels):
+            with bf16_autocast(self.bf16_autocast, device):
+                embedding = self.edge_encoder(
+                    empty_blocks[:, min(depth, empty_blocks.shape[1] - 1)],
+                    embedding,
+                    embedding,
+                )
+            embeddings.append(embedding)
+        return torch.cat(embeddings, dim=1)
+
+    def encode_nonzero_cones(
+        self,
+        zero_cones: Tuple,
+        zero_cone_embeddings: Tensor,
+        diagonal: Tensor,
+        embeddings_left: Tensor,
+        embeddings_right: Tensor,
+    ) -> Tensor:
+        """
+        Runs the edge encoder only on the positions with nonzero cones, filling the rest with
+        the embeddings of the zero cones of their graphs' paddings and depths.
+        """
+        positions, paddings, depths = zero_cones
+        # the graphs deeper than the embeddings have no zero cones, so their embeddings get overwritten
+        depths = depths.clamp(max=zero_cone_embeddings.shape[1] - 1)
+        embeddings = zero_cone_embeddings[paddings, depths][:, None, :].expand(
+            *diagonal.shape[:2], -1
+        )
+        if len(positions[0]) == 0:
+            return embeddings
+        nonzero_cone_embeddings = self.edge_encoder(
+            diagonal[positions][None],
+            embeddings_left[positions][None],
+            embeddings_right[positions][None],
+        )[0]
+        return embeddings.index_put(
+            positions, nonzero_cone_embeddings.to(embeddings.dtype)
+        )
 
     def step(self, batch: Tensor) -> Tensor:
         embeddings = self(batch)
@@ -174,6 +618,47 @@ class GraphEncoder(BaseModel):
             )
         except ArgumentError:
             pass
+        add_max_bandwidth_arg(parser)
+        parser.add_argument(
+            "--zero_cone_memoization",
+            dest="zero_cone_memoization",
+            action="store_true",
+            help="run the edge encoder only on the positions with some edges in their cones of input blocks, \
+                reusing the embedding of an empty graph for the rest; exact, helps for sparse BFS ordered graphs",
+        )
+        try:  # these may collide with the other recursive component, but that's fine
+            parser.add_argument(
+                "--recursion_checkpoint_every",
+                dest="recursion_checkpoint_every",
+                default=0,
+                type=int,
+                metavar="NUM_STEPS",
+                help="checkpoint the activations of the encoder and decoder recursions every NUM_STEPS diagonals, \
+                    recomputing the ones in between during the backward pass; 0 disables checkpointing",
+            )
+            parser.add_argument(
+                "--bf16_autocast",
+                dest="bf16_autocast",
+                action="store_true",
+                help="run the encoder and decoder MLPs in bfloat16 autocast, keeping their gates, outputs and \
+                    the losses in fp32; requires torch>=1.10",
+            )
+            parser.add_argument(
+                "--compiled_recursion",
+                dest="compiled_recursion",
+                action="store_true",
+                help="in inference, run the per diagonal steps of the encoder and decoder compiled with \
+                    torch.compile, once for each bucket of the batch size and diagonal length",
+            )
+            parser.add_argument(
+                "--compiled_recursion_backend",
+                dest="compiled_recursion_backend",
+                default="inductor",
+                type=str,
+                help="torch.compile backend of `--compiled_recursion`",
+            )
+        except ArgumentError:
+            pass
         return parent_parser
 
 
@@ -190,6 +675,12 @@ class GraphDecoder(BaseModel):
         graph_decoder_border_embedding_fill: str,
         graph_decoder_filling_nn_layer_sizes: List[int],
         graph_decoder_filling_nn_activation_function: str,
+        sync_free_training: bool = False,
+        recursion_checkpoint_every: int = 0,
+        bf16_autocast: bool = False,
+        max_bandwidth: int = 0,
+        compiled_recursion: bool = False,
+        compiled_recursion_backend: str = "inductor",
         **kwargs,
     ):
         if embedding_size % 2 != 0:
@@ -199,6 +690,17 @@ class GraphDecoder(BaseModel):
         self.internal_embedding_size = int(embedding_size / 2)
         self.edge_size = edge_size
         self.block_size = block_size
+        self.sync_free_training = sync_free_training
+        self.recursion_checkpoint_every = recursion_checkpoint_every
+        check_banded_recursion_args(
+            max_bandwidth,
+            recursion_checkpoint_every,
+            sync_free_training=sync_free_training,
+        )
+        self.max_bandwidth = max_bandwidth
+        if bf16_autocast:
+            check_bf16_autocast_available()
+        self.bf16_autocast = bf16_autocast
         super().__init__(**kwargs)
 
         self.edge_decoder = edge_decoder_class(
@@ -213,14 +715,53 @@ class GraphDecoder(BaseModel):
             graph_decoder_filling_nn_layer_sizes,
             graph_decoder_filling_nn_activation_function,
         )
+        check_compiled_recursion_args(compiled_recursion, bf16_autocast)
+        self.compiled_edge_decoder = None
+        self.compiled_border_embeddings = None
+        if compiled_recursion:
+            self.compiled_edge_decoder = BucketedCompiledStep(
+                self.edge_decoder, backend=compiled_recursion_backend
+            )
+            self.compiled_border_embeddings = BucketedCompiledStep(
+                self,
+                "generate_border_embeddings",
+                pad_length=False,
+                backend=compiled_recursion_backend,
+            )
+        if max_bandwidth:
+            # expands an embedding into two, each weighted with the parent, as in `generate_nn_border_embedding`
+            self.far_region_nn = sequential_from_layer_sizes(
+                embedding_size,
+                embedding_size * 4,
+                graph_decoder_filling_nn_layer_sizes,
+                get_activation_function(graph_decoder_filling_nn_activation_function),
+            )
 
     def forward(
-        self, graph_encoding_batch: Tensor, max_number_of_nodes: int
+        self,
+        graph_encoding_batch: Tensor,
+        max_number_of_nodes: int,
+        num_nodes_batch: Optional[Tensor] = None,
+        num_diagonals_batch: Optional[Tensor] = None,
     ) -> Tuple[Tensor, Tensor]:
         """
         :param graph_encoding_batch: batch of graph encodings (products of an encoder) of dimensions [batch_size, embedding_size]
+        :param num_nodes_batch: numbers of nodes of the decoded graphs, required only with `max_bandwidth`
+        :param num_diagonals_batch: numbers of the kept diagonals of the decoded graphs, only with `max_bandwidth`,
+            which they default to
         :return: graph adjacency matrices tensor of dimensions [batch_size, num_nodes, num_nodes, edge_size]
         """
+        if self.max_bandwidth:
+            if num_nodes_batch is None:
+                raise ValueError(
+                    "decoding with `max_bandwidth` requires the numbers of nodes of the graphs"
+                )
+            return self.forward_banded(
+                graph_encoding_batch, num_nodes_batch, num_diagonals_batch
+            )
+        if self.sync_free_training:
+            return self.forward_sync_free(graph_encoding_batch, max_number_of_nodes)
+
         decoded_diagonals_with_masks = []
         # The working embeddings batch has this shape: [graph_idx x embdedding_idx x embedding]
         prev_doubled_embeddings = graph_encoding_batch[:, None]
@@ -230,30 +771,99 @@ class GraphDecoder(BaseModel):
             dim=-1,
         )
 
-        original_indices = torch.IntTensor(list(range(graph_encoding_batch.shape[0])))
-        indices_of_finished_graphs = []
+        recursion_state = DecoderRecursionState(graph_encoding_batch.shape[0])
 
         diagonal_embedding_squares = torch.zeros(
             [1], device=graph_encoding_batch.device
         )
-        mask_state = None
         max_num_blocks = int(
             calculate_num_blocks(max_number_of_nodes + 1, self.block_size)
         )
 
-        for _ in range(max_num_blocks):
+        for segment_steps in split_into_segments(
+            range(max_num_blocks), self.recursion_checkpoint_every
+        ):
+            if recursion_state.all_finished:
+                break
+            decode_segment = partial(
+                self.decode_diagonals, recursion_state, segment_steps
+            )
+            if should_checkpoint(self.recursion_checkpoint_every):
+                segment_outputs = checkpoint_segment(
+                    decode_segment, prev_embeddings_l, prev_embeddings_r
+                )
+            else:
+                segment_outputs = decode_segment(prev_embeddings_l, prev_embeddings_r)
             (
-                decoded_edges_with_mask,
+                segment_diagonals_with_masks,
+                segment_embedding_squares,
                 new_embedding_l,
                 new_embedding_r,
-            ) = self.edge_decoder(prev_embeddings_l, prev_embeddings_r)
+                prev_embeddings_l,
+                prev_embeddings_r,
+            ) = segment_outputs
+            decoded_diagonals_with_masks.append(segment_diagonals_with_masks)
+            diagonal_embedding_squares = (
+                diagonal_embedding_squares + segment_embedding_squares
+            )
+
+        concatenated_diagonals_with_masks = torch.cat(
+            decoded_diagonals_with_masks, dim=1
+        )
+
+        if new_embedding_l.shape[0] > 0:
+            unfinished_doubled_embeddings = torch.cat(
+                (new_embedding_l, new_embedding_r), dim=-1
+            )
+            diagonal_embedding_squares += (
+                unfinished_doubled_embeddings.flatten().square().sum()
+            )
+
+        masks, concatenated_diagonals = torch.split(
+            concatenated_diagonals_with_masks, (1, self.edge_size), dim=-1
+        )
+
+        diagonal_embeddings_norm = diagonal_embedding_squares.sqrt()
+
+        return (concatenated_diagonals, masks), diagonal_embeddings_norm
+
+    def decode_diagonals(
+        self,
+        recursion_state: "DecoderRecursionState",
+        steps: range,
+        prev_embeddings_l: Tensor,
+        prev_embeddings_r: Tensor,
+    ) -> Tuple[Tensor, Tensor, Tensor, Tensor, Tensor, Tensor]:
+        """
+        Decodes the diagonals of the given recursion steps, stopping early if all graphs are finished.
+
+        Returns the decoded diagonals (concatenated, padded for the finished graphs), the summed squares of
+        the last embeddings of the graphs finished on the way, the last decoded embeddings and the embeddings
+        prepared for the next step.
+        """
+        decoded_diagonals_with_masks = []
+        diagonal_embedding_squares = torch.zeros([1], device=prev_embeddings_l.device)
+        for step in steps:
+            edge_decoder = self.compiled_edge_decoder or self.edge_decoder
+            with bf16_autocast(self.bf16_autocast, prev_embeddings_l.device):
+                (
+                    decoded_edges_with_mask,
+                    new_embedding_l,
+                    new_embedding_r,
+                ) = edge_decoder(prev_embeddings_l, prev_embeddings_r)
+            decoded_edges_with_mask = full_precision(decoded_edges_with_mask)
 
             masks = decoded_edges_with_mask[..., 0]
             # just here, not part of the output - used for checking if the graphs are finished in the loop
             masks = torch.sigmoid(masks)
 
+            (
+                indices_of_finished_graphs,
+                indices_graphs_finished,
+            ) = recursion_state.advance(step, masks)
+
             decoded_edges_with_mask_padded = decoded_edges_with_mask
-            for i in sorted(indices_of_finished_graphs):
+            for i in indices_of_finished_graphs:
                 decoded_edges_with_mask_padded = torch.cat(
                     [
                         decoded_edges_with_mask_padded[:i],
@@ -267,48 +877,329 @@ class GraphDecoder(BaseModel):
                 )
             decoded_diagonals_with_masks.append(decoded_edges_with_mask_padded)
 
-            indices_graphs_finished, mask_state = find_finished_masks(masks, mask_state)
-
-            indices_of_finished_graphs.extend(
-                original_indices[indices_graphs_finished].tolist()
-            )
-            original_indices = original_indices[~indices_graphs_finished]
-
             if any(indices_graphs_finished):
                 finished_emb_l = new_embedding_l[indices_graphs_finished]
                 finished_emb_r = new_embedding_r[indices_graphs_finished]
                 finished_doubled_embeddings = torch.cat(
                     (finished_emb_l, finished_emb_r), dim=-1
                 )
-                diagonal_embedding_squares += (
-                    finished_doubled_embeddings.flatten().square().sum()
+                diagonal_embedding_squares = (
+                    diagonal_embedding_squares
+                    + finished_doubled_embeddings.flatten().square().sum()
                 )
 
             new_embedding_l = new_embedding_l[~indices_graphs_finished]
             new_embedding_r = new_embedding_r[~indices_graphs_finished]
 
             if new_embedding_l.shape[0] == 0:
+                recursion_state.all_finished = True
                 break
 
             prev_embeddings_l = prev_embeddings_l[~indices_graphs_finished]
             prev_embeddings_r = prev_embeddings_r[~indices_graphs_finished]
 
-            prev_embeddings_l, prev_embeddings_r = self.fill_border_embeddings_fn(
-                prev_embeddings_l, prev_embeddings_r, new_embedding_l, new_embedding_r
+            with bf16_autocast(self.bf16_autocast, prev_embeddings_l.device):
+                prev_embeddings_l, prev_embeddings_r = self.fill_border_embeddings_fn(
+                    prev_embeddings_l,
+                    prev_embeddings_r,
+                    new_embedding_l,
+                    new_embedding_r,
+                )
+
+        return (
+            torch.cat(decoded_diagonals_with_masks, dim=1),
+            diagonal_embedding_squares,
+            new_embedding_l,
+            new_embedding_r,
+            prev_embeddings_l,
+            prev_embeddings_r,
+        )
+
+    def decode_stream(
+        self, graph_encoding_batch: Tensor, max_num_blocks: Tensor
+    ) -> Iterator[Tuple[Tensor, Tensor, Tensor]]:
+        """
+        Decodes the graphs like `forward`, but yields the graphs finished at each step as soon as they are,
+        while the others keep decoding. A graph unfinished after its step budget of `max_num_blocks[i]`
+        diagonals is retired too, so that it doesn't hold the others.
+
+        Yields the indices in the batch of the retired graphs, their decoded diagonals and their masks,
+        of shapes [num_retired, num_blocks, block_size, block_size, edge_size or 1].
+        Not differentiable and without `max_bandwidth`.
+        """
+        prev_embeddings_l, prev_embeddings_r = torch.split(
+            graph_encoding_batch[:, None],
+            (self.internal_embedding_size, self.internal_embedding_size),
+            dim=-1,
+        )
+        device = graph_encoding_batch.device
+        original_indices = torch.arange(graph_encoding_batch.shape[0], device=device)
+        max_num_blocks = max_num_blocks.to(device)
+        mask_state = None
+        # the diagonals decoded at each step of the graphs still decoded
+        decoded_diagonals_with_masks = []
+        for step in itertools.count():
+            edge_decoder = self.compiled_edge_decoder or self.edge_decoder
+            with bf16_autocast(self.bf16_autocast, device):
+                (
+                    decoded_edges_with_mask,
+                    new_embedding_l,
+                    new_embedding_r,
+                ) = edge_decoder(prev_embeddings_l, prev_embeddings_r)
+            decoded_edges_with_mask = full_precision(decoded_edges_with_mask)
+            decoded_diagonals_with_masks.append(decoded_edges_with_mask)
+
+            indices_graphs_finished, mask_state = find_finished_masks(
+                torch.sigmoid(decoded_edges_with_mask[..., 0]), mask_state
             )
+            retired = indices_graphs_finished | (max_num_blocks <= step + 1)
+            if retired.any():
+                masks, diagonals = torch.split(
+                    torch.cat(
+                        [d[retired] for d in decoded_diagonals_with_masks], dim=1
+                    ),
+                    (1, self.edge_size),
+                    dim=-1,
+                )
+                yield original_indices[retired], diagonals, masks
+                if retired.all():
+                    return
 
-        concatenated_diagonals_with_masks = torch.cat(
-            decoded_diagonals_with_masks, dim=1
+                # only the steps retiring graphs copy the decoded history of the kept ones
+                kept = ~retired
+                decoded_diagonals_with_masks = [
+                    d[kept] for d in decoded_diagonals_with_masks
+                ]
+                mask_state = mask_state[kept]
+                original_indices = original_indices[kept]
+                max_num_blocks = max_num_blocks[kept]
+                prev_embeddings_l = prev_embeddings_l[kept]
+                prev_embeddings_r = prev_embeddings_r[kept]
+                new_embedding_l = new_embedding_l[kept]
+                new_embedding_r = new_embedding_r[kept]
+            with bf16_autocast(self.bf16_autocast, device):
+                prev_embeddings_l, prev_embeddings_r = self.fill_border_embeddings_fn(
+                    prev_embeddings_l,
+                    prev_embeddings_r,
+                    new_embedding_l,
+                    new_embedding_r,
+                )
+
+    def forward_banded(
+        self,
+        graph_encoding_batch: Tensor,
+        num_nodes_batch: Tensor,
+        num_diagonals_batch: Optional[Tensor] = None,
+    ) -> Tuple[Tensor, Tensor]:
+        """
+        Equivalent of `forward` for the graphs represented with only their `num_diagonals_batch` diagonals
+        closest to the main one, `max_bandwidth` for all of them by default.
+
+        The embeddings are first expanded into the rows below the omitted far regions of the graphs,
+        see `expand_far_region`, and then the kept diagonals are decoded as in `forward`, up to the main ones.
+        The ends of the graphs are given by their sizes instead of being decided from the decoded masks.
+        """
+        device = graph_encoding_batch.device
+        num_blocks_batch = calculate_num_blocks(num_nodes_batch, self.block_size).long()
+        if num_diagonals_batch is None:
+            num_diagonals_batch = torch.full_like(num_blocks_batch, self.max_bandwidth)
+        sorted_num_blocks_batch, ordered_indices = num_blocks_batch.sort()
+        _, indices_in_original_batch_order = ordered_indices.sort()
+        first_diagonal_lengths = calculate_first_diagonal_length(
+            sorted_num_blocks_batch,
+            num_diagonals_batch.to(ordered_indices.device)[ordered_indices],
+        ).tolist()
+        num_blocks = sorted_num_blocks_batch.tolist()
+
+        far_region_rows = self.expand_far_region(
+            graph_encoding_batch[ordered_indices], first_diagonal_lengths
         )
+        graphs_starting_at = defaultdict(list)
+        for position, first_diagonal_length in enumerate(first_diagonal_lengths):
+            graphs_starting_at[first_diagonal_length].append(position)
 
-        if new_embedding_l.shape[0] > 0:
-            unfinished_doubled_embeddings = torch.cat(
-                (new_embedding_l, new_embedding_r), dim=-1
+        # The graphs are ordered from the smallest, so they finish in the batch order, but they start after
+        # their own numbers of diagonals, so the batch positions of the graphs in progress are tracked, in order.
+        decoded_graphs_with_masks = [[] for _ in num_blocks]
+        diagonal_embedding_squares = torch.zeros([1], device=device)
+        in_progress = []
+        prev_embeddings_l = prev_embeddings_r = torch.zeros(
+            (0, 0, self.internal_embedding_size), device=device
+        )
+        for diag_length in range(min(first_diagonal_lengths), num_blocks[-1] + 1):
+            starting = graphs_starting_at[diag_length]
+            if starting:
+                new_embeddings_l, new_embeddings_r = torch.split(
+                    torch.stack([far_region_rows[p] for p in starting]),
+                    (self.internal_embedding_size, self.internal_embedding_size),
+                    dim=-1,
+                )
+                if len(in_progress) == 0:
+                    prev_embeddings_l, prev_embeddings_r = (
+                        new_embeddings_l,
+                        new_embeddings_r,
+                    )
+                else:
+                    positions = in_progress + starting
+                    order = sorted(range(len(positions)), key=positions.__getitem__)
+                    prev_embeddings_l = torch.cat(
+                        [prev_embeddings_l, new_embeddings_l]
+                    )[order]
+                    prev_embeddings_r = torch.cat(
+                        [prev_embeddings_r, new_embeddings_r]
+                    )[order]
+                in_progress = sorted(in_progress + starting)
+            if len(in_progress) == 0:
+                continue
+
+            edge_decoder = self.compiled_edge_decoder or self.edge_decoder
+            with bf16_autocast(self.bf16_autocast, device):
+                (
+                    decoded_edges_with_mask,
+                    new_embedding_l,
+                    new_embedding_r,
+                ) = edge_decoder(prev_embeddings_l, prev_embeddings_r)
+            decoded_edges_with_mask = full_precision(decoded_edges_with_mask)
+            for position, decoded_diagonal in zip(
+                in_progress, decoded_edges_with_mask.unbind(0)
+            ):
+                decoded_graphs_with_masks[position].append(decoded_diagonal)
+
+            num_graphs_finished = 0
+            while (
+                num_graphs_finished < len(in_progress)
+                and num_blocks[in_progress[num_graphs_finished]] == diag_length
+            ):
+                num_graphs_finished += 1
+            diagonal_embedding_squares = (
+                diagonal_embedding_squares
+                + doubled_embedding_squares(
+                    new_embedding_l[:num_graphs_finished],
+                    new_embedding_r[:num_graphs_finished],
+                ).sum()
             )
-            diagonal_embedding_squares += (
-                unfinished_doubled_embeddings.flatten().square().sum()
+            in_progress = in_progress[num_graphs_finished:]
+            if len(in_progress) == 0:
+                continue
+
+            with bf16_autocast(self.bf16_autocast, device):
+                prev_embeddings_l, prev_embeddings_r = self.fill_border_embeddings_fn(
+                    prev_embeddings_l[num_graphs_finished:],
+                    prev_embeddings_r[num_graphs_finished:],
+                    new_embedding_l[num_graphs_finished:],
+                    new_embedding_r[num_graphs_finished:],
+                )
+
+        decoded_graphs_with_masks = torch.nn.utils.rnn.pad_sequence(
+            [torch.cat(diagonals) for diagonals in decoded_graphs_with_masks],
+            batch_first=True,
+            padding_value=float("-inf"),
+        )[indices_in_original_batch_order]
+        masks, decoded_graphs = torch.split(
+            decoded_graphs_with_masks, (1, self.edge_size), dim=-1
+        )
+        return (decoded_graphs, masks), diagonal_embedding_squares.sqrt()
+
+    def expand_far_region(
+        self, graph_encoding_batch: Tensor, row_lengths: List[int]
+    ) -> List[Tensor]:
+        """
+        Expands the graph embeddings into the rows of embeddings below the far regions of the graphs,
+        of the given lengths. Each expansion step replaces every embedding with two.
+        """
+        rows = graph_encoding_batch[:, None]
+        expanded_rows = [None] * len(row_lengths)
+        while True:
+            for i, row_length in enumerate(row_lengths):
+                if expanded_rows[i] is None and row_length <= rows.shape[1]:
+                    expanded_rows[i] = rows[i, :row_length]
+            if all(row is not None for row in expanded_rows):
+                return expanded_rows
+
+            with bf16_autocast(self.bf16_autocast, rows.device):
+                nn_output = self.far_region_nn(rows)
+            children, weights = torch.split(
+                nn_output,
+                (rows.shape[-1] * 2, rows.shape[-1] * 2),
+                dim=-1,
+            )
+            parents = rows.repeat_interleave(2, dim=1)
+            rows = weighted_average(
+                children.reshape(parents.shape), parents, weights.reshape(parents.shape)
             )
 
+    def forward_sync_free(
+        self, graph_encoding_batch: Tensor, max_number_of_nodes: int
+    ) -> Tuple[Tensor, Tensor]:
+        """
+        Equivalent of `forward` that never reads decoded values back to the host.
+
+        Instead of removing the finished graphs from the batch and stopping when all of them are finished,
+        every graph is decoded for all `max_number_of_nodes` steps. The outputs of the already finished graphs
+        are overwritten with the `-inf` padding, which also cuts them off from the gradient.
+        """
+        decoded_diagonals_with_masks = []
+        prev_doubled_embeddings = graph_encoding_batch[:, None]
+        prev_embeddings_l, prev_embeddings_r = torch.split(
+            prev_doubled_embeddings,
+            (self.internal_embedding_size, self.internal_embedding_size),
+            dim=-1,
+        )
+
+        indices_graphs_active = torch.ones(
+            graph_encoding_batch.shape[0],
+            dtype=torch.bool,
+            device=graph_encoding_batch.device,
+        )
+        diagonal_embedding_squares = torch.zeros(
+            [1], device=graph_encoding_batch.device
+        )
+        mask_state = initial_mask_state(
+            graph_encoding_batch.shape[0], self.block_size, graph_encoding_batch.device
+        )
+        max_num_blocks = int(
+            calculate_num_blocks(max_number_of_nodes + 1, self.block_size)
+        )
+
+        for segment_steps in split_into_segments(
+            range(max_num_blocks), self.recursion_checkpoint_every
+        ):
+            decode_segment = partial(
+                self.decode_diagonals_sync_free, len(segment_steps)
+            )
+            segment_inputs = (
+                prev_embeddings_l,
+                prev_embeddings_r,
+                indices_graphs_active,
+                mask_state,
+            )
+            if should_checkpoint(self.recursion_checkpoint_every):
+                segment_outputs = checkpoint_segment(decode_segment, *segment_inputs)
+            else:
+                segment_outputs = decode_segment(*segment_inputs)
+            (
+                segment_diagonals_with_masks,
+                segment_embedding_squares,
+                new_embedding_l,
+                new_embedding_r,
+                prev_embeddings_l,
+                prev_embeddings_r,
+                indices_graphs_active,
+                mask_state,
+            ) = segment_outputs
+            decoded_diagonals_with_masks.append(segment_diagonals_with_masks)
+            diagonal_embedding_squares = (
+                diagonal_embedding_squares + segment_embedding_squares
+            )
+
+        diagonal_embedding_squares += (
+            doubled_embedding_squares(new_embedding_l, new_embedding_r)
+            * indices_graphs_active
+        ).sum()
+
+        concatenated_diagonals_with_masks = torch.cat(
+            decoded_diagonals_with_masks, dim=1
+        )
         masks, concatenated_diagonals = torch.split(
             concatenated_diagonals_with_masks, (1, self.edge_size), dim=-1
         )
@@ -317,6 +1208,71 @@ class GraphDecoder(BaseModel):
 
         return (concatenated_diagonals, masks), diagonal_embeddings_norm
 
+    def decode_diagonals_sync_free(
+        self,
+        num_steps: int,
+        prev_embeddings_l: Tensor,
+        prev_embeddings_r: Tensor,
+        indices_graphs_active: Tensor,
+        mask_state: Tensor,
+    ) -> Tuple[Tensor, Tensor, Tensor, Tensor, Tensor, Tensor, Tensor, Tensor]:
+        """
+        Decodes `num_steps` diagonals of `forward_sync_free`, passing all of its recursion state as tensors.
+        """
+        decoded_diagonals_with_masks = []
+        diagonal_embedding_squares = torch.zeros([1], device=prev_embeddings_l.device)
+        for _ in range(num_steps):
+            edge_decoder = self.compiled_edge_decoder or self.edge_decoder
+            with bf16_autocast(self.bf16_autocast, prev_embeddings_l.device):
+                (
+                    decoded_edges_with_mask,
+                    new_embedding_l,
+                    new_embedding_r,
+                ) = edge_decoder(prev_embeddings_l, prev_embeddings_r)
+            decoded_edges_with_mask = full_precision(decoded_edges_with_mask)
+
+            masks = torch.sigmoid(decoded_edges_with_mask[..., 0])
+
+            decoded_edges_with_mask = torch.where(
+                indices_graphs_active.view(-1, 1, 1, 1, 1),
+                decoded_edges_with_mask,
+                torch.full_like(decoded_edges_with_mask, float("-inf")),
+            )
+            decoded_diagonals_with_masks.append(decoded_edges_with_mask)
+
+            indices_graphs_finished, mask_state = find_finished_masks(
+                masks.detach(), mask_state
+            )
+            indices_graphs_finished = indices_graphs_finished & indices_graphs_active
+            indices_graphs_active = indices_graphs_active & ~indices_graphs_finished
+
+            diagonal_embedding_squares = (
+                diagonal_embedding_squares
+                + (
+                    doubled_embedding_squares(new_embedding_l, new_embedding_r)
+                    * indices_graphs_finished
+                ).sum()
+            )
+
+            with bf16_autocast(self.bf16_autocast, prev_embeddings_l.device):
+                prev_embeddings_l, prev_embeddings_r = self.fill_border_embeddings_fn(
+                    prev_embeddings_l,
+                    prev_embeddings_r,
+                    new_embedding_l,
+                    new_embedding_r,
+                )
+
+        return (
+            torch.cat(decoded_diagonals_with_masks, dim=1),
+            diagonal_embedding_squares,
+            new_embedding_l,
+            new_embedding_r,
+            prev_embeddings_l,
+            prev_embeddings_r,
+            indices_graphs_active,
+            mask_state,
+        )
+
     def set_fill_border_embeddings_fn(
         self,
         name: str,
@@ -380,11 +1336,33 @@ class GraphDecoder(BaseModel):
         """
         Generate missing border embeddings from a nn.
         """
-        prev_left_border_embedding_l = prev_embeddings_l[:, 0]
-        prev_left_border_embedding_r = prev_embeddings_r[:, 0]
-        prev_right_border_embedding_l = prev_embeddings_l[:, -1]
-        prev_right_border_embedding_r = prev_embeddings_r[:, -1]
+        generate_border_embeddings = (
+            self.compiled_border_embeddings or self.generate_border_embeddings
+        )
+        new_left_border_embedding, new_right_border_embedding = (
+            generate_border_embeddings(
+                prev_embeddings_l[:, 0],
+                prev_embeddings_r[:, 0],
+                prev_embeddings_l[:, -1],
+                prev_embeddings_r[:, -1],
+            )
+        )
 
+        new_embeddings_l = torch.cat(
+            (new_embedding_l, new_left_border_embedding[:, None]), dim=1
+        )
+        new_embeddings_r = torch.cat(
+            (new_right_border_embedding[:, None], new_embedding_r), dim=1
+        )
+        return new_embeddings_l, new_embeddings_r
+
+    def generate_border_embeddings(
+        self,
+        prev_left_border_embedding_l: Tensor,
+        prev_left_border_embedding_r: Tensor,
+        prev_right_border_embedding_l: Tensor,
+        prev_right_border_embedding_r: Tensor,
+    ) -> Tuple[Tensor, Tensor]:
         if self.fill_border_separate_sides:
             new_left_border_embedding = self.generate_nn_border_embedding(
                 prev_left_border_embedding_l,
@@ -407,14 +1385,7 @@ class GraphDecoder(BaseModel):
                 prev_right_border_embedding_l,
                 self.border_embedding_nn,
             )
-
-        new_embeddings_l = torch.cat(
-            (new_embedding_l, new_left_border_embedding[:, None]), dim=1
-        )
-        new_embeddings_r = torch.cat(
-            (new_right_border_embedding[:, None], new_embedding_r), dim=1
-        )
-        return new_embeddings_l, new_embeddings_r
+        return new_left_border_embedding, new_right_border_embedding
 
     def generate_nn_border_embedding(
         self,
@@ -462,6 +1433,13 @@ class GraphDecoder(BaseModel):
                 metavar="EDGE_SIZE",
                 help="number of dimensions of a graph's edge",
             )
+            parser.add_argument(
+                "--sync_free_training",
+                dest="sync_free_training",
+                action="store_true",
+                help="decode and calculate the losses without reading values back to the host, at the cost of \
+                    decoding the already finished graphs until the longest one ends",
+            )
             try:  # may collide with a data module, but that's fine
                 parser.add_argument(
                     "--block_size",
@@ -472,6 +1450,7 @@ class GraphDecoder(BaseModel):
                 )
             except ArgumentError:
                 pass
+            add_max_bandwidth_arg(parser)
             parser.add_argument(
                 "--graph_decoder_border_embedding_fill",
                 dest="graph_decoder_border_embedding_fill",
@@ -498,12 +1477,127 @@ class GraphDecoder(BaseModel):
             )
         except ArgumentError:
             pass
+        try:  # these may collide with the other recursive component, but that's fine
+            parser.add_argument(
+                "--recursion_checkpoint_every",
+                dest="recursion_checkpoint_every",
+                default=0,
+                type=int,
+                metavar="NUM_STEPS",
+                help="checkpoint the activations of the encoder and decoder recursions every NUM_STEPS diagonals, \
+                    recomputing the ones in between during the backward pass; 0 disables checkpointing",
+            )
+            parser.add_argument(
+                "--bf16_autocast",
+                dest="bf16_autocast",
+                action="store_true",
+                help="run the encoder and decoder MLPs in bfloat16 autocast, keeping their gates, outputs and \
+                    the losses in fp32; requires torch>=1.10",
+            )
+            parser.add_argument(
+                "--compiled_recursion",
+                dest="compiled_recursion",
+                action="store_true",
+                help="in inference, run the per diagonal steps of the encoder and decoder compiled with \
+                    torch.compile, once for each bucket of the batch size and diagonal length",
+            )
+            parser.add_argument(
+                "--compiled_recursion_backend",
+                dest="compiled_recursion_backend",
+                default="inductor",
+                type=str,
+                help="torch.compile backend of `--compiled_recursion`",
+            )
+        except ArgumentError:
+            pass
         return parent_parser
 
 
+def check_compiled_recursion_args(compiled_recursion: bool, bf16_autocast: bool):
+    if compiled_recursion and bf16_autocast:
+        raise ValueError(
+            "`compiled_recursion` can't be combined with `bf16_autocast`, as the steps are compiled for a precision"
+        )
+
+
+def check_banded_recursion_args(
+    max_bandwidth: int,
+    recursion_checkpoint_every: int,
+    sync_free_training: bool = False,
+    zero_cone_memoization: bool = False,
+):
+    if not max_bandwidth:
+        return
+    for name, value in [
+        ("recursion_checkpoint_every", recursion_checkpoint_every),
+        ("sync_free_training", sync_free_training),
+        ("zero_cone_memoization", zero_cone_memoization),
+    ]:
+        if value:
+            raise ValueError(f"`max_bandwidth` can't be combined with `{name}`")
+
+
+def add_max_bandwidth_arg(parser: ArgumentParser):
+    try:  # may collide with a data module or the other recursive component, but that's fine
+        parser.add_argument(
+            "--max_bandwidth",
+            dest="max_bandwidth",
+            default=0,
+            type=int,
+            metavar="NUM_BLOCKS",
+            help="encode and decode only the NUM_BLOCKS block diagonals closest to the main one, passing over \
+                the empty rest of the adjacency matrix in O(num_nodes); requires the data represented the same way \
+                and the graph sizes for decoding; 0 processes all of the diagonals",
+        )
+    except ArgumentError:
+        pass
+
+
+class DecoderRecursionState:
+    """
+    Host-side bookkeeping of the graphs finished during the decoding recursion.
+
+    The decisions made at each step are recorded, so that when a segment of steps is recomputed
+    by activation checkpointing, they are replayed instead of being reevaluated on the recomputed masks.
+    This guarantees the recomputed tensors to have the same shapes as in the original pass.
+    """
+
+    def __init__(self, num_graphs: int):
+        self.original_indices = torch.IntTensor(list(range(num_graphs)))
+        self.indices_of_finished_graphs = []
+        self.mask_state = None
+        self.all_finished = False
+        self.recorded_steps = []
+
+    def advance(self, step: int, masks: Tensor) -> Tuple[List[int], Tensor]:
+        """
+        Returns the original batch indices of the graphs finished before the given step (sorted)
+        and which of the still decoded graphs are finished in it.
+        """
+        if step < len(self.recorded_steps):
+            return self.recorded_steps[step]
+
+        indices_of_finished_graphs = sorted(self.indices_of_finished_graphs)
+        indices_graphs_finished, mask_state = find_finished_masks(
+            masks.detach(), self.mask_state
+        )
+        self.mask_state = mask_state[~indices_graphs_finished]
+        self.indices_of_finished_graphs.extend(
+            self.original_indices[indices_graphs_finished].tolist()
+        )
+        self.original_indices = self.original_indices[~indices_graphs_finished]
+
+        self.recorded_steps.append(
+            (indices_of_finished_graphs, indices_graphs_finished)
+        )
+        return indices_of_finished_graphs, indices_graphs_finished
+
+
 def find_finished_masks(
     masks: Tensor, prev_mask_state: Tensor
 ) -> Tuple[List[int], Tensor]:
+    # the statistics are always calculated in fp32
+    masks = full_precision(masks)
     num_graphs = masks.shape[0]
     num_mask_blocks = masks.shape[1]
     block_size = masks.shape[2]
@@ -512,15 +1606,7 @@ def find_finished_masks(
     # The prev_mask_state is a Tensor containing weighted means of the previous masks,
     # but only the ones relevant, i.e. the means of the diagonals after the previous center.
     if prev_mask_state is None:
-        # create a state of mean-neutral 0.5s
-        num_diagonals_from_prev_mask_relevant_in_curr_mask = int(
-            num_diagonals_in_block / 2
-        )
-        neutral_means = torch.zeros(
-            (num_graphs, num_diagonals_from_prev_mask_relevant_in_curr_mask),
-            device=masks.device,
-        )
-        prev_mask_state = neutral_means
+        prev_mask_state = initial_mask_state(num_graphs, block_size, masks.device)
 
     prev_means = prev_mask_state
     absolute_diag_offset = block_size * (num_mask_blocks - 1)
@@ -545,7 +1631,30 @@ def find_finished_masks(
     indices_graph_diags_finished = curr_diag_means[:, : center_diag_offset + 1] <= 0.5
     indices_graphs_finished = indices_graph_diags_finished.sum(dim=1) > 0
 
+    # The state is returned for all graphs, including the finished ones.
     curr_mask_state = curr_diag_means[:, center_diag_offset + 1 :]
-    curr_mask_state = curr_mask_state[~indices_graphs_finished]
 
     return (indices_graphs_finished, curr_mask_state)
+
+
+def initial_mask_state(
+    num_graphs: int, block_size: int, device: torch.device
+) -> Tensor:
+    """
+    Returns the `find_finished_masks` state before the first step: mean-neutral 0.5s.
+    """
+    num_diagonals_in_block = 2 * block_size - 1
+    num_diagonals_from_prev_mask_relevant_in_curr_mask = int(num_diagonals_in_block / 2)
+    return torch.zeros(
+        (num_graphs, num_diagonals_from_prev_mask_relevant_in_curr_mask),
+        device=device,
+    )
+
+
+def doubled_embedding_squares(embedding_l: Tensor, embedding_r: Tensor) -> Tensor:
+    """
+    Returns the per graph sums of squares of the concatenated left and right embeddings.
+    """
+    return embedding_l.square().flatten(start_dim=1).sum(
+        dim=1
+    ) + embedding_r.square().flatten(start_dim=1).sum(dim=1)
@@ -47,7 +47,6 @@ class RecursiveGraphAutoencoderWithClassifier(RecursiveGraphAutoencoder):
         )
         loss = (loss_reconstruction + loss_embeddings) * (1-self.classification_loss_weight) + loss_classification
 
-        shared_metric_state = {}
         for metric in metrics:
             if isinstance(metric, torchmetrics.Accuracy):
                 metric.update(prediction_labels, labels)
@@ -61,7 +60,6 @@ class RecursiveGraphAutoencoderWithClassifier(RecursiveGraphAutoencoder):
                     loss_reconstruction=loss_reconstruction,
                     loss_embeddings=loss_embeddings,
                     loss_classification=loss_classification,
-                    shared_metric_state=shared_metric_state,
                 )
 
         return loss
@@ -89,6 +87,8 @@ class RecursiveGraphAutoencoderWithClassifier(RecursiveGraphAutoencoder):
         reconstructed_graph_diagonals, diagonal_embeddings_norm = self.decoder(
             graph_encoding_batch=graph_embeddings,
             max_number_of_nodes=max_num_nodes_in_graph_batch,
+            num_nodes_batch=num_nodes_batch,
+            num_diagonals_batch=self.num_diagonals_batch(batch),
         )
 
         return reconstructed_graph_diagonals, diagonal_embeddings_norm, labels
@@ -0,0 +1,296 @@
+import os
+from argparse import ArgumentParser
+from typing import Callable, List, Optional, Tuple
+
+import torch
+from torch import nn, Tensor
+from torch.nn import functional as F
+
+from rga.models.autoencoder_base import (
+    RecursiveGraphAutoencoder,
+    equalize_dim_by_padding,
+)
+from rga.models.utils.teacher_cache import (
+    TeacherOutputCache,
+    checkpoint_digest,
+    graph_keys,
+)
+from rga.util import load_model
+from rga.util.adjmatrix.diagonal_block_representation import (
+    calculate_num_blocks,
+    calculate_num_omitted_blocks,
+)
+
+
+class DistilledRecursiveGraphAutoencoder(RecursiveGraphAutoencoder):
+    """
+    A (smaller) autoencoder trained to imitate a trained teacher autoencoder, for cheaper inference.
+
+    The student's graph embeddings are mapped to the teacher's embedding size by a learned projection and
+    matched to the teacher's embeddings. Optionally, the decoded edge and mask logits are matched to the
+    teacher's ones as soft targets, on the diagonals decoded by both. The distillation losses are added to
+    the regular reconstruction loss.
+
+    The teacher outputs are computed once per graph and cached in `teacher_cache_dir`, so that the teacher
+    is only loaded if some graphs are missing in the cache. The projection is used for training only, it's saved
+    next to the state dict in the checkpoints, so that the trained students are loaded and served as
+    `RecursiveGraphAutoencoder`s.
+    """
+
+    model_name = "DistilledRecursiveGraphAutoencoder"
+
+    def __init__(
+        self,
+        teacher_hparams_path: str,
+        teacher_checkpoint_path: str,
+        embedding_size: int,
+        block_size: int,
+        edge_size: int,
+        teacher_cache_dir: Optional[str] = "teacher_cache",
+        embedding_distillation_weight: float = 1.0,
+        logits_distillation_weight: float = 0.0,
+        reconstruction_loss_weight: float = 1.0,
+        **kwargs,
+    ):
+        super(DistilledRecursiveGraphAutoencoder, self).__init__(
+            embedding_size=embedding_size,
+            block_size=block_size,
+            edge_size=edge_size,
+            **kwargs,
+        )
+        self.teacher_hparams_path = teacher_hparams_path
+        self.teacher_checkpoint_path = teacher_checkpoint_path
+        teacher_hparams = load_model.load_hparams(teacher_hparams_path)
+        for name, value in [("block_size", block_size), ("edge_size", edge_size)]:
+            if teacher_hparams[name] != value:
+                raise ValueError(
+                    f"the student's {name} ({value}) must be equal to the teacher's ({teacher_hparams[name]})"
+                )
+        self.block_size = block_size
+
+        self.embedding_projection = nn.Linear(
+            embedding_size, teacher_hparams["embedding_size"]
+        )
+        self.embedding_distillation_weight = embedding_distillation_weight
+        self.logits_distillation_weight = logits_distillation_weight
+        self.reconstruction_loss_weight = reconstruction_loss_weight
+
+        cache_path = None
+        if teacher_cache_dir is not None:
+            cache_path = os.path.join(
+                teacher_cache_dir, f"{checkpoint_digest(teacher_checkpoint_path)}.pt"
+            )
+        self.teacher_cache = TeacherOutputCache(cache_path)
+        self.teacher = None
+        self.batch_keys = None
+
+    def __setattr__(self, name, value):
+        # The teacher is not a submodule, so that it's neither trained nor saved with the student.
+        if name == "teacher":
+            object.__setattr__(self, name, value)
+        else:
+            super().__setattr__(name, value)
+
+    # override
+    def on_save_checkpoint(self, checkpoint: dict) -> None:
+        state_dict = checkpoint["state_dict"]
+        checkpoint["embedding_projection"] = {
+            key: state_dict.pop(key)
+            for key in list(state_dict)
+            if key.startswith("embedding_projection.")
+        }
+
+    # override
+    def on_load_checkpoint(self, checkpoint: dict) -> None:
+        # the projection is restored to resume the training
+        checkpoint["state_dict"].update(checkpoint.pop("embedding_projection", {}))
+
+    def load_teacher(self) -> RecursiveGraphAutoencoder:
+        if self.teacher is None:
+            self.teacher = load_model.load_model(
+                self.teacher_hparams_path,
+                self.teacher_checkpoint_path,
+                RecursiveGraphAutoencoder,
+            ).eval()
+        return self.teacher.to(self.device)
+
+    # override
+    def on_before_batch_transfer(self, batch, dataloader_idx: int = 0):
+        # the cache keys are calculated before the batch is moved to the device, not to read it back
+        self.batch_keys = graph_keys(batch[0], batch[2], self.block_size)
+        return batch
+
+    def step(self, batch, metrics: List[Callable] = []) -> Tensor:
+        graph_embeddings = self.encoder(batch)
+        y_pred, diagonal_embeddings_norm = self.decoder(
+            graph_encoding_batch=graph_embeddings,
+            max_number_of_nodes=max(batch[2]),
+            num_nodes_batch=batch[2],
+            num_diagonals_batch=self.num_diagonals_batch(batch),
+        )
+
+        teacher_outputs = self.teacher_outputs(batch)
+        loss_distillation = self.embedding_distillation_weight * F.mse_loss(
+            self.embedding_projection(graph_embeddings),
+            torch.stack([output["embedding"] for output in teacher_outputs]),
+        )
+        if self.logits_distillation_weight:
+            loss_distillation = (
+                loss_distillation
+                + self.logits_distillation_weight
+                * logits_distillation_loss(y_pred, teacher_outputs)
+            )
+
+        loss = self.calc_loss(
+            batch,
+            y_pred,
+            diagonal_embeddings_norm,
+            metrics,
+            loss_distillation=loss_distillation,
+        )
+        return self.reconstruction_loss_weight * loss + loss_distillation
+
+    def teacher_outputs(self, batch) -> List[dict]:
+        """
+        Returns the teacher outputs of the graphs of the batch (on the batch's device), running the teacher
+        on the graphs missing in the cache.
+        """
+        keys = self.batch_keys
+        self.batch_keys = None
+        if keys is None or len(keys) != len(batch[0]):
+            keys = graph_keys(batch[0], batch[2], self.block_size)
+
+        with_logits = bool(self.logits_distillation_weight)
+        outputs = [self.teacher_cache.get(key, with_logits) for key in keys]
+        missing = [i for i, output in enumerate(outputs) if output is None]
+        if missing:
+            for i, output in zip(missing, self.run_teacher(batch, missing)):
+                self.teacher_cache.put(keys[i], output)
+                outputs[i] = output
+
+        device = batch[0].device
+        return [{k: v.to(device) for k, v in output.items()} for output in outputs]
+
+    @torch.no_grad()
+    def run_teacher(self, batch, indices: List[int]) -> List[dict]:
+        teacher = self.load_teacher()
+        indices = torch.tensor(indices)
+        # the numbers of nodes may be kept on the host, see `sync_free_training`
+        teacher_inputs = tuple(
+            t[indices.to(t.device)] for t in batch[: 4 if teacher.max_bandwidth else 3]
+        )
+        num_nodes = teacher_inputs[2]
+        num_diagonals = teacher.num_diagonals_batch(teacher_inputs)
+        embeddings = teacher.encoder(teacher_inputs)
+        outputs = [{"embedding": embedding} for embedding in embeddings]
+        if not self.logits_distillation_weight:
+            return outputs
+
+        (edges, graph_masks), _ = teacher.decoder(
+            graph_encoding_batch=embeddings,
+            max_number_of_nodes=max(num_nodes),
+            num_nodes_batch=num_nodes,
+            num_diagonals_batch=num_diagonals,
+        )
+        num_blocks = calculate_num_blocks(num_nodes, self.block_size)
+        num_kept_blocks = num_blocks * (num_blocks + 1) // 2
+        if teacher.max_bandwidth:
+            num_kept_blocks -= calculate_num_omitted_blocks(
+                num_blocks,
+                teacher.max_bandwidth if num_diagonals is None else num_diagonals,
+            )
+        for output, graph_edges, graph_mask, n in zip(
+            outputs, edges, graph_masks, num_kept_blocks.tolist()
+        ):
+            # the logits beyond the graph's size are never used
+            output["edges"] = graph_edges[:n]
+            output["masks"] = graph_mask[:n]
+        return outputs
+
+    def on_train_epoch_end(self) -> None:
+        self.teacher_cache.save()
+
+    def on_validation_epoch_end(self) -> None:
+        self.teacher_cache.save()
+
+    def on_test_epoch_end(self) -> None:
+        self.teacher_cache.save()
+
+    @classmethod
+    def add_model_specific_args(cls, parent_parser: ArgumentParser) -> ArgumentParser:
+        parent_parser = super(
+            DistilledRecursiveGraphAutoencoder, cls
+        ).add_model_specific_args(parent_parser)
+        parser = parent_parser.add_argument_group(cls.__name__)
+        parser.add_argument(
+            "--teacher_hparams_path",
+            dest="teacher_hparams_path",
+            type=str,
+            required=True,
+            help="hparams file of the teacher model",
+        )
+        parser.add_argument(
+            "--teacher_checkpoint_path",
+            dest="teacher_checkpoint_path",
+            type=str,
+            required=True,
+            help="checkpoint of the teacher model",
+        )
+        parser.add_argument(
+            "--teacher_cache_dir",
+            dest="teacher_cache_dir",
+            type=str,
+            default="teacher_cache",
+            help="directory of the teacher outputs cache, shared by all runs with the same teacher",
+        )
+        parser.add_argument(
+            "--embedding_distillation_weight",
+            dest="embedding_distillation_weight",
+            type=float,
+            default=1.0,
+            help="weight of the loss matching the projected student embeddings to the teacher's",
+        )
+        parser.add_argument(
+            "--logits_distillation_weight",
+            dest="logits_distillation_weight",
+            type=float,
+            default=0.0,
+            help="weight of the loss matching the decoded edge and mask logits to the teacher's, 0 to disable",
+        )
+        parser.add_argument(
+            "--reconstruction_loss_weight",
+            dest="reconstruction_loss_weight",
+            type=float,
+            default=1.0,
+            help="weight of the regular reconstruction loss of the student",
+        )
+        return parent_parser
+
+
+def logits_distillation_loss(y_pred: Tuple[Tensor, Tensor], teacher_outputs) -> Tensor:
+    """
+    Binary cross entropy of the decoded edge and mask logits against the teacher's probabilities,
+    on the blocks decoded by both the student and the teacher.
+    """
+    predicted_edges, predicted_masks = y_pred
+    teacher_edges, teacher_masks = (
+        torch.nn.utils.rnn.pad_sequence(
+            [o[name] for o in teacher_outputs],
+            batch_first=True,
+            padding_value=float("-inf"),
+        )
+        for name in ("edges", "masks")
+    )
+    predicted_edges, teacher_edges = equalize_dim_by_padding(
+        predicted_edges, teacher_edges, 1, float("-inf"), float("-inf")
+    )
+    predicted_masks, teacher_masks = equalize_dim_by_padding(
+        predicted_masks, teacher_masks, 1, float("-inf"), float("-inf")
+    )
+    mask = (predicted_masks > float("-inf")) & (teacher_masks > float("-inf"))
+    edge_mask = mask.expand_as(predicted_edges)
+    predicted = torch.cat([predicted_edges[edge_mask], predicted_masks[mask]])
+    target = torch.sigmoid(torch.cat([teacher_edges[edge_mask], teacher_masks[mask]]))
+    if predicted.numel() == 0:
+        return predicted.sum()
+    return F.binary_cross_entropy_with_logits(predicted, target)
@@ -0,0 +1,102 @@
+from typing import List, Tuple
+from argparse import ArgumentParser
+
+import torch
+from torch import nn, Tensor
+
+from rga.models.edge_decoders.memory_standard import MemoryEdgeDecoder
+from rga.models.utils.getters import get_activation_function
+from rga.models.utils.calc import weighted_average
+from rga.models.utils.layers import sequential_from_layer_sizes
+
+
+class LowRankMemoryEdgeDecoder(nn.Module):
+    """
+    Variant of `MemoryEdgeDecoder` decoding each block as a low-rank product of row and column factors,
+    plus a learned bias per block position. Instead of the block_size^2 logits per block, the last layer
+    outputs 2 * block_size * rank factors per edge channel (the mask included), which shrinks the largest
+    layer of the model for large block sizes.
+    """
+
+    def __init__(
+        self,
+        embedding_size: int,
+        edge_size: int,
+        block_size: int,
+        decoder_hidden_layer_sizes: List[int],
+        decoder_activation_function: str,
+        edge_decoder_rank: int = 8,
+        **kwargs,
+    ):
+        super().__init__()
+        self.embedding_size = embedding_size
+        self.edge_size = edge_size
+        self.block_size = block_size
+        self.rank = edge_decoder_rank
+
+        nn_input_size = embedding_size * 2
+        graph_end_mask_size = 1
+        self.num_channels = graph_end_mask_size + edge_size
+        self.factors_size = 2 * block_size * self.rank * self.num_channels
+        nn_output_size = embedding_size * 4 + self.factors_size
+
+        activation_f = get_activation_function(decoder_activation_function)
+        self.nn = sequential_from_layer_sizes(
+            nn_input_size,
+            nn_output_size,
+            decoder_hidden_layer_sizes,
+            activation_f,
+        )
+        self.block_bias = nn.Parameter(
+            torch.zeros(block_size, block_size, self.num_channels)
+        )
+
+    def forward(
+        self, embedding_l: Tensor, embedding_r: Tensor
+    ) -> Tuple[Tensor, Tensor, Tensor]:
+        prev_doubled_embeddings = torch.cat((embedding_l, embedding_r), dim=-1)
+        nn_output = self.nn(prev_doubled_embeddings)
+
+        factors, doubled_embeddings, mem_overwrite_ratio = torch.split(
+            nn_output,
+            [
+                self.factors_size,
+                self.embedding_size * 2,
+                self.embedding_size * 2,
+            ],
+            dim=2,
+        )
+
+        row_factors, column_factors = factors.view(
+            *factors.shape[:-1], 2, self.block_size, self.rank, self.num_channels
+        ).unbind(dim=-4)
+        decoded_edges_with_mask = (
+            torch.einsum("...irc,...jrc->...ijc", row_factors, column_factors)
+            + self.block_bias
+        )
+
+        doubled_embeddings = weighted_average(
+            doubled_embeddings, prev_doubled_embeddings, mem_overwrite_ratio
+        )
+
+        new_embedding_l, new_embedding_r = torch.split(
+            doubled_embeddings,
+            [self.embedding_size, self.embedding_size],
+            dim=-1,
+        )
+
+        return decoded_edges_with_mask, new_embedding_l, new_embedding_r
+
+    @classmethod
+    def add_model_specific_args(cls, parent_parser: ArgumentParser) -> ArgumentParser:
+        parent_parser = MemoryEdgeDecoder.add_model_specific_args(parent_parser)
+        parser = parent_parser.add_argument_group(cls.__name__)
+        parser.add_argument(
+            "--edge_decoder_rank",
+            dest="edge_decoder_rank",
+            default=8,
+            type=int,
+            metavar="RANK",
+            help="rank of the decoded blocks, the number of row and column factor pairs per block",
+        )
+        return parent_parser
@@ -0,0 +1,12 @@
+from rga.models.autoencoder_base import RecursiveGraphAutoencoder
+from rga.models.edge_decoders.low_rank import LowRankMemoryEdgeDecoder
+
+
+class LowRankRecursiveGraphAutoencoder(RecursiveGraphAutoencoder):
+    """
+    `RecursiveGraphAutoencoder` decoding the blocks with `LowRankMemoryEdgeDecoder`, of rank `edge_decoder_rank`.
+    """
+
+    model_name = "LowRankRecursiveGraphAutoencoder"
+
+    edge_decoder_class = LowRankMemoryEdgeDecoder
@@ -1,12 +1,24 @@
 import torch
-from typing import List
+from typing import List, Optional, Type
 
 from rga.util import load_model
 from rga.util.adjmatrix import diagonal_block_representation
+from rga.util.adjmatrix.edge_list_diagonal_blocks import EdgeListDiagonalBlocks
 from rga.models.autoencoder_base import RecursiveGraphAutoencoder
+from rga.models.utils.embedding_cache import EmbeddingCache, adj_matrix_key
+from rga.models.utils.inference_checkpoint import InferenceCheckpoint
+from rga.models.utils.incremental_encoding import (
+    IncrementalEncoderState,
+    IncrementalGraphEncoder,
+)
+from rga.models.utils.quantization import quantize_dynamic_int8
+from rga.models.utils.teacher_cache import checkpoint_digest
 from rga.util.generate_graphs import (
     convert_model_output_to_diag_block,
+    diag_block_graphs_to_edge_lists,
     diag_block_graphs_to_tril_adj_matrices,
+    edge_list_output,
+    remove_block_padding,
 )
 
 
@@ -16,11 +28,72 @@ class RGAE:
     input adjacency matrices to the models native format on-line, which may be quite inefficient. For proper, large
     scale training, the training dataloaders should pass graphs in the `diagonal` format.
     """
-    def __init__(self, path_hparams: str, path_ckpt: str):
+    def __init__(
+        self,
+        path_hparams: str,
+        path_ckpt: str,
+        quantize: bool = False,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        model_class: Type[RecursiveGraphAutoencoder] = RecursiveGraphAutoencoder,
+    ):
+        """
+        Parameters
+        ----------
+        quantize : bool
+            Whether to quantize the model's Linear layers to int8 for faster CPU inference, see `quantize_dynamic_int8`.
+            Default False
+        embedding_cache : EmbeddingCache, optional
+            Cache of the embeddings returned by `encode`, keyed by the graphs' structure and the model's checkpoint,
+            hyperparameters and quantization, so it may be shared between models. Its counters are available
+            through `embedding_cache.stats()`.
+            Default None
+        model_class : Type[RecursiveGraphAutoencoder]
+            The variant of the autoencoder the checkpoint was trained as, e.g. `LowRankRecursiveGraphAutoencoder`.
+            Default RecursiveGraphAutoencoder
+        """
         self.hparams = load_model.load_hparams(path_hparams)
-        self.engine = load_model.load_model(
-            path_hparams, path_ckpt, RecursiveGraphAutoencoder
-        )
+        self.engine = load_model.load_model(path_hparams, path_ckpt, model_class)
+        if quantize:
+            self.engine = quantize_dynamic_int8(self.engine)
+        self.embedding_cache = embedding_cache
+        if embedding_cache is not None:
+            self.model_digest = f"{checkpoint_digest(path_ckpt)}:{checkpoint_digest(path_hparams)}:{quantize}"
+
+    @classmethod
+    def from_inference_checkpoint(
+        cls,
+        path: str,
+        parts: List[str] = ("encoder", "decoder"),
+        quantize: bool = False,
+        embedding_cache: Optional[EmbeddingCache] = None,
+    ) -> "RGAE":
+        """
+        Load a checkpoint written by `export_inference_checkpoint`, with its weights memory-mapped.
+
+        Parameters
+        ----------
+        parts : List[str]
+            The parts of the model to build, "encoder" and/or "decoder", e.g. only the encoder for a service that
+            only encodes, which then never reads the decoder's weights.
+            Default ("encoder", "decoder")
+
+        See `__init__` for the other parameters. The embeddings cached with the source checkpoint stay valid.
+        """
+        checkpoint = InferenceCheckpoint(path)
+        rgae = cls.__new__(cls)
+        rgae.hparams = checkpoint.hparams
+        rgae.engine = checkpoint.load(parts)
+        if quantize:
+            rgae.engine = quantize_dynamic_int8(rgae.engine)
+        rgae.embedding_cache = embedding_cache
+        rgae.model_digest = f"{checkpoint.source_digest}:{quantize}"
+        return rgae
+
+    def engine_part(self, part: str) -> torch.nn.Module:
+        module = getattr(self.engine, part)
+        if module is None:
+            raise ValueError(f"the model was loaded without its {part}")
+        return module
 
     def encode(self, adj_matrices: List[torch.FloatTensor]) -> torch.FloatTensor:
         """
@@ -36,14 +109,60 @@ class RGAE:
         torch.FloatTensor
             Tensor with embedded graphs. Shape (B, E) where B is the number of embedded graphs and E is the embedding size (based on the loaded model).
         """
+        if self.embedding_cache is None:
+            return self.encode_batch(adj_matrices)
+
+        keys = [adj_matrix_key(adj_matrix, self.model_digest) for adj_matrix in adj_matrices]
+        embeds = {}
+        misses = {}
+        for key, adj_matrix in zip(keys, adj_matrices):
+            if key in embeds or key in misses:
+                continue
+            embedding = self.embedding_cache.get(key)
+            if embedding is None:
+                misses[key] = adj_matrix
+            else:
+                embeds[key] = embedding
+
+        # only the missing graphs, each once, are encoded, in a single batch
+        if misses:
+            with torch.no_grad():
+                missing_embeds = self.encode_batch(list(misses.values()))
+            for key, embedding in zip(misses.keys(), missing_embeds):
+                self.embedding_cache.put(key, embedding)
+                embeds[key] = embedding.detach().cpu()
+        return torch.stack([embeds[key] for key in keys])
+
+    def kept_diagonals(self, adj_matrices: List[torch.FloatTensor]) -> Optional[List[int]]:
+        """
+        Returns the numbers of the block diagonals of the graphs kept by the models trained with `max_bandwidth`,
+        the graphs' bandwidths capped by it, with which they are encoded and which `decode` takes.
+        None for the other models, which keep all the diagonals.
+        """
+        max_bandwidth = self.hparams.get("max_bandwidth")
+        if not max_bandwidth:
+            return None
+        return [
+            min(
+                diagonal_block_representation.calculate_bandwidth_in_blocks(
+                    el[:, :, None], el.shape[0], self.hparams["block_size"]
+                ),
+                max_bandwidth,
+            )
+            for el in adj_matrices
+        ]
+
+    def encode_batch(self, adj_matrices: List[torch.FloatTensor]) -> torch.FloatTensor:
+        num_diagonals = self.kept_diagonals(adj_matrices)
         adj_matrices_in_block_representation = []
-        for el in adj_matrices:
+        for i, el in enumerate(adj_matrices):
             adj_matrices_in_block_representation.append(
                 diagonal_block_representation.adj_matrix_to_diagonal_block_representation(
                     el.float()[:, :, None].clone(),
                     num_nodes=el.shape[0],
                     block_size=self.hparams["block_size"],
                     pad_value=-1,
+                    num_diagonals=None if num_diagonals is None else num_diagonals[i],
                 )
             )
 
@@ -56,13 +175,91 @@ class RGAE:
             [],
             torch.Tensor([el.shape[0] for el in adj_matrices]),
         ]
+        if num_diagonals is not None:
+            adj_matrices_in_block_representation.append(torch.tensor(num_diagonals))
 
-        embeds = self.engine.encoder.forward(adj_matrices_in_block_representation)
+        embeds = self.engine_part("encoder").forward(adj_matrices_in_block_representation)
         return embeds
 
+    def encode_edge_list(self, edges, num_nodes: int, edge_features=None) -> torch.FloatTensor:
+        """
+        Encode a single graph given by its edge list into an embedding, without densifying it.
+        The block diagonals are generated from the edges one at a time and fed to the encoder, so that
+        large graphs (100k+ nodes) fit in memory, see `GraphEncoder.forward_streaming`.
+
+        Parameters
+        ----------
+        edges : array-like
+            Pairs of node indices of the undirected edges, shape (M, 2). May be memory-mapped,
+            e.g. loaded with `np.load(path, mmap_mode="r")`.
+        num_nodes : int
+            Node count of the graph.
+        edge_features : array-like, optional
+            Features of the edges, shape (M, edge_size). Default None, the edges are ones
+
+        Returns
+        -------
+        torch.FloatTensor
+            Embedding of the graph. Shape (E,) where E is the embedding size (based on the loaded model).
+        """
+        diagonals = EdgeListDiagonalBlocks(
+            edges,
+            num_nodes,
+            self.hparams["block_size"],
+            edge_features,
+            edge_size=self.hparams.get("edge_size", 1),
+            pad_value=-1,
+        )
+        max_bandwidth = self.hparams.get("max_bandwidth")
+        num_diagonals = min(diagonals.bandwidth, max_bandwidth) if max_bandwidth else None
+        with torch.no_grad():
+            return self.engine_part("encoder").forward_streaming(
+                diagonals, num_nodes, num_diagonals=num_diagonals
+            )
+
+    def create_incremental_state(self) -> IncrementalEncoderState:
+        """
+        Creates the state of an empty graph to be grown by `encode_appended`.
+        The state may be serialized with `torch.save(state.state_dict(), path)`
+        and restored with `IncrementalEncoderState.from_state_dict(torch.load(path))`.
+        """
+        return IncrementalGraphEncoder(self.engine_part("encoder")).create_state()
+
+    def encode_appended(
+        self, state: IncrementalEncoderState, num_new_nodes: int, edges, edge_features=None
+    ) -> torch.FloatTensor:
+        """
+        Append nodes to a graph encoded incrementally and return its new embedding, the same as of a full
+        re-encode, updating the state in O(N) steps per appended node, see `IncrementalGraphEncoder`.
+
+        Parameters
+        ----------
+        state : IncrementalEncoderState
+            State of the graph, see `create_incremental_state`. Updated in place.
+        num_new_nodes : int
+            Number of the appended nodes, numbered after the existing ones.
+        edges : array-like
+            Pairs of node indices of the undirected edges of the appended nodes, shape (M, 2).
+        edge_features : array-like, optional
+            Features of the edges, shape (M, edge_size). Default None, the edges are ones
+
+        Returns
+        -------
+        torch.FloatTensor
+            Embedding of the graph. Shape (E,) where E is the embedding size (based on the loaded model).
+        """
+        return IncrementalGraphEncoder(self.engine_part("encoder")).append(
+            state, num_new_nodes, edges, edge_features
+        )
+
     def decode(
-        self, embeds: torch.FloatTensor, max_graph_size: int = 999
-    ) -> List[torch.FloatTensor]:
+        self,
+        embeds: torch.FloatTensor,
+        max_graph_size: int = 999,
+        num_nodes: Optional[List[int]] = None,
+        output_format: str = "dense",
+        num_diagonals: Optional[List[int]] = None,
+    ) -> list:
         """
         Parameters
         ----------
@@ -73,17 +270,46 @@ class RGAE:
             Infinitely large graphs may occur if the network for some reason does not decide to end the graph, 
             which should not happen with a properly trained network.
             Default 999
+        num_nodes : List[int], optional
+            Node counts of the decoded graphs, required by the models trained with `max_bandwidth`,
+            which decode only the diagonals close to the main one and can't decide the graph sizes themselves.
+            Default None
+        output_format : str
+            "dense" for adjacency matrices, "edge_list" for the edges of the lower triangles of shape (M, 2), where
+            M is the edge count, with the node counts, or "scipy" for symmetric `scipy.sparse.csr_matrix`.
+            The sparse formats are read directly from the decoded blocks, without the (N, N) matrices.
+            Default "dense"
+        num_diagonals : List[int], optional
+            Numbers of the block diagonals of the decoded graphs, only for the models trained with `max_bandwidth`,
+            see `kept_diagonals`. Default None, all the `max_bandwidth` diagonals are decoded
 
         Returns
         -------
         adj_matrices: List(torch.FloatTensor)
             List of reconstructed graphs. Each graph shape (N, N) where N is node count.
+            Or a list of (edges, N) tuples or of sparse matrices, depending on `output_format`.
         """
+        if output_format not in ("dense", "edge_list", "scipy"):
+            raise ValueError(f"unknown output format {output_format}")
+
+        max_bandwidth = self.hparams.get("max_bandwidth")
+        if max_bandwidth:
+            if num_nodes is None:
+                raise ValueError("models trained with `max_bandwidth` require `num_nodes` to decode")
+            if num_diagonals is None:
+                num_diagonals = [max_bandwidth] * len(num_nodes)
+            return self.decode_banded(embeds, num_nodes, num_diagonals, output_format)
 
-        reconstructed_graphs = self.engine.decoder.forward(
+        reconstructed_graphs = self.engine_part("decoder").forward(
             embeds, max_number_of_nodes=torch.FloatTensor([max_graph_size])
         )
 
+        if output_format != "dense":
+            edge_lists = diag_block_graphs_to_edge_lists(
+                convert_model_output_to_diag_block([reconstructed_graphs])
+            )
+            return [edge_list_output(edges, n, output_format) for edges, n in edge_lists]
+
         adj_matrices = diag_block_graphs_to_tril_adj_matrices(
             convert_model_output_to_diag_block([reconstructed_graphs])
         )
@@ -92,3 +318,29 @@ class RGAE:
             adj_matrices[i] = adj_matrices[i] + adj_matrices[i].T
 
         return adj_matrices
+
+    def decode_banded(
+        self, embeds: torch.FloatTensor, num_nodes: List[int], num_diagonals: List[int], output_format: str = "dense"
+    ) -> list:
+        (graphs, _), _ = self.engine_part("decoder").forward(
+            embeds,
+            max_number_of_nodes=max(num_nodes),
+            num_nodes_batch=torch.tensor(num_nodes),
+            num_diagonals_batch=torch.tensor(num_diagonals),
+        )
+
+        adj_matrices = []
+        for graph, graph_num_nodes, graph_num_diagonals in zip(graphs, num_nodes, num_diagonals):
+            graph = torch.sigmoid(remove_block_padding(graph)).round()
+            if output_format != "dense":
+                edges, _ = diagonal_block_representation.diagonal_block_to_edge_list(
+                    graph, graph_num_nodes, graph_num_diagonals
+                )
+                adj_matrices.append(edge_list_output(edges, graph_num_nodes, output_format))
+                continue
+            adj_matrix = diagonal_block_representation.diagonal_block_to_adj_matrix_representation(
+                graph, graph_num_nodes, graph_num_diagonals
+            )
+            adj_matrix = torch.tril(adj_matrix[:, :, 0], -1).int()
+            adj_matrices.append(adj_matrix + adj_matrix.T)
+        return adj_matrices
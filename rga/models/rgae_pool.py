@@ -0,0 +1,189 @@
+import itertools
+import pickle
+import queue
+from typing import List, Optional
+
+import torch
+import torch.multiprocessing as mp
+
+from rga.models.rgae import RGAE
+from rga.models.utils.quantization import quantize_dynamic_int8
+
+
+def run_worker(rgae: RGAE, num_threads: int, quantize: bool, tasks, results) -> None:
+    """
+    Serves the requests of `RGAEPool` in a worker process until it receives None.
+    """
+    torch.set_num_threads(num_threads)
+    torch.set_num_interop_threads(1)
+    rgae.engine.eval()
+    if quantize:
+        rgae.engine = quantize_dynamic_int8(rgae.engine)
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, method, args, kwargs = task
+        try:
+            with torch.no_grad():
+                result = getattr(rgae, method)(*args, **kwargs)
+        except Exception as e:
+            try:
+                pickle.dumps(e)
+            except Exception:
+                # an exception that can't be pickled would be lost by the queue, leaving the task unanswered
+                e = RuntimeError(f"{type(e).__name__}: {e}")
+            results.put((task_id, None, e))
+        else:
+            results.put((task_id, result, None))
+
+
+class RGAEPool:
+    """
+    Pool of worker processes serving `RGAE.encode` and `RGAE.decode` on the CPU, for throughput on many-core
+    machines, as the recursion over the diagonals of small graphs doesn't scale with intra-op threads.
+
+    The checkpoint is loaded once, its weights are moved to shared memory and shared read-only with the workers,
+    each limited to `num_threads_per_worker` intra-op threads. With `quantize`, each worker quantizes its model
+    after start, see `quantize_dynamic_int8`, as the packed int8 weights can't be sent to the workers. A call is
+    split into shards of `shard_size` graphs distributed to the workers. The tensors of the requests and of the
+    results are passed through shared memory by the `torch.multiprocessing` queues.
+
+    While waiting for the results, the workers are checked every `poll_interval` seconds. If any of them has died,
+    e.g. killed for running out of memory, the pool is terminated and the call raises instead of waiting forever.
+    """
+
+    poll_interval = 1.0
+
+    def __init__(
+        self,
+        path_hparams: str,
+        path_ckpt: str,
+        num_workers: int = 4,
+        num_threads_per_worker: int = 1,
+        shard_size: int = 32,
+        quantize: bool = False,
+    ):
+        self.rgae = RGAE(path_hparams, path_ckpt)
+        self.rgae.engine.eval()
+        self.rgae.engine.share_memory()
+        self.hparams = self.rgae.hparams
+        self.shard_size = shard_size
+        self.task_ids = itertools.count()
+
+        context = mp.get_context("spawn")
+        self.tasks = context.Queue()
+        self.results = context.Queue()
+        self.workers = [
+            context.Process(
+                target=run_worker,
+                args=(
+                    self.rgae,
+                    num_threads_per_worker,
+                    quantize,
+                    self.tasks,
+                    self.results,
+                ),
+                daemon=True,
+            )
+            for _ in range(num_workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def __enter__(self) -> "RGAEPool":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for _ in self.workers:
+            self.tasks.put(None)
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+
+    def terminate(self) -> None:
+        for worker in self.workers:
+            worker.terminate()
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+
+    def map(self, method: str, shards_args: List[tuple], **kwargs) -> list:
+        """
+        Runs `RGAE.<method>(*shard_args, **kwargs)` for each shard on the workers, returning the results in order.
+        """
+        if not self.workers:
+            raise RuntimeError("the pool is closed")
+        task_ids = []
+        for shard_args in shards_args:
+            task_ids.append(next(self.task_ids))
+            self.tasks.put((task_ids[-1], method, shard_args, kwargs))
+
+        results = {}
+        error = None
+        while len(results) < len(task_ids):
+            try:
+                task_id, result, task_error = self.results.get(
+                    timeout=self.poll_interval
+                )
+            except queue.Empty:
+                self.check_workers()
+                continue
+            results[task_id] = result
+            error = error or task_error
+        if error is not None:
+            raise error
+        return [results[task_id] for task_id in task_ids]
+
+    def check_workers(self) -> None:
+        dead_workers = [worker for worker in self.workers if not worker.is_alive()]
+        if dead_workers:
+            exit_codes = [worker.exitcode for worker in dead_workers]
+            self.terminate()
+            raise RuntimeError(
+                f"{len(dead_workers)} worker processes exited unexpectedly with codes {exit_codes}, "
+                "the pool was terminated"
+            )
+
+    def encode(self, adj_matrices: List[torch.FloatTensor]) -> torch.FloatTensor:
+        """
+        See `RGAE.encode`.
+        """
+        shards = [
+            (adj_matrices[start : start + self.shard_size],)
+            for start in range(0, len(adj_matrices), self.shard_size)
+        ]
+        return torch.cat(self.map("encode", shards))
+
+    def decode(
+        self,
+        embeds: torch.FloatTensor,
+        max_graph_size: int = 999,
+        num_nodes: Optional[List[int]] = None,
+        num_diagonals: Optional[List[int]] = None,
+    ) -> List[torch.FloatTensor]:
+        """
+        See `RGAE.decode`.
+        """
+        shards = [
+            (
+                embeds[start : start + self.shard_size],
+                max_graph_size,
+                (
+                    None
+                    if num_nodes is None
+                    else num_nodes[start : start + self.shard_size]
+                ),
+                "dense",
+                (
+                    None
+                    if num_diagonals is None
+                    else num_diagonals[start : start + self.shard_size]
+                ),
+            )
+            for start in range(0, len(embeds), self.shard_size)
+        ]
+        return [graph for shard in self.map("decode", shards) for graph in shard]
@@ -0,0 +1,337 @@
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, Hashable, List, Optional
+
+import numpy as np
+import torch
+
+from rga.models.rgae import RGAE
+from rga.util.adjmatrix.diagonal_block_representation import calculate_num_blocks
+
+
+class ServerOverloaded(Exception):
+    pass
+
+
+def size_bucket(size: int) -> int:
+    return math.ceil(math.log2(size + 1))
+
+
+class PendingRequest:
+    def __init__(self, payload, size: int, future: asyncio.Future):
+        self.payload = payload
+        self.size = size
+        self.future = future
+        self.arrival_time = time.perf_counter()
+
+
+class MicroBatchingServer:
+    """
+    Asyncio serving layer of `RGAE` coalescing the concurrent single graph `encode` and `decode` requests into
+    batches, to make use of the batch dimension of the recursion.
+
+    The requests are bucketed by size, the graphs to encode by powers of two of their number of blocks, the embeddings
+    to decode by their `max_graph_size`, and by powers of two of their `num_nodes` if given. A batch is formed from
+    the bucket of the oldest request once it waited `max_wait` seconds or its bucket fills a batch, of up to
+    `max_batch_size` graphs and `max_batch_blocks` blocks of the padded batch. The batches run one at a time in
+    a worker thread, keeping the event loop responsive.
+
+    A request cancelled or timed out before its batch runs is dropped. With `max_pending` requests waiting, new ones
+    wait for a free slot, or raise `ServerOverloaded` after `admission_timeout` seconds. The latencies and the batch
+    fill are reported by `stats`.
+    """
+
+    def __init__(
+        self,
+        rgae: RGAE,
+        max_wait: float = 0.005,
+        max_batch_size: int = 64,
+        max_batch_blocks: int = 2**14,
+        max_pending: int = 1024,
+        admission_timeout: Optional[float] = None,
+        num_latencies: int = 10000,
+    ):
+        self.rgae = rgae
+        self.block_size = rgae.hparams["block_size"]
+        self.max_wait = max_wait
+        self.max_batch_size = max_batch_size
+        self.max_batch_blocks = max_batch_blocks
+        self.admission_timeout = admission_timeout
+        self.pending_slots = asyncio.Semaphore(max_pending)
+        self.buckets: Dict[str, Dict[Hashable, deque]] = {"encode": {}, "decode": {}}
+        self.new_request = asyncio.Event()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.latencies = {
+            kind: deque(maxlen=num_latencies) for kind in ("encode", "decode")
+        }
+        self.batch_sizes: Deque[int] = deque(maxlen=num_latencies)
+        self.batch_fills: Deque[float] = deque(maxlen=num_latencies)
+        self.num_batches = 0
+        self.num_dropped = 0
+        self.batching_task: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> "MicroBatchingServer":
+        self.start()
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.stop()
+
+    def start(self) -> None:
+        self.batching_task = asyncio.get_running_loop().create_task(self.run_batches())
+
+    async def stop(self) -> None:
+        self.batching_task.cancel()
+        try:
+            await self.batching_task
+        except asyncio.CancelledError:
+            pass
+        self.executor.shutdown(wait=True)
+
+    async def encode(
+        self, adj_matrix: torch.FloatTensor, timeout: Optional[float] = None
+    ) -> torch.FloatTensor:
+        """
+        See `RGAE.encode`, for a single graph of shape (N, N), returns its embedding of shape (E,).
+        """
+        num_blocks = int(
+            calculate_num_blocks(torch.tensor(adj_matrix.shape[0]), self.block_size)
+        )
+        return await self.submit(
+            "encode",
+            adj_matrix,
+            num_blocks * (num_blocks + 1) // 2,
+            size_bucket(num_blocks),
+            timeout,
+        )
+
+    async def decode(
+        self,
+        embedding: torch.FloatTensor,
+        max_graph_size: int = 999,
+        num_nodes: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> torch.FloatTensor:
+        """
+        See `RGAE.decode`, for a single embedding of shape (E,), returns the adjacency matrix of the graph.
+        """
+        bucket = (max_graph_size, None if num_nodes is None else size_bucket(num_nodes))
+        return await self.submit(
+            "decode", (embedding, max_graph_size, num_nodes), 1, bucket, timeout
+        )
+
+    async def submit(
+        self, kind: str, payload, size: int, bucket, timeout: Optional[float]
+    ):
+        try:
+            await asyncio.wait_for(self.pending_slots.acquire(), self.admission_timeout)
+        except asyncio.TimeoutError:
+            raise ServerOverloaded(
+                f"the server has too many pending requests to accept a new {kind} request"
+            )
+        try:
+            request = PendingRequest(
+                payload, size, asyncio.get_running_loop().create_future()
+            )
+            self.buckets[kind].setdefault(bucket, deque()).append(request)
+            self.new_request.set()
+            # shielded, so that a timeout cancels only the waiting for the result
+            result = await asyncio.wait_for(asyncio.shield(request.future), timeout)
+            self.latencies[kind].append(time.perf_counter() - request.arrival_time)
+            return result
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            request.future.cancel()
+            raise
+        finally:
+            self.pending_slots.release()
+
+    async def run_batches(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            oldest = self.oldest_request()
+            if oldest is None:
+                self.new_request.clear()
+                await self.new_request.wait()
+                continue
+            kind, bucket, request = oldest
+            remaining_wait = request.arrival_time + self.max_wait - time.perf_counter()
+            if remaining_wait > 0 and not self.bucket_is_full(kind, bucket):
+                self.new_request.clear()
+                try:
+                    await asyncio.wait_for(self.new_request.wait(), remaining_wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            batch = self.take_batch(kind, bucket)
+            if not batch:
+                continue
+            try:
+                results = await loop.run_in_executor(
+                    self.executor, self.run_batch, kind, [r.payload for r in batch]
+                )
+            except Exception as e:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+            for request, result in zip(batch, results):
+                if not request.future.done():
+                    request.future.set_result(result)
+
+    def oldest_request(self):
+        oldest = None
+        for kind, buckets in self.buckets.items():
+            for bucket, requests in buckets.items():
+                self.drop_cancelled(requests)
+                if requests and (
+                    oldest is None or requests[0].arrival_time < oldest[2].arrival_time
+                ):
+                    oldest = (kind, bucket, requests[0])
+        return oldest
+
+    def drop_cancelled(self, requests: deque) -> None:
+        while requests and requests[0].future.done():
+            requests.popleft()
+            self.num_dropped += 1
+
+    def bucket_is_full(self, kind: str, bucket: Hashable) -> bool:
+        requests = self.buckets[kind][bucket]
+        return len(requests) >= self.max_batch_size or (
+            kind == "encode"
+            and len(requests) * max(r.size for r in requests) >= self.max_batch_blocks
+        )
+
+    def take_batch(self, kind: str, bucket: Hashable) -> List[PendingRequest]:
+        requests = self.buckets[kind][bucket]
+        batch = []
+        max_size = 0
+        while requests and len(batch) < self.max_batch_size:
+            request = requests[0]
+            if request.future.done():
+                requests.popleft()
+                self.num_dropped += 1
+                continue
+            new_max_size = max(max_size, request.size)
+            if (
+                kind == "encode"
+                and batch
+                and (len(batch) + 1) * new_max_size > self.max_batch_blocks
+            ):
+                break
+            batch.append(requests.popleft())
+            max_size = new_max_size
+
+        if batch:
+            self.num_batches += 1
+            self.batch_sizes.append(len(batch))
+            if kind == "encode":
+                self.batch_fills.append(
+                    sum(r.size for r in batch) / max(len(batch) * max_size, 1)
+                )
+        return batch
+
+    def run_batch(self, kind: str, payloads: list) -> list:
+        with torch.no_grad():
+            if kind == "encode":
+                return list(self.rgae.encode(payloads).detach().cpu())
+            embeds = torch.stack([embedding for embedding, _, _ in payloads])
+            max_graph_size = payloads[0][1]
+            num_nodes = [n for _, _, n in payloads]
+            return self.rgae.decode(
+                embeds,
+                max_graph_size,
+                num_nodes=None if None in num_nodes else num_nodes,
+            )
+
+    def stats(self) -> dict:
+        """
+        Returns the percentiles of the latencies of the recent requests in seconds, the mean number of graphs per
+        recent batch relative to `max_batch_size` and the mean share of the blocks of the recent padded encode batches
+        taken by the graphs. Up to `num_latencies` recent requests and batches are kept.
+        """
+        stats = {}
+        for kind, latencies in self.latencies.items():
+            if latencies:
+                p50, p90, p99 = np.percentile(list(latencies), [50, 90, 99])
+                stats[f"{kind}_latency_p50"] = p50
+                stats[f"{kind}_latency_p90"] = p90
+                stats[f"{kind}_latency_p99"] = p99
+            stats[f"{kind}_requests"] = len(latencies)
+        stats["batches"] = self.num_batches
+        stats["mean_batch_size"] = float(np.mean(self.batch_sizes or [0]))
+        stats["mean_batch_size_fill"] = stats["mean_batch_size"] / self.max_batch_size
+        stats["mean_padded_batch_fill"] = float(np.mean(self.batch_fills or [0]))
+        stats["dropped_requests"] = self.num_dropped
+        return stats
+
+
+async def serve_http(
+    server: MicroBatchingServer, host: str = "127.0.0.1", port: int = 0
+) -> asyncio.AbstractServer:
+    """
+    Minimal HTTP/1.1 stand-in of a web service in front of `server`, for local testing:
+    - POST /encode {"num_nodes": N, "edges": [[u, v], ...], "timeout": optional} -> {"embedding": [...]}
+    - POST /decode {"embedding": [...], "max_graph_size": optional, "num_nodes": optional, "timeout": optional}
+      -> {"num_nodes": N, "edges": [[u, v], ...]}
+    - GET /stats -> `MicroBatchingServer.stats`
+    """
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = (await reader.readline()).decode().split()
+            headers = {}
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                name, _, value = line.decode().partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            status, response = await handle_request(
+                server, request_line[0], request_line[1], body
+            )
+        except Exception as e:
+            status, response = 400, {"error": str(e)}
+        payload = json.dumps(response).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n"
+            "Connection: close\r\n\r\n".encode() + payload
+        )
+        await writer.drain()
+        writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+async def handle_request(server: MicroBatchingServer, method: str, path: str, body):
+    if method == "GET" and path == "/stats":
+        return 200, server.stats()
+    if method != "POST" or path not in ("/encode", "/decode"):
+        return 404, {"error": f"unknown endpoint {method} {path}"}
+
+    request = json.loads(body or b"{}")
+    try:
+        if path == "/encode":
+            num_nodes = request["num_nodes"]
+            adj_matrix = torch.zeros((num_nodes, num_nodes))
+            edges = torch.tensor(request["edges"], dtype=torch.long).reshape(-1, 2)
+            adj_matrix[edges[:, 0], edges[:, 1]] = 1.0
+            adj_matrix[edges[:, 1], edges[:, 0]] = 1.0
+            embedding = await server.encode(adj_matrix, request.get("timeout"))
+            return 200, {"embedding": embedding.tolist()}
+
+        adj_matrix = await server.decode(
+            torch.tensor(request["embedding"]),
+            request.get("max_graph_size", 999),
+            request.get("num_nodes"),
+            request.get("timeout"),
+        )
+        edges = torch.tril(adj_matrix, -1).nonzero()
+        return 200, {"num_nodes": len(adj_matrix), "edges": edges.tolist()}
+    except asyncio.TimeoutError:
+        return 504, {"error": "timed out"}
+    except ServerOverloaded as e:
+        return 503, {"error": str(e)}
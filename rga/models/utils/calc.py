@@ -1,6 +1,8 @@
 import torch
 from torch.functional import Tensor
 
+from rga.models.utils.precision import full_precision
+
 
 def weighted_average(v1: Tensor, v2: Tensor, weight: Tensor) -> Tensor:
     """
@@ -8,7 +10,9 @@ def weighted_average(v1: Tensor, v2: Tensor, weight: Tensor) -> Tensor:
     avg = v1 * sig(w) + v2 * (1 - sig(w))
 
     All Tensors have to have the same dimensions.
+    The gate is always evaluated in fp32, also when the tensors come from bfloat16 autocast layers.
     """
+    v1, v2, weight = full_precision(v1), full_precision(v2), full_precision(weight)
     weight = torch.sigmoid(weight)
     # ones = torch.ones(v1.shape, device=v1.device, requires_grad=v1.requires_grad)
     return v1 * weight + (1 - weight) * v2
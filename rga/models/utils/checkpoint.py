@@ -0,0 +1,30 @@
+import inspect
+from typing import Callable, Iterator, Sequence, Tuple
+
+import torch
+from torch.utils.checkpoint import checkpoint
+
+
+def checkpoint_segment(fn: Callable, *args) -> Tuple:
+    """
+    Runs `fn` without storing its activations, which are recomputed during the backward pass instead.
+
+    The reentrant implementation is used, as it's the only one available on the older supported torch versions.
+    It requires at least one of the input tensors to require grad for the gradients to be propagated.
+    """
+    if "use_reentrant" in inspect.signature(checkpoint).parameters:
+        return checkpoint(fn, *args, use_reentrant=True)
+    return checkpoint(fn, *args)
+
+
+def should_checkpoint(checkpoint_every: int) -> bool:
+    return checkpoint_every > 0 and torch.is_grad_enabled()
+
+
+def split_into_segments(steps: Sequence, checkpoint_every: int) -> Iterator[Sequence]:
+    """
+    Splits the recursion steps into segments of `checkpoint_every` steps, or a single one if checkpointing is disabled.
+    """
+    segment_length = checkpoint_every if checkpoint_every > 0 else len(steps)
+    for start in range(0, len(steps), max(segment_length, 1)):
+        yield steps[start : start + segment_length]
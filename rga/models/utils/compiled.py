@@ -0,0 +1,128 @@
+import warnings
+from typing import Dict, Optional, Tuple
+
+import torch
+from torch import nn, Tensor
+
+
+class BucketedCompiledStep:
+    """
+    Runs a method of a module compiled with `torch.compile`, removing the interpreter and dispatch overhead
+    of the many small operations of a recursion step.
+
+    A compiled graph is specialized to the shapes it was compiled for. To keep the number of compilations bounded,
+    the first (graph) dimension of the inputs and, if `pad_length` is set, their second (diagonal length)
+    dimension are zero padded up to a bucket size and the outputs are cut back to the original sizes.
+    This is only valid for methods treating every graph and every diagonal position independently, with
+    the outputs' diagonal lengths equal to the inputs'.
+
+    Every bucket is compiled ahead of time into a separate function, selected by the bucket's key, instead of
+    `torch._dynamo` searching the guards of all the compiled buckets on every call.
+    The compiled functions share the parameters with the module, so they always reflect its current weights.
+    If the compilation fails, or `max_num_buckets` buckets were compiled already, the eager method is used instead.
+    With `inference_only`, the eager method is also used whenever the gradient calculation is enabled.
+    """
+
+    def __init__(
+        self,
+        module: nn.Module,
+        method_name: str = "forward",
+        pad_length: bool = True,
+        backend: str = "inductor",
+        max_num_buckets: int = 128,
+        inference_only: bool = True,
+    ):
+        self.module = module
+        self.method_name = method_name
+        self.pad_length = pad_length
+        self.backend = backend
+        self.max_num_buckets = max_num_buckets
+        self.inference_only = inference_only
+        self.compiled_methods = {}
+        self.compilation_failed = False
+
+    def __call__(self, *inputs: Tensor):
+        eager_method = getattr(self.module, self.method_name)
+        if self.compilation_failed or (self.inference_only and torch.is_grad_enabled()):
+            return eager_method(*inputs)
+
+        num_graphs = inputs[0].shape[0]
+        length = inputs[0].shape[1] if self.pad_length else None
+        bucket = (bucket_size(num_graphs), bucket_size(length) if length else None)
+        # the variants of a bucket, which need separate compilations
+        key = (
+            bucket,
+            inputs[0].dtype,
+            inputs[0].device,
+            self.module.training,
+            torch.is_grad_enabled(),
+        )
+        padded_inputs = tuple(pad_to_bucket(t, bucket) for t in inputs)
+        compiled_method = self.compiled_methods.get(key)
+        if compiled_method is None:
+            if len(self.compiled_methods) >= self.max_num_buckets:
+                return eager_method(*inputs)
+            try:
+                # the unbound method, taking the module as its first argument
+                method = getattr(type(self.module), self.method_name)
+                compiled_method = torch.compile(
+                    method, backend=self.backend, fullgraph=True, dynamic=False
+                ).aot_compile(((self.module, *padded_inputs), {}))
+                # the key of the bucket selects the compiled function instead of its guards
+                compiled_method.disable_guard_check()
+            except Exception as e:
+                warnings.warn(
+                    f"compiling {type(self.module).__name__}.{self.method_name} failed, "
+                    f"falling back to eager execution: {e}"
+                )
+                self.compilation_failed = True
+                return eager_method(*inputs)
+            self.compiled_methods[key] = compiled_method
+        outputs = compiled_method(self.module, *padded_inputs)
+
+        length_padding = bucket[1] - length if self.pad_length else 0
+        if isinstance(outputs, Tensor):
+            return cut_to_size(outputs, num_graphs, length_padding)
+        return tuple(
+            cut_to_size(output, num_graphs, length_padding) for output in outputs
+        )
+
+    def __getstate__(self) -> Dict:
+        # the buckets are compiled again after unpickling or copying
+        return {**self.__dict__, "compiled_methods": {}}
+
+
+def bucket_size(size: int) -> int:
+    """
+    Rounds the size up to one of eight buckets per power of two, bounding the padding overhead to 12.5%.
+    """
+    step = 1 << max(max(size - 1, 0).bit_length() - 4, 0)
+    return -(-size // step) * step
+
+
+def pad_to_bucket(t: Tensor, bucket: Tuple[int, Optional[int]]) -> Tensor:
+    num_graphs, length = bucket
+    padding = [0, 0] * (t.ndim - 1) + [0, num_graphs - t.shape[0]]
+    if length is not None:
+        padding[-3] = length - t.shape[1]
+    if any(padding):
+        t = torch.nn.functional.pad(t, padding)
+    # the compiled functions also check the strides of the inputs, including the ones of single element dimensions
+    if t.stride() != contiguous_strides(t.shape):
+        t = t.clone(memory_format=torch.contiguous_format)
+    return t
+
+
+def contiguous_strides(shape: torch.Size) -> Tuple[int, ...]:
+    strides = [1]
+    for size in reversed(shape[1:]):
+        strides.insert(0, strides[0] * size)
+    return tuple(strides)
+
+
+def cut_to_size(t: Tensor, num_graphs: int, length_padding: int) -> Tensor:
+    if t.shape[0] > num_graphs:
+        t = t[:num_graphs]
+    if length_padding > 0:
+        t = t[:, : t.shape[1] - length_padding]
+    return t
@@ -0,0 +1,124 @@
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import torch
+from torch import Tensor
+
+
+class EmbeddingCache:
+    """
+    Least recently used cache of graph embeddings, keyed by content hashes of the graphs and of the model,
+    see `adj_matrix_key`. The entries are kept on the CPU within `max_bytes` of embedding data,
+    evicting the least recently used ones.
+
+    With `path`, the entries are also written to that directory as they are added, which makes a second,
+    unbounded tier, shared between processes and kept between runs. The entries missing in memory are looked up
+    on disk and moved back to memory.
+    """
+
+    def __init__(self, max_bytes: int = 2**28, path: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.path = path
+        self.entries: "OrderedDict[str, Tensor]" = OrderedDict()
+        self.num_bytes = 0
+        self.num_hits = 0
+        self.num_disk_hits = 0
+        self.num_misses = 0
+        self.num_evictions = 0
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: str) -> Optional[Tensor]:
+        embedding = self.entries.get(key)
+        if embedding is not None:
+            self.entries.move_to_end(key)
+            self.num_hits += 1
+            return embedding
+
+        entry_path = self.entry_path(key)
+        if entry_path is not None and os.path.exists(entry_path):
+            embedding = torch.load(entry_path)
+            self.add(key, embedding)
+            self.num_hits += 1
+            self.num_disk_hits += 1
+            return embedding
+
+        self.num_misses += 1
+        return None
+
+    def put(self, key: str, embedding: Tensor) -> None:
+        embedding = embedding.detach().cpu()
+        entry_path = self.entry_path(key)
+        if entry_path is not None and not os.path.exists(entry_path):
+            # written to a temporary file first, so that concurrent readers never see a partial entry
+            tmp_path = f"{entry_path}.tmp{os.getpid()}"
+            torch.save(embedding.clone(), tmp_path)
+            os.replace(tmp_path, entry_path)
+        self.add(key, embedding)
+
+    def add(self, key: str, embedding: Tensor) -> None:
+        if key in self.entries:
+            self.num_bytes -= entry_size(self.entries.pop(key))
+        if entry_size(embedding) > self.max_bytes:
+            return
+        self.entries[key] = embedding
+        self.num_bytes += entry_size(embedding)
+        while self.num_bytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.num_bytes -= entry_size(evicted)
+            self.num_evictions += 1
+
+    def entry_path(self, key: str) -> Optional[str]:
+        if self.path is None:
+            return None
+        return os.path.join(self.path, f"{key}.pt")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self.entries),
+            "bytes": self.num_bytes,
+            "hits": self.num_hits,
+            "disk_hits": self.num_disk_hits,
+            "misses": self.num_misses,
+            "evictions": self.num_evictions,
+        }
+
+    def clear(self) -> None:
+        """
+        Empties the in-memory tier, keeping the counters and the on-disk tier.
+        """
+        self.entries.clear()
+        self.num_bytes = 0
+
+
+def entry_size(embedding: Tensor) -> int:
+    return embedding.numel() * embedding.element_size()
+
+
+def adj_matrix_key(adj_matrix: Tensor, model_digest: str = "") -> str:
+    """
+    Returns a content hash of the structure of a graph, its number of nodes and the positions and values of
+    the edges of the lower triangle of its adjacency matrix, the only part seen by the encoder, combined with
+    `model_digest` identifying the model the embeddings come from.
+    """
+    adj_matrix = adj_matrix.detach().cpu()
+    lower_triangle = torch.tril(
+        adj_matrix.reshape(*adj_matrix.shape[:2], -1).permute(2, 0, 1), -1
+    )
+    edge_indices = lower_triangle.any(dim=0).nonzero()
+    h = hashlib.sha1(model_digest.encode())
+    h.update(f"{adj_matrix.shape[0]}:{lower_triangle.shape[0]}".encode())
+    h.update(edge_indices.numpy().astype("int64").tobytes())
+    h.update(
+        lower_triangle[:, edge_indices[:, 0], edge_indices[:, 1]]
+        .float()
+        .contiguous()
+        .numpy()
+        .tobytes()
+    )
+    return h.hexdigest()
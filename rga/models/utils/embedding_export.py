@@ -0,0 +1,317 @@
+import json
+import os
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple
+
+import numpy as np
+import torch
+
+from rga.data.util.pickled_data import load_pickled_data
+from rga.util.adjmatrix.diagonal_block_representation import calculate_num_blocks
+from rga.util.adjmatrix.edge_list_diagonal_blocks import EdgeListDiagonalBlocks
+
+# id, edges of shape [num_edges, 2] and number of nodes of a graph
+GraphRecord = Tuple[str, np.ndarray, int]
+
+MANIFEST_FILE = "manifest.json"
+EMBEDDINGS_FILE = "embeddings.bin"
+IDS_FILE = "ids.txt"
+
+
+def graph_to_edge_list(graph) -> Tuple[np.ndarray, int]:
+    """
+    Returns the edges of the lower triangle and the number of nodes of an adjacency matrix,
+    given as a numpy array, a dense or sparse torch tensor, or a scipy sparse matrix.
+    """
+    if hasattr(graph, "tocoo"):
+        coo = graph.tocoo()
+        edges = np.stack([coo.row, coo.col], axis=1)
+    elif isinstance(graph, torch.Tensor):
+        if graph.layout == torch.sparse_coo:
+            edges = graph.coalesce().indices().T.numpy()
+        else:
+            edges = graph.nonzero().numpy()
+    else:
+        edges = np.stack(np.nonzero(np.asarray(graph)), axis=1)
+    edges = edges.astype(np.int64).reshape(-1, 2)
+    return edges[edges[:, 0] > edges[:, 1]], int(graph.shape[0])
+
+
+def tu_dataset_graphs(datasets_dir: str, dataset_name: str) -> Iterator[GraphRecord]:
+    """
+    Yields the graphs of a dataset in the TU format, `<name>_A.txt` and `<name>_graph_indicator.txt`,
+    with the isolated nodes removed like in `RealGraphLoader`, identified by their 1-based indices in the dataset.
+    """
+    dataset_folder = Path(datasets_dir) / dataset_name
+    data_adj = np.loadtxt(
+        dataset_folder / f"{dataset_name}_A.txt", delimiter=",", dtype=np.int64
+    ).reshape(-1, 2)
+    graph_indicator = np.loadtxt(
+        dataset_folder / f"{dataset_name}_graph_indicator.txt",
+        delimiter=",",
+        dtype=np.int64,
+    ).reshape(-1)
+
+    edge_graphs = graph_indicator[data_adj[:, 0] - 1]
+    edge_order = np.argsort(edge_graphs, kind="stable")
+    graph_bounds = np.searchsorted(
+        edge_graphs[edge_order], np.arange(1, graph_indicator.max() + 2)
+    )
+    for graph_idx in range(graph_indicator.max()):
+        edges = data_adj[
+            edge_order[graph_bounds[graph_idx] : graph_bounds[graph_idx + 1]]
+        ]
+        # renumbered from 0 in the original order of the nodes, skipping the isolated ones
+        nodes, edges = np.unique(edges, return_inverse=True)
+        yield str(graph_idx + 1), edges.reshape(-1, 2), len(nodes)
+
+
+def pickled_dataset_graphs(path: str, split: str = "test") -> Iterator[GraphRecord]:
+    """
+    Yields the graphs of a `split` of a pickled dataset, identified by the index of the dataset of the split
+    and the graph's index in it.
+    """
+    train_dataset, val_datasets, test_datasets = load_pickled_data(path, False)
+    datasets = {"train": [train_dataset], "val": val_datasets, "test": test_datasets}[
+        split
+    ]
+    for dataset_idx, dataset in enumerate(datasets):
+        for graph_idx, graph in enumerate(dataset):
+            edges, num_nodes = graph_to_edge_list(graph)
+            yield f"{dataset_idx}/{graph_idx}", edges, num_nodes
+
+
+def edge_list_dir_graphs(directory: str) -> Iterator[GraphRecord]:
+    """
+    Yields the graphs of the edge list files of a directory in the order of their names, identified by the names
+    without the extensions. `.npy` files hold arrays of shape [num_edges, 2], other files whitespace separated
+    pairs of node indices, one edge per line. The graphs have as many nodes as the largest node index + 1.
+    """
+    for path in sorted(Path(directory).iterdir()):
+        if not path.is_file():
+            continue
+        if path.suffix == ".npy":
+            edges = np.load(path, mmap_mode="r")
+        else:
+            edges = np.loadtxt(path, dtype=np.int64, ndmin=2)
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        yield path.stem, edges, int(edges.max()) + 1 if len(edges) else 0
+
+
+class EmbeddingExporter:
+    """
+    Encodes a stream of graphs with an `RGAE` model into a memory-mapped array of embeddings with an index of the
+    graph ids, see `load_exported_embeddings`.
+
+    The graphs are processed in chunks of `chunk_size` in the order of the stream. Within a chunk, they are sorted
+    by size and batched greedily while the padded batch of their diagonal block representations fits in
+    `max_batch_bytes`, so that the memory is bounded and the big graphs don't inflate the padding of the small ones.
+    A graph that doesn't fit alone is encoded with `GraphEncoder.forward_streaming`. The graphs are converted from
+    their edge lists, never densified.
+
+    The output directory holds the raw embeddings, the ids, one per line, and a manifest with the number of
+    exported graphs, updated after each chunk. An interrupted export is resumed from the last completed chunk,
+    dropping the embeddings written after it, given the same stream of graphs.
+    """
+
+    def __init__(
+        self,
+        rgae,
+        output_dir: str,
+        dtype: str = "float32",
+        chunk_size: int = 4096,
+        max_batch_bytes: int = 2**28,
+        max_batch_size: int = 512,
+    ):
+        self.rgae = rgae
+        self.encoder = rgae.engine_part("encoder")
+        self.output_dir = Path(output_dir)
+        self.dtype = np.dtype(dtype)
+        self.chunk_size = chunk_size
+        self.max_batch_bytes = max_batch_bytes
+        self.max_batch_size = max_batch_size
+        self.block_size = rgae.hparams["block_size"]
+        self.num_diagonals = rgae.hparams.get("max_bandwidth") or None
+        self.block_bytes = self.block_size**2 * rgae.hparams.get("edge_size", 1) * 4
+
+    def export(self, graphs: Iterable[GraphRecord]) -> int:
+        """
+        Encodes the graphs, skipping the ones exported before an interruption, and returns the number of graphs.
+        """
+        manifest = self.resume()
+        num_exported = manifest["num_graphs"]
+        graphs = iter(graphs)
+        for _ in range(num_exported):
+            next(graphs, None)
+
+        with open(self.output_dir / EMBEDDINGS_FILE, "ab") as embeddings_file, open(
+            self.output_dir / IDS_FILE, "a"
+        ) as ids_file:
+            while True:
+                chunk = [graph for _, graph in zip(range(self.chunk_size), graphs)]
+                if not chunk:
+                    break
+                embeddings = self.encode_chunk(chunk)
+                embeddings_file.write(embeddings.astype(self.dtype).tobytes())
+                embeddings_file.flush()
+                os.fsync(embeddings_file.fileno())
+                ids_file.writelines(f"{graph_id}\n" for graph_id, _, _ in chunk)
+                ids_file.flush()
+                os.fsync(ids_file.fileno())
+
+                num_exported += len(chunk)
+                manifest["num_graphs"] = num_exported
+                self.write_manifest(manifest)
+
+        manifest["complete"] = True
+        self.write_manifest(manifest)
+        return num_exported
+
+    def resume(self) -> dict:
+        """
+        Returns the manifest of the previous export into the output directory, or a new one,
+        truncating the files to the last completed chunk.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        manifest_path = self.output_dir / MANIFEST_FILE
+        manifest = {
+            "num_graphs": 0,
+            "embedding_size": self.encoder.embedding_size,
+            "dtype": self.dtype.name,
+            "complete": False,
+        }
+        if manifest_path.exists():
+            with open(manifest_path) as f:
+                previous_manifest = json.load(f)
+            if (
+                previous_manifest["embedding_size"] != manifest["embedding_size"]
+                or previous_manifest["dtype"] != manifest["dtype"]
+            ):
+                raise ValueError(
+                    f"{self.output_dir} holds an export of a different embedding size or dtype"
+                )
+            manifest.update(num_graphs=previous_manifest["num_graphs"])
+
+        num_graphs = manifest["num_graphs"]
+        with open(self.output_dir / EMBEDDINGS_FILE, "ab") as f:
+            f.truncate(num_graphs * manifest["embedding_size"] * self.dtype.itemsize)
+        ids = []
+        if (self.output_dir / IDS_FILE).exists():
+            with open(self.output_dir / IDS_FILE) as f:
+                ids = [line for _, line in zip(range(num_graphs), f)]
+        with open(self.output_dir / IDS_FILE, "w") as f:
+            f.writelines(ids)
+        self.write_manifest(manifest)
+        return manifest
+
+    def write_manifest(self, manifest: dict) -> None:
+        manifest_path = self.output_dir / MANIFEST_FILE
+        tmp_path = f"{manifest_path}.tmp{os.getpid()}"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, manifest_path)
+
+    @torch.no_grad()
+    def encode_chunk(self, chunk: List[GraphRecord]) -> np.ndarray:
+        embeddings = np.zeros((len(chunk), self.encoder.embedding_size), np.float32)
+        num_nodes = np.array([n for _, _, n in chunk])
+        num_blocks = self.num_representation_blocks(num_nodes)
+        # the graphs without blocks, of a single node, are encoded by streaming too, as the batches skip them
+        streamed_indices = np.nonzero(
+            (num_blocks * self.block_bytes > self.max_batch_bytes) | (num_blocks == 0)
+        )[0]
+        for i in streamed_indices:
+            _, edges, graph_num_nodes = chunk[i]
+            diagonals = self.diagonals(edges, graph_num_nodes)
+            embedding = self.encoder.forward_streaming(
+                diagonals,
+                graph_num_nodes,
+                num_diagonals=self.num_kept_diagonals(diagonals),
+            )
+            embeddings[i] = embedding.float().cpu().numpy()
+
+        batched_indices = np.setdiff1d(np.arange(len(chunk)), streamed_indices)
+        for batch_indices in self.size_buckets(num_nodes[batched_indices]):
+            batch_indices = batched_indices[batch_indices]
+            graphs, num_diagonals = [], []
+            for _, edges, n in (chunk[i] for i in batch_indices):
+                diagonals = self.diagonals(edges, n)
+                num_diagonals.append(self.num_kept_diagonals(diagonals))
+                graphs.append(
+                    torch.cat(
+                        [diagonals.diagonal(d) for d in range(num_diagonals[-1])][::-1]
+                    )
+                )
+            batch = (
+                torch.nn.utils.rnn.pad_sequence(graphs, batch_first=True),
+                [],
+                torch.tensor(num_nodes[batch_indices]),
+                torch.tensor(num_diagonals),
+            )
+            embeddings[batch_indices] = self.encoder(batch).float().cpu().numpy()
+        return embeddings
+
+    def size_buckets(self, num_nodes: np.ndarray) -> Iterator[np.ndarray]:
+        """
+        Yields the indices of the batches of graphs of similar sizes within `max_batch_bytes`, from the smallest.
+        """
+        order = np.argsort(num_nodes, kind="stable")
+        num_blocks = self.num_representation_blocks(num_nodes[order])
+        start = 0
+        while start < len(order):
+            end = start + 1
+            while (
+                end < len(order)
+                and end - start < self.max_batch_size
+                and (end + 1 - start) * num_blocks[end] * self.block_bytes
+                <= self.max_batch_bytes
+            ):
+                end += 1
+            yield order[start:end]
+            start = end
+
+    def num_representation_blocks(self, num_nodes: np.ndarray) -> np.ndarray:
+        num_blocks = calculate_num_blocks(torch.from_numpy(num_nodes), self.block_size)
+        num_blocks = num_blocks.long().clamp(min=0).numpy()
+        if self.num_diagonals is None:
+            return num_blocks * (num_blocks + 1) // 2
+        num_kept_diagonals = np.minimum(num_blocks, self.num_diagonals)
+        return num_kept_diagonals * (2 * num_blocks - num_kept_diagonals + 1) // 2
+
+    def diagonals(self, edges: np.ndarray, num_nodes: int) -> EdgeListDiagonalBlocks:
+        return EdgeListDiagonalBlocks(
+            edges,
+            num_nodes,
+            self.block_size,
+            edge_size=self.rgae.hparams.get("edge_size", 1),
+            pad_value=self.encoder.pad_value,
+        )
+
+    def num_kept_diagonals(self, diagonals: EdgeListDiagonalBlocks) -> int:
+        """
+        Returns the number of the diagonals of a graph kept in its representation, up to its bandwidth
+        capped by `max_bandwidth` for the models trained with it, see `diagonal_block_example`.
+        """
+        if self.num_diagonals is None:
+            return len(diagonals)
+        return min(diagonals.bandwidth, self.num_diagonals, len(diagonals))
+
+
+def load_exported_embeddings(output_dir: str) -> Tuple[np.memmap, List[str]]:
+    """
+    Returns the memory-mapped embeddings of an export, of shape [num_graphs, embedding_size],
+    and the ids of their graphs, see `EmbeddingExporter`.
+    """
+    output_dir = Path(output_dir)
+    with open(output_dir / MANIFEST_FILE) as f:
+        manifest = json.load(f)
+    shape = (manifest["num_graphs"], manifest["embedding_size"])
+    if shape[0] == 0:
+        embeddings = np.zeros(shape, dtype=manifest["dtype"])
+    else:
+        embeddings = np.memmap(
+            output_dir / EMBEDDINGS_FILE, dtype=manifest["dtype"], mode="r", shape=shape
+        )
+    with open(output_dir / IDS_FILE) as f:
+        ids = [line.rstrip("\n") for _, line in zip(range(shape[0]), f)]
+    return embeddings, ids
@@ -0,0 +1,410 @@
+import json
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+FORMAT_VERSION = 1
+CONFIG_FILE = "index.json"
+CENTROIDS_FILE = "centroids.npy"
+CODEBOOKS_FILE = "codebooks.npy"
+CODES_FILE = "codes.bin"
+LISTS_FILE = "lists.bin"
+IDS_FILE = "ids.bin"
+# the number of rows processed at once by the assignments and the exact search, bounding their memory
+CHUNK_SIZE = 2**16
+
+
+def normalize(embeddings) -> np.ndarray:
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+
+def assign(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """
+    Returns the indices of the closest centroids, in the euclidean distance, of the rows of `x`.
+    """
+    centroid_norms = (centroids**2).sum(axis=1)
+    assignments = np.empty(len(x), dtype=np.int64)
+    for start in range(0, len(x), CHUNK_SIZE):
+        chunk = x[start : start + CHUNK_SIZE]
+        assignments[start : start + len(chunk)] = np.argmin(
+            centroid_norms[None] - 2 * chunk @ centroids.T, axis=1
+        )
+    return assignments
+
+
+def kmeans(
+    x: np.ndarray, num_clusters: int, num_iterations: int, rng: np.random.Generator
+) -> np.ndarray:
+    """
+    Lloyd's k-means of the rows of `x`, initialized with random rows. The empty clusters are reseeded with
+    random rows. Returns the centroids of shape [num_clusters, x.shape[1]].
+    """
+    centroids = x[rng.choice(len(x), num_clusters, replace=len(x) < num_clusters)]
+    centroids = centroids.astype(np.float32)
+    for _ in range(num_iterations):
+        assignments = assign(x, centroids)
+        counts = np.bincount(assignments, minlength=num_clusters)
+        non_empty = np.nonzero(counts)[0]
+        starts = (np.cumsum(counts) - counts)[non_empty]
+        sums = np.add.reduceat(x[np.argsort(assignments, kind="stable")], starts)
+        centroids[non_empty] = sums / counts[non_empty, None]
+        empty = np.nonzero(counts == 0)[0]
+        centroids[empty] = x[rng.choice(len(x), len(empty))]
+    return centroids
+
+
+def top_k(scores: np.ndarray, ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the `k` highest scores of each row and their ids, the highest first.
+    """
+    if scores.shape[1] > k:
+        selected = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, selected, axis=1)
+        ids = np.take_along_axis(ids, selected, axis=1)
+    order = np.argsort(-scores, axis=1, kind="stable")
+    return (
+        np.take_along_axis(scores, order, axis=1),
+        np.take_along_axis(ids, order, axis=1),
+    )
+
+
+def exact_search(
+    embeddings: np.ndarray, queries: np.ndarray, k: int = 10
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Brute force cosine similarity search, reading the possibly memory-mapped embeddings in chunks.
+    Returns the similarities and the row indices of the `k` most similar embeddings of each query,
+    of shape [num_queries, min(k, num_embeddings)], the most similar first.
+    """
+    queries = normalize(queries)
+    scores = np.zeros((len(queries), 0), dtype=np.float32)
+    ids = np.zeros((len(queries), 0), dtype=np.int64)
+    for start in range(0, len(embeddings), CHUNK_SIZE):
+        chunk = normalize(embeddings[start : start + CHUNK_SIZE])
+        chunk_ids = np.broadcast_to(
+            np.arange(start, start + len(chunk)), (len(queries), len(chunk))
+        )
+        scores, ids = top_k(
+            np.concatenate([scores, queries @ chunk.T], axis=1),
+            np.concatenate([ids, chunk_ids], axis=1),
+            k,
+        )
+    return scores, ids
+
+
+class InvertedLists:
+    """
+    The PQ codes and the ids of indexed embeddings, grouped by their coarse clusters.
+    """
+
+    def __init__(
+        self, codes: np.ndarray, lists: np.ndarray, ids: np.ndarray, num_lists: int
+    ):
+        self.codes = codes
+        self.ids = ids
+        self.order = np.argsort(lists, kind="stable")
+        counts = np.bincount(lists, minlength=num_lists)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def entries(self, list_idx: int) -> Tuple[np.ndarray, np.ndarray]:
+        rows = self.order[self.offsets[list_idx] : self.offsets[list_idx + 1]]
+        return self.codes[rows], self.ids[rows]
+
+
+class IVFPQIndex:
+    """
+    Approximate cosine similarity search over graph embeddings, e.g. of `RGAE.encode` or `EmbeddingExporter`,
+    with an inverted file of product quantization codes, in numpy only.
+
+    The normalized embeddings are assigned to the closest of `num_lists` coarse centroids, and their residuals
+    to the centroids are split into `num_subvectors` parts, each stored as the index of the closest of its
+    `num_codes` codewords, i.e. in `num_subvectors` bytes. A query is compared to the embeddings of its
+    `num_probes` closest lists only, with the similarities computed from per query tables of the similarities
+    to the codewords. The candidates can be reranked with the exact embeddings.
+
+    The centroids and the codebooks are learned by `train`, after which the embeddings can be added at any time.
+    A saved index is memory-mapped by `load`. Saving again into the same directory appends only the embeddings
+    added since, so that a growing index is persisted incrementally.
+    """
+
+    def __init__(
+        self,
+        embedding_size: int,
+        num_lists: int = 256,
+        num_subvectors: int = 8,
+        num_codes: int = 256,
+    ):
+        if embedding_size % num_subvectors != 0:
+            raise ValueError(
+                f"the embedding size {embedding_size} is not divisible by the number of subvectors {num_subvectors}"
+            )
+        if num_codes > 256:
+            raise ValueError(f"the codes are stored in single bytes, got {num_codes}")
+        self.embedding_size = embedding_size
+        self.num_lists = num_lists
+        self.num_subvectors = num_subvectors
+        self.num_codes = num_codes
+        self.centroids: Optional[np.ndarray] = None
+        self.codebooks: Optional[np.ndarray] = None
+
+        # the saved part of the index, possibly memory-mapped, and the added embeddings not saved yet
+        self.path: Optional[Path] = None
+        self.stored = self.empty_entries()
+        self.added: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        self.inverted_lists: Optional[List[InvertedLists]] = None
+
+    def __len__(self) -> int:
+        return len(self.stored[2]) + sum(len(ids) for _, _, ids in self.added)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def empty_entries(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return (
+            np.zeros((0, self.num_subvectors), dtype=np.uint8),
+            np.zeros(0, dtype=np.int32),
+            np.zeros(0, dtype=np.int64),
+        )
+
+    def train(
+        self,
+        embeddings: np.ndarray,
+        num_iterations: int = 20,
+        max_training_embeddings: int = 2**16,
+        seed: int = 0,
+    ) -> None:
+        """
+        Learns the coarse centroids and the codebooks of the residuals on a random sample of the embeddings.
+        """
+        rng = np.random.default_rng(seed)
+        if len(embeddings) > max_training_embeddings:
+            sample = np.sort(
+                rng.choice(len(embeddings), max_training_embeddings, False)
+            )
+            embeddings = embeddings[sample]
+        x = normalize(embeddings)
+
+        self.centroids = kmeans(x, self.num_lists, num_iterations, rng)
+        residuals = x - self.centroids[assign(x, self.centroids)]
+        self.codebooks = np.stack(
+            [
+                kmeans(subvectors, self.num_codes, num_iterations, rng)
+                for subvectors in self.split(residuals)
+            ]
+        )
+
+    def split(self, x: np.ndarray) -> List[np.ndarray]:
+        return np.split(x, self.num_subvectors, axis=1)
+
+    def add(self, embeddings: np.ndarray, ids: np.ndarray = None) -> None:
+        """
+        Adds the embeddings, identified by `ids`, by default by their positions in the order of addition,
+        which are the row indices of an export if it's indexed as a whole or in order.
+        """
+        if not self.is_trained:
+            raise ValueError("the index must be trained before adding embeddings")
+        if ids is None:
+            ids = np.arange(len(self), len(self) + len(embeddings))
+        x = normalize(embeddings)
+        lists = assign(x, self.centroids)
+        residuals = x - self.centroids[lists]
+        codes = np.stack(
+            [
+                assign(subvectors, codebook)
+                for subvectors, codebook in zip(self.split(residuals), self.codebooks)
+            ],
+            axis=1,
+        )
+        self.added.append(
+            (
+                codes.astype(np.uint8),
+                lists.astype(np.int32),
+                np.asarray(ids, dtype=np.int64),
+            )
+        )
+        self.inverted_lists = None
+
+    def all_added(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if not self.added:
+            return self.empty_entries()
+        return tuple(np.concatenate(arrays) for arrays in zip(*self.added))
+
+    def get_inverted_lists(self) -> List[InvertedLists]:
+        if self.inverted_lists is None:
+            self.added = [self.all_added()]
+            self.inverted_lists = [
+                InvertedLists(*entries, self.num_lists)
+                for entries in [self.stored, self.added[0]]
+                if len(entries[2]) > 0
+            ]
+        return self.inverted_lists
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int = 10,
+        num_probes: int = 8,
+        rerank_embeddings: np.ndarray = None,
+        num_candidates: int = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the approximate cosine similarities and the ids of the `k` most similar embeddings to each
+        of the queries, of shape [num_queries, k], the most similar first, padded with -inf and -1.
+
+        With `rerank_embeddings`, the embeddings indexed by the ids, e.g. the memory-mapped export,
+        the `num_candidates` best candidates, `4 * k` by default, are reranked with their exact similarities.
+        """
+        if not self.is_trained:
+            raise ValueError("the index must be trained before searching")
+        queries = normalize(queries)
+        num_probes = min(num_probes, self.num_lists)
+        coarse_scores = queries @ self.centroids.T
+        probes = np.argpartition(-coarse_scores, num_probes - 1, axis=1)[:, :num_probes]
+        # the similarities of the parts of the queries to the codewords, flattened to [num_queries, M * K]
+        tables = np.einsum(
+            "qmd,mkd->qmk",
+            queries.reshape(len(queries), self.num_subvectors, -1),
+            self.codebooks,
+        ).reshape(len(queries), -1)
+        table_offsets = np.arange(self.num_subvectors) * self.num_codes
+
+        candidate_scores = [[] for _ in queries]
+        candidate_ids = [[] for _ in queries]
+        inverted_lists = self.get_inverted_lists()
+        for list_idx in np.unique(probes):
+            query_indices = np.nonzero((probes == list_idx).any(axis=1))[0]
+            for lists in inverted_lists:
+                codes, ids = lists.entries(list_idx)
+                if len(ids) == 0:
+                    continue
+                scores = np.take(
+                    tables[query_indices], codes + table_offsets, axis=1
+                ).sum(axis=2)
+                scores += coarse_scores[query_indices, list_idx, None]
+                for i, query_idx in enumerate(query_indices):
+                    candidate_scores[query_idx].append(scores[i])
+                    candidate_ids[query_idx].append(ids)
+
+        num_kept = k if rerank_embeddings is None else max(k, num_candidates or 4 * k)
+        results = [
+            self.best_candidates(scores, ids, num_kept)
+            for scores, ids in zip(candidate_scores, candidate_ids)
+        ]
+        scores = np.stack([scores for scores, _ in results])
+        ids = np.stack([ids for _, ids in results])
+        if rerank_embeddings is not None:
+            scores, ids = self.rerank(queries, ids, rerank_embeddings)
+        return scores[:, :k], ids[:, :k]
+
+    def best_candidates(
+        self, scores: List[np.ndarray], ids: List[np.ndarray], k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        scores = np.concatenate(scores or [np.zeros(0, dtype=np.float32)])
+        ids = np.concatenate(ids or [np.zeros(0, dtype=np.int64)])
+        scores, ids = top_k(scores[None], ids[None], k)
+        padding = k - scores.shape[1]
+        return (
+            np.pad(scores[0], (0, padding), constant_values=-np.inf),
+            np.pad(ids[0], (0, padding), constant_values=-1),
+        )
+
+    def rerank(
+        self, queries: np.ndarray, ids: np.ndarray, embeddings: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        found = ids >= 0
+        exact_embeddings = np.zeros(ids.shape + (self.embedding_size,), np.float32)
+        # the rows are read in increasing order, which is faster for memory-mapped embeddings
+        unique_ids, inverse = np.unique(ids[found], return_inverse=True)
+        exact_embeddings[found] = normalize(embeddings[unique_ids])[inverse]
+        scores = np.einsum("qd,qcd->qc", queries, exact_embeddings)
+        scores[~found] = -np.inf
+        return top_k(scores, ids, ids.shape[1])
+
+    def save(self, path: str) -> None:
+        """
+        Saves the index into the directory `path`. If the index was loaded from or saved into it before,
+        only the embeddings added since are appended to its files. The index is then memory-mapped from it.
+        """
+        path = Path(path)
+        os.makedirs(path, exist_ok=True)
+        appending = self.path is not None and path.resolve() == self.path.resolve()
+        if not appending:
+            np.save(path / CENTROIDS_FILE, self.centroids)
+            np.save(path / CODEBOOKS_FILE, self.codebooks)
+
+        num_saved = len(self.stored[2]) if appending else 0
+        entries = self.all_added() if appending else self.all_entries()
+        for file_name, array, empty in zip(
+            [CODES_FILE, LISTS_FILE, IDS_FILE], entries, self.empty_entries()
+        ):
+            with open(path / file_name, "ab" if appending else "wb") as f:
+                # drops the embeddings written by an interrupted save
+                f.truncate(num_saved * empty.itemsize * int(np.prod(empty.shape[1:])))
+                f.write(np.ascontiguousarray(array).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+        config = {
+            "format_version": FORMAT_VERSION,
+            "embedding_size": self.embedding_size,
+            "num_lists": self.num_lists,
+            "num_subvectors": self.num_subvectors,
+            "num_codes": self.num_codes,
+            "num_embeddings": num_saved + len(entries[2]),
+        }
+        # the number of embeddings is updated last, like the manifest of `EmbeddingExporter`
+        tmp_path = path / f"{CONFIG_FILE}.tmp{os.getpid()}"
+        with open(tmp_path, "w") as f:
+            json.dump(config, f)
+        os.replace(tmp_path, path / CONFIG_FILE)
+
+        loaded = IVFPQIndex.load(path)
+        self.path = loaded.path
+        self.stored = loaded.stored
+        self.added = []
+        self.inverted_lists = None
+
+    def all_entries(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return tuple(
+            np.concatenate([stored, added])
+            for stored, added in zip(self.stored, self.all_added())
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "IVFPQIndex":
+        path = Path(path)
+        with open(path / CONFIG_FILE) as f:
+            config = json.load(f)
+        if config["format_version"] > FORMAT_VERSION:
+            raise ValueError(
+                f"the index format version {config['format_version']} is not supported"
+            )
+        index = cls(
+            config["embedding_size"],
+            num_lists=config["num_lists"],
+            num_subvectors=config["num_subvectors"],
+            num_codes=config["num_codes"],
+        )
+        index.centroids = np.load(path / CENTROIDS_FILE)
+        index.codebooks = np.load(path / CODEBOOKS_FILE)
+        index.path = path
+
+        num_embeddings = config["num_embeddings"]
+        if num_embeddings > 0:
+            index.stored = tuple(
+                np.memmap(
+                    path / file_name,
+                    dtype=empty.dtype,
+                    mode="r",
+                    shape=(num_embeddings,) + empty.shape[1:],
+                )
+                for file_name, empty in zip(
+                    [CODES_FILE, LISTS_FILE, IDS_FILE], index.empty_entries()
+                )
+            )
+        return index
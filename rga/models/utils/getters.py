@@ -9,6 +9,7 @@ from rga.metrics.edge_accuracy import EdgeAccuracy, MaskAccuracy
 from rga.metrics.graph_size import MaxGraphSize
 from rga.metrics.losses import (
     MeanEmbeddingsLoss,
+    MeanDistillationLoss,
     MeanKLDLoss,
     MeanReconstructionLoss,
     MeanClassificationLoss,
@@ -74,12 +75,18 @@ def get_metrics(metrics: List[str]):
         "EdgeRecallNonWeighted": EdgeRecallNonWeighted,
         "EdgePrecisionSquareWeighted": EdgePrecisionSquareWeighted,
         "EdgeRecallSquareWeighted": EdgeRecallSquareWeighted,
+        "EdgeAccuracyWeighted": EdgeAccuracyWeighted,
+        "EdgeAccuracyNonWeighted": EdgeAccuracyNonWeighted,
+        "EdgeAccuracySquareWeighted": EdgeAccuracySquareWeighted,
         "EdgeF1": EdgeF1,
+        "EdgeF1NonWeighted": EdgeF1NonWeighted,
+        "EdgeF1SquareWeighted": EdgeF1SquareWeighted,
         "MaskPrecision": MaskPrecision,
         "MaskRecall": MaskRecall,
         "MaxGraphSize": MaxGraphSize,
         "MeanReconstructionLoss": MeanReconstructionLoss,
         "MeanEmbeddingsLoss": MeanEmbeddingsLoss,
+        "MeanDistillationLoss": MeanDistillationLoss,
         "MeanClassificationLoss": MeanClassificationLoss,
         "MeanKLDLoss": MeanKLDLoss,
         "GraphDrawer": GraphDrawer,
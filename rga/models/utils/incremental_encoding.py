@@ -0,0 +1,231 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+from torch import Tensor
+
+from rga.models.utils.precision import bf16_autocast
+from rga.util.adjmatrix.diagonal_block_representation import calculate_num_blocks
+from rga.util.adjmatrix.edge_list_diagonal_blocks import (
+    EdgeListDiagonalBlocks,
+    edge_list_to_block_row,
+)
+
+
+class IncrementalEncoderState:
+    """
+    State of a graph encoded incrementally by `IncrementalGraphEncoder`, growing by appended nodes.
+
+    The representation pads the rows at the top to `(1 - num_nodes) % block_size`, so appending fewer than
+    `block_size` nodes shifts all the blocks. However, for a fixed padding, appending a row of blocks leaves the
+    existing ones, and so the existing embeddings of the encoder's pyramid, unchanged, and adds one embedding at
+    the right end of each level. Hence, per padding, only the right boundary of the pyramid is kept, the last
+    embedding of each level, up to `block_size` boundaries in total, O(num_nodes x embedding_size).
+
+    The edges are kept as [larger node index, smaller node index] pairs ordered by the larger index, as the rows
+    of the appended nodes are needed for the updates. The state is serialized by `state_dict`, e.g. with `torch.save`.
+    """
+
+    def __init__(self, block_size: int, edge_size: int = 1):
+        self.block_size = block_size
+        self.edge_size = edge_size
+        self.num_nodes = 0
+        self.edge_chunks: List[np.ndarray] = []
+        self.edge_feature_chunks: List[np.ndarray] = []
+        # padding -> [num_blocks, embedding_size] last embeddings of the levels of the pyramid, from the lowest one
+        self.boundaries: Dict[int, Tensor] = {}
+
+    def padding(self, num_nodes: int) -> int:
+        return (1 - num_nodes) % self.block_size
+
+    def edges(self):
+        if not self.edge_chunks:
+            return np.zeros((0, 2), dtype=np.int64), np.zeros(
+                (0, self.edge_size), dtype=np.float32
+            )
+        return np.concatenate(self.edge_chunks), np.concatenate(
+            self.edge_feature_chunks
+        )
+
+    def edges_of_nodes(self, first_node: int, last_node: int):
+        """
+        Returns the edges of the nodes from `first_node` to `last_node` inclusive to the preceding ones.
+        """
+        edges, edge_features = [], []
+        for chunk, feature_chunk in zip(
+            reversed(self.edge_chunks), reversed(self.edge_feature_chunks)
+        ):
+            start, end = np.searchsorted(chunk[:, 0], [first_node, last_node + 1])
+            edges.append(chunk[start:end])
+            edge_features.append(feature_chunk[start:end])
+            if start > 0:
+                break
+        if not edges:
+            return self.edges()
+        return np.concatenate(edges), np.concatenate(edge_features)
+
+    def state_dict(self) -> dict:
+        edges, edge_features = self.edges()
+        return {
+            "block_size": self.block_size,
+            "edge_size": self.edge_size,
+            "num_nodes": self.num_nodes,
+            # tensors rather than arrays, loadable by `torch.load` with `weights_only`
+            "edges": torch.from_numpy(edges),
+            "edge_features": torch.from_numpy(edge_features),
+            "boundaries": {
+                padding: boundary.cpu() for padding, boundary in self.boundaries.items()
+            },
+        }
+
+    @classmethod
+    def from_state_dict(cls, state_dict: dict) -> "IncrementalEncoderState":
+        state = cls(state_dict["block_size"], state_dict["edge_size"])
+        state.num_nodes = state_dict["num_nodes"]
+        state.edge_chunks = [state_dict["edges"].numpy()]
+        state.edge_feature_chunks = [state_dict["edge_features"].numpy()]
+        state.boundaries = dict(state_dict["boundaries"])
+        return state
+
+
+class IncrementalGraphEncoder:
+    """
+    Encodes graphs growing by appended nodes with `GraphEncoder`, updating their `IncrementalEncoderState`
+    in O(num_blocks) recursion steps per appended node instead of re-encoding the whole graph.
+    The embeddings are the same as of a full re-encode.
+
+    The boundary of a padding is created by a full encode the first time the graph reaches a size of that padding,
+    at most `block_size` times per graph, or just once when appending `block_size` nodes at a time.
+    """
+
+    def __init__(self, encoder):
+        if encoder.max_bandwidth:
+            raise ValueError(
+                "incremental encoding doesn't support models with `max_bandwidth`"
+            )
+        self.encoder = encoder
+
+    def create_state(self) -> IncrementalEncoderState:
+        return IncrementalEncoderState(self.encoder.block_size, self.encoder.edge_size)
+
+    @torch.no_grad()
+    def append(
+        self,
+        state: IncrementalEncoderState,
+        num_new_nodes: int,
+        edges,
+        edge_features=None,
+    ) -> Tensor:
+        """
+        Appends `num_new_nodes` nodes with their edges to the graph of the state and returns the graph's embedding.
+
+        :param edges: pairs of node indices of the undirected edges of the appended nodes, each with at least
+            one of the appended nodes, numbered after the existing ones
+        :param edge_features: optional features of the edges of shape [num_edges, edge_size], ones by default
+        :return: Graph embedding Tensor of dimensions [embedding_size]
+        """
+        if state.block_size != self.encoder.block_size:
+            raise ValueError(
+                f"the state was created for a block size of {state.block_size}, "
+                f"not {self.encoder.block_size}"
+            )
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        edges = np.stack([edges.max(axis=1), edges.min(axis=1)], axis=1)
+        if edge_features is None:
+            edge_features = np.ones((len(edges), state.edge_size), dtype=np.float32)
+        edge_features = np.asarray(edge_features, dtype=np.float32)
+        new_num_nodes = state.num_nodes + num_new_nodes
+        if len(edges) > 0 and (
+            edges[:, 0].min() < state.num_nodes or edges[:, 0].max() >= new_num_nodes
+        ):
+            raise ValueError(
+                f"the edges must connect the appended nodes {state.num_nodes}-{new_num_nodes - 1} "
+                "to themselves or to the existing ones"
+            )
+        order = np.argsort(edges[:, 0], kind="stable")
+        state.edge_chunks.append(edges[order])
+        state.edge_feature_chunks.append(edge_features[order])
+
+        for num_nodes in range(state.num_nodes + 1, new_num_nodes + 1):
+            padding = state.padding(num_nodes)
+            if padding in state.boundaries:
+                state.boundaries[padding] = self.append_block_row(
+                    state, state.boundaries[padding], num_nodes
+                )
+        state.num_nodes = new_num_nodes
+
+        padding = state.padding(new_num_nodes)
+        if padding not in state.boundaries:
+            state.boundaries[padding] = self.encode_boundary(state)
+        return self.embedding(state)
+
+    def embedding(self, state: IncrementalEncoderState) -> Tensor:
+        boundary = state.boundaries[state.padding(state.num_nodes)]
+        if len(boundary) == 0:
+            return boundary.new_zeros(self.encoder.embedding_size)
+        return boundary[-1]
+
+    def append_block_row(
+        self, state: IncrementalEncoderState, boundary: Tensor, num_nodes: int
+    ) -> Tensor:
+        """
+        Extends the boundary of the padding of `num_nodes` by the row of blocks of the last `block_size` nodes,
+        adding one embedding at the end of each level of the pyramid, from the lowest one.
+        """
+        block_size = self.encoder.block_size
+        device = boundary.device
+        block_row_idx = (
+            int(calculate_num_blocks(torch.tensor(num_nodes), block_size)) - 1
+        )
+        edges, edge_features = state.edges_of_nodes(
+            num_nodes - block_size, num_nodes - 1
+        )
+        row = edge_list_to_block_row(
+            edges,
+            block_row_idx,
+            state.padding(num_nodes),
+            block_size,
+            edge_features,
+            pad_value=self.encoder.pad_value,
+        ).to(device)
+
+        edge_encoder = self.encoder.compiled_edge_encoder or self.encoder.edge_encoder
+        zero_embedding = boundary.new_zeros((1, 1, self.encoder.embedding_size))
+        embedding_right = zero_embedding
+        new_boundary = []
+        for level in range(block_row_idx + 1):
+            embedding_left = (
+                boundary[level - 1].view(1, 1, -1) if level > 0 else zero_embedding
+            )
+            with bf16_autocast(self.encoder.bf16_autocast, device):
+                embedding_right = edge_encoder(
+                    row[block_row_idx - level].view(1, 1, *row.shape[1:]),
+                    embedding_left,
+                    embedding_right,
+                )
+            new_boundary.append(embedding_right.view(-1))
+        return torch.stack(new_boundary)
+
+    def encode_boundary(self, state: IncrementalEncoderState) -> Tensor:
+        """
+        Encodes the whole graph of the state, see `GraphEncoder.forward_streaming`,
+        keeping the last embedding of each level.
+        """
+        device = next(self.encoder.parameters()).device
+        edges, edge_features = state.edges()
+        diagonals = EdgeListDiagonalBlocks(
+            edges,
+            state.num_nodes,
+            self.encoder.block_size,
+            edge_features,
+            pad_value=self.encoder.pad_value,
+        )
+        boundary = []
+        self.encoder.forward_streaming(
+            diagonals,
+            state.num_nodes,
+            level_callback=lambda embedding: boundary.append(embedding[0, -1]),
+        )
+        if not boundary:
+            return torch.zeros((0, self.encoder.embedding_size), device=device)
+        return torch.stack(boundary)
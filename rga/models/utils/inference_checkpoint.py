@@ -0,0 +1,172 @@
+import json
+import os
+from typing import Dict, Iterable, Optional, Type
+
+import numpy as np
+import torch
+from torch import Tensor, nn
+
+from rga.models.autoencoder_base import RecursiveGraphAutoencoder
+from rga.models.low_rank_autoencoder import LowRankRecursiveGraphAutoencoder
+from rga.models.utils.load import load_hparams
+from rga.models.utils.teacher_cache import checkpoint_digest
+
+FORMAT_VERSION = 1
+# the offsets of the tensors in the weights file, so that they can be viewed in place from the memory map
+ALIGNMENT = 64
+PARTS = ("encoder", "decoder")
+# the autoencoder variants, by their `model_name` recorded in the configs
+MODEL_CLASSES = {
+    model_class.model_name: model_class
+    for model_class in [RecursiveGraphAutoencoder, LowRankRecursiveGraphAutoencoder]
+}
+
+
+class InferenceEngine(nn.Module):
+    """
+    The part of `RecursiveGraphAutoencoder` used by `RGAE`, its encoder and/or decoder, without the training
+    state of the Lightning module.
+    """
+
+    def __init__(
+        self, encoder: Optional[nn.Module] = None, decoder: Optional[nn.Module] = None
+    ):
+        super().__init__()
+        self.encoder = encoder
+        self.decoder = decoder
+
+
+def export_inference_checkpoint(
+    path_hparams: str,
+    path_ckpt: str,
+    output_dir: str,
+    parts: Iterable[str] = PARTS,
+    model_class: Type[RecursiveGraphAutoencoder] = RecursiveGraphAutoencoder,
+) -> None:
+    """
+    Writes an inference-only checkpoint of a `RecursiveGraphAutoencoder`, or of its `model_class` variant: `config.json` with the hyperparameters
+    and the layout of the weights, and `weights.bin`, the raw weights of the encoder and/or decoder one after
+    another. The optimizer, scheduler and metric states are left out.
+
+    The weights are read from the checkpoint's state dict, without instantiating the Lightning module.
+    """
+    if model_class.model_name not in MODEL_CLASSES:
+        raise ValueError(
+            f"unknown model class {model_class.model_name}, available: {list(MODEL_CLASSES)}"
+        )
+    parts = list(parts)
+    unknown_parts = set(parts) - set(PARTS)
+    if unknown_parts:
+        raise ValueError(f"unknown model parts {unknown_parts}, available: {PARTS}")
+    hparams = load_hparams(path_hparams)
+    state_dict = torch.load(path_ckpt, map_location="cpu")["state_dict"]
+
+    os.makedirs(output_dir, exist_ok=True)
+    tensors = {}
+    offset = 0
+    with open(os.path.join(output_dir, "weights.bin"), "wb") as weights_file:
+        for name, tensor in state_dict.items():
+            if name.split(".")[0] not in parts or ".metrics_" in name:
+                continue
+            data = tensor.detach().contiguous().view(-1).view(torch.uint8).numpy()
+            weights_file.write(b"\0" * (-offset % ALIGNMENT))
+            offset += -offset % ALIGNMENT
+            tensors[name] = {
+                "dtype": str(tensor.dtype).removeprefix("torch."),
+                "shape": list(tensor.shape),
+                "offset": offset,
+            }
+            weights_file.write(data.tobytes())
+            offset += len(data)
+
+    config = {
+        "format_version": FORMAT_VERSION,
+        "model_class": model_class.model_name,
+        "parts": parts,
+        "hparams": hparams,
+        # the digest of the source checkpoint, so that the embedding caches are shared with it
+        "source_digest": f"{checkpoint_digest(path_ckpt)}:{checkpoint_digest(path_hparams)}",
+        "tensors": tensors,
+    }
+    with open(os.path.join(output_dir, "config.json"), "w") as f:
+        json.dump(config, f, indent=1)
+
+
+class InferenceCheckpoint:
+    """
+    Loads the checkpoints written by `export_inference_checkpoint`. The weights file is memory-mapped
+    copy-on-write and the parameters are views of it, so only the pages of the loaded parts are read,
+    lazily, and they are shared by the processes loading the same checkpoint.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "config.json")) as f:
+            self.config = json.load(f)
+        if self.config["format_version"] > FORMAT_VERSION:
+            raise ValueError(
+                f"the inference checkpoint format version {self.config['format_version']} is not supported"
+            )
+        self.hparams = self.config["hparams"]
+        self.parts = self.config["parts"]
+        self.model_class = MODEL_CLASSES[self.config["model_class"]]
+        weights_path = os.path.join(path, "weights.bin")
+        self.weights = (
+            np.memmap(weights_path, dtype=np.uint8, mode="c")
+            if os.path.getsize(weights_path) > 0
+            else np.zeros(0, dtype=np.uint8)
+        )
+
+    def tensor(self, name: str) -> Tensor:
+        layout = self.config["tensors"][name]
+        dtype = getattr(torch, layout["dtype"])
+        num_bytes = (
+            int(np.prod(layout["shape"], dtype=np.int64))
+            * torch.empty(0, dtype=dtype).element_size()
+        )
+        data = torch.from_numpy(
+            self.weights[layout["offset"] : layout["offset"] + num_bytes]
+        )
+        return data.view(dtype).view(layout["shape"])
+
+    def state_dict(self, part: str) -> Dict[str, Tensor]:
+        prefix = f"{part}."
+        return {
+            name[len(prefix) :]: self.tensor(name)
+            for name in self.config["tensors"]
+            if name.startswith(prefix)
+        }
+
+    def load_part(self, part: str) -> nn.Module:
+        if part not in self.parts:
+            raise ValueError(
+                f"the inference checkpoint has no {part}, only {self.parts}"
+            )
+        # the metrics of the Lightning modules of the parts are not needed
+        hparams = {**self.hparams, "metrics": []}
+        # built without allocating nor initializing the weights, which are then assigned from the memory map
+        with torch.device("meta"):
+            if part == "encoder":
+                module = self.model_class.graph_encoder_class(
+                    self.model_class.edge_encoder_class, **hparams
+                )
+            else:
+                module = self.model_class.graph_decoder_class(
+                    edge_decoder_class=self.model_class.edge_decoder_class,
+                    **hparams,
+                )
+        module.load_state_dict(self.state_dict(part), strict=True, assign=True)
+        # the non-persistent buffers are not in the state dict
+        if any(buffer.is_meta for buffer in module.buffers()):
+            raise ValueError(f"the {part} has buffers not restored by the checkpoint")
+        return module.eval()
+
+    def load(self, parts: Iterable[str] = PARTS) -> InferenceEngine:
+        """
+        Builds an `InferenceEngine` with only the given parts, the others are None.
+        """
+        return InferenceEngine(**{part: self.load_part(part) for part in parts})
+
+    @property
+    def source_digest(self) -> str:
+        return self.config["source_digest"]
@@ -0,0 +1,42 @@
+import contextlib
+
+import torch
+from torch import nn, Tensor
+
+
+def check_bf16_autocast_available() -> None:
+    if not hasattr(torch, "autocast"):
+        raise ValueError(
+            f"bfloat16 autocast requires torch>=1.10, the installed version is {torch.__version__}"
+        )
+
+
+def bf16_autocast(enabled: bool, device: torch.device):
+    """
+    Runs the matrix multiplications of the MLPs in bfloat16. The precision-sensitive parts of the models,
+    i.e. the gates, the decoded outputs and thus the graph end masks and the losses, are kept in fp32
+    by casting their inputs back with `full_precision`.
+    """
+    if not enabled:
+        return contextlib.nullcontext()
+    return torch.autocast(device_type=device.type, dtype=torch.bfloat16)
+
+
+def full_precision(t: Tensor) -> Tensor:
+    """
+    Casts reduced precision tensors, such as the outputs of autocast layers, to fp32.
+    """
+    if t.dtype in (torch.bfloat16, torch.float16):
+        return t.float()
+    return t
+
+
+def set_bf16_autocast(model: nn.Module, enabled: bool) -> None:
+    """
+    Switches the bfloat16 autocast mode of all submodules supporting it, e.g. of a loaded model.
+    """
+    if enabled:
+        check_bf16_autocast_available()
+    for module in model.modules():
+        if hasattr(module, "bf16_autocast"):
+            module.bf16_autocast = enabled
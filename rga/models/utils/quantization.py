@@ -0,0 +1,14 @@
+import torch
+from torch import nn
+
+
+def quantize_dynamic_int8(model: nn.Module) -> nn.Module:
+    """
+    Returns a copy of the model for CPU inference, with the weights of all Linear layers quantized to int8
+    and their activations quantized dynamically, on the fly. This covers the edge encoder and decoder MLPs,
+    the border filling nets and the classifier; the gates and the rest of the recursion stay in fp32.
+    """
+    model = torch.quantization.quantize_dynamic(
+        model, {nn.Linear}, dtype=torch.qint8, inplace=False
+    )
+    return model.eval()
@@ -0,0 +1,78 @@
+import hashlib
+import os
+from typing import Dict, List, Optional
+
+import torch
+from torch import Tensor
+
+from rga.util.adjmatrix.diagonal_block_representation import calculate_num_blocks
+
+
+class TeacherOutputCache:
+    """
+    Stores the outputs of a distillation teacher per graph, so that the teacher runs once per graph
+    instead of once per epoch. The graphs are identified by a hash of their contents, as their order and
+    batching change between the epochs.
+
+    The entries are kept on the CPU and saved to `path` by `save`, which is a no-op without new entries.
+    An entry is a dict with the teacher's graph embedding under "embedding" and, if requested,
+    its decoded edge and mask logits under "edges" and "masks".
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Tensor]] = {}
+        self.num_hits = 0
+        self.num_misses = 0
+        self.modified = False
+        if path is not None and os.path.exists(path):
+            self.entries = torch.load(path)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: str, with_logits: bool = False) -> Optional[Dict[str, Tensor]]:
+        entry = self.entries.get(key)
+        if entry is None or (with_logits and "edges" not in entry):
+            self.num_misses += 1
+            return None
+        self.num_hits += 1
+        return entry
+
+    def put(self, key: str, entry: Dict[str, Tensor]) -> None:
+        self.entries[key] = {k: v.detach().cpu() for k, v in entry.items()}
+        self.modified = True
+
+    def save(self) -> None:
+        if self.path is None or not self.modified:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # written to a temporary file first, so that an interrupted save keeps the previous cache
+        tmp_path = f"{self.path}.tmp{os.getpid()}"
+        torch.save(self.entries, tmp_path)
+        os.replace(tmp_path, self.path)
+        self.modified = False
+
+
+def graph_keys(graphs: Tensor, num_nodes: Tensor, block_size: int) -> List[str]:
+    """
+    Returns content hashes of the graphs of a batch in the diagonal block representation,
+    excluding the padding of the batch.
+    """
+    graphs = graphs.detach().cpu()
+    num_blocks = calculate_num_blocks(num_nodes.cpu(), block_size).tolist()
+    keys = []
+    for graph, n, k in zip(graphs, num_nodes.tolist(), num_blocks):
+        graph = graph[: k * (k + 1) // 2].contiguous()
+        h = hashlib.sha1(graph.numpy().tobytes())
+        h.update(f"{int(n)}:{tuple(graph.shape)}".encode())
+        keys.append(h.hexdigest())
+    return keys
+
+
+def checkpoint_digest(checkpoint_path: str) -> str:
+    h = hashlib.sha1()
+    with open(checkpoint_path, "rb") as f:
+        while chunk := f.read(1 << 24):
+            h.update(chunk)
+    return h.hexdigest()
@@ -1,4 +1,4 @@
-from typing import List, Tuple, Callable
+from typing import Iterator, List, Optional, Tuple, Callable, Union
 from argparse import ArgumentParser
 
 import torch
@@ -7,6 +7,13 @@ from torch import nn
 import torchmetrics
 
 from rga.models.autoencoder_base import RecursiveGraphAutoencoder
+from rga.util.adjmatrix.diagonal_block_representation import calculate_num_blocks
+from rga.util.generate_graphs import (
+    convert_model_output_to_diag_block,
+    diag_block_graphs_to_edge_lists,
+    diag_block_graphs_to_tril_adj_matrices,
+    edge_list_output,
+)
 
 
 class RecursiveGraphVAE(RecursiveGraphAutoencoder):
@@ -81,6 +88,8 @@ class RecursiveGraphVAE(RecursiveGraphAutoencoder):
         reconstructed_graph_diagonals, diagonal_embeddings_norm = self.decoder(
             graph_encoding_batch=graph_embeddings,
             max_number_of_nodes=max_num_nodes_in_graph_batch,
+            num_nodes_batch=num_nodes_batch,
+            num_diagonals_batch=self.num_diagonals_batch(batch),
         )
 
         return (
@@ -115,6 +124,65 @@ class RecursiveGraphVAE(RecursiveGraphAutoencoder):
             dim=0,
         )
 
+    def sample(
+        self,
+        n: int,
+        batch_size: int = 64,
+        max_num_nodes: Union[int, Tensor] = 100,
+        output_format: str = "dense",
+        generator: Optional[torch.Generator] = None,
+    ) -> Iterator[Tuple[int, object]]:
+        """
+        Generates `n` graphs from latents drawn from the standard normal prior, `batch_size` at a time.
+
+        The graphs of a batch are yielded as soon as they are finished, as (sample index, graph) pairs, while
+        the others keep decoding, see `GraphDecoder.decode_stream`. The decoding of each graph is limited
+        to the blocks of `max_num_nodes` nodes, given for all samples or per sample as a Tensor of shape [n],
+        so that a graph that doesn't end only holds its own budget.
+
+        The graphs are symmetric adjacency matrices with the "dense" `output_format`, (edges of the lower
+        triangle of shape [num_edges, 2], number of nodes) pairs with "edge_list" or `scipy.sparse.csr_matrix`
+        with "scipy", like the outputs of `RGAE.decode`.
+        """
+        if output_format not in ("dense", "edge_list", "scipy"):
+            raise ValueError(f"unknown output format {output_format}")
+        if self.decoder.max_bandwidth:
+            raise ValueError(
+                "models trained with `max_bandwidth` can't decide the sizes of the sampled graphs"
+            )
+        max_num_blocks = calculate_num_blocks(
+            torch.as_tensor(max_num_nodes).expand(n) + 1, self.decoder.block_size
+        )
+
+        for batch_start in range(0, n, batch_size):
+            num_latents = min(batch_size, n - batch_start)
+            latents = torch.randn(
+                (num_latents, self.encoder.embedding_size), generator=generator
+            ).to(self.device)
+            with torch.inference_mode():
+                for indices, diagonals, masks in self.decoder.decode_stream(
+                    latents, max_num_blocks[batch_start : batch_start + num_latents]
+                ):
+                    diag_block_graphs = convert_model_output_to_diag_block(
+                        [((diagonals, masks), None)]
+                    )
+                    if output_format == "dense":
+                        graphs = [
+                            adj_matrix + adj_matrix.T
+                            for adj_matrix in diag_block_graphs_to_tril_adj_matrices(
+                                diag_block_graphs
+                            )
+                        ]
+                    else:
+                        graphs = [
+                            edge_list_output(edges, num_nodes, output_format)
+                            for edges, num_nodes in diag_block_graphs_to_edge_lists(
+                                diag_block_graphs
+                            )
+                        ]
+                    for i, graph in zip(indices.tolist(), graphs):
+                        yield batch_start + i, graph
+
     @classmethod
     def add_model_specific_args(cls, parent_parser: ArgumentParser) -> ArgumentParser:
         parent_parser = RecursiveGraphAutoencoder.add_model_specific_args(
@@ -5,3 +5,4 @@ from .remove_duplicates import *
 from .filter_out_big_graphs import *
 from .diagonal_representation import *
 from .diagonal_block_representation import *
+from .edge_list_diagonal_blocks import *
@@ -1,4 +1,6 @@
 import math
+from typing import Union
+
 import torch
 from torch.functional import Tensor
 
@@ -7,8 +9,52 @@ def calculate_num_blocks(num_nodes: Tensor, block_size: int):
     return torch.ceil((num_nodes - 1) / block_size).int()
 
 
+def calculate_first_diagonal_length(
+    num_blocks: Tensor, num_diagonals: Union[int, Tensor]
+) -> Tensor:
+    """
+    Returns the length of the furthest diagonal from the main one kept in a representation
+    truncated to `num_diagonals` diagonals, see `adj_matrix_to_diagonal_block_representation`.
+    The numbers of diagonals may be given per graph, like the numbers of blocks.
+    """
+    return torch.clamp(num_blocks - num_diagonals + 1, min=1)
+
+
+def calculate_num_omitted_blocks(
+    num_blocks: Tensor, num_diagonals: Union[int, Tensor]
+) -> Tensor:
+    """
+    Returns the number of blocks omitted from the beginning of a representation truncated to `num_diagonals` diagonals.
+    """
+    first_diagonal_length = calculate_first_diagonal_length(num_blocks, num_diagonals)
+    return first_diagonal_length * (first_diagonal_length - 1) // 2
+
+
+def calculate_bandwidth_in_blocks(
+    adj_matrix: torch.Tensor, num_nodes: int, block_size: int
+) -> int:
+    """
+    Returns the number of block diagonals, counted from the main one, that contain the edges of the lower triangle
+    of the adjacency matrix, i.e. the minimal number of diagonals a truncated representation must keep to be lossless.
+    The adjacency matrix has a shape like [y, x, edge_size].
+    """
+    edges = torch.tril((adj_matrix[:num_nodes, :num_nodes] != 0).any(dim=-1), -1)
+    edge_y, edge_x = edges.nonzero(as_tuple=True)
+    if len(edge_y) == 0:
+        return 1
+    # the same shift of the rows as in the representation, see `adj_matrix_to_diagonal_block_representation`
+    padding = (1 - num_nodes) % block_size
+    block_y = torch.div(edge_y - 1 + padding, block_size, rounding_mode="floor")
+    block_x = torch.div(edge_x, block_size, rounding_mode="floor")
+    return int((block_y - block_x).max()) + 1
+
+
 def adj_matrix_to_diagonal_block_representation(
-    adj_matrix: torch.Tensor, num_nodes: int, block_size: int, pad_value=0
+    adj_matrix: torch.Tensor,
+    num_nodes: int,
+    block_size: int,
+    pad_value=0,
+    num_diagonals: int = None,
 ) -> torch.Tensor:
     """
     The adjacency matrix has a shape like [y, x, edge_size].
@@ -39,6 +85,12 @@ def adj_matrix_to_diagonal_block_representation(
 
     The dimensions of the resulting Tensor: [ block_idx  : edge_y_idx : edge_x_idx : edge      ]
     The size of the dimensions:             [ num_blocks : block_size : block_size : edge_size ]
+
+    With `num_diagonals`, only the diagonals closest to the main one are kept, omitting the blocks
+    of the furthest ones from the beginning of the representation. In the example, with `num_diagonals=1`:
+
+    --> 0 0  0 0
+        1 0  1 0
     """
 
     triu_indices = torch.triu_indices(adj_matrix.shape[0], adj_matrix.shape[0])
@@ -73,8 +125,12 @@ def adj_matrix_to_diagonal_block_representation(
 
     # now the dimensions are [block_y : block_x : edge_in_block_y : edge_in_block_x : edge]
 
+    num_omitted_diagonals = 0
+    if num_diagonals is not None:
+        num_omitted_diagonals = max(block_adj_matrix.shape[0] - num_diagonals, 0)
+
     diagonals = []
-    for diagonal_offset in range(block_adj_matrix.shape[0]):
+    for diagonal_offset in range(num_omitted_diagonals, block_adj_matrix.shape[0]):
         diagonal = torch.diagonal(
             block_adj_matrix,
             offset=diagonal_offset - (block_adj_matrix.shape[0] - 1),
@@ -86,7 +142,7 @@ def adj_matrix_to_diagonal_block_representation(
 
 
 def diagonal_block_to_adj_matrix_representation(
-    diagonal_block_graph: torch.Tensor, num_nodes: int
+    diagonal_block_graph: torch.Tensor, num_nodes: int, num_diagonals: int = None
 ) -> torch.Tensor:
     """
     The diagonal block representatuin has a shape like [ block_idx  : edge_y_idx : edge_x_idx : edge      ]
@@ -106,6 +162,8 @@ def diagonal_block_to_adj_matrix_representation(
     3  0 1 1 0
 
     to a shape [y, x, edge_size]
+
+    A representation truncated to `num_diagonals` diagonals gets its omitted blocks filled with zeros.
     """
     if num_nodes == 1:
         return torch.tensor(
@@ -119,6 +177,14 @@ def diagonal_block_to_adj_matrix_representation(
     edge_size = diagonal_block_graph.shape[-1]
     num_columns = divide_integer_round_up(num_nodes - 1, block_size)
 
+    if num_diagonals is not None:
+        num_omitted_blocks = int(
+            calculate_num_omitted_blocks(torch.tensor(num_columns), num_diagonals)
+        )
+        diagonal_block_graph = torch.nn.functional.pad(
+            diagonal_block_graph, (0, 0, 0, 0, 0, 0, num_omitted_blocks, 0)
+        )
+
     num_unpadded_blocks = int((num_columns + 1) / 2 * num_columns)
     diagonal_block_graph = diagonal_block_graph[:num_unpadded_blocks]
     num_blocks = num_unpadded_blocks
@@ -177,9 +243,75 @@ def diagonal_block_to_adj_matrix_representation(
     return adj_matrix
 
 
+def diagonal_block_coordinates(block_indices: Tensor, num_columns: int):
+    """
+    Returns the block row and column indices, in the matrix of blocks of `num_columns` x `num_columns`,
+    of the blocks of a diagonal block representation, see `adj_matrix_to_diagonal_block_representation`.
+    """
+    block_indices = block_indices.long()
+    diagonal = ((torch.sqrt(block_indices.double() * 8 + 1) - 1) / 2).long()
+    # corrects the rounding of the square root of large indices
+    diagonal -= (diagonal * (diagonal + 1) // 2 > block_indices).long()
+    diagonal += ((diagonal + 1) * (diagonal + 2) // 2 <= block_indices).long()
+    idx_in_diagonal = block_indices - diagonal * (diagonal + 1) // 2
+    return idx_in_diagonal + num_columns - 1 - diagonal, idx_in_diagonal
+
+
+def diagonal_block_to_edge_list(
+    diagonal_block_graph: torch.Tensor,
+    num_nodes: int,
+    num_diagonals: int = None,
+    threshold: float = 0.0,
+):
+    """
+    The sparse counterpart of `diagonal_block_to_adj_matrix_representation`, returns the edges of the lower triangle
+    of the adjacency matrix, the [y, x] pairs with y > x of shape [num_edges, 2], whose first edge feature
+    is greater than `threshold`, and their features of shape [num_edges, edge_size], without building the matrix.
+    """
+    block_size = diagonal_block_graph.shape[1]
+    num_columns = divide_integer_round_up(num_nodes - 1, block_size)
+    num_omitted_blocks = 0
+    if num_diagonals is not None:
+        num_omitted_blocks = int(
+            calculate_num_omitted_blocks(torch.tensor(num_columns), num_diagonals)
+        )
+    num_blocks = num_columns * (num_columns + 1) // 2 - num_omitted_blocks
+
+    block_idx, in_block_y, in_block_x = (
+        diagonal_block_graph[:num_blocks, :, :, 0] > threshold
+    ).nonzero(as_tuple=True)
+    block_y, block_x = diagonal_block_coordinates(
+        block_idx + num_omitted_blocks, num_columns
+    )
+    # the rows shift of the representation, see `adj_matrix_to_diagonal_block_representation`
+    padding = (1 - num_nodes) % block_size
+    edge_y = block_y * block_size + in_block_y - padding + 1
+    edge_x = block_x * block_size + in_block_x
+    lower_triangle = edge_y > edge_x
+
+    edges = torch.stack([edge_y[lower_triangle], edge_x[lower_triangle]], dim=1)
+    features = diagonal_block_graph[
+        block_idx[lower_triangle],
+        in_block_y[lower_triangle],
+        in_block_x[lower_triangle],
+    ]
+    return edges, features
+
+
 def divide_integer_round_up(dividend, divisor) -> int:
     return int((dividend + divisor - 1) / divisor)
 
 
-def block_count_to_num_block_diagonals(block_count):
+def block_count_to_num_block_diagonals(block_count, num_diagonals: int = None):
+    """
+    Returns the number of blocks of the main diagonal of a representation of `block_count` blocks,
+    truncated to `num_diagonals` diagonals if given.
+    """
+    if (
+        num_diagonals is not None
+        and block_count > num_diagonals * (num_diagonals + 1) / 2
+    ):
+        return int(
+            (block_count + num_diagonals * (num_diagonals - 1) / 2) / num_diagonals
+        )
     return int((math.sqrt(block_count * 8 + 1) - 1) / 2)
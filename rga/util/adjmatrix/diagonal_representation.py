@@ -49,3 +49,22 @@ def adj_matrix_to_diagonal_representation(
         )
 
     return concatenated_diagonals
+
+
+def edge_list_to_diagonal_representation(
+    edges: torch.Tensor, num_nodes: int
+) -> torch.Tensor:
+    """
+    Returns `adj_matrix_to_diagonal_representation` of a graph given by the edges of the lower triangle
+    of its adjacency matrix, the [y, x] pairs with y > x of shape [num_edges, 2], without the edge_size dimension.
+    """
+    diagonal_representation = torch.zeros(
+        num_nodes * (num_nodes - 1) // 2, dtype=torch.int
+    )
+    if len(edges) == 0:
+        return diagonal_representation
+    edges = torch.as_tensor(edges, dtype=torch.long)
+    diagonal_length = num_nodes - (edges[:, 0] - edges[:, 1])
+    diagonal_start = diagonal_length * (diagonal_length - 1) // 2
+    diagonal_representation[diagonal_start + edges[:, 1]] = 1
+    return diagonal_representation
@@ -0,0 +1,200 @@
+from typing import Iterator, Optional
+
+import numpy as np
+import torch
+from torch import Tensor
+
+
+class EdgeListDiagonalBlocks:
+    """
+    Generates the block diagonals of the diagonal block representation of a graph, see
+    `adj_matrix_to_diagonal_block_representation`, one at a time, directly from its edge list,
+    without building the adjacency matrix nor the whole representation.
+
+    The edges may be any array-like of shape [num_edges, 2], e.g. a `np.memmap` or an array loaded with
+    `np.load(..., mmap_mode="r")`. They are read once to sort them by their diagonals, which keeps
+    only O(num_edges) indices in memory, and then only the edges of the requested diagonal are read.
+    """
+
+    def __init__(
+        self,
+        edges,
+        num_nodes: int,
+        block_size: int,
+        edge_features=None,
+        edge_size: int = 1,
+        pad_value=-1,
+        chunk_size: int = 2**20,
+    ):
+        """
+        :param edges: pairs of node indices of the undirected edges, in any order
+        :param edge_features: optional array-like of shape [num_edges, edge_size], the edges are ones by default
+        """
+        self.edges = edges
+        self.num_nodes = num_nodes
+        self.block_size = block_size
+        self.edge_features = edge_features
+        self.edge_size = (
+            edge_size if edge_features is None else int(edge_features.shape[1])
+        )
+        self.pad_value = pad_value
+        self.num_blocks = max((num_nodes - 2) // block_size + 1, 0)
+        # the rows shift of the representation, see `adj_matrix_to_diagonal_block_representation`
+        self.padding = (1 - num_nodes) % block_size
+
+        diagonal_indices = np.concatenate(
+            [
+                self.diagonal_indices(np.asarray(edges[start : start + chunk_size]))
+                for start in range(0, len(edges), chunk_size)
+            ]
+            or [np.zeros(0, dtype=np.int64)]
+        )
+        self.edge_order = np.argsort(diagonal_indices, kind="stable")
+        self.diagonal_bounds = np.searchsorted(
+            diagonal_indices[self.edge_order], np.arange(self.num_blocks + 1)
+        )
+        # the number of diagonals up to the furthest one with edges, see `calculate_bandwidth_in_blocks`
+        nonempty_diagonals = np.nonzero(np.diff(self.diagonal_bounds))[0]
+        self.bandwidth = (
+            int(nonempty_diagonals[-1]) + 1 if len(nonempty_diagonals) else 1
+        )
+
+    def diagonal_indices(self, edges: np.ndarray) -> np.ndarray:
+        """
+        Returns the indices of the diagonals of the edges, counted from the main one, or `num_blocks` for self loops.
+        """
+        edge_y, edge_x = self.lower_triangle_coordinates(edges)
+        block_y = (edge_y - 1 + self.padding) // self.block_size
+        block_x = edge_x // self.block_size
+        return np.where(edge_y == edge_x, self.num_blocks, block_y - block_x)
+
+    @staticmethod
+    def lower_triangle_coordinates(edges: np.ndarray):
+        edges = edges.astype(np.int64)
+        return edges.max(axis=1), edges.min(axis=1)
+
+    def __len__(self) -> int:
+        return self.num_blocks
+
+    def __iter__(self) -> Iterator[Tensor]:
+        """
+        Yields the diagonals from the main, longest one outwards, in the order consumed by `GraphEncoder`.
+        """
+        for diagonal_idx in range(self.num_blocks):
+            yield self.diagonal(diagonal_idx)
+
+    def diagonal(self, diagonal_idx: int) -> Tensor:
+        """
+        Returns the `diagonal_idx`-th diagonal counted from the main one,
+        of shape [num_blocks - diagonal_idx, block_size, block_size, edge_size].
+        """
+        block_size = self.block_size
+        diagonal = torch.zeros(
+            (self.num_blocks - diagonal_idx, block_size, block_size, self.edge_size)
+        )
+
+        # the upper triangle of the adjacency matrix reaches at most the diagonal next to the main one
+        in_block_y = torch.arange(block_size)[:, None]
+        in_block_x = torch.arange(block_size)[None, :]
+        pad_mask = (
+            diagonal_idx * block_size + in_block_y - in_block_x <= self.padding - 1
+        )
+        diagonal[:, pad_mask] = self.pad_value
+
+        edge_indices = self.edge_order[
+            self.diagonal_bounds[diagonal_idx] : self.diagonal_bounds[diagonal_idx + 1]
+        ]
+        if len(edge_indices) == 0:
+            return diagonal
+        # sorted indices read memory-mapped storage sequentially
+        edge_indices = np.sort(edge_indices)
+        edge_y, edge_x = self.lower_triangle_coordinates(
+            np.asarray(self.edges[edge_indices])
+        )
+        shifted_edge_y = edge_y - 1 + self.padding
+        values = (
+            1.0
+            if self.edge_features is None
+            else torch.as_tensor(
+                np.asarray(self.edge_features[edge_indices]), dtype=diagonal.dtype
+            )
+        )
+        diagonal[
+            torch.from_numpy(edge_x // block_size),
+            torch.from_numpy(shifted_edge_y % block_size),
+            torch.from_numpy(edge_x % block_size),
+        ] = values
+        return diagonal
+
+
+def edge_list_to_block_diagonals(
+    edges,
+    num_nodes: int,
+    block_size: int,
+    edge_features=None,
+    edge_size: int = 1,
+    pad_value=-1,
+    num_diagonals: Optional[int] = None,
+) -> Iterator[Tensor]:
+    """
+    Yields the block diagonals of a graph given by its edge list from the main one outwards,
+    optionally only the `num_diagonals` closest to the main one, see `EdgeListDiagonalBlocks`.
+    """
+    diagonals = EdgeListDiagonalBlocks(
+        edges,
+        num_nodes,
+        block_size,
+        edge_features,
+        edge_size=edge_size,
+        pad_value=pad_value,
+    )
+    for diagonal_idx in range(min(len(diagonals), num_diagonals or len(diagonals))):
+        yield diagonals.diagonal(diagonal_idx)
+
+
+def edge_list_to_block_row(
+    edges: np.ndarray,
+    block_row_idx: int,
+    padding: int,
+    block_size: int,
+    edge_features: Optional[np.ndarray] = None,
+    edge_size: int = 1,
+    pad_value=-1,
+) -> Tensor:
+    """
+    Returns the `block_row_idx`-th row of blocks of the diagonal block representation with `padding` rows
+    prepended, see `adj_matrix_to_diagonal_block_representation`, up to the main diagonal, of shape
+    [block_row_idx + 1, block_size, block_size, edge_size]. The row covers the nodes from
+    `block_row_idx * block_size - padding + 1` to `(block_row_idx + 1) * block_size - padding`.
+
+    :param edges: pairs of node indices of the undirected edges of the nodes of the row, to the preceding nodes
+    """
+    if edge_features is not None:
+        edge_size = int(edge_features.shape[1])
+    row = torch.zeros((block_row_idx + 1, block_size, block_size, edge_size))
+
+    block_x = torch.arange(block_row_idx + 1)[:, None, None]
+    in_block_y = torch.arange(block_size)[None, :, None]
+    in_block_x = torch.arange(block_size)[None, None, :]
+    pad_mask = (block_row_idx - block_x) * block_size + in_block_y - in_block_x
+    row[pad_mask <= padding - 1] = pad_value
+
+    if len(edges) == 0:
+        return row
+    edge_y, edge_x = EdgeListDiagonalBlocks.lower_triangle_coordinates(
+        np.asarray(edges)
+    )
+    not_self_loop = edge_y != edge_x
+    shifted_edge_y = edge_y[not_self_loop] - 1 + padding
+    edge_x = edge_x[not_self_loop]
+    values = (
+        1.0
+        if edge_features is None
+        else torch.as_tensor(np.asarray(edge_features)[not_self_loop], dtype=row.dtype)
+    )
+    row[
+        torch.from_numpy(edge_x // block_size),
+        torch.from_numpy(shifted_edge_y - block_row_idx * block_size),
+        torch.from_numpy(edge_x % block_size),
+    ] = values
+    return row
@@ -0,0 +1,97 @@
+import atexit
+import multiprocessing
+import queue
+import traceback
+from typing import List, Optional, Tuple
+
+from torch import Tensor
+
+from rga.util.draw import draw_diag_repr_graph
+
+# a single frame is a list of (diagonal block representation, num_nodes, name) of graphs drawn together
+Frame = List[Tuple[Tensor, int, str]]
+
+
+class AsyncGraphRenderer:
+    """
+    Draws graphs in a background process, so that computing the layouts and saving the figures
+    does not stall training.
+
+    Frames are put into a bounded queue and dropped when the queue is full, that is when the
+    renderer falls behind. Submitted tensors must already be detached CPU copies.
+    The process is forked, as the experiment scripts are not guarded against being re-imported.
+    """
+
+    def __init__(
+        self,
+        max_queue_size: int = 4,
+        max_num_nodes: Optional[int] = None,
+        layout: str = "spring",
+    ):
+        self.max_queue_size = max_queue_size
+        self.max_num_nodes = max_num_nodes
+        self.layout = layout
+        self.num_submitted_frames = 0
+        self.num_dropped_frames = 0
+        self._queue = None
+        self._process = None
+
+    def start(self) -> None:
+        if self._process is not None:
+            return
+        context = multiprocessing.get_context("fork")
+        self._queue = context.Queue(self.max_queue_size)
+        self._process = context.Process(
+            target=render_frames,
+            args=(self._queue, self.max_num_nodes, self.layout),
+            daemon=True,
+        )
+        self._process.start()
+        atexit.register(self.close)
+
+    def submit(self, frame: Frame) -> bool:
+        """
+        Returns whether the frame was queued for rendering.
+        """
+        self.start()
+        self.num_submitted_frames += 1
+        try:
+            self._queue.put_nowait(frame)
+        except queue.Full:
+            self.num_dropped_frames += 1
+            return False
+        return True
+
+    def close(self, timeout: float = 60.0) -> None:
+        """
+        Waits up to `timeout` seconds for the queued frames to be rendered and stops the process,
+        terminating it if it's still rendering. Called at exit, if not called before.
+        """
+        if self._process is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join(timeout)
+        self._queue.close()
+        self._queue = None
+        self._process = None
+        atexit.unregister(self.close)
+
+
+def render_frames(
+    frames: multiprocessing.Queue, max_num_nodes: Optional[int], layout: str
+) -> None:
+    while (frame := frames.get()) is not None:
+        for g, num_nodes, name in frame:
+            try:
+                draw_diag_repr_graph(
+                    g, num_nodes, name, max_num_nodes=max_num_nodes, layout=layout
+                )
+            except Exception:
+                # a single failed drawing should not stop rendering the following ones
+                traceback.print_exc()
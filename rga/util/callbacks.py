@@ -2,6 +2,8 @@ from typing import Callable
 
 from pytorch_lightning.callbacks.base import Callback
 
+from rga.util.host_sync import HostSyncCounter
+
 
 class SteppingGraphSizeMonitor(Callback):
     def __init__(
@@ -36,3 +38,41 @@ class MetricMonitor(Callback):
         self.data_module.current_metrics = {
             k: v.cpu().numpy() for (k, v) in trainer.callback_metrics.items()
         }
+
+
+class HostSyncMonitor(Callback):
+    """
+    Logs the number of host synchronizations (see `HostSyncCounter`) made during each training step.
+    """
+
+    def __init__(self, include_cpu: bool = False):
+        self.include_cpu = include_cpu
+        self.host_sync_counter = None
+        self.last_step_count = None
+
+    def on_train_batch_start(self, trainer, *args, **kwargs):
+        self.host_sync_counter = HostSyncCounter(include_cpu=self.include_cpu)
+        self.host_sync_counter.__enter__()
+
+    def on_train_batch_end(self, trainer, *args, **kwargs):
+        self.last_step_count = self._stop_counting()
+        if trainer.logger is not None:
+            trainer.logger.log_metrics(
+                {"host_syncs_per_step": self.last_step_count},
+                step=trainer.global_step,
+            )
+
+    def on_exception(self, trainer, *args, **kwargs):
+        # an exception during the step skips `on_train_batch_end`, the tensor methods must be restored anyway
+        self._stop_counting()
+
+    def teardown(self, trainer, *args, **kwargs):
+        self._stop_counting()
+
+    def _stop_counting(self) -> int:
+        if self.host_sync_counter is None:
+            return 0
+        self.host_sync_counter.__exit__()
+        count = self.host_sync_counter.count
+        self.host_sync_counter = None
+        return count
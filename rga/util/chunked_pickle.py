@@ -0,0 +1,131 @@
+import lzma
+import pickle
+import struct
+from typing import Any, Iterator, List, Optional
+
+CHUNKED_PICKLE_MAGIC = b"RGACHNK2"
+_FORMAT_LENGTH_FORMAT = "<H"
+_FOOTER_FORMAT = "<Q"
+_FOOTER_SIZE = struct.calcsize(_FOOTER_FORMAT)
+
+
+class ChunkedPickleWriter:
+    """
+    Writes a list of items as a sequence of independently lzma-compressed pickled chunks.
+
+    The file consists of the magic bytes, the `item_format` tag naming what the items are, the compressed chunks,
+    a pickled index of the chunks (offset, compressed size and number of items of each) and the offset of that index.
+    Thanks to the index, any chunk may be read without decompressing the others.
+    """
+
+    def __init__(self, path: str, item_format: str = "", chunk_size: int = 256):
+        self.path = path
+        self.item_format = item_format
+        self.chunk_size = chunk_size
+        self._buffer = []
+        self._index = []
+        self._file = None
+
+    def __enter__(self) -> "ChunkedPickleWriter":
+        self._file = open(self.path, "wb")
+        self._file.write(CHUNKED_PICKLE_MAGIC)
+        item_format = self.item_format.encode()
+        self._file.write(struct.pack(_FORMAT_LENGTH_FORMAT, len(item_format)))
+        self._file.write(item_format)
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def write(self, item: Any) -> None:
+        self._buffer.append(item)
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def write_all(self, items: List[Any]) -> None:
+        for item in items:
+            self.write(item)
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        data = lzma.compress(pickle.dumps(self._buffer))
+        self._index.append((self._file.tell(), len(data), len(self._buffer)))
+        self._file.write(data)
+        self._buffer = []
+
+    def close(self) -> None:
+        if self._file is None:
+            return
+        self.flush()
+        index_offset = self._file.tell()
+        pickle.dump(self._index, self._file)
+        self._file.write(struct.pack(_FOOTER_FORMAT, index_offset))
+        self._file.close()
+        self._file = None
+
+
+class ChunkedPickleReader:
+    """
+    Random access reader of the files written by `ChunkedPickleWriter`. With `item_format`, files of items of
+    another format are rejected.
+    """
+
+    def __init__(self, path: str, item_format: Optional[str] = None):
+        self.path = path
+        self._file = open(path, "rb")
+        if self._file.read(len(CHUNKED_PICKLE_MAGIC)) != CHUNKED_PICKLE_MAGIC:
+            self._file.close()
+            raise ValueError(f"{path} is not a chunked pickle file")
+        (format_length,) = struct.unpack(
+            _FORMAT_LENGTH_FORMAT,
+            self._file.read(struct.calcsize(_FORMAT_LENGTH_FORMAT)),
+        )
+        self.item_format = self._file.read(format_length).decode()
+        if item_format is not None and self.item_format != item_format:
+            self._file.close()
+            raise ValueError(
+                f"{path} holds items of format {self.item_format!r}, not {item_format!r}"
+            )
+        self._file.seek(-_FOOTER_SIZE, 2)
+        footer_offset = self._file.tell()
+        (index_offset,) = struct.unpack(_FOOTER_FORMAT, self._file.read(_FOOTER_SIZE))
+        self._file.seek(index_offset)
+        self.index = pickle.loads(self._file.read(footer_offset - index_offset))
+
+    def __enter__(self) -> "ChunkedPickleReader":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return sum(num_items for _, _, num_items in self.index)
+
+    @property
+    def num_chunks(self) -> int:
+        return len(self.index)
+
+    def chunk_bounds(self, chunk_idx: int) -> range:
+        """
+        Returns the range of item indices stored in the given chunk.
+        """
+        start = sum(num_items for _, _, num_items in self.index[:chunk_idx])
+        return range(start, start + self.index[chunk_idx][2])
+
+    def read_chunk(self, chunk_idx: int) -> List[Any]:
+        offset, size, _ = self.index[chunk_idx]
+        self._file.seek(offset)
+        return pickle.loads(lzma.decompress(self._file.read(size)))
+
+    def __iter__(self) -> Iterator[List[Any]]:
+        for chunk_idx in range(self.num_chunks):
+            yield self.read_chunk(chunk_idx)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def is_chunked_pickle(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(CHUNKED_PICKLE_MAGIC)) == CHUNKED_PICKLE_MAGIC
@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Optional
 
 import networkx as nx
 import numpy as np
@@ -6,23 +7,46 @@ import matplotlib.pyplot as plt
 
 from rga.util import adjmatrix
 
+LAYOUTS = {
+    "spring": nx.spring_layout,
+    "spectral": nx.spectral_layout,
+    "circular": nx.circular_layout,
+    "random": nx.random_layout,
+}
 
-def draw_diag_repr_graph(g, num_nodes: int, name: str):
+
+def draw_diag_repr_graph(
+    g,
+    num_nodes: int,
+    name: str,
+    max_num_nodes: Optional[int] = None,
+    layout: str = "spring",
+):
+    """
+    If `max_num_nodes` is given, only the subgraph induced by the first `max_num_nodes` nodes is drawn.
+    """
+    num_nodes = int(num_nodes)
     g = (
         adjmatrix.diagonal_block_to_adj_matrix_representation(g, num_nodes)
         .cpu()
         .numpy()
     )[:num_nodes, :num_nodes, 0]
+    if max_num_nodes is not None:
+        g = g[:max_num_nodes, :max_num_nodes]
     g = np.tril(g, -1)
-    g = nx.from_numpy_matrix(g)
-    draw_graph(g, name)
+    g = nx.from_numpy_array(g)
+    draw_graph(g, name, layout)
 
 
-def draw_graph(G: nx.Graph, name: str):
+def draw_graph(G: nx.Graph, name: str, layout: str = "spring"):
+    """
+    The spring layout takes quadratic time in the number of nodes per iteration;
+    the circular and random ones are linear and suit large graphs.
+    """
     plt.switch_backend("agg")
     plt.axis("off")
 
-    pos = nx.spring_layout(G)
+    pos = LAYOUTS[layout](G)
     nx.draw_networkx(
         G,
         with_labels=False,
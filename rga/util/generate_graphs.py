@@ -1,6 +1,9 @@
+from collections import OrderedDict
 from typing import List, Tuple
 
+import numpy as np
 import torch
+from scipy import sparse
 from torch.functional import Tensor
 
 from rga import util
@@ -10,37 +13,49 @@ from rga.util import adjmatrix
 def convert_model_output_to_diag_block(
     model_output,
 ) -> List[Tuple[Tensor, Tensor, int]]:
+    """
+    Returns the thresholded graphs, the masks and the numbers of nodes of the decoded graphs, processing each
+    batch at once, see `batch_get_num_nodes`.
+    """
     diag_block_graphs = []
     for (graphs, masks), _ in model_output:
-        for i in range(len(graphs)):
-            graph = graphs[i]
-            mask = masks[i]
-
-            graph_without_padding = (
-                torch.sigmoid(remove_block_padding(graph)).round().int()
-            )
-
-            block_count = mask.shape[0]
-            block_size = mask.shape[1]
-            mask_without_padding = torch.sigmoid(remove_block_padding(mask))
+        if len(graphs) == 0:
+            continue
+        # the size limit is given by the length of the batch, before removing the padding
+        block_count = masks.shape[1]
+        block_size = masks.shape[2]
+        num_nodes_upper_limit = (
+            adjmatrix.block_count_to_num_block_diagonals(block_count) * block_size
+        )
 
-            num_nodes_upper_limit = (
-                adjmatrix.block_count_to_num_block_diagonals(block_count) * block_size
-            )
-            if mask_without_padding.shape[0] == 34:
-                mask_without_padding = mask_without_padding
-                pass
-            adj_matrix_mask = adjmatrix.diagonal_block_to_adj_matrix_representation(
-                mask_without_padding, num_nodes_upper_limit
-            )
-            num_nodes = get_num_nodes(adj_matrix_mask)
+        graphs, graph_block_counts = remove_batch_block_padding(graphs)
+        masks, mask_block_counts = remove_batch_block_padding(masks)
+        graphs = torch.sigmoid(graphs).round().int()
+        masks = torch.sigmoid(masks)
+        num_nodes = batch_get_num_nodes(masks, num_nodes_upper_limit)
 
+        for i in range(len(graphs)):
             diag_block_graphs.append(
-                (graph_without_padding, mask_without_padding, num_nodes)
+                (
+                    graphs[i, : graph_block_counts[i]],
+                    masks[i, : mask_block_counts[i]],
+                    int(num_nodes[i]),
+                )
             )
     return diag_block_graphs
 
 
+def remove_batch_block_padding(graphs: Tensor) -> Tuple[Tensor, List[int]]:
+    """
+    Batched `remove_block_padding`, moves the padding blocks of the graphs of shape [batch_size, num_blocks, ...]
+    after their other blocks and returns the graphs with the numbers of their blocks.
+    """
+    is_padding = graphs.flatten(start_dim=2).isinf().all(dim=2)
+    order = torch.sort(is_padding.int(), dim=1, stable=True).indices
+    graphs = graphs[torch.arange(len(graphs), device=graphs.device)[:, None], order]
+    return graphs, (~is_padding).sum(dim=1).tolist()
+
+
 def get_num_nodes(mask):
     for i in range(1, mask.shape[0]):
         if torch.diagonal(mask, -(mask.shape[0] - i)).mean() < 0.5:
@@ -48,6 +63,103 @@ def get_num_nodes(mask):
     return i
 
 
+def get_num_nodes_from_diagonal_blocks(mask: Tensor, num_nodes_upper_limit: int) -> int:
+    """
+    Returns `get_num_nodes` of the adjacency matrix of `num_nodes_upper_limit` nodes of the diagonal block
+    representation `mask`, computed on the blocks, without building the matrix.
+    """
+    return int(batch_get_num_nodes(mask[None], num_nodes_upper_limit)[0])
+
+
+def batch_get_num_nodes(masks: Tensor, num_nodes_upper_limit: int) -> Tensor:
+    """
+    Batched `get_num_nodes_from_diagonal_blocks` of the masks of shape [batch_size, num_blocks, ...],
+    the missing blocks, up to the size limit, are taken as zeros like in the adjacency matrices.
+    """
+    if num_nodes_upper_limit < 2:
+        return torch.full((len(masks),), num_nodes_upper_limit - 1)
+    block_size = masks.shape[2]
+    block_element_indices, edge_y, edge_x = lower_triangle_index_table(
+        num_nodes_upper_limit, block_size
+    )
+    in_masks = block_element_indices < masks[0, ..., 0].numel()
+    distances = edge_y - edge_x
+
+    values = masks.double().mean(dim=-1).flatten(start_dim=1).cpu()
+    sums = torch.zeros((len(masks), num_nodes_upper_limit), dtype=torch.double)
+    sums.index_add_(1, distances[in_masks], values[:, block_element_indices[in_masks]])
+    counts = torch.bincount(distances, minlength=num_nodes_upper_limit)
+    means = sums / counts.clamp(min=1)
+
+    # the diagonals are checked from the furthest one from the main diagonal, like in `get_num_nodes`,
+    # the size is given by the closest mostly empty one
+    mostly_empty = means[:, 1:] < 0.5
+    closest_mostly_empty = torch.where(
+        mostly_empty, torch.arange(num_nodes_upper_limit - 1), -1
+    ).max(dim=1)
+    return num_nodes_upper_limit - 1 - closest_mostly_empty.values.clamp(min=0)
+
+
+# the tables take about 12 * num_nodes ** 2 bytes, so their cache is bounded by size instead of by count
+INDEX_TABLES_MAX_BYTES = 2**28
+index_tables: "OrderedDict[Tuple[int, int], Tuple[Tensor, ...]]" = OrderedDict()
+
+
+def lower_triangle_index_table(
+    num_nodes: int, block_size: int
+) -> Tuple[Tensor, Tensor, Tensor]:
+    """
+    Returns the indices of the elements of the flattened blocks, of shape [num_blocks * block_size * block_size],
+    of the diagonal block representation of a graph of `num_nodes` nodes, that lay in the lower triangle
+    of its adjacency matrix, and their row and column indices in the matrix.
+    The least recently used tables are cached within `INDEX_TABLES_MAX_BYTES`, as the graphs are mostly
+    of a few sizes.
+    """
+    key = (num_nodes, block_size)
+    tables = index_tables.get(key)
+    if tables is not None:
+        index_tables.move_to_end(key)
+        return tables
+
+    tables = create_lower_triangle_index_table(num_nodes, block_size)
+    if index_table_size(tables) <= INDEX_TABLES_MAX_BYTES:
+        index_tables[key] = tables
+        while sum(map(index_table_size, index_tables.values())) > (
+            INDEX_TABLES_MAX_BYTES
+        ):
+            index_tables.popitem(last=False)
+    return tables
+
+
+def index_table_size(tables: Tuple[Tensor, Tensor, Tensor]) -> int:
+    return sum(table.element_size() * table.numel() for table in tables)
+
+
+def create_lower_triangle_index_table(
+    num_nodes: int, block_size: int
+) -> Tuple[Tensor, Tensor, Tensor]:
+    num_columns = adjmatrix.divide_integer_round_up(num_nodes - 1, block_size)
+    num_blocks = num_columns * (num_columns + 1) // 2
+    block_y, block_x = adjmatrix.diagonal_block_coordinates(
+        torch.arange(num_blocks), num_columns
+    )
+    in_block = torch.arange(block_size)
+    # the rows shift of the representation, see `adj_matrix_to_diagonal_block_representation`
+    padding = (1 - num_nodes) % block_size
+    edge_y = (
+        (block_y * block_size)[:, None, None] + in_block[None, :, None] - padding + 1
+    )
+    edge_x = (block_x * block_size)[:, None, None] + in_block[None, None, :]
+    edge_y, edge_x = torch.broadcast_tensors(edge_y, edge_x)
+    edge_y, edge_x = edge_y.flatten(), edge_x.flatten()
+    in_lower_triangle = edge_y > edge_x
+    return (
+        in_lower_triangle.nonzero()[:, 0],
+        edge_y[in_lower_triangle],
+        edge_x[in_lower_triangle],
+    )
+
+
 def remove_block_padding(graph):
     mask = graph.flatten(start_dim=1).isinf().all(dim=1)
     return graph[~mask]
@@ -59,13 +171,71 @@ def diag_block_graphs_to_tril_adj_matrices(
     adj_matrices = []
     for (graph, _, num_nodes) in data:
         graph = util.to_dense_if_not(graph)
-        graph = graph.clamp(min=0)
-        adj_matrix = adjmatrix.diagonal_block_to_adj_matrix_representation(
-            graph, num_nodes
+        block_element_indices, edge_y, edge_x = (
+            table.to(graph.device)
+            for table in lower_triangle_index_table(num_nodes, graph.shape[1])
+        )
+        values = graph[..., 0].clamp(min=0).flatten()
+        # the missing blocks are zeros, like in `diagonal_block_to_adj_matrix_representation`
+        in_graph = block_element_indices < len(values)
+        adj_matrix = torch.zeros(
+            (num_nodes, num_nodes), dtype=torch.int, device=graph.device
         )
-        adj_matrix = adj_matrix[:, :, 0]
-        adj_matrix = torch.tril(adj_matrix, -1)
-        adj_matrix = adj_matrix.int()
+        adj_matrix[edge_y[in_graph], edge_x[in_graph]] = values[
+            block_element_indices[in_graph]
+        ].int()
 
         adj_matrices.append(adj_matrix)
     return adj_matrices
+
+
+def diag_block_graphs_to_edge_lists(
+    data: List[Tuple[Tensor, Tensor, int]]
+) -> List[Tuple[Tensor, int]]:
+    """
+    The sparse counterpart of `diag_block_graphs_to_tril_adj_matrices`, returns the edges of the lower triangles
+    of the graphs, of shape [num_edges, 2], and their numbers of nodes.
+    """
+    edge_lists = []
+    for (graph, _, num_nodes) in data:
+        graph = util.to_dense_if_not(graph)
+        edges, _ = adjmatrix.diagonal_block_to_edge_list(graph, num_nodes, threshold=0)
+        edge_lists.append((edges, num_nodes))
+    return edge_lists
+
+
+def edge_list_output(edges: Tensor, num_nodes: int, output_format: str):
+    """
+    Returns the edges of a graph, of shape [num_edges, 2], with its number of nodes for the "edge_list"
+    `output_format`, or its symmetric `scipy.sparse.csr_matrix` adjacency matrix for "scipy".
+    """
+    if output_format == "edge_list":
+        return edges, num_nodes
+    edges = edges.cpu().numpy()
+    return sparse.csr_matrix(
+        (
+            np.ones(2 * len(edges), dtype=np.int32),
+            (
+                np.concatenate([edges[:, 0], edges[:, 1]]),
+                np.concatenate([edges[:, 1], edges[:, 0]]),
+            ),
+        ),
+        shape=(num_nodes, num_nodes),
+    )
+
+
+def diag_block_graphs_to_diagonal_representations(
+    data: List[Tuple[Tensor, Tensor, int]]
+) -> List[Tensor]:
+    """
+    Returns the diagonal representations, without the edge_size dimension, of the graphs, see
+    `adj_matrix_to_diagonal_representation`.
+    """
+    return [
+        adjmatrix.adj_matrix_to_diagonal_representation(
+            adj_matrix[..., None], num_nodes
+        )[..., 0]
+        for adj_matrix, (_, _, num_nodes) in zip(
+            diag_block_graphs_to_tril_adj_matrices(data), data
+        )
+    ]
@@ -0,0 +1,80 @@
+from typing import Callable
+
+import torch
+
+
+class HostSyncCounter:
+    """
+    Context manager counting the tensor operations that read tensor values back to the host.
+    On an accelerator each of them blocks until the device's queue is drained.
+
+    Counted are the explicit reads (`item`, `tolist`, `numpy`, `cpu`, `nonzero`), Python conversions
+    (`bool`, `int`, `float`, `index`) and indexing with boolean masks, whose output shape depends on
+    the mask's values. Operations on CPU tensors are skipped unless `include_cpu` is set, which allows
+    checking for would-be synchronizations on machines without an accelerator.
+    """
+
+    counted_methods = (
+        "item",
+        "tolist",
+        "numpy",
+        "cpu",
+        "nonzero",
+        "__bool__",
+        "__int__",
+        "__float__",
+        "__index__",
+    )
+    is_active = False
+
+    def __init__(self, include_cpu: bool = False):
+        self.include_cpu = include_cpu
+        self.count = 0
+        self._original_methods = {}
+        self._is_counting_call = False
+
+    def __enter__(self) -> "HostSyncCounter":
+        if HostSyncCounter.is_active:
+            raise RuntimeError("only a single HostSyncCounter may be active at a time")
+        HostSyncCounter.is_active = True
+        for name in self.counted_methods:
+            self._patch(name, self._count_always)
+        self._patch("__getitem__", self._count_boolean_indexing)
+        return self
+
+    def __exit__(self, *args) -> None:
+        for name, method in self._original_methods.items():
+            setattr(torch.Tensor, name, method)
+        self._original_methods = {}
+        HostSyncCounter.is_active = False
+
+    def _patch(self, name: str, should_count: Callable) -> None:
+        original_method = getattr(torch.Tensor, name)
+        self._original_methods[name] = original_method
+
+        def counting_method(tensor, *args, **kwargs):
+            if self._is_counting_call:
+                return original_method(tensor, *args, **kwargs)
+            if should_count(tensor, *args) and (
+                self.include_cpu or tensor.device.type != "cpu"
+            ):
+                self.count += 1
+            # the counted methods may call each other internally, which is a single synchronization
+            self._is_counting_call = True
+            try:
+                return original_method(tensor, *args, **kwargs)
+            finally:
+                self._is_counting_call = False
+
+        setattr(torch.Tensor, name, counting_method)
+
+    @staticmethod
+    def _count_always(tensor, *args) -> bool:
+        return True
+
+    @staticmethod
+    def _count_boolean_indexing(tensor, index) -> bool:
+        indices = index if isinstance(index, tuple) else (index,)
+        return any(
+            isinstance(i, torch.Tensor) and i.dtype == torch.bool for i in indices
+        )
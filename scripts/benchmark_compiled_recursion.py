@@ -0,0 +1,83 @@
+import argparse
+import statistics
+import time
+
+import torch
+
+from rga.models.autoencoder_base import RecursiveGraphAutoencoder
+from scripts.benchmark_recursion_checkpointing import create_batch
+
+
+def steps_per_second(model, batches, train: bool) -> float:
+    """
+    Returns the number of training (forward and backward) or inference steps per second of an epoch.
+    """
+    start = time.perf_counter()
+    for batch in batches:
+        if train:
+            model.zero_grad()
+            model.step(batch).backward()
+        else:
+            with torch.no_grad():
+                model(batch)
+    return len(batches) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measures the steps per second of the eager and `--compiled_recursion` execution on small graphs."
+    )
+    parser.add_argument(
+        "--graph_size_range",
+        default=[10, 28],
+        type=int,
+        nargs=2,
+        help="the defaults resemble MUTAG, IMDB-BINARY graphs have 12-136 nodes, with a mean of 20",
+    )
+    parser.add_argument("--batch_size", default=32, type=int)
+    parser.add_argument("--num_batches", default=20, type=int)
+    parser.add_argument(
+        "--num_repeats",
+        default=5,
+        type=int,
+        help="the epochs of both models are interleaved, the median speed is reported",
+    )
+    parser = RecursiveGraphAutoencoder.add_model_specific_args(parser)
+    parser.set_defaults(
+        loss_function="BCEWithLogits", mask_loss_function="BCEWithLogits", metrics=[]
+    )
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    batches = [
+        create_batch(
+            torch.randint(*args.graph_size_range, (args.batch_size,)).tolist(),
+            args.block_size,
+            torch.device("cpu"),
+        )
+        for _ in range(args.num_batches)
+    ]
+
+    models = {}
+    for compiled_recursion in [False, True]:
+        model = RecursiveGraphAutoencoder(
+            **{**vars(args), "compiled_recursion": compiled_recursion}
+        )
+        if models:
+            model.load_state_dict(models["eager"].state_dict())
+        models["compiled" if compiled_recursion else "eager"] = model
+
+    # the compared epochs follow each other, to reduce the effect of speed fluctuations
+    speeds = {(mode, train): [] for train in [True, False] for mode in models}
+    # the first epoch is a warm-up, compiling the buckets
+    for repeat in range(args.num_repeats + 1):
+        for (mode, train), mode_speeds in speeds.items():
+            speed = steps_per_second(models[mode], batches, train)
+            if repeat > 0:
+                mode_speeds.append(speed)
+
+    print(f"{'mode':>10} {'train [steps/s]':>16} {'inference [steps/s]':>20}")
+    for mode in models:
+        train_speed = statistics.median(speeds[mode, True])
+        inference_speed = statistics.median(speeds[mode, False])
+        print(f"{mode:>10} {train_speed:>16.2f} {inference_speed:>20.2f}")
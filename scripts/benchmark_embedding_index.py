@@ -0,0 +1,97 @@
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from rga.models.utils.embedding_export import load_exported_embeddings
+from rga.models.utils.embedding_index import IVFPQIndex, exact_search
+
+
+def recall(found_ids: np.ndarray, true_ids: np.ndarray) -> float:
+    return np.mean(
+        [
+            len(np.intersect1d(found, true)) / len(true)
+            for found, true in zip(found_ids, true_ids)
+        ]
+    )
+
+
+def timed(fn, *args, **kwargs):
+    start_time = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start_time
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measures the recall and the query latency of IVFPQIndex against the exact cosine "
+        "similarity search over exported embeddings, e.g. of IMDB-BINARY and REDDIT-BINARY."
+    )
+    parser.add_argument(
+        "--embeddings_dirs",
+        required=True,
+        type=str,
+        nargs="+",
+        help="output directories of scripts.export_embeddings",
+    )
+    parser.add_argument("--num_queries", default=1000, type=int)
+    parser.add_argument("--k", default=10, type=int)
+    parser.add_argument("--num_lists", default=256, type=int)
+    parser.add_argument("--num_subvectors", default=8, type=int)
+    parser.add_argument("--num_probes", default=[1, 4, 16, 64], type=int, nargs="+")
+    parser.add_argument(
+        "--num_candidates",
+        default=None,
+        type=int,
+        help="rerank this many candidates with the exact embeddings, 4 * k by default",
+    )
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    report = {}
+    for embeddings_dir in args.embeddings_dirs:
+        name = Path(embeddings_dir).name
+        embeddings, _ = load_exported_embeddings(embeddings_dir)
+        queries = np.asarray(
+            embeddings[np.sort(rng.choice(len(embeddings), args.num_queries))]
+        )
+
+        (_, true_ids), exact_time = timed(exact_search, embeddings, queries, args.k)
+        report[(name, "exact")] = {
+            f"Recall@{args.k}": 1.0,
+            "Latency [ms/query]": exact_time / len(queries) * 1000,
+        }
+
+        index = IVFPQIndex(
+            embeddings.shape[1],
+            num_lists=min(args.num_lists, len(embeddings)),
+            num_subvectors=args.num_subvectors,
+        )
+        _, train_time = timed(index.train, embeddings)
+        _, add_time = timed(index.add, embeddings)
+        print(
+            f"{name}: {len(embeddings)} embeddings, trained in {train_time:.1f}s, added in {add_time:.1f}s",
+            flush=True,
+        )
+
+        for num_probes in args.num_probes:
+            for rerank in [False, True]:
+                (_, ids), search_time = timed(
+                    index.search,
+                    queries,
+                    args.k,
+                    num_probes,
+                    rerank_embeddings=embeddings if rerank else None,
+                    num_candidates=args.num_candidates,
+                )
+                method = f"IVF-PQ, {num_probes} probes" + (
+                    ", reranked" if rerank else ""
+                )
+                report[(name, method)] = {
+                    f"Recall@{args.k}": recall(ids, true_ids),
+                    "Latency [ms/query]": search_time / len(queries) * 1000,
+                }
+
+    print(pd.DataFrame(report).T.round(3))
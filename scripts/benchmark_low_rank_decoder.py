@@ -0,0 +1,169 @@
+import argparse
+import time
+from typing import List
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import torch
+
+from rga.metrics.edge_accuracy import EdgeAccuracy
+from rga.metrics.precision_recall import EdgeF1, EdgePrecision, EdgeRecall
+from rga.models.autoencoder_base import RecursiveGraphAutoencoder
+from rga.models.edge_decoders.low_rank import LowRankMemoryEdgeDecoder
+from rga.models.low_rank_autoencoder import LowRankRecursiveGraphAutoencoder
+from rga.util.adjmatrix.diagonal_block_representation import (
+    adj_matrix_to_diagonal_block_representation,
+)
+
+
+def reddit_like_graph(num_nodes: int, seed: int) -> np.ndarray:
+    """
+    A tree-like discussion thread, as in REDDIT-BINARY, with the nodes in BFS order from the most
+    connected one, as with the `bfs` option of the data modules.
+    """
+    graph = nx.barabasi_albert_graph(num_nodes, 1, seed=seed)
+    root = max(graph.degree, key=lambda x: x[1])[0]
+    return nx.to_numpy_array(graph, nodelist=list(nx.bfs_tree(graph, root)))
+
+
+def create_batch(adj_matrices: List[np.ndarray], block_size: int):
+    graphs, masks = [], []
+    for adj_matrix in adj_matrices:
+        num_nodes = adj_matrix.shape[0]
+        adj_matrix = torch.tril(torch.from_numpy(adj_matrix).float(), -1)[:, :, None]
+        graphs.append(
+            adj_matrix_to_diagonal_block_representation(
+                adj_matrix, num_nodes, block_size, pad_value=-1
+            )
+        )
+        mask = torch.tril(torch.ones((num_nodes, num_nodes)), diagonal=-1)[:, :, None]
+        masks.append(
+            adj_matrix_to_diagonal_block_representation(mask, num_nodes, block_size)
+        )
+    return (
+        torch.nn.utils.rnn.pad_sequence(graphs, batch_first=True),
+        torch.nn.utils.rnn.pad_sequence(masks, batch_first=True),
+        torch.tensor([m.shape[0] for m in adj_matrices]),
+    )
+
+
+def edge_decoder_flops_per_block(edge_decoder: torch.nn.Module) -> int:
+    """
+    Multiply-add FLOPs of decoding a single block (a single position of a diagonal).
+    """
+    flops = sum(
+        2 * module.in_features * module.out_features
+        for module in edge_decoder.modules()
+        if isinstance(module, torch.nn.Linear)
+    )
+    if isinstance(edge_decoder, LowRankMemoryEdgeDecoder):
+        flops += (
+            2
+            * edge_decoder.block_size**2
+            * edge_decoder.rank
+            * edge_decoder.num_channels
+        )
+    return flops
+
+
+def train(model, train_graphs, batch_size: int, num_steps: int, block_size: int):
+    optimizer = torch.optim.AdamW(model.parameters(), lr=model.learning_rate)
+    generator = np.random.default_rng(0)
+    model.train()
+    for _ in range(num_steps):
+        indices = generator.choice(len(train_graphs), batch_size, replace=False)
+        batch = create_batch([train_graphs[i] for i in indices], block_size)
+        optimizer.zero_grad()
+        model.step(batch).backward()
+        torch.nn.utils.clip_grad_norm_(model.parameters(), 1.0)
+        optimizer.step()
+
+
+def evaluate(model, test_graphs, batch_size: int, block_size: int) -> dict:
+    metrics = [EdgeAccuracy(), EdgePrecision(), EdgeRecall(), EdgeF1()]
+    model.eval()
+    decoding_time = 0.0
+    with torch.no_grad():
+        for start in range(0, len(test_graphs), batch_size):
+            batch = create_batch(test_graphs[start : start + batch_size], block_size)
+            model.step(batch, metrics)
+            embeddings = model.encoder(batch)
+            start_time = time.perf_counter()
+            model.decoder(embeddings, max(batch[2]))
+            decoding_time += time.perf_counter() - start_time
+    return {
+        **{type(metric).__name__: metric.compute().item() for metric in metrics},
+        "Decoding time [ms/graph]": decoding_time / len(test_graphs) * 1000,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compares LowRankMemoryEdgeDecoder of several ranks with MemoryEdgeDecoder on generated "
+        "REDDIT-BINARY-like graphs: FLOPs and parameters of the edge decoder, and reconstruction quality "
+        "after training both for the same number of steps."
+    )
+    parser.add_argument("--ranks", default=[2, 4, 8, 16], type=int, nargs="+")
+    parser.add_argument("--num_nodes_range", default=[50, 300], type=int, nargs=2)
+    parser.add_argument("--num_train_graphs", default=256, type=int)
+    parser.add_argument("--num_test_graphs", default=64, type=int)
+    parser.add_argument("--num_steps", default=200, type=int)
+    parser.add_argument("--train_batch_size", default=8, type=int)
+    parser = LowRankRecursiveGraphAutoencoder.add_model_specific_args(parser)
+    parser.set_defaults(
+        loss_function="BCEWithLogits",
+        mask_loss_function="BCEWithLogits",
+        recall_to_precision_bias=0.03,
+        metrics=[],
+        learning_rate=0.0005,
+        block_size=64,
+        embedding_size=128,
+        encoder_hidden_layer_sizes=[512],
+        encoder_activation_function="ELU",
+        decoder_hidden_layer_sizes=[768],
+        decoder_activation_function="ELU",
+    )
+    args = parser.parse_args()
+
+    num_nodes = np.random.default_rng(0).integers(
+        *args.num_nodes_range, args.num_train_graphs + args.num_test_graphs
+    )
+    graphs = [reddit_like_graph(int(n), seed) for seed, n in enumerate(num_nodes)]
+    train_graphs, test_graphs = (
+        graphs[: args.num_train_graphs],
+        graphs[args.num_train_graphs :],
+    )
+
+    report = {}
+    for rank in [None] + args.ranks:
+        torch.manual_seed(0)
+        if rank is None:
+            name = "MemoryEdgeDecoder"
+            model = RecursiveGraphAutoencoder(**vars(args))
+        else:
+            name = f"LowRank r={rank}"
+            model = LowRankRecursiveGraphAutoencoder(
+                **{**vars(args), "edge_decoder_rank": rank}
+            )
+        edge_decoder = model.decoder.edge_decoder
+
+        train(
+            model,
+            train_graphs,
+            args.train_batch_size,
+            args.num_steps,
+            args.block_size,
+        )
+        report[name] = {
+            "Edge decoder MFLOPs/block": edge_decoder_flops_per_block(edge_decoder)
+            / 1e6,
+            "Edge decoder params [M]": sum(p.numel() for p in edge_decoder.parameters())
+            / 1e6,
+            "Model params [M]": sum(p.numel() for p in model.parameters()) / 1e6,
+            **evaluate(model, test_graphs, args.train_batch_size, args.block_size),
+        }
+        print(name, report[name], flush=True)
+
+    with pd.option_context("display.max_rows", None, "display.max_columns", None):
+        print(pd.DataFrame(report).round(4))
@@ -0,0 +1,131 @@
+import argparse
+import time
+from typing import List
+
+import torch
+
+from rga.models.autoencoder_base import RecursiveGraphAutoencoder
+from rga.util.adjmatrix.diagonal_block_representation import (
+    adj_matrix_to_diagonal_block_representation,
+)
+
+
+def create_batch(graph_sizes: List[int], block_size: int, device: torch.device):
+    graphs, masks = [], []
+    for num_nodes in graph_sizes:
+        adj_matrix = torch.rand((num_nodes, num_nodes)) < 0.3
+        adj_matrix = torch.tril(adj_matrix.float(), -1)[:, :, None]
+        graphs.append(
+            adj_matrix_to_diagonal_block_representation(
+                adj_matrix, num_nodes, block_size, pad_value=-1
+            )
+        )
+        mask = torch.tril(torch.ones((num_nodes, num_nodes)), diagonal=-1)[:, :, None]
+        masks.append(
+            adj_matrix_to_diagonal_block_representation(mask, num_nodes, block_size)
+        )
+    return (
+        torch.nn.utils.rnn.pad_sequence(graphs, batch_first=True).to(device),
+        torch.nn.utils.rnn.pad_sequence(masks, batch_first=True).to(device),
+        torch.tensor(graph_sizes, device=device),
+    )
+
+
+class SavedTensorsCounter:
+    """
+    Tracks the peak size of the tensors saved for the backward pass, i.e. of the stored activations,
+    including the ones recomputed during the backward pass. Used on the CPU, where there are no allocator statistics.
+    """
+
+    def __init__(self):
+        self.num_bytes = 0
+        self.peak_num_bytes = 0
+
+    def __enter__(self):
+        self.hooks = torch.autograd.graph.saved_tensors_hooks(
+            self.pack, lambda saved: saved.tensor
+        )
+        self.hooks.__enter__()
+        return self
+
+    def __exit__(self, *args):
+        self.hooks.__exit__(*args)
+
+    def pack(self, t: torch.Tensor) -> "SavedTensor":
+        return SavedTensor(t, self)
+
+    def add(self, num_bytes: int) -> None:
+        self.num_bytes += num_bytes
+        self.peak_num_bytes = max(self.peak_num_bytes, self.num_bytes)
+
+
+class SavedTensor:
+    def __init__(self, tensor: torch.Tensor, counter: SavedTensorsCounter):
+        self.tensor = tensor
+        self.counter = counter
+        self.num_bytes = tensor.numel() * tensor.element_size()
+        counter.add(self.num_bytes)
+
+    def __del__(self):
+        self.counter.add(-self.num_bytes)
+
+
+def benchmark(model, batch, num_repeats: int, device: torch.device):
+    """
+    Returns the mean time of a training step's forward and backward pass and its peak memory
+    (on the CPU, the peak memory of the saved activations).
+    """
+    times = []
+    # the first step is a warm-up
+    for _ in range(num_repeats + 1):
+        model.zero_grad()
+        if device.type == "cuda":
+            torch.cuda.reset_peak_memory_stats(device)
+            torch.cuda.synchronize(device)
+        start = time.perf_counter()
+        with SavedTensorsCounter() as counter:
+            loss = model.step(batch)
+            loss.backward()
+        if device.type == "cuda":
+            torch.cuda.synchronize(device)
+        times.append(time.perf_counter() - start)
+    memory = (
+        torch.cuda.max_memory_allocated(device)
+        if device.type == "cuda"
+        else counter.peak_num_bytes
+    )
+    return sum(times[1:]) / num_repeats, memory
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measures the memory and time trade-off of `--recursion_checkpoint_every`."
+    )
+    parser.add_argument(
+        "--checkpoint_every", default=[0, 1, 2, 4, 8, 16], type=int, nargs="+"
+    )
+    parser.add_argument("--graph_sizes", default=[100, 80, 60, 40], type=int, nargs="+")
+    parser.add_argument("--num_repeats", default=3, type=int)
+    parser.add_argument(
+        "--device", default="cuda" if torch.cuda.is_available() else "cpu"
+    )
+    parser = RecursiveGraphAutoencoder.add_model_specific_args(parser)
+    parser.set_defaults(
+        loss_function="BCEWithLogits", mask_loss_function="BCEWithLogits", metrics=[]
+    )
+    args = parser.parse_args()
+    device = torch.device(args.device)
+
+    print(f"{'K':>4} {'time [s]':>10} {'memory [MiB]':>14}")
+    state_dict = None
+    for checkpoint_every in args.checkpoint_every:
+        model_args = {**vars(args), "recursion_checkpoint_every": checkpoint_every}
+        model = RecursiveGraphAutoencoder(**model_args).to(device)
+        if state_dict is None:
+            state_dict = model.state_dict()
+        model.load_state_dict(state_dict)
+
+        torch.manual_seed(0)
+        batch = create_batch(args.graph_sizes, args.block_size, device)
+        step_time, memory = benchmark(model, batch, args.num_repeats, device)
+        print(f"{checkpoint_every:>4} {step_time:>10.3f} {memory / 2**20:>14.1f}")
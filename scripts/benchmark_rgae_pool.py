@@ -0,0 +1,87 @@
+import argparse
+import os
+import time
+
+import networkx as nx
+import pandas as pd
+import torch
+
+from rga.models.rgae import RGAE
+from rga.models.rgae_pool import RGAEPool
+
+
+def random_graphs(num_graphs: int, num_nodes_range, seed: int = 0):
+    generator = torch.Generator().manual_seed(seed)
+    graphs = []
+    for i in range(num_graphs):
+        num_nodes = int(torch.randint(*num_nodes_range, (1,), generator=generator))
+        graph = nx.barabasi_albert_graph(num_nodes, 1, seed=seed + i)
+        graphs.append(torch.from_numpy(nx.to_numpy_array(graph)).float())
+    return graphs
+
+
+def throughput(encode, decode, graphs, num_repeats: int) -> dict:
+    embeddings = encode(graphs)
+    decode(embeddings)
+
+    start_time = time.perf_counter()
+    for _ in range(num_repeats):
+        embeddings = encode(graphs)
+    encode_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for _ in range(num_repeats):
+        decode(embeddings)
+    decode_time = time.perf_counter() - start_time
+    return {
+        "Encode [graphs/s]": len(graphs) * num_repeats / encode_time,
+        "Decode [graphs/s]": len(graphs) * num_repeats / decode_time,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measures the encoding and decoding throughput of RGAEPool against its number of workers, "
+        "compared to a single in-process RGAE."
+    )
+    parser.add_argument("--hparams_path", required=True, type=str)
+    parser.add_argument("--checkpoint_path", required=True, type=str)
+    parser.add_argument("--num_workers", default=[1, 2, 4, 8, 16], type=int, nargs="+")
+    parser.add_argument("--num_threads_per_worker", default=1, type=int)
+    parser.add_argument("--shard_size", default=16, type=int)
+    parser.add_argument("--num_graphs", default=256, type=int)
+    parser.add_argument("--num_nodes_range", default=[10, 60], type=int, nargs=2)
+    parser.add_argument("--num_repeats", default=3, type=int)
+    parser.add_argument("--max_graph_size", default=100, type=int)
+    args = parser.parse_args()
+
+    graphs = random_graphs(args.num_graphs, args.num_nodes_range)
+    print(f"{os.cpu_count()} CPUs", flush=True)
+
+    report = {}
+    rgae = RGAE(args.hparams_path, args.checkpoint_path)
+    with torch.no_grad():
+        report[f"RGAE, {torch.get_num_threads()} threads"] = throughput(
+            rgae.encode,
+            lambda embeddings: rgae.decode(embeddings, args.max_graph_size),
+            graphs,
+            args.num_repeats,
+        )
+
+    for num_workers in args.num_workers:
+        with RGAEPool(
+            args.hparams_path,
+            args.checkpoint_path,
+            num_workers=num_workers,
+            num_threads_per_worker=args.num_threads_per_worker,
+            shard_size=args.shard_size,
+        ) as pool:
+            report[f"RGAEPool, {num_workers} workers"] = throughput(
+                pool.encode,
+                lambda embeddings: pool.decode(embeddings, args.max_graph_size),
+                graphs,
+                args.num_repeats,
+            )
+        print(report, flush=True)
+
+    print(pd.DataFrame(report).T.round(1))
@@ -0,0 +1,38 @@
+import pandas as pd
+
+from .generate_graphs import GraphGenerator
+
+if __name__ == "__main__":
+    NUM_DATASETS = 5
+    DATASET_NAMES = ["synthetic_grid", "IMDB-BINARY"]
+    DATASETS_PATH = "/usr/local/datasets/"
+    CHECKPOINTS_PATH = "./best_checkpoints/"
+
+    comparisons = {}
+    for dataset in DATASET_NAMES:
+        metrics = {"fp32": [], "bf16": []}
+        for i in range(NUM_DATASETS):
+            dataset_path = f"{DATASETS_PATH}/{dataset}/{i}.pkl"
+            checkpoint_path = f"{CHECKPOINTS_PATH}/{dataset}/{i}.ckpt"
+
+            for precision, bf16_autocast in [("fp32", False), ("bf16", True)]:
+                metrics[precision].append(
+                    GraphGenerator().run(
+                        dataset_pickle_path=dataset_path,
+                        checkpoint_path=checkpoint_path,
+                        bf16_autocast=bf16_autocast,
+                    )
+                )
+
+        df = pd.DataFrame(
+            {
+                precision: pd.DataFrame(dataset_metrics).mean()
+                for precision, dataset_metrics in metrics.items()
+            }
+        )
+        df["difference"] = df["bf16"] - df["fp32"]
+        comparisons[dataset] = df.round(4)
+
+    df = pd.concat(comparisons, axis=1)
+    with pd.option_context("display.max_rows", None, "display.max_columns", None):
+        print(df)
@@ -0,0 +1,74 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+import torch
+
+from rga.models.rgae import RGAE
+from .quantization_report import (
+    load_test_graphs,
+    reconstruction_metrics,
+    run_model,
+    serialized_size,
+)
+
+
+def model_report(rgae: RGAE, graphs, batch_size: int) -> dict:
+    # the first batch is a warm-up
+    run_model(rgae, graphs[:batch_size], batch_size)
+    _, reconstructions, latencies = run_model(rgae, graphs, batch_size)
+    return {
+        "Embedding size": rgae.hparams["embedding_size"],
+        "Parameters [M]": sum(p.numel() for p in rgae.engine.parameters()) / 1e6,
+        "Model size [MB]": serialized_size(rgae.engine) / 2**20,
+        "Throughput [graphs/s]": len(graphs) / sum(latencies),
+        "Batch latency p50 [ms]": np.percentile(latencies, 50) * 1000,
+        "Batch latency p95 [ms]": np.percentile(latencies, 95) * 1000,
+        **reconstruction_metrics(graphs, reconstructions),
+    }
+
+
+def distillation_report(
+    teacher_checkpoint_path: str,
+    student_checkpoint_path: str,
+    graphs,
+    batch_size: int,
+) -> pd.DataFrame:
+    report = {}
+    for name, checkpoint_path in [
+        ("teacher", teacher_checkpoint_path),
+        ("student", student_checkpoint_path),
+    ]:
+        hparams_path = checkpoint_path.removesuffix(".ckpt") + "_hparams.yaml"
+        report[name] = model_report(
+            RGAE(hparams_path, checkpoint_path), graphs, batch_size
+        )
+
+    df = pd.DataFrame(report)
+    df["student / teacher"] = df["student"] / df["teacher"]
+    return df.round(4)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compares the size, speed and reconstruction quality of a distilled student with its teacher, "
+        "documenting the accuracy trade-off of the distillation. The hparams are expected next to the checkpoints, "
+        "as `<checkpoint>_hparams.yaml`."
+    )
+    parser.add_argument("--teacher_checkpoint_path", type=str, required=True)
+    parser.add_argument("--student_checkpoint_path", type=str, required=True)
+    parser.add_argument("--dataset_pickle_path", type=str, required=True)
+    parser.add_argument("--batch_size", type=int, default=32)
+    parser.add_argument("--num_graphs", type=int, default=1024)
+    args = parser.parse_args()
+
+    torch.set_grad_enabled(False)
+    graphs = load_test_graphs(args.dataset_pickle_path, args.num_graphs)
+    report = distillation_report(
+        args.teacher_checkpoint_path,
+        args.student_checkpoint_path,
+        graphs,
+        args.batch_size,
+    )
+    with pd.option_context("display.max_rows", None, "display.max_columns", None):
+        print(report)
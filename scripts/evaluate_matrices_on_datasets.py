@@ -1,82 +1,153 @@
 import pickle
-from multiprocessing import Process, Queue
-import gc
+from functools import partial
+from multiprocessing import Pool
+from typing import List, Tuple
 import numpy as np
 import pandas as pd
 import torch
+from torch import Tensor
 from tqdm import tqdm
-import argparse
 
 from rga.data.util.pickled_data import load_pickled_data
 from rga import util
 from rga.util import adjmatrix
-from rga.metrics.adjency_matrices_metrics import calculate_metrics
+from rga.util.chunked_pickle import ChunkedPickleReader, is_chunked_pickle
+from rga.metrics.adjency_matrices_metrics import (
+    confusion_counts,
+    graph_sizes,
+    metrics_from_counts,
+)
 
 import lzma
 
+# the `item_format` of the chunked prediction files: the predicted adjacency matrices of the test graphs,
+# in the order of the targets of the dataset
+PREDICTION_MATRICES_FORMAT = "prediction_matrices"
+
 
 def print_separator(name: str = "", size: int = 60):
     print("")
     print("\u2500" * 3, name, "\u2500" * (size - 3 - len(name)), sep="")
 
 
-def evaluate_single_dataset(dataset_path, predictions_path, q: Queue):
-    _, _, targets = load_pickled_data(dataset_path, False)
-    if isinstance(targets, list):
-        targets = targets[0]
-    with lzma.open(predictions_path, "rb") as input:
-        predictions = pickle.load(input)
-        print(f"Loaded predictions from {predictions_path}")
+def to_diagonal_representation_pair(target, prediction) -> Tuple[Tensor, Tensor]:
+    if isinstance(target, (np.ndarray, np.generic)):
+        target = torch.from_numpy(target)
+    target = util.to_dense_if_not(target)[..., None]
 
-    if len(targets) != len(predictions):
-        print(
-            f"Number of predictions does not match the number of targets in the test dataset;"
-            f"{len(predictions) = }, {len(targets) = }"
-        )
+    num_nodes = target.shape[0]
+
+    if isinstance(prediction, (np.ndarray, np.generic)):
+        prediction = torch.from_numpy(prediction)
+    prediction = util.to_dense_if_not(prediction)[..., None]
+    if prediction.shape[0] > num_nodes:
+        prediction = prediction[:num_nodes, :num_nodes, :]
 
+    target = adjmatrix.adj_matrix_to_diagonal_representation(target, num_nodes)[
+        ..., 0
+    ].int()
+    prediction = adjmatrix.adj_matrix_to_diagonal_representation(prediction, num_nodes)[
+        ..., 0
+    ]
+
+    if ((prediction == 0.0).sum() + (prediction == 1.0).sum()) != len(prediction):
+        prediction = torch.sigmoid(prediction)
+        prediction = prediction.round_().int()
+
+    return target, prediction
+
+
+def evaluate_pairs(targets: List, predictions: List) -> Tuple[Tensor, Tensor, Tensor]:
+    """
+    Returns the partial results of a chunk: per graph confusion counts, target sizes and prediction sizes.
+    """
     diag_targets = []
     diag_predictions = []
-    for i in tqdm(
-        range(len(targets)), desc=f"processing target and prediction matrices"
-    ):
-        target = targets[i]
-        if isinstance(target, (np.ndarray, np.generic)):
-            target = torch.from_numpy(target)
-        target = util.to_dense_if_not(target)[..., None]
-
-        num_nodes = target.shape[0]
-
-        prediction = predictions[i]
-        if isinstance(prediction, (np.ndarray, np.generic)):
-            prediction = torch.from_numpy(prediction)
-        prediction = util.to_dense_if_not(prediction)[..., None]
-        if prediction.shape[0] > num_nodes:
-            prediction = prediction[:num_nodes, :num_nodes, :]
-
-        target = adjmatrix.adj_matrix_to_diagonal_representation(target, num_nodes)[
-            ..., 0
-        ].int()
-        prediction = adjmatrix.adj_matrix_to_diagonal_representation(
-            prediction, num_nodes
-        )[..., 0]
-
-        if ((prediction == 0.0).sum() + (prediction == 1.0).sum()) != len(prediction):
-            prediction = torch.sigmoid(prediction)
-            prediction = prediction.round_().int()
-
+    for target, prediction in zip(targets, predictions):
+        target, prediction = to_diagonal_representation_pair(target, prediction)
         diag_targets.append(target)
         diag_predictions.append(prediction)
+    return (
+        confusion_counts(diag_targets, diag_predictions),
+        graph_sizes(diag_targets),
+        graph_sizes(diag_predictions),
+    )
+
+
+def evaluate_chunk(
+    targets: List, predictions_path: str, chunk_idx: int
+) -> Tuple[Tensor, Tensor, Tensor]:
+    with ChunkedPickleReader(predictions_path, PREDICTION_MATRICES_FORMAT) as reader:
+        predictions = reader.read_chunk(chunk_idx)
+    return evaluate_pairs(targets, predictions)
+
 
-    del targets
-    del predictions
+def star_call(fn, args):
+    return fn(*args)
 
-    metrics = calculate_metrics(diag_targets, diag_predictions)
 
-    del diag_targets
-    del diag_predictions
-    gc.collect()
+def evaluate_single_dataset(
+    dataset_path: str, predictions_path: str, num_workers: int, chunk_size: int
+) -> dict:
+    """
+    Evaluates the predictions chunk by chunk in a pool of workers, merging their partial confusion counts.
+
+    Predictions in the seekable chunked format (see `rga.util.chunked_pickle`) of `PREDICTION_MATRICES_FORMAT`
+    are read by the workers, one chunk at a time, other chunked files are rejected. Legacy, whole-file lzma
+    pickles are loaded in full and then split into chunks.
+    """
+    _, _, targets = load_pickled_data(dataset_path, False)
+    if isinstance(targets, list):
+        targets = targets[0]
+
+    if is_chunked_pickle(predictions_path):
+        with ChunkedPickleReader(
+            predictions_path, PREDICTION_MATRICES_FORMAT
+        ) as reader:
+            num_predictions = len(reader)
+            chunk_bounds = [reader.chunk_bounds(i) for i in range(reader.num_chunks)]
+        tasks = (
+            (targets[bounds.start : bounds.stop], predictions_path, chunk_idx)
+            for chunk_idx, bounds in enumerate(chunk_bounds)
+        )
+        evaluate_fn = evaluate_chunk
+    else:
+        with lzma.open(predictions_path, "rb") as input:
+            predictions = pickle.load(input)
+        num_predictions = len(predictions)
+        chunk_bounds = [
+            range(start, min(start + chunk_size, num_predictions))
+            for start in range(0, num_predictions, chunk_size)
+        ]
+        tasks = (
+            (
+                targets[bounds.start : bounds.stop],
+                predictions[bounds.start : bounds.stop],
+            )
+            for bounds in chunk_bounds
+        )
+        evaluate_fn = evaluate_pairs
+    print(f"Opened predictions from {predictions_path}")
+
+    if len(targets) != num_predictions:
+        print(
+            f"Number of predictions does not match the number of targets in the test dataset;"
+            f"{num_predictions = }, {len(targets) = }"
+        )
+
+    with Pool(num_workers) as pool:
+        partial_results = list(
+            tqdm(
+                pool.imap(partial(star_call, evaluate_fn), tasks),
+                total=len(chunk_bounds),
+                desc="evaluating chunks of target and prediction matrices",
+            )
+        )
 
-    q.put(metrics)
+    counts, target_sizes, predicted_sizes = [
+        torch.cat(results) for results in zip(*partial_results)
+    ]
+    return metrics_from_counts(counts, target_sizes, predicted_sizes)
 
 
 if __name__ == "__main__":
@@ -85,6 +156,8 @@ if __name__ == "__main__":
     DATASETS_PATH = "/usr/local/datasets"
     PREDICTIONS_PATH = "path"
     RESULT_SAVE_PATH = PREDICTIONS_PATH + "/metrics.csv"
+    NUM_WORKERS = 8
+    CHUNK_SIZE = 64
 
     aggregated_metrics = {}
     for dataset in DATASET_NAMES:
@@ -93,19 +166,9 @@ if __name__ == "__main__":
             dataset_path = f"{DATASETS_PATH}/{dataset}/{i}.pkl"
             predictions_path = f"{PREDICTIONS_PATH}/{dataset}/test_predictions_{i}.pkl"
 
-            # Evaluations are performed in separate processes to force memory flushing
-            q = Queue()
-            p = Process(
-                target=evaluate_single_dataset,
-                args=(
-                    dataset_path,
-                    predictions_path,
-                    q,
-                ),
+            metrics = evaluate_single_dataset(
+                dataset_path, predictions_path, NUM_WORKERS, CHUNK_SIZE
             )
-            p.start()
-            metrics = q.get()
-            p.join()
 
             all_metrics.append(metrics)
             for k, v in metrics.items():
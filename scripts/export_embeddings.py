@@ -0,0 +1,66 @@
+import argparse
+
+from rga.models.rgae import RGAE
+from rga.models.utils.embedding_export import (
+    EmbeddingExporter,
+    edge_list_dir_graphs,
+    pickled_dataset_graphs,
+    tu_dataset_graphs,
+)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Encodes all graphs of a dataset with a trained model into a memory-mapped array of "
+        "embeddings with an index of the graph ids, resuming an interrupted export into the same directory."
+    )
+    parser.add_argument("--hparams_path", required=True, type=str)
+    parser.add_argument("--checkpoint_path", required=True, type=str)
+    parser.add_argument("--output_dir", required=True, type=str)
+    parser.add_argument(
+        "--source",
+        required=True,
+        choices=["tu", "pickle", "edge_lists"],
+        help="a dataset in the TU format, a pickled dataset or a directory of edge list files",
+    )
+    parser.add_argument(
+        "--source_path",
+        required=True,
+        type=str,
+        help="the directory of the TU datasets, the pickled dataset or the directory of edge lists",
+    )
+    parser.add_argument(
+        "--dataset_name", default="", type=str, help="name of the TU dataset"
+    )
+    parser.add_argument(
+        "--pickle_split", default="test", choices=["train", "val", "test"]
+    )
+    parser.add_argument("--dtype", default="float32", choices=["float16", "float32"])
+    parser.add_argument("--chunk_size", default=4096, type=int)
+    parser.add_argument(
+        "--max_batch_bytes",
+        default=2**28,
+        type=int,
+        help="memory bound of a padded batch of graph representations",
+    )
+    parser.add_argument("--max_batch_size", default=512, type=int)
+    parser.add_argument("--quantize", action="store_true")
+    args = parser.parse_args()
+
+    if args.source == "tu":
+        graphs = tu_dataset_graphs(args.source_path, args.dataset_name)
+    elif args.source == "pickle":
+        graphs = pickled_dataset_graphs(args.source_path, args.pickle_split)
+    else:
+        graphs = edge_list_dir_graphs(args.source_path)
+
+    rgae = RGAE(args.hparams_path, args.checkpoint_path, quantize=args.quantize)
+    exporter = EmbeddingExporter(
+        rgae,
+        args.output_dir,
+        dtype=args.dtype,
+        chunk_size=args.chunk_size,
+        max_batch_bytes=args.max_batch_bytes,
+        max_batch_size=args.max_batch_size,
+    )
+    num_graphs = exporter.export(graphs)
+    print(f"Exported the embeddings of {num_graphs} graphs to {args.output_dir}")
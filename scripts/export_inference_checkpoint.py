@@ -0,0 +1,39 @@
+import argparse
+
+from rga.models.utils.inference_checkpoint import (
+    MODEL_CLASSES,
+    PARTS,
+    export_inference_checkpoint,
+)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Writes an inference-only checkpoint of a trained model, loaded with "
+        "`RGAE.from_inference_checkpoint`, without the optimizer and metric states."
+    )
+    parser.add_argument("--hparams_path", required=True, type=str)
+    parser.add_argument("--checkpoint_path", required=True, type=str)
+    parser.add_argument("--output_dir", required=True, type=str)
+    parser.add_argument(
+        "--parts",
+        nargs="+",
+        default=list(PARTS),
+        choices=PARTS,
+        help="the parts of the model to export",
+    )
+    parser.add_argument(
+        "--model_class",
+        default="RecursiveGraphAutoencoder",
+        choices=list(MODEL_CLASSES),
+        help="the variant of the autoencoder the checkpoint was trained as",
+    )
+    args = parser.parse_args()
+
+    export_inference_checkpoint(
+        args.hparams_path,
+        args.checkpoint_path,
+        args.output_dir,
+        args.parts,
+        MODEL_CLASSES[args.model_class],
+    )
+    print(f"Exported the {' and '.join(args.parts)} to {args.output_dir}")
@@ -1,16 +1,60 @@
 import argparse
-import pickle
+from typing import Dict, Iterator, List, Tuple
+
 import pytorch_lightning as pl
+import torch
+from torch import Tensor
 
-from rga.data.diag_repr_graph_data_module import DiagonalRepresentationGraphDataModule
+from rga.data.util.size_bucketed_loader import (
+    SizeBucketedGraphLoader,
+    load_pickled_test_graphs,
+)
 from rga.models.utils.load import load_hparams, load_model
 from rga.models.autoencoder_base import RecursiveGraphAutoencoder
+from rga.models.utils.precision import set_bf16_autocast
 from rga.util import adjmatrix
 from rga.util.generate_graphs import *
-from rga.metrics.adjency_matrices_metrics import calculate_metrics
+from rga.util.chunked_pickle import ChunkedPickleReader, ChunkedPickleWriter
+from rga.metrics.adjency_matrices_metrics import calculate_metrics_from_chunks
+
+# the `item_format` of the files saved by `GraphGenerator`: (graph index, prediction, target) records in the
+# order of the size buckets, read by `evaluate_generated_graphs`, not by `scripts.evaluate_matrices_on_datasets`
+GENERATED_GRAPH_RECORDS_FORMAT = "generated_graph_records"
+
+
+def evaluation_chunk(records: List[Tuple]) -> Tuple[List[Tensor], List[Tensor]]:
+    """
+    Returns the diagonal representations of the targets and the predictions of the records of `GraphGenerator`.
+    """
+    targets, predictions = [], []
+    for _, prediction, target in records:
+        if isinstance(prediction, tuple):
+            prediction = adjmatrix.edge_list_to_diagonal_representation(*prediction)
+            target = adjmatrix.edge_list_to_diagonal_representation(*target)
+        targets.append(target)
+        predictions.append(prediction)
+    return targets, predictions
+
+
+def evaluate_generated_graphs(path: str) -> Dict[str, float]:
+    """
+    Evaluates the records saved by `GraphGenerator` one chunk at a time.
+    """
+    with ChunkedPickleReader(path, GENERATED_GRAPH_RECORDS_FORMAT) as reader:
+        return calculate_metrics_from_chunks(map(evaluation_chunk, reader))
 
 
 class GraphGenerator:
+    """
+    Reconstructs the test graphs of a pickled dataset with a trained model and evaluates the reconstructions.
+
+    The model is run directly, without a Trainer nor a data module preparing the whole dataset: the test graphs
+    are prepared, reconstructed and post-processed one size-bucketed batch at a time, and the resulting
+    (graph index, prediction, target) records are streamed to the output file and to the evaluation.
+    The predictions and targets are diagonal representations, or with `sparse_output` (edges of the lower
+    triangle, number of nodes) pairs.
+    """
+
     def run(
         self,
         checkpoint_path: str,
@@ -18,6 +62,9 @@ class GraphGenerator:
         output_graphs_path: str = None,
         gpu: int = None,
         evaluate: bool = True,
+        bf16_autocast: bool = False,
+        sparse_output: bool = False,
+        batch_size: int = None,
         **kwargs,
     ):
         pl.seed_everything(0)
@@ -25,42 +72,93 @@ class GraphGenerator:
         hparams_path = checkpoint_path.removesuffix(".ckpt") + "_hparams.yaml"
         hparams = load_hparams(hparams_path)
         model = load_model(hparams_path, checkpoint_path, RecursiveGraphAutoencoder)
+        set_bf16_autocast(model, bf16_autocast)
+        device = (
+            torch.device(f"cuda:{gpu}")
+            if gpu not in ["none", "None", None]
+            else torch.device("cpu")
+        )
+        model.to(device).eval()
 
         print("Model loaded.")
-        # model.summarize()
-        # pl.utilities.model_summary.summarize(model)
-
-        hparams["pickled_dataset_path"] = dataset_pickle_path
-        data_module = DiagonalRepresentationGraphDataModule(**hparams)
 
-        gpus = [gpu] if gpu not in ["none", "None", None] else None
-        predictor = pl.Trainer(gpus=gpus)
-        model_output = predictor.predict(
-            model, dataloaders=data_module.test_dataloader()
+        if batch_size is None:
+            batch_size = hparams.get("batch_size_test", -1)
+            if batch_size <= 0:
+                batch_size = hparams["batch_size"]
+        loader = SizeBucketedGraphLoader(
+            load_pickled_test_graphs(dataset_pickle_path),
+            block_size=hparams["block_size"],
+            batch_size=batch_size,
+            bfs=hparams.get("bfs", False),
+            max_bandwidth=hparams.get("max_bandwidth") or 0,
         )
-        diag_block_predictions = convert_model_output_to_diag_block(model_output)
-
-        predictions = diag_block_graphs_to_tril_adj_matrices(diag_block_predictions)
-        test_dataset = data_module.test_datasets[0]
-        targets = diag_block_graphs_to_tril_adj_matrices(test_dataset)
-
-        for i, g in enumerate(predictions):
-            predictions[i] = adjmatrix.adj_matrix_to_diagonal_representation(
-                g[..., None], diag_block_predictions[i][2]
-            )[..., 0]
-        for i, g in enumerate(targets):
-            targets[i] = adjmatrix.adj_matrix_to_diagonal_representation(
-                g[..., None], test_dataset[i][2]
-            )[..., 0]
 
+        batches = self.generate(model, loader, device, sparse_output)
         if output_graphs_path is not None:
-            with open(output_graphs_path, "wb") as output:
-                pickle.dump((predictions, targets), output)
+            batches = self.save_stream(batches, output_graphs_path)
 
         if evaluate:
-            return calculate_metrics(targets, predictions)
+            return calculate_metrics_from_chunks(map(evaluation_chunk, batches))
+        for _ in batches:
+            pass
         return None
 
+    def generate(
+        self,
+        model: RecursiveGraphAutoencoder,
+        loader: SizeBucketedGraphLoader,
+        device: torch.device,
+        sparse_output: bool = False,
+    ) -> Iterator[List[Tuple]]:
+        """
+        Yields the (graph index, prediction, target) records of each batch of the loader, as soon as it's reconstructed.
+        """
+        for indices, adj_matrices, batch in loader:
+            with torch.inference_mode():
+                model_output = model(tuple(t.to(device) for t in batch))
+            diag_block_predictions = convert_model_output_to_diag_block([model_output])
+
+            if sparse_output:
+                predictions = [
+                    (edges.cpu(), num_nodes)
+                    for edges, num_nodes in diag_block_graphs_to_edge_lists(
+                        diag_block_predictions
+                    )
+                ]
+                targets = [
+                    (torch.tril(m[..., 0], -1).nonzero(), m.shape[0])
+                    for m in adj_matrices
+                ]
+            else:
+                predictions = [
+                    p.cpu()
+                    for p in diag_block_graphs_to_diagonal_representations(
+                        diag_block_predictions
+                    )
+                ]
+                targets = [
+                    adjmatrix.adj_matrix_to_diagonal_representation(
+                        m.clone(), m.shape[0]
+                    )[..., 0].int()
+                    for m in adj_matrices
+                ]
+            yield list(zip(indices, predictions, targets))
+
+    def save_stream(
+        self, batches: Iterator[List[Tuple]], output_graphs_path: str
+    ) -> Iterator[List[Tuple]]:
+        """
+        Writes the records of the batches to a chunked pickle file of `GENERATED_GRAPH_RECORDS_FORMAT`
+        while passing the batches on. The file is evaluated by `evaluate_generated_graphs`.
+        """
+        with ChunkedPickleWriter(
+            output_graphs_path, GENERATED_GRAPH_RECORDS_FORMAT
+        ) as writer:
+            for batch in batches:
+                writer.write_all(batch)
+                yield batch
+
     def add_argparse_arguments(
         self, parser: argparse.ArgumentParser
     ) -> argparse.ArgumentParser:
@@ -69,6 +167,18 @@ class GraphGenerator:
         parser.add_argument("--output_graphs_path", type=str, default=None)
         parser.add_argument("--gpu", type=int, default=None)
         parser.add_argument("--evaluate", type=bool, default=True)
+        parser.add_argument("--bf16_autocast", action="store_true")
+        parser.add_argument(
+            "--batch_size",
+            type=int,
+            default=None,
+            help="Number of graphs reconstructed at once, the test batch size of the model by default",
+        )
+        parser.add_argument(
+            "--sparse_output",
+            action="store_true",
+            help="Save the graphs as edge lists instead of dense diagonal representations",
+        )
         return parser
 
 
@@ -81,4 +191,4 @@ if __name__ == "__main__":
 
     metrics = generator.run(**vars(args))
     for k, v in metrics.items():
-        print(f"{k}:{v.item():.4f}")
+        print(f"{k}:{v:.4f}")
@@ -0,0 +1,113 @@
+import argparse
+import io
+import time
+from typing import List
+
+import numpy as np
+import pandas as pd
+import torch
+
+from rga import util
+from rga.data.util.pickled_data import load_pickled_data
+from rga.metrics.adjency_matrices_metrics import calculate_metrics
+from rga.models.rgae import RGAE
+from .evaluate_matrices_on_datasets import to_diagonal_representation_pair
+
+
+def serialized_size(model: torch.nn.Module) -> int:
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.getbuffer().nbytes
+
+
+def load_test_graphs(dataset_pickle_path: str, num_graphs: int) -> List[torch.Tensor]:
+    _, _, graphs = load_pickled_data(dataset_pickle_path, False)
+    if isinstance(graphs, list):
+        graphs = graphs[0]
+    return [to_dense_tensor(g) for g in graphs[:num_graphs]]
+
+
+def to_dense_tensor(g) -> torch.Tensor:
+    if isinstance(g, (np.ndarray, np.generic)):
+        g = torch.from_numpy(g)
+    return util.to_dense_if_not(g).float()
+
+
+def run_model(rgae: RGAE, graphs: List[torch.Tensor], batch_size: int):
+    """
+    Returns the embeddings and reconstructions of the graphs and the latencies of the batches.
+    """
+    embeddings, reconstructions, latencies = [], [], []
+    with torch.no_grad():
+        for start in range(0, len(graphs), batch_size):
+            batch = graphs[start : start + batch_size]
+            start_time = time.perf_counter()
+            batch_embeddings = rgae.encode(batch)
+            reconstructions.extend(rgae.decode(batch_embeddings))
+            latencies.append(time.perf_counter() - start_time)
+            embeddings.append(batch_embeddings)
+    return torch.cat(embeddings), reconstructions, latencies
+
+
+def reconstruction_metrics(graphs, reconstructions) -> dict:
+    targets, predictions = zip(
+        *[
+            to_diagonal_representation_pair(t, p)
+            for t, p in zip(graphs, reconstructions)
+        ]
+    )
+    return calculate_metrics(list(targets), list(predictions))
+
+
+def checkpoint_report(
+    checkpoint_path: str, graphs: List[torch.Tensor], batch_size: int
+) -> pd.DataFrame:
+    hparams_path = checkpoint_path.removesuffix(".ckpt") + "_hparams.yaml"
+    report = {}
+    results = {}
+    for precision, quantize in [("fp32", False), ("int8", True)]:
+        rgae = RGAE(hparams_path, checkpoint_path, quantize=quantize)
+        # the first batch is a warm-up
+        run_model(rgae, graphs[:batch_size], batch_size)
+        embeddings, reconstructions, latencies = run_model(rgae, graphs, batch_size)
+        results[precision] = embeddings
+
+        report[precision] = {
+            "Model size [MB]": serialized_size(rgae.engine) / 2**20,
+            "Throughput [graphs/s]": len(graphs) / sum(latencies),
+            "Batch latency p50 [ms]": np.percentile(latencies, 50) * 1000,
+            "Batch latency p95 [ms]": np.percentile(latencies, 95) * 1000,
+            **reconstruction_metrics(graphs, reconstructions),
+        }
+
+    cosine_similarities = torch.nn.functional.cosine_similarity(
+        results["fp32"], results["int8"]
+    )
+    report["int8"][
+        "Embedding cosine similarity mean"
+    ] = cosine_similarities.mean().item()
+    report["int8"]["Embedding cosine similarity min"] = cosine_similarities.min().item()
+
+    df = pd.DataFrame(report)
+    df["difference"] = df["int8"] - df["fp32"]
+    return df.round(4)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compares the dynamic int8 quantized models with their fp32 originals; as the quantization of "
+        "the activations is dynamic, no calibration data is needed and this report serves as the accuracy check."
+    )
+    parser.add_argument("--checkpoint_paths", type=str, nargs="+", required=True)
+    parser.add_argument("--dataset_pickle_path", type=str, required=True)
+    parser.add_argument("--batch_size", type=int, default=32)
+    parser.add_argument("--num_graphs", type=int, default=1024)
+    args = parser.parse_args()
+
+    graphs = load_test_graphs(args.dataset_pickle_path, args.num_graphs)
+    reports = {
+        checkpoint_path: checkpoint_report(checkpoint_path, graphs, args.batch_size)
+        for checkpoint_path in args.checkpoint_paths
+    }
+    with pd.option_context("display.max_rows", None, "display.max_columns", None):
+        print(pd.concat(reports, axis=1))
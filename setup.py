@@ -3,7 +3,7 @@ from setuptools import setup, find_packages
 setup(
     name="rga",
     version="1.0.0",
-    python_requires=">3.7",
+    python_requires=">=3.9",
     author_email="adam.malkowski@billennium.com",
     description="R-GAE: Graph autoencoder based on recursive neural networks",
     packages=find_packages(),
@@ -14,7 +14,7 @@ setup(
         "matplotlib==3.4.3",
         "scipy==1.7.1",
         "networkx==2.6.2",
-        "torch==1.9.0",
+        "torch==2.1.0",
         "numpy==1.21.2",
         "pytorch_lightning==1.5.6",
         "setuptools==59.5.0"
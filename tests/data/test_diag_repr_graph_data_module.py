@@ -0,0 +1,48 @@
+import pickle
+
+import networkx as nx
+
+from rga.data.diag_repr_graph_data_module import DiagonalRepresentationGraphDataModule
+
+
+def test_graphs_over_max_bandwidth_are_dropped_only_from_training(tmp_path, capsys):
+    # the larger path is within two block diagonals, the smaller one within one,
+    # the cycle connects its first and last nodes
+    graphs = [
+        nx.to_numpy_array(nx.path_graph(8)),
+        nx.to_numpy_array(nx.cycle_graph(8)),
+        nx.to_numpy_array(nx.path_graph(5)),
+    ]
+    dataset_path = tmp_path / "dataset.pkl"
+    with open(dataset_path, "wb") as f:
+        pickle.dump((graphs, [graphs], [graphs[1:]], None, None, None), f)
+
+    data_module = DiagonalRepresentationGraphDataModule(
+        block_size=2,
+        max_bandwidth=2,
+        pickled_dataset_path=str(dataset_path),
+        batch_size=3,
+        batch_size_val=0,
+        batch_size_test=0,
+        workers=0,
+    )
+
+    assert [example[2:] for example in data_module.train_dataset] == [(8, 2), (5, 1)]
+    assert [example[2:] for example in data_module.val_datasets[0]] == [
+        (8, 2),
+        (8, 2),
+        (5, 1),
+    ]
+    assert [example[2:] for example in data_module.test_datasets[0]] == [
+        (8, 2),
+        (5, 1),
+    ]
+    output = capsys.readouterr().out
+    assert "Dropped 1 of 3 graphs of dataset train" in output
+    assert "Truncated 1 of 3 graphs of dataset val 0" in output
+    assert "Truncated 1 of 2 graphs of dataset test 0" in output
+
+    graphs, masks, num_nodes, num_diagonals = next(iter(data_module.train_dataloader()))
+    # 4 + 3 blocks of the two diagonals of the larger graph, 2 blocks of the single one of the smaller one
+    assert graphs.shape[1] == masks.shape[1] == 7 and num_nodes.tolist() == [8, 5]
+    assert num_diagonals.tolist() == [2, 1] and (masks[1, 2:] == 0).all()
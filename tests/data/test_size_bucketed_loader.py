@@ -0,0 +1,43 @@
+import numpy as np
+import torch
+
+from rga.data.util.size_bucketed_loader import (
+    SizeBucketedGraphLoader,
+    size_bucketed_batches,
+)
+from rga.util import adjmatrix
+
+
+def random_graphs(graph_sizes, seed=0):
+    rng = np.random.default_rng(seed)
+    graphs = []
+    for num_nodes in graph_sizes:
+        graph = np.tril(rng.random((num_nodes, num_nodes)) < 0.3, -1).astype(float)
+        graphs.append(graph + graph.T)
+    return graphs
+
+
+def test_size_bucketed_batches():
+    assert size_bucketed_batches([5, 3, 8, 3, 6], 2) == [[1, 3], [0, 4], [2]]
+
+
+def test_size_bucketed_graph_loader():
+    graph_sizes = [7, 4, 12, 9, 4, 10]
+    graphs = random_graphs(graph_sizes)
+    loader = SizeBucketedGraphLoader(graphs, block_size=3, batch_size=4)
+
+    batches = list(loader)
+
+    assert len(batches) == len(loader) == 2
+    assert sorted(i for indices, _, _ in batches for i in indices) == list(range(6))
+    for indices, adj_matrices, (diag_graphs, masks, num_nodes) in batches:
+        assert num_nodes.tolist() == [graph_sizes[i] for i in indices]
+        for i, adj_matrix, diag_graph in zip(indices, adj_matrices, diag_graphs):
+            # the adjacency matrices are left unchanged by the conversion
+            assert torch.equal(
+                adj_matrix[..., 0], torch.tensor(np.tril(graphs[i])).float()
+            )
+            expected = adjmatrix.adj_matrix_to_diagonal_block_representation(
+                adj_matrix.clone(), graph_sizes[i], 3, pad_value=-1
+            )
+            assert torch.equal(diag_graph[: len(expected)], expected)
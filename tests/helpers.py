@@ -0,0 +1,153 @@
+"""
+Factories of the models and batches shared by the tests.
+"""
+
+import argparse
+
+import pytorch_lightning as pl
+import torch
+import yaml
+
+from rga.models.autoencoder_base import RecursiveGraphAutoencoder
+from rga.util.adjmatrix.diagonal_block_representation import (
+    adj_matrix_to_diagonal_block_representation,
+    calculate_bandwidth_in_blocks,
+)
+
+
+def create_model(model_class=RecursiveGraphAutoencoder, **kwargs):
+    parser = model_class.add_model_specific_args(argparse.ArgumentParser())
+    args = vars(parser.parse_args([]))
+    args.update(
+        loss_function="BCEWithLogits",
+        mask_loss_function="BCEWithLogits",
+        embedding_size=16,
+        encoder_hidden_layer_sizes=[32],
+        decoder_hidden_layer_sizes=[32],
+        metrics=[],
+    )
+    args.update(kwargs)
+    return model_class(**args)
+
+
+def create_batch(graph_sizes, block_size):
+    generator = torch.Generator().manual_seed(0)
+    graphs, masks = [], []
+    for num_nodes in graph_sizes:
+        adj_matrix = torch.rand((num_nodes, num_nodes), generator=generator) < 0.3
+        adj_matrix = torch.tril(adj_matrix.float(), -1)[:, :, None]
+        graphs.append(
+            adj_matrix_to_diagonal_block_representation(
+                adj_matrix, num_nodes, block_size, pad_value=-1
+            )
+        )
+        mask = torch.tril(torch.ones((num_nodes, num_nodes)), diagonal=-1)[:, :, None]
+        masks.append(
+            adj_matrix_to_diagonal_block_representation(mask, num_nodes, block_size)
+        )
+    return (
+        torch.nn.utils.rnn.pad_sequence(graphs, batch_first=True),
+        torch.nn.utils.rnn.pad_sequence(masks, batch_first=True),
+        torch.tensor(graph_sizes),
+    )
+
+
+def create_banded_batch(
+    graph_sizes, block_size, num_diagonals, max_parent_distance=None
+):
+    """
+    Random graphs with the edges only in the block diagonals close to the main one, each parent at most
+    `max_parent_distance` nodes, `block_size` by default, before its child. With `num_diagonals`, the graphs are
+    represented with their own bandwidths capped by it, which are appended to the batch as by the data module.
+    """
+    generator = torch.Generator().manual_seed(0)
+    graphs, masks, graph_num_diagonals = [], [], []
+    for num_nodes in graph_sizes:
+        adj_matrix = torch.zeros((num_nodes, num_nodes, 1))
+        for node in range(1, num_nodes):
+            parent = (
+                node
+                - 1
+                - torch.randint(
+                    min(node, max_parent_distance or block_size),
+                    (1,),
+                    generator=generator,
+                )
+            )
+            adj_matrix[node, parent] = 1.0
+        if num_diagonals is not None:
+            graph_num_diagonals.append(
+                min(
+                    calculate_bandwidth_in_blocks(adj_matrix, num_nodes, block_size),
+                    num_diagonals,
+                )
+            )
+        graphs.append(
+            adj_matrix_to_diagonal_block_representation(
+                adj_matrix,
+                num_nodes,
+                block_size,
+                pad_value=-1,
+                num_diagonals=graph_num_diagonals[-1] if graph_num_diagonals else None,
+            )
+        )
+        mask = torch.tril(torch.ones((num_nodes, num_nodes)), diagonal=-1)[:, :, None]
+        masks.append(
+            adj_matrix_to_diagonal_block_representation(
+                mask,
+                num_nodes,
+                block_size,
+                num_diagonals=graph_num_diagonals[-1] if graph_num_diagonals else None,
+            )
+        )
+    batch = (
+        torch.nn.utils.rnn.pad_sequence(graphs, batch_first=True),
+        torch.nn.utils.rnn.pad_sequence(masks, batch_first=True),
+        torch.tensor(graph_sizes),
+    )
+    if num_diagonals is not None:
+        return (*batch, torch.tensor(graph_num_diagonals))
+    return batch
+
+
+def create_rgae_files(tmp_path, model_class=RecursiveGraphAutoencoder, **kwargs):
+    """
+    Saves a randomly initialized RecursiveGraphAutoencoder, or `model_class`, as the hyperparameters and
+    checkpoint files loaded by `RGAE`.
+    """
+    parser = model_class.add_model_specific_args(argparse.ArgumentParser())
+    args = vars(parser.parse_args([]))
+    args.update(
+        loss_function="BCEWithLogits",
+        mask_loss_function="BCEWithLogits",
+        embedding_size=16,
+        encoder_hidden_layer_sizes=[32],
+        decoder_hidden_layer_sizes=[32],
+        metrics=[],
+        block_size=3,
+    )
+    args.update(kwargs)
+    model = model_class(**args)
+    path_hparams, path_ckpt = tmp_path / "hparams.yaml", tmp_path / "model.ckpt"
+    with open(path_hparams, "w") as f:
+        yaml.safe_dump(args, f)
+    torch.save(
+        {
+            "state_dict": model.state_dict(),
+            "pytorch-lightning_version": pl.__version__,
+        },
+        path_ckpt,
+    )
+    return str(path_hparams), str(path_ckpt)
+
+
+def random_adj_matrices(graph_sizes, seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    adj_matrices = []
+    for num_nodes in graph_sizes:
+        adj_matrix = torch.tril(
+            (torch.rand((num_nodes, num_nodes), generator=generator) < 0.3).float(),
+            -1,
+        )
+        adj_matrices.append(adj_matrix + adj_matrix.T)
+    return adj_matrices
@@ -0,0 +1,72 @@
+import pytest
+
+import torch
+from rga.metrics.adjency_matrices_metrics import (
+    calculate_metrics,
+    calculate_metrics_from_chunks,
+    confusion_counts,
+)
+
+
+@pytest.mark.parametrize(
+    "target,predicted,expected",
+    [
+        ([[1, 0, 1]], [[1, 1, 0]], [[[0, 1], [1, 1]]]),
+        # a shorter prediction is padded with non-existing edges
+        ([[1, 0, 1, 1, 0, 1]], [[1, 0, 0]], [[[2, 0], [3, 1]]]),
+        # a longer one is compared against a padded target
+        ([[1]], [[1, 1, 1]], [[[0, 2], [0, 1]]]),
+        (
+            [[0, 1, 1], [1]],
+            [[0, 1, 0], [0]],
+            [[[1, 0], [1, 1]], [[0, 0], [1, 0]]],
+        ),
+    ],
+)
+def test_confusion_counts(target, predicted, expected):
+    target = [torch.tensor(t) for t in target]
+    predicted = [torch.tensor(p) for p in predicted]
+    assert confusion_counts(target, predicted).tolist() == expected
+
+
+def test_calculate_metrics_weighting():
+    # graphs of 3 and 2 nodes, that is of 2 and 1 diagonals
+    target = [torch.tensor([1, 0, 1]), torch.tensor([1])]
+    predicted = [torch.tensor([1, 1, 1]), torch.tensor([0])]
+    metrics = calculate_metrics(target, predicted)
+
+    assert metrics["Precision_w0"] == pytest.approx((2 / 3 + 0) / 2)
+    assert metrics["Precision_w1"] == pytest.approx((2 / 3 * 2 + 0) / 3)
+    assert metrics["Recall_w2"] == pytest.approx((1 * 4 + 0) / 5)
+    assert metrics["Accuracy_w1"] == pytest.approx((2 / 3 * 2 + 0) / 3)
+    assert metrics["F1_w0"] == pytest.approx(2 / (3 + 2))
+    assert metrics["Size accuracy"] == pytest.approx(1.0)
+
+
+def test_multidimensional_graphs():
+    target = [torch.tensor([[1, 0], [1, 1], [0, 0]]), torch.ones(6, 2)]
+    predicted = [torch.tensor([[1, 1], [0, 1]]), torch.ones(6, 2)]
+
+    assert confusion_counts(target, predicted).tolist() == [
+        [[2, 1], [1, 2]],
+        [[0, 0], [0, 12]],
+    ]
+    metrics = calculate_metrics(target, predicted)
+    assert metrics["Precision_w0"] == pytest.approx((2 / 3 + 1) / 2)
+    assert metrics["Size accuracy"] == pytest.approx(0.5)
+
+
+def test_calculate_metrics_from_chunks():
+    generator = torch.Generator().manual_seed(0)
+    target = [
+        torch.randint(2, (n * (n - 1) // 2,), generator=generator) for n in range(2, 9)
+    ]
+    predicted = [
+        torch.randint(2, ((n - n % 2) * (n - n % 2 - 1) // 2,), generator=generator)
+        for n in range(2, 9)
+    ]
+    chunks = [(target[i : i + 3], predicted[i : i + 3]) for i in range(0, 7, 3)]
+
+    assert calculate_metrics_from_chunks(chunks) == pytest.approx(
+        calculate_metrics(target, predicted)
+    )
@@ -0,0 +1,21 @@
+from rga.metrics.graph_drawer import GraphDrawer
+
+
+class CircularGraphDrawer(GraphDrawer):
+    layout = "circular"
+    max_rendered_nodes = 100
+
+
+def test_renderers_are_shared_by_rendering_settings(monkeypatch):
+    monkeypatch.setattr(GraphDrawer, "_renderers", {})
+
+    renderer = GraphDrawer.get_renderer()
+    circular_renderer = CircularGraphDrawer.get_renderer()
+
+    assert GraphDrawer.get_renderer() is renderer
+    assert CircularGraphDrawer.get_renderer() is circular_renderer
+    assert (renderer.layout, renderer.max_num_nodes) == ("spring", None)
+    assert (circular_renderer.layout, circular_renderer.max_num_nodes) == (
+        "circular",
+        100,
+    )
@@ -0,0 +1,124 @@
+import pytest
+
+import torch
+from rga.metrics.precision_recall import (
+    EdgePrecision,
+    EdgeRecall,
+    EdgeAccuracyNonWeighted,
+    EdgeF1,
+    EdgeMetric,
+    EdgePrecisionSquareWeighted,
+    calc_edge_confusion,
+)
+from rga.util.adjmatrix.diagonal_block_representation import calculate_num_blocks
+
+
+def random_block_batch(num_nodes, block_size, seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    num_blocks = calculate_num_blocks(num_nodes, block_size)
+    # with a block size of 1 the graphs are classified by their number of nodes
+    size_classes = num_blocks if block_size != 1 else num_nodes
+    max_blocks = int(num_blocks.max())
+    num_block_cells = int((max_blocks + 1) * max_blocks / 2)
+    shape = (len(num_nodes), num_block_cells, block_size, block_size, 1)
+    target = torch.randint(0, 2, shape, generator=generator).float()
+    predicted = torch.randn(shape, generator=generator)
+    for i, graph_blocks in enumerate(num_blocks.tolist()):
+        graph_cells = int((graph_blocks + 1) * graph_blocks / 2)
+        target[i, graph_cells:] = -1
+        predicted[i, graph_cells:] = float("-inf")
+    return predicted, target, size_classes
+
+
+def brute_force_metric(predicted, target, num_blocks, fn, weight_power):
+    predicted = torch.sigmoid(predicted).round().int()
+    target = target.clamp(min=0).int()
+    values, weights = [], []
+    for size in num_blocks.unique().tolist():
+        size_mask = num_blocks == size
+        p = predicted[size_mask].flatten()
+        t = target[size_mask].flatten()
+        values.append(fn(p, t))
+        weights.append(pow(size, 2 - weight_power) * size_mask.sum().item())
+    values, weights = torch.tensor(values), torch.tensor(weights).double()
+    return (values * weights).sum() / weights.sum()
+
+
+def precision(p, t):
+    positives = (p == 1).sum().item()
+    return ((p == 1) & (t == 1)).sum().item() / positives if positives else 0.0
+
+
+def recall(p, t):
+    positives = (t == 1).sum().item()
+    return ((p == 1) & (t == 1)).sum().item() / positives if positives else 0.0
+
+
+def accuracy(p, t):
+    return (p == t).float().mean().item()
+
+
+@pytest.mark.parametrize(
+    "num_nodes,block_size",
+    [
+        ([2, 5, 5, 9], 1),
+        ([3, 7, 12, 12, 4], 2),
+        ([20, 9, 33], 4),
+    ],
+)
+def test_edge_metrics_match_per_size_brute_force(num_nodes, block_size):
+    num_nodes = torch.tensor(num_nodes)
+    metrics = {
+        (EdgePrecision(), precision, 1),
+        (EdgeRecall(), recall, 1),
+        (EdgeAccuracyNonWeighted(), accuracy, 0),
+        (EdgePrecisionSquareWeighted(), precision, 2),
+    }
+    batches = [random_block_batch(num_nodes, block_size, seed) for seed in range(2)]
+    for metric, fn, weight_power in metrics:
+        for predicted, target, _ in batches:
+            metric.update(
+                edges_predicted=predicted, edges_target=target, num_nodes=num_nodes
+            )
+        predicted = torch.cat([b[0] for b in batches])
+        target = torch.cat([b[1] for b in batches])
+        num_blocks = torch.cat([b[2] for b in batches])
+        expected = brute_force_metric(predicted, target, num_blocks, fn, weight_power)
+        assert torch.isclose(metric.compute().double(), expected, atol=1e-6)
+
+
+def test_edge_f1_from_weighted_precision_and_recall():
+    num_nodes = torch.tensor([4, 9, 9, 16])
+    predicted, target, _ = random_block_batch(num_nodes, 2)
+    metrics = [EdgePrecision(), EdgeRecall(), EdgeF1()]
+    for metric in metrics:
+        metric.update(
+            edges_predicted=predicted, edges_target=target, num_nodes=num_nodes
+        )
+    precision_value, recall_value, f1_value = [m.compute() for m in metrics]
+    expected = 2 * precision_value * recall_value / (precision_value + recall_value)
+    assert torch.isclose(f1_value, expected)
+
+
+def test_edge_confusion_counts_every_graph_cell_once():
+    num_nodes = torch.tensor([5, 9, 3])
+    predicted, target, num_blocks = random_block_batch(num_nodes, 2)
+    confusion, graph_counts = calc_edge_confusion(predicted, target, num_nodes, 8)
+    assert confusion.sum() == target.numel()
+    assert graph_counts.tolist() == torch.bincount(num_blocks, minlength=8).tolist()
+
+
+def test_edge_metric_state_has_a_fixed_size():
+    num_nodes = torch.tensor([5, 9, 3])
+    predicted, target, _ = random_block_batch(num_nodes, 2)
+    metric = EdgePrecision(num_size_classes=8)
+    metric.update(edges_predicted=predicted, edges_target=target, num_nodes=num_nodes)
+    assert metric.confusion.shape == (8, 2, 2)
+
+    small_metric = EdgePrecision(num_size_classes=4)
+    with pytest.raises(ValueError):
+        small_metric.update(
+            edges_predicted=predicted, edges_target=target, num_nodes=num_nodes
+        )
+    with pytest.raises(TypeError):
+        EdgeMetric()
@@ -0,0 +1,142 @@
+import networkx as nx
+import pytest
+
+import torch
+from rga.models.rgae import RGAE
+from rga.util.adjmatrix.diagonal_block_representation import (
+    calculate_bandwidth_in_blocks,
+    calculate_num_blocks,
+    calculate_num_omitted_blocks,
+)
+from tests.helpers import (
+    create_banded_batch,
+    create_batch,
+    create_model,
+    create_rgae_files,
+)
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 3])
+def test_banded_recursion_without_truncation_matches_plain(block_size):
+    torch.manual_seed(0)
+    graph_sizes = [5, 9, 12, 3, 7]
+    model = create_model(block_size=block_size)
+    banded_model = create_model(block_size=block_size, max_bandwidth=12)
+    banded_model.load_state_dict(model.state_dict(), strict=False)
+    batch = create_batch(graph_sizes, block_size)
+
+    embeddings = model.encoder(batch)
+    assert torch.allclose(embeddings, banded_model.encoder(batch), atol=1e-6)
+
+    (edges, masks), _ = model.decoder(embeddings, max(batch[2]))
+    (banded_edges, banded_masks), _ = banded_model.decoder(
+        embeddings, max(batch[2]), batch[2]
+    )
+    num_blocks = calculate_num_blocks(batch[2], block_size)
+    for i, k in enumerate(num_blocks.tolist()):
+        num_graph_blocks = k * (k + 1) // 2
+        assert torch.isinf(banded_edges[i, num_graph_blocks:]).all()
+        num_compared_blocks = min(num_graph_blocks, edges.shape[1])
+        assert torch.allclose(
+            edges[i, :num_compared_blocks],
+            banded_edges[i, :num_compared_blocks],
+            atol=1e-6,
+        )
+        assert torch.allclose(
+            masks[i, :num_compared_blocks],
+            banded_masks[i, :num_compared_blocks],
+            atol=1e-6,
+        )
+
+
+@pytest.mark.parametrize("block_size", [1, 2])
+@pytest.mark.parametrize("max_bandwidth", [1, 2, 3])
+def test_banded_recursion_step(block_size, max_bandwidth):
+    torch.manual_seed(0)
+    graph_sizes = [5, 19, 12, 3, 27]
+    model = create_model(block_size=block_size, max_bandwidth=max_bandwidth)
+    batch = create_banded_batch(graph_sizes, block_size, max_bandwidth)
+
+    embeddings = model.encoder(batch)
+    (edges, masks), _ = model.decoder(embeddings, max(batch[2]), batch[2], batch[3])
+    num_blocks = calculate_num_blocks(batch[2], block_size)
+    num_graph_blocks = num_blocks * (
+        num_blocks + 1
+    ) // 2 - calculate_num_omitted_blocks(num_blocks, batch[3])
+    assert edges.shape[1] == batch[0].shape[1] == num_graph_blocks.max()
+    for i, num_blocks in enumerate(num_graph_blocks.tolist()):
+        assert torch.isfinite(edges[i, :num_blocks]).all()
+        assert torch.isinf(edges[i, num_blocks:]).all()
+
+    loss = model.step(batch)
+    loss.backward()
+    assert torch.isfinite(loss).all()
+    assert model.decoder.far_region_nn[0].weight.grad is not None
+
+
+def test_banded_recursion_with_own_bandwidths_matches_single_graphs():
+    torch.manual_seed(0)
+    block_size = 2
+    graph_sizes = [5, 19, 12, 3, 27, 9, 16]
+    model = create_model(block_size=block_size, max_bandwidth=3)
+    batch = create_banded_batch(
+        graph_sizes, block_size, 3, max_parent_distance=3 * block_size
+    )
+    # the graphs start and finish their recursions out of their size order
+    assert len(set(batch[3].tolist())) > 1
+
+    with torch.no_grad():
+        embeddings = model.encoder(batch)
+        (edges, masks), _ = model.decoder(embeddings, max(batch[2]), batch[2], batch[3])
+        for i in range(len(graph_sizes)):
+            graph_batch = tuple(t[i : i + 1] for t in batch)
+            graph_embedding = model.encoder(graph_batch)
+            assert torch.allclose(graph_embedding, embeddings[i : i + 1], atol=1e-6)
+            (graph_edges, graph_masks), _ = model.decoder(
+                graph_embedding, graph_batch[2][0], graph_batch[2], graph_batch[3]
+            )
+            num_graph_blocks = graph_edges.shape[1]
+            assert torch.allclose(
+                graph_edges[0], edges[i, :num_graph_blocks], atol=1e-6
+            )
+            assert torch.isinf(edges[i, num_graph_blocks:]).all()
+
+
+def test_rgae_keeps_own_bandwidths(tmp_path):
+    torch.manual_seed(0)
+    rgae = RGAE(*create_rgae_files(tmp_path, max_bandwidth=2))
+    adj_matrices = [
+        torch.tensor(nx.to_numpy_array(nx.path_graph(7))),
+        torch.tensor(nx.to_numpy_array(nx.cycle_graph(9))),
+    ]
+    # the path is within the main block diagonal, the cycle is truncated to the cap
+    num_diagonals = rgae.kept_diagonals(adj_matrices)
+    assert num_diagonals == [1, 2]
+
+    with torch.no_grad():
+        embeddings = rgae.encode(adj_matrices)
+    for adj_matrix, embedding in zip(adj_matrices, embeddings):
+        edges = torch.tril(adj_matrix, -1).nonzero().numpy()
+        assert torch.allclose(
+            rgae.encode_edge_list(edges, adj_matrix.shape[0]), embedding, atol=1e-6
+        )
+
+    with torch.no_grad():
+        graphs = rgae.decode(
+            embeddings * 3, num_nodes=[7, 9], num_diagonals=num_diagonals
+        )
+    assert [graph.shape[0] for graph in graphs] == [7, 9]
+    assert calculate_bandwidth_in_blocks(graphs[0][:, :, None], 7, 3) == 1
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        dict(recursion_checkpoint_every=2),
+        dict(sync_free_training=True),
+        dict(zero_cone_memoization=True),
+    ],
+)
+def test_banded_recursion_incompatible_args(kwargs):
+    with pytest.raises(ValueError):
+        create_model(max_bandwidth=2, **kwargs)
@@ -0,0 +1,41 @@
+import pytest
+
+import torch
+from rga.models.autoencoder_components import find_finished_masks
+from rga.models.utils.calc import weighted_average
+from tests.helpers import create_batch, create_model
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(torch, "autocast"), reason="bfloat16 autocast requires torch>=1.10"
+)
+
+
+def test_gates_and_mask_statistics_are_full_precision():
+    v1, v2, weight = torch.randn((3, 3, 4, 8)).bfloat16()
+    assert weighted_average(v1, v2, weight).dtype == torch.float32
+
+    masks = torch.rand((4, 3, 2, 2))
+    finished, mask_state = find_finished_masks(masks.bfloat16(), None)
+    assert mask_state.dtype == torch.float32
+    assert torch.equal(finished, find_finished_masks(masks.bfloat16().float(), None)[0])
+
+
+@pytest.mark.parametrize("block_size", [1, 3])
+def test_bf16_autocast_is_close_to_fp32(block_size):
+    torch.manual_seed(0)
+    model = create_model(block_size=block_size)
+    bf16_model = create_model(block_size=block_size, bf16_autocast=True)
+    bf16_model.load_state_dict(model.state_dict())
+    batch = create_batch([5, 9, 12, 3, 7], block_size)
+
+    (edges, masks), _ = model(batch)
+    (bf16_edges, bf16_masks), _ = bf16_model(batch)
+    assert bf16_edges.dtype == bf16_masks.dtype == torch.float32
+    assert bf16_edges.shape == edges.shape
+    finite = torch.isfinite(edges)
+    assert torch.allclose(bf16_edges[finite], edges[finite], atol=1e-2)
+
+    loss = bf16_model.step(batch)
+    assert loss.dtype == torch.float32
+    assert loss.item() == pytest.approx(model.step(batch).item(), rel=1e-2)
+    loss.backward()
@@ -0,0 +1,88 @@
+import pytest
+
+import torch
+from rga.models.utils.compiled import BucketedCompiledStep, bucket_size
+from tests.helpers import create_batch, create_model
+
+
+def test_bucket_size():
+    sizes = [bucket_size(size) for size in range(1, 200)]
+    assert all(size <= bucket for size, bucket in zip(range(1, 200), sizes))
+    assert all(bucket <= size * 1.125 for size, bucket in zip(range(1, 200), sizes))
+    assert len(set(sizes)) < 50
+
+
+@pytest.mark.parametrize("sync_free_training", [False, True])
+@pytest.mark.parametrize(
+    "graph_decoder_border_embedding_fill", ["separate_sides_nn", "single_nn", "pad"]
+)
+@pytest.mark.parametrize("block_size", [1, 2])
+def test_compiled_recursion_matches_eager(
+    sync_free_training, graph_decoder_border_embedding_fill, block_size
+):
+    torch.manual_seed(0)
+    model_args = dict(
+        block_size=block_size,
+        sync_free_training=sync_free_training,
+        graph_decoder_border_embedding_fill=graph_decoder_border_embedding_fill,
+    )
+    model = create_model(**model_args)
+    # the graphs captured by torch.compile are run as they are, skipping the slow code generation
+    compiled_model = create_model(
+        **model_args, compiled_recursion=True, compiled_recursion_backend="aot_eager"
+    )
+    compiled_model.load_state_dict(model.state_dict())
+    batch = create_batch([5, 9, 12, 3, 7], block_size)
+
+    with torch.no_grad():
+        (edges, masks), norm = model(batch)
+        (compiled_edges, compiled_masks), compiled_norm = compiled_model(batch)
+
+    assert compiled_model.encoder.compiled_edge_encoder.compiled_methods
+    assert compiled_model.decoder.compiled_edge_decoder.compiled_methods
+    assert not compiled_model.encoder.compiled_edge_encoder.compilation_failed
+    assert not compiled_model.decoder.compiled_edge_decoder.compilation_failed
+    assert torch.allclose(edges, compiled_edges, atol=1e-6)
+    assert torch.allclose(masks, compiled_masks, atol=1e-6)
+    assert torch.allclose(norm, compiled_norm)
+
+
+def test_compiled_step_is_bounded_and_falls_back_to_eager():
+    torch.manual_seed(0)
+    linear = torch.nn.Linear(4, 3)
+    step = BucketedCompiledStep(linear, backend="aot_eager", max_num_buckets=2)
+
+    with torch.no_grad():
+        for num_graphs, length in [(1, 3), (2, 3), (1, 2), (7, 9), (9, 20)]:
+            x = torch.randn(num_graphs, length, 4)
+            assert torch.allclose(step(x), linear(x), atol=1e-6)
+    assert len(step.compiled_methods) == 2
+
+    # the gradient calculation runs eagerly
+    x = torch.randn(2, 3, 4, requires_grad=True)
+    assert step(x).grad_fn is not None
+
+    failing_step = BucketedCompiledStep(linear, backend="no_such_backend")
+    with pytest.warns(UserWarning), torch.no_grad():
+        assert torch.allclose(failing_step(x), linear(x))
+    assert failing_step.compilation_failed
+
+
+def test_compiled_recursion_with_inductor():
+    torch.manual_seed(0)
+    model = create_model(block_size=2)
+    compiled_model = create_model(block_size=2, compiled_recursion=True)
+    compiled_model.load_state_dict(model.state_dict())
+    batch = create_batch([5, 6], 2)
+
+    with torch.no_grad():
+        embeddings = model.encoder(batch)
+        compiled_embeddings = compiled_model.encoder(batch)
+
+    assert not compiled_model.encoder.compiled_edge_encoder.compilation_failed
+    assert torch.allclose(embeddings, compiled_embeddings, atol=1e-5)
+
+
+def test_compiled_recursion_incompatible_with_bf16_autocast():
+    with pytest.raises(ValueError):
+        create_model(compiled_recursion=True, bf16_autocast=True)
@@ -0,0 +1,149 @@
+import argparse
+
+import pytest
+import torch
+import yaml
+
+from rga.metrics.losses import MeanDistillationLoss
+from rga.models.autoencoder_base import RecursiveGraphAutoencoder
+from rga.models.distilled_autoencoder import DistilledRecursiveGraphAutoencoder
+from rga.util import load_model
+from tests.helpers import create_batch, create_model
+
+
+def save_model(model, args, path):
+    checkpoint = {
+        "state_dict": model.state_dict(),
+        "pytorch-lightning_version": "1.5.6",
+        "epoch": 0,
+        "global_step": 0,
+    }
+    model.on_save_checkpoint(checkpoint)
+    torch.save(checkpoint, f"{path}.ckpt")
+    with open(f"{path}_hparams.yaml", "w") as f:
+        yaml.safe_dump(args, f)
+
+
+@pytest.fixture
+def teacher_path(tmp_path):
+    torch.manual_seed(0)
+    parser = RecursiveGraphAutoencoder.add_model_specific_args(
+        argparse.ArgumentParser()
+    )
+    args = vars(parser.parse_args([]))
+    args.update(
+        loss_function="BCEWithLogits",
+        mask_loss_function="BCEWithLogits",
+        embedding_size=32,
+        encoder_hidden_layer_sizes=[64],
+        decoder_hidden_layer_sizes=[64],
+        block_size=2,
+        metrics=[],
+    )
+    save_model(create_model(**args), args, tmp_path / "teacher")
+    return tmp_path / "teacher"
+
+
+def create_student(teacher_path, **kwargs):
+    parser = DistilledRecursiveGraphAutoencoder.add_model_specific_args(
+        argparse.ArgumentParser()
+    )
+    args = vars(
+        parser.parse_args(
+            [
+                f"--teacher_hparams_path={teacher_path}_hparams.yaml",
+                f"--teacher_checkpoint_path={teacher_path}.ckpt",
+            ]
+        )
+    )
+    args.update(
+        loss_function="BCEWithLogits",
+        mask_loss_function="BCEWithLogits",
+        embedding_size=8,
+        encoder_hidden_layer_sizes=[16],
+        decoder_hidden_layer_sizes=[16],
+        block_size=2,
+        teacher_cache_dir=str(teacher_path.parent / "cache"),
+        metrics=[],
+    )
+    args.update(kwargs)
+    return DistilledRecursiveGraphAutoencoder(**args), args
+
+
+@pytest.mark.parametrize("logits_distillation_weight", [0.0, 1.0])
+def test_teacher_outputs_are_cached(teacher_path, logits_distillation_weight):
+    batch = create_batch([5, 9, 12, 3, 7], 2)
+    student, _ = create_student(
+        teacher_path, logits_distillation_weight=logits_distillation_weight
+    )
+    metric = MeanDistillationLoss()
+    loss = student.step(batch, [metric])
+    loss.backward()
+    assert torch.isfinite(loss).all()
+    assert metric.compute() > 0
+    assert student.embedding_projection.weight.grad.abs().sum() > 0
+    assert student.teacher is not None
+    assert len(student.teacher_cache) == 5
+    assert student.teacher_cache.num_misses == 5
+    # the teacher is not a part of the student
+    assert not any(k.startswith("teacher") for k in student.state_dict())
+    student.on_train_epoch_end()
+
+    reloaded_student, _ = create_student(
+        teacher_path, logits_distillation_weight=logits_distillation_weight
+    )
+    reloaded_student.load_state_dict(student.state_dict())
+    assert reloaded_student.step(batch).item() == pytest.approx(loss.item())
+    assert reloaded_student.teacher is None
+    assert reloaded_student.teacher_cache.num_hits == 5
+
+
+def test_teacher_embeddings(teacher_path):
+    batch = create_batch([5, 9, 12, 3, 7], 2)
+    student, _ = create_student(teacher_path)
+    outputs = student.teacher_outputs(batch)
+    teacher = load_model.load_model(
+        f"{teacher_path}_hparams.yaml",
+        f"{teacher_path}.ckpt",
+        RecursiveGraphAutoencoder,
+    ).eval()
+    with torch.no_grad():
+        expected = teacher.encoder(batch)
+    assert torch.allclose(torch.stack([o["embedding"] for o in outputs]), expected)
+
+
+def test_block_size_must_match_teacher(teacher_path):
+    with pytest.raises(ValueError):
+        create_student(teacher_path, block_size=3)
+
+
+def test_student_loads_as_autoencoder(teacher_path):
+    student, args = create_student(teacher_path)
+    save_model(student, args, teacher_path.parent / "student")
+    model = load_model.load_model(
+        str(teacher_path.parent / "student_hparams.yaml"),
+        str(teacher_path.parent / "student.ckpt"),
+        RecursiveGraphAutoencoder,
+    )
+    assert type(model) is RecursiveGraphAutoencoder
+    assert torch.equal(
+        model.encoder.edge_encoder.nn[0].weight,
+        student.encoder.edge_encoder.nn[0].weight,
+    )
+
+
+def test_student_checkpoint_keeps_projection_for_resuming(teacher_path):
+    student, args = create_student(teacher_path)
+    save_model(student, args, teacher_path.parent / "student")
+    checkpoint = torch.load(teacher_path.parent / "student.ckpt")
+    assert not any(
+        k.startswith("embedding_projection") for k in checkpoint["state_dict"]
+    )
+
+    resumed_student, _ = create_student(teacher_path)
+    resumed_student.on_load_checkpoint(checkpoint)
+    resumed_student.load_state_dict(checkpoint["state_dict"])
+    assert torch.equal(
+        resumed_student.embedding_projection.weight,
+        student.embedding_projection.weight,
+    )
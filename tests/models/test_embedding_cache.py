@@ -0,0 +1,66 @@
+import torch
+
+from rga.models.rgae import RGAE
+from rga.models.utils.embedding_cache import EmbeddingCache, adj_matrix_key
+from tests.helpers import create_rgae_files, random_adj_matrices
+
+
+def test_lru_eviction_within_byte_bound():
+    cache = EmbeddingCache(max_bytes=3 * 16 * 4)
+    for i in range(3):
+        cache.put(str(i), torch.full((16,), float(i)))
+    assert cache.get("0") is not None
+    cache.put("3", torch.zeros(16))
+
+    assert cache.get("1") is None
+    assert cache.get("0") is not None and cache.get("3") is not None
+    assert cache.stats() == {
+        "entries": 3,
+        "bytes": 3 * 16 * 4,
+        "hits": 3,
+        "disk_hits": 0,
+        "misses": 1,
+        "evictions": 1,
+    }
+
+
+def test_disk_tier(tmp_path):
+    cache = EmbeddingCache(max_bytes=16 * 4, path=str(tmp_path))
+    cache.put("a", torch.ones(16))
+    cache.put("b", torch.zeros(16))
+    assert len(cache) == 1
+
+    assert torch.equal(cache.get("a"), torch.ones(16))
+    assert cache.num_disk_hits == 1
+    assert torch.equal(EmbeddingCache(path=str(tmp_path)).get("b"), torch.zeros(16))
+
+
+def test_adj_matrix_key_ignores_upper_triangle():
+    adj_matrix = random_adj_matrices([6])[0]
+    assert adj_matrix_key(adj_matrix) == adj_matrix_key(torch.tril(adj_matrix))
+    assert adj_matrix_key(adj_matrix) != adj_matrix_key(adj_matrix, "other model")
+    adj_matrix[5, 0] = 1 - adj_matrix[5, 0]
+    assert adj_matrix_key(adj_matrix) != adj_matrix_key(torch.tril(adj_matrix.T))
+
+
+def test_rgae_encode_with_cache(tmp_path):
+    torch.manual_seed(0)
+    path_hparams, path_ckpt = create_rgae_files(tmp_path)
+    rgae = RGAE(path_hparams, path_ckpt)
+    cache = EmbeddingCache()
+    cached_rgae = RGAE(path_hparams, path_ckpt, embedding_cache=cache)
+    adj_matrices = random_adj_matrices([5, 9, 12, 7])
+    expected = rgae.encode(adj_matrices).detach()
+
+    assert torch.allclose(cached_rgae.encode(adj_matrices[:2]), expected[:2], atol=1e-6)
+    encoded_graphs = []
+    encode_batch = cached_rgae.encode_batch
+    cached_rgae.encode_batch = lambda graphs: encoded_graphs.extend(
+        graphs
+    ) or encode_batch(graphs)
+
+    embeddings = cached_rgae.encode(adj_matrices + adj_matrices[3:])
+    assert torch.allclose(embeddings[:4], expected, atol=1e-6)
+    assert torch.equal(embeddings[4], embeddings[3])
+    assert len(encoded_graphs) == 2
+    assert cache.num_hits == 2 and cache.num_misses == 4
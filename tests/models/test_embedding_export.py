@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+import torch
+
+from rga.models.rgae import RGAE
+from rga.models.utils.embedding_export import (
+    EmbeddingExporter,
+    load_exported_embeddings,
+    tu_dataset_graphs,
+)
+from tests.helpers import create_rgae_files, random_adj_matrices
+
+
+def graph_records(adj_matrices):
+    return [
+        (str(i), np.stack(np.nonzero(adj_matrix.numpy()), axis=1), len(adj_matrix))
+        for i, adj_matrix in enumerate(adj_matrices)
+    ]
+
+
+def test_export_matches_encode(tmp_path):
+    torch.manual_seed(0)
+    rgae = RGAE(*create_rgae_files(tmp_path))
+    adj_matrices = random_adj_matrices([5, 30, 9, 12, 1, 7, 3])
+    expected = rgae.encode(adj_matrices[:4] + adj_matrices[5:]).detach().numpy()
+    expected = np.insert(expected, 4, 0.0, axis=0)
+
+    # the 30 nodes graph is encoded alone by streaming
+    exporter = EmbeddingExporter(
+        rgae, tmp_path / "export", chunk_size=3, max_batch_bytes=3 * 12 * 9 * 4
+    )
+    assert exporter.export(graph_records(adj_matrices)) == len(adj_matrices)
+
+    embeddings, ids = load_exported_embeddings(tmp_path / "export")
+    assert ids == [str(i) for i in range(len(adj_matrices))]
+    assert np.allclose(embeddings, expected, atol=1e-6)
+
+
+def test_export_resumes_after_interruption(tmp_path):
+    torch.manual_seed(0)
+    rgae = RGAE(*create_rgae_files(tmp_path))
+    records = graph_records(random_adj_matrices([5, 8, 9, 12, 4, 7, 3]))
+
+    def interrupted(records):
+        yield from records[:5]
+        raise KeyboardInterrupt
+
+    exporter = EmbeddingExporter(
+        rgae, tmp_path / "export", dtype="float16", chunk_size=2
+    )
+    with pytest.raises(KeyboardInterrupt):
+        exporter.export(interrupted(records))
+    embeddings, ids = load_exported_embeddings(tmp_path / "export")
+    assert len(embeddings) == len(ids) == 4
+
+    encoded_chunks = []
+    encode_chunk = exporter.encode_chunk
+    exporter.encode_chunk = lambda chunk: encoded_chunks.append(chunk) or encode_chunk(
+        chunk
+    )
+    exporter.export(records)
+    assert [graph_id for chunk in encoded_chunks for graph_id, _, _ in chunk] == [
+        "4",
+        "5",
+        "6",
+    ]
+
+    EmbeddingExporter(rgae, tmp_path / "clean_export", dtype="float16").export(records)
+    embeddings, ids = load_exported_embeddings(tmp_path / "export")
+    clean_embeddings, clean_ids = load_exported_embeddings(tmp_path / "clean_export")
+    assert embeddings.dtype == np.float16
+    assert ids == clean_ids
+    assert np.array_equal(embeddings, clean_embeddings)
+
+
+def test_tu_dataset_graphs(tmp_path):
+    dataset_dir = tmp_path / "TOY"
+    dataset_dir.mkdir()
+    # a triangle, an isolated node and a path of 2 nodes, the edges listed in both directions
+    edges = [(1, 2), (2, 1), (2, 3), (3, 2), (1, 3), (3, 1), (5, 6), (6, 5)]
+    np.savetxt(dataset_dir / "TOY_A.txt", edges, fmt="%d", delimiter=", ")
+    np.savetxt(dataset_dir / "TOY_graph_indicator.txt", [1, 1, 1, 2, 2, 2], fmt="%d")
+
+    graphs = list(tu_dataset_graphs(tmp_path, "TOY"))
+    assert [(graph_id, num_nodes) for graph_id, _, num_nodes in graphs] == [
+        ("1", 3),
+        ("2", 2),
+    ]
+    assert graphs[1][1].tolist() == [[0, 1], [1, 0]]
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from rga.models.utils.embedding_index import IVFPQIndex, exact_search, normalize
+
+
+def clustered_embeddings(num_embeddings, embedding_size=16, num_clusters=500, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(num_clusters, embedding_size))
+    embeddings = centers[rng.integers(num_clusters, size=num_embeddings)]
+    embeddings += 0.1 * rng.normal(size=embeddings.shape)
+    return embeddings.astype(np.float32)
+
+
+def recall(found_ids, true_ids):
+    return np.mean(
+        [len(np.intersect1d(f, t)) / len(t) for f, t in zip(found_ids, true_ids)]
+    )
+
+
+def test_exact_search():
+    embeddings = clustered_embeddings(1000)
+    queries = embeddings[:7] + 0.01
+
+    scores, ids = exact_search(embeddings, queries, k=5)
+
+    similarities = normalize(queries) @ normalize(embeddings).T
+    expected_ids = np.argsort(-similarities, axis=1)[:, :5]
+    assert np.array_equal(ids, expected_ids)
+    assert np.allclose(scores, np.take_along_axis(similarities, expected_ids, axis=1))
+
+
+def test_search_recall():
+    embeddings = clustered_embeddings(5000)
+    queries = embeddings[:50]
+    _, true_ids = exact_search(embeddings, queries, k=10)
+
+    index = IVFPQIndex(16, num_lists=32, num_subvectors=8)
+    index.train(embeddings, num_iterations=10)
+    index.add(embeddings[:2000])
+    index.add(embeddings[2000:])
+    _, ids = index.search(queries, k=10, num_probes=32)
+    _, reranked_ids = index.search(
+        queries, k=10, num_probes=32, rerank_embeddings=embeddings, num_candidates=50
+    )
+
+    assert len(index) == len(embeddings)
+    assert recall(ids, true_ids) > 0.7
+    assert recall(reranked_ids, true_ids) > 0.95
+
+
+def test_save_appends_added_embeddings(tmp_path):
+    embeddings = clustered_embeddings(600)
+    queries = embeddings[::50]
+    index = IVFPQIndex(16, num_lists=8, num_subvectors=4)
+    index.train(embeddings, num_iterations=5)
+    index.add(embeddings[:400])
+    index.save(tmp_path)
+    codes_size = (tmp_path / "codes.bin").stat().st_size
+
+    loaded = IVFPQIndex.load(tmp_path)
+    assert isinstance(loaded.stored[0], np.memmap)
+    loaded.add(embeddings[400:])
+    loaded.save(tmp_path)
+    index.add(embeddings[400:])
+
+    assert (tmp_path / "codes.bin").stat().st_size == codes_size * 600 // 400
+    reloaded = IVFPQIndex.load(tmp_path)
+    assert len(reloaded) == 600
+    for searched in [loaded, reloaded]:
+        scores, ids = searched.search(queries, k=5, num_probes=4)
+        expected_scores, expected_ids = index.search(queries, k=5, num_probes=4)
+        assert np.array_equal(ids, expected_ids)
+        assert np.allclose(scores, expected_scores)
+
+
+def test_untrained_index():
+    index = IVFPQIndex(16)
+    with pytest.raises(ValueError):
+        index.add(clustered_embeddings(10))
+    with pytest.raises(ValueError):
+        IVFPQIndex(15, num_subvectors=4)
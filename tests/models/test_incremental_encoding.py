@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+import torch
+from rga.models.utils.incremental_encoding import (
+    IncrementalEncoderState,
+    IncrementalGraphEncoder,
+)
+from rga.util.adjmatrix.diagonal_block_representation import (
+    adj_matrix_to_diagonal_block_representation,
+)
+from tests.helpers import create_model
+
+
+def random_edges(num_nodes, seed):
+    rng = np.random.default_rng(seed)
+    adj_matrix = np.tril(rng.random((num_nodes, num_nodes)) < 0.3, -1)
+    return np.stack(np.nonzero(adj_matrix), axis=1)
+
+
+def encode(model, edges, num_nodes, block_size):
+    adj_matrix = torch.zeros((num_nodes, num_nodes, 1))
+    adj_matrix[edges[:, 0], edges[:, 1]] = 1.0
+    graph = adj_matrix_to_diagonal_block_representation(
+        adj_matrix, num_nodes, block_size, pad_value=-1
+    )
+    return model.encoder((graph[None], None, torch.tensor([num_nodes])))[0]
+
+
+@pytest.mark.parametrize("block_size", [1, 3, 4])
+@pytest.mark.parametrize("appended_sizes", [[2, 1, 1, 3, 1, 5, 2], [4, 4, 4, 4]])
+def test_incremental_encoding_matches_full_encode(block_size, appended_sizes, tmp_path):
+    torch.manual_seed(0)
+    model = create_model(block_size=block_size)
+    incremental_encoder = IncrementalGraphEncoder(model.encoder)
+    edges = random_edges(sum(appended_sizes), 0)
+
+    state = incremental_encoder.create_state()
+    num_nodes = 0
+    for num_new_nodes in appended_sizes:
+        new_edges = edges[
+            (edges[:, 0] >= num_nodes) & (edges[:, 0] < num_nodes + num_new_nodes)
+        ]
+        num_nodes += num_new_nodes
+        embedding = incremental_encoder.append(state, num_new_nodes, new_edges)
+
+        # serialized between the calls
+        torch.save(state.state_dict(), tmp_path / "state.pt")
+        state = IncrementalEncoderState.from_state_dict(
+            torch.load(tmp_path / "state.pt")
+        )
+        with torch.no_grad():
+            expected = encode(
+                model, edges[edges[:, 0] < num_nodes], num_nodes, block_size
+            )
+        assert torch.allclose(embedding, expected, atol=1e-6)
+
+    if appended_sizes[0] == block_size:
+        assert len(state.boundaries) == 1
+
+
+def test_incremental_encoding_rejects_edges_of_existing_nodes():
+    model = create_model(block_size=2)
+    incremental_encoder = IncrementalGraphEncoder(model.encoder)
+    state = incremental_encoder.create_state()
+    incremental_encoder.append(state, 3, [[1, 0], [2, 1]])
+    with pytest.raises(ValueError):
+        incremental_encoder.append(state, 2, [[2, 0]])
@@ -0,0 +1,59 @@
+import pytest
+import torch
+
+from rga.models.rgae import RGAE
+from rga.models.utils.embedding_cache import EmbeddingCache
+from rga.models.utils.inference_checkpoint import export_inference_checkpoint
+from tests.helpers import create_rgae_files, random_adj_matrices
+
+
+def test_inference_checkpoint_matches_rgae(tmp_path):
+    torch.manual_seed(0)
+    path_hparams, path_ckpt = create_rgae_files(tmp_path)
+    export_inference_checkpoint(path_hparams, path_ckpt, tmp_path / "inference")
+    rgae = RGAE(path_hparams, path_ckpt)
+    inference_rgae = RGAE.from_inference_checkpoint(tmp_path / "inference")
+    adj_matrices = random_adj_matrices([5, 9, 12, 7])
+
+    with torch.no_grad():
+        embeddings = rgae.encode(adj_matrices)
+        graphs = rgae.decode(embeddings, max_graph_size=20)
+        inference_embeddings = inference_rgae.encode(adj_matrices)
+        inference_graphs = inference_rgae.decode(embeddings, max_graph_size=20)
+
+    assert torch.equal(inference_embeddings, embeddings)
+    for graph, inference_graph in zip(graphs, inference_graphs):
+        assert torch.equal(inference_graph, graph)
+    assert (
+        inference_rgae.engine.encoder.state_dict().keys()
+        == rgae.engine.encoder.state_dict().keys()
+    )
+
+
+def test_encoder_only(tmp_path):
+    path_hparams, path_ckpt = create_rgae_files(tmp_path)
+    export_inference_checkpoint(
+        path_hparams, path_ckpt, tmp_path / "inference", parts=["encoder"]
+    )
+    rgae = RGAE.from_inference_checkpoint(tmp_path / "inference", parts=["encoder"])
+
+    assert rgae.engine.decoder is None
+    assert rgae.encode(random_adj_matrices([6])).shape == (1, 16)
+    with pytest.raises(ValueError):
+        rgae.decode(torch.zeros(1, 16))
+    with pytest.raises(ValueError):
+        RGAE.from_inference_checkpoint(tmp_path / "inference", parts=["decoder"])
+
+
+def test_shares_embedding_cache_with_source_checkpoint(tmp_path):
+    path_hparams, path_ckpt = create_rgae_files(tmp_path)
+    export_inference_checkpoint(path_hparams, path_ckpt, tmp_path / "inference")
+    cache = EmbeddingCache()
+    RGAE(path_hparams, path_ckpt, embedding_cache=cache).encode(
+        random_adj_matrices([6])
+    )
+    RGAE.from_inference_checkpoint(
+        tmp_path / "inference", embedding_cache=cache
+    ).encode(random_adj_matrices([6]))
+
+    assert cache.stats()["hits"] == 1
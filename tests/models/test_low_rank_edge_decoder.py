@@ -0,0 +1,80 @@
+import torch
+
+from rga.models.edge_decoders.low_rank import LowRankMemoryEdgeDecoder
+from rga.models.edge_decoders.memory_standard import MemoryEdgeDecoder
+from rga.models.low_rank_autoencoder import LowRankRecursiveGraphAutoencoder
+from rga.models.rgae import RGAE
+from rga.models.utils.inference_checkpoint import export_inference_checkpoint
+from tests.helpers import (
+    create_batch,
+    create_model,
+    create_rgae_files,
+    random_adj_matrices,
+)
+
+
+def test_blocks_are_low_rank():
+    torch.manual_seed(0)
+    decoder = LowRankMemoryEdgeDecoder(
+        embedding_size=8,
+        edge_size=2,
+        block_size=6,
+        decoder_hidden_layer_sizes=[32],
+        decoder_activation_function="ReLU",
+        edge_decoder_rank=2,
+    )
+    embeddings = torch.randn(3, 4, 8)
+    blocks, new_embedding_l, new_embedding_r = decoder(embeddings, embeddings)
+
+    reference_blocks, *_ = MemoryEdgeDecoder(
+        embedding_size=8,
+        edge_size=2,
+        block_size=6,
+        decoder_hidden_layer_sizes=[32],
+        decoder_activation_function="ReLU",
+    )(embeddings, embeddings)
+    assert blocks.shape == reference_blocks.shape == (3, 4, 6, 6, 3)
+    assert new_embedding_l.shape == new_embedding_r.shape == (3, 4, 8)
+
+    blocks = blocks - decoder.block_bias
+    ranks = torch.linalg.matrix_rank(blocks.permute(0, 1, 4, 2, 3))
+    assert ranks.max() == 2
+
+
+def test_low_rank_autoencoder_step():
+    torch.manual_seed(0)
+    model = create_model(
+        LowRankRecursiveGraphAutoencoder, edge_decoder_rank=3, block_size=4
+    )
+    assert model.decoder.edge_decoder.rank == 3
+
+    loss = model.step(create_batch([5, 9, 12, 3, 7], 4))
+    loss.backward()
+    assert torch.isfinite(loss).all()
+    assert model.decoder.edge_decoder.block_bias.grad is not None
+
+
+def test_low_rank_checkpoint_loading(tmp_path):
+    torch.manual_seed(0)
+    path_hparams, path_ckpt = create_rgae_files(
+        tmp_path, LowRankRecursiveGraphAutoencoder, edge_decoder_rank=2
+    )
+    export_inference_checkpoint(
+        path_hparams,
+        path_ckpt,
+        tmp_path / "inference",
+        model_class=LowRankRecursiveGraphAutoencoder,
+    )
+    rgae = RGAE(path_hparams, path_ckpt, model_class=LowRankRecursiveGraphAutoencoder)
+    inference_rgae = RGAE.from_inference_checkpoint(tmp_path / "inference")
+    adj_matrices = random_adj_matrices([5, 9, 7])
+
+    with torch.no_grad():
+        embeddings = rgae.encode(adj_matrices)
+        graphs = rgae.decode(embeddings, max_graph_size=20)
+        inference_graphs = inference_rgae.decode(embeddings, max_graph_size=20)
+
+    assert isinstance(rgae.engine.decoder.edge_decoder, LowRankMemoryEdgeDecoder)
+    assert torch.equal(inference_rgae.encode(adj_matrices), embeddings)
+    for graph, inference_graph in zip(graphs, inference_graphs):
+        assert torch.equal(inference_graph, graph)
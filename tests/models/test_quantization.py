@@ -0,0 +1,25 @@
+import torch
+from rga.models.utils.quantization import quantize_dynamic_int8
+from tests.helpers import create_batch, create_model
+
+
+def test_quantize_dynamic_int8():
+    torch.manual_seed(0)
+    model = create_model(block_size=2, embedding_size=64)
+    quantized_model = quantize_dynamic_int8(model)
+
+    assert isinstance(model.encoder.edge_encoder.nn[0], torch.nn.Linear)
+    assert not any(
+        type(module) is torch.nn.Linear for module in quantized_model.modules()
+    )
+    assert not quantized_model.training
+
+    batch = create_batch([5, 9, 12, 3, 7], 2)
+    with torch.no_grad():
+        embeddings = model.encoder(batch)
+        quantized_embeddings = quantized_model.encoder(batch)
+        quantized_model.decoder(quantized_embeddings, max(batch[2]))
+    assert (
+        torch.nn.functional.cosine_similarity(embeddings, quantized_embeddings).min()
+        > 0.99
+    )
@@ -0,0 +1,63 @@
+import pytest
+
+import torch
+from rga.models import autoencoder_components
+from tests.helpers import create_batch, create_model
+
+
+@pytest.fixture
+def staggered_finishing(monkeypatch):
+    """
+    Makes the first of the decoded graphs finish at each step from the third one on,
+    so that the graphs finish at different steps, also in the middle of checkpointed segments.
+    """
+    find_finished_masks = autoencoder_components.find_finished_masks
+
+    def find_finished_masks_staggered(masks, prev_mask_state):
+        indices_graphs_finished, mask_state = find_finished_masks(
+            masks, prev_mask_state
+        )
+        if masks.shape[1] >= 3:
+            indices_graphs_finished[0] = True
+        return indices_graphs_finished, mask_state
+
+    monkeypatch.setattr(
+        autoencoder_components, "find_finished_masks", find_finished_masks_staggered
+    )
+
+
+def outputs_and_gradients(model, batch):
+    model.zero_grad()
+    loss = model.step(batch)
+    loss.backward()
+    # parameters unused in the forward pass get no gradient without checkpointing and zeros with it
+    return loss, {
+        name: p.grad if p.grad is not None else torch.zeros_like(p)
+        for name, p in model.named_parameters()
+    }
+
+
+@pytest.mark.parametrize("sync_free_training", [False, True])
+@pytest.mark.parametrize("block_size", [1, 2])
+@pytest.mark.parametrize("checkpoint_every", [1, 2, 5])
+def test_checkpointed_recursion_matches_plain(
+    sync_free_training, block_size, checkpoint_every, staggered_finishing
+):
+    torch.manual_seed(0)
+    model = create_model(block_size=block_size, sync_free_training=sync_free_training)
+    checkpointed_model = create_model(
+        block_size=block_size,
+        sync_free_training=sync_free_training,
+        recursion_checkpoint_every=checkpoint_every,
+    )
+    checkpointed_model.load_state_dict(model.state_dict())
+    batch = create_batch([5, 9, 12, 3, 7], block_size)
+
+    loss, gradients = outputs_and_gradients(model, batch)
+    checkpointed_loss, checkpointed_gradients = outputs_and_gradients(
+        checkpointed_model, batch
+    )
+
+    assert torch.allclose(loss, checkpointed_loss)
+    for name, gradient in gradients.items():
+        assert torch.allclose(gradient, checkpointed_gradients[name], atol=1e-6), name
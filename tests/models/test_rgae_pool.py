@@ -0,0 +1,65 @@
+import os
+import signal
+
+import pytest
+import torch
+
+from rga.models.rgae import RGAE
+from rga.models.rgae_pool import RGAEPool
+from tests.helpers import create_rgae_files, random_adj_matrices
+
+
+def test_pool_matches_rgae(tmp_path):
+    torch.manual_seed(0)
+    path_hparams, path_ckpt = create_rgae_files(tmp_path)
+    rgae = RGAE(path_hparams, path_ckpt)
+    adj_matrices = random_adj_matrices([5, 9, 12, 7, 4, 10, 6])
+    with torch.no_grad():
+        expected_embeddings = rgae.encode(adj_matrices)
+        expected_graphs = rgae.decode(expected_embeddings, max_graph_size=20)
+
+    with RGAEPool(path_hparams, path_ckpt, num_workers=2, shard_size=3) as pool:
+        embeddings = pool.encode(adj_matrices)
+        graphs = pool.decode(embeddings, max_graph_size=20)
+
+    assert torch.allclose(embeddings, expected_embeddings, atol=1e-6)
+    assert len(graphs) == len(expected_graphs)
+    for graph, expected_graph in zip(graphs, expected_graphs):
+        assert torch.equal(graph, expected_graph)
+
+
+def test_quantized_pool_matches_rgae(tmp_path):
+    torch.manual_seed(0)
+    path_hparams, path_ckpt = create_rgae_files(tmp_path)
+    rgae = RGAE(path_hparams, path_ckpt, quantize=True)
+    adj_matrices = random_adj_matrices([5, 9, 12, 7])
+    with torch.no_grad():
+        # the activations are quantized with the ranges of each batch, i.e. of each shard
+        expected_embeddings = torch.cat(
+            [rgae.encode(adj_matrices[:2]), rgae.encode(adj_matrices[2:])]
+        )
+
+    with RGAEPool(
+        path_hparams, path_ckpt, num_workers=2, shard_size=2, quantize=True
+    ) as pool:
+        embeddings = pool.encode(adj_matrices)
+
+    assert torch.allclose(embeddings, expected_embeddings, atol=1e-6)
+
+
+def test_pool_errors(tmp_path):
+    path_hparams, path_ckpt = create_rgae_files(tmp_path)
+    adj_matrices = random_adj_matrices([5, 9])
+
+    with RGAEPool(path_hparams, path_ckpt, num_workers=1) as pool:
+        pool.poll_interval = 0.1
+        with pytest.raises(ValueError):
+            pool.map("decode", [(torch.zeros(2, 16),)], output_format="coo")
+        # the worker survives the errors of the tasks
+        assert len(pool.encode(adj_matrices)) == 2
+
+        os.kill(pool.workers[0].pid, signal.SIGKILL)
+        pool.workers[0].join()
+        with pytest.raises(RuntimeError, match="exited unexpectedly"):
+            pool.encode(adj_matrices)
+        assert not pool.workers
@@ -0,0 +1,160 @@
+import asyncio
+import json
+
+import pytest
+import torch
+
+from rga.models.rgae import RGAE
+from rga.models.rgae_server import MicroBatchingServer, ServerOverloaded, serve_http
+from tests.helpers import create_rgae_files, random_adj_matrices
+
+
+def create_rgae(tmp_path) -> RGAE:
+    torch.manual_seed(0)
+    return RGAE(*create_rgae_files(tmp_path))
+
+
+def test_concurrent_requests_are_batched(tmp_path):
+    rgae = create_rgae(tmp_path)
+    adj_matrices = random_adj_matrices([5, 9, 12, 7, 4, 10, 6, 11])
+    with torch.no_grad():
+        expected_embeddings = rgae.encode(adj_matrices)
+        expected_graphs = rgae.decode(expected_embeddings, max_graph_size=20)
+
+    async def run():
+        async with MicroBatchingServer(rgae, max_wait=0.05) as server:
+            embeddings = await asyncio.gather(*map(server.encode, adj_matrices))
+            graphs = await asyncio.gather(
+                *[server.decode(embedding, 20) for embedding in embeddings]
+            )
+            return embeddings, graphs, server.stats()
+
+    embeddings, graphs, stats = asyncio.run(run())
+
+    assert torch.allclose(torch.stack(embeddings), expected_embeddings, atol=1e-6)
+    for graph, expected_graph in zip(graphs, expected_graphs):
+        assert torch.equal(graph, expected_graph)
+    assert stats["encode_requests"] == stats["decode_requests"] == 8
+    # one batch per size bucket of the encoded graphs and one for the decoded ones
+    assert stats["batches"] < 8
+    assert 0 < stats["mean_padded_batch_fill"] <= 1
+    assert stats["encode_latency_p50"] <= stats["encode_latency_p99"]
+
+
+def test_max_batch_size(tmp_path):
+    rgae = create_rgae(tmp_path)
+    adj_matrices = random_adj_matrices([8] * 5)
+
+    async def run():
+        async with MicroBatchingServer(rgae, max_wait=1, max_batch_size=2) as server:
+            await asyncio.gather(*map(server.encode, adj_matrices))
+            return server.stats()
+
+    stats = asyncio.run(run())
+
+    assert stats["batches"] == 3
+    assert stats["mean_batch_size_fill"] == pytest.approx(5 / 6)
+
+
+def test_stats_of_recent_batches(tmp_path):
+    rgae = create_rgae(tmp_path)
+    adj_matrices = random_adj_matrices([8] * 5)
+
+    async def run():
+        async with MicroBatchingServer(
+            rgae, max_wait=1, max_batch_size=2, num_latencies=2
+        ) as server:
+            await asyncio.gather(*map(server.encode, adj_matrices))
+            return server.stats()
+
+    stats = asyncio.run(run())
+
+    # only the last two batches, of 2 and 1 graphs, are kept
+    assert stats["batches"] == 3
+    assert stats["encode_requests"] == 2
+    assert stats["mean_batch_size_fill"] == pytest.approx(3 / 4)
+
+
+def test_timed_out_requests_are_dropped(tmp_path):
+    rgae = create_rgae(tmp_path)
+    adj_matrix, other_adj_matrix = random_adj_matrices([8, 8])
+
+    async def run():
+        async with MicroBatchingServer(rgae, max_wait=0.2) as server:
+            with pytest.raises(asyncio.TimeoutError):
+                await server.encode(adj_matrix, timeout=0.01)
+            embedding = await server.encode(other_adj_matrix)
+            return embedding, server.stats()
+
+    embedding, stats = asyncio.run(run())
+
+    assert torch.allclose(embedding, rgae.encode([other_adj_matrix])[0], atol=1e-6)
+    assert stats["dropped_requests"] == 1
+    assert stats["encode_requests"] == 1
+
+
+def test_backpressure(tmp_path):
+    rgae = create_rgae(tmp_path)
+    adj_matrix, other_adj_matrix = random_adj_matrices([8, 8])
+
+    async def run():
+        async with MicroBatchingServer(
+            rgae, max_wait=0.2, max_pending=1, admission_timeout=0.01
+        ) as server:
+            pending = asyncio.ensure_future(server.encode(adj_matrix))
+            await asyncio.sleep(0)
+            with pytest.raises(ServerOverloaded):
+                await server.encode(other_adj_matrix)
+            await pending
+
+    asyncio.run(run())
+
+
+def test_http_round_trip(tmp_path):
+    rgae = create_rgae(tmp_path)
+    (adj_matrix,) = random_adj_matrices([9])
+    edges = torch.tril(adj_matrix, -1).nonzero().tolist()
+    with torch.no_grad():
+        expected_embedding = rgae.encode([adj_matrix])[0]
+
+    async def request(port, method, path, body=None):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        payload = json.dumps(body).encode() if body is not None else b""
+        writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+            f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload
+        )
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        head, _, body = response.partition(b"\r\n\r\n")
+        return int(head.split()[1]), json.loads(body)
+
+    async def run():
+        async with MicroBatchingServer(rgae) as server:
+            http_server = await serve_http(server)
+            port = http_server.sockets[0].getsockname()[1]
+            async with http_server:
+                encoded = await request(
+                    port, "POST", "/encode", {"num_nodes": 9, "edges": edges}
+                )
+                decoded = await request(
+                    port,
+                    "POST",
+                    "/decode",
+                    {"embedding": encoded[1]["embedding"], "max_graph_size": 20},
+                )
+                stats = await request(port, "GET", "/stats")
+                missing = await request(port, "GET", "/missing")
+            return encoded, decoded, stats, missing
+
+    encoded, decoded, stats, missing = asyncio.run(run())
+
+    assert encoded[0] == 200
+    assert torch.allclose(
+        torch.tensor(encoded[1]["embedding"]), expected_embedding, atol=1e-6
+    )
+    assert decoded[0] == 200
+    assert decoded[1]["num_nodes"] > 0
+    assert stats[0] == 200 and stats[1]["encode_requests"] == 1
+    assert missing[0] == 404
@@ -0,0 +1,37 @@
+import pytest
+import torch
+
+from rga.models.rgae import RGAE
+from tests.helpers import create_rgae_files
+
+
+@pytest.mark.parametrize("max_bandwidth", [None, 2])
+def test_sparse_decode_matches_dense(tmp_path, max_bandwidth):
+    torch.manual_seed(0)
+    rgae = RGAE(*create_rgae_files(tmp_path, max_bandwidth=max_bandwidth))
+    embeds = torch.randn(6, 16) * 3
+    num_nodes = [5, 9, 12, 2, 7, 10] if max_bandwidth else None
+
+    with torch.no_grad():
+        torch.manual_seed(1)
+        adj_matrices = rgae.decode(embeds, 20, num_nodes)
+        torch.manual_seed(1)
+        edge_lists = rgae.decode(embeds, 20, num_nodes, output_format="edge_list")
+        torch.manual_seed(1)
+        sparse_matrices = rgae.decode(embeds, 20, num_nodes, output_format="scipy")
+
+    assert len(edge_lists) == len(sparse_matrices) == len(adj_matrices)
+    for adj_matrix, (edges, graph_num_nodes), sparse_matrix in zip(
+        adj_matrices, edge_lists, sparse_matrices
+    ):
+        assert graph_num_nodes == adj_matrix.shape[0]
+        lower_triangle = torch.zeros_like(adj_matrix)
+        lower_triangle[edges[:, 0], edges[:, 1]] = 1
+        assert torch.equal(lower_triangle, torch.tril(adj_matrix, -1))
+        assert torch.equal(torch.from_numpy(sparse_matrix.toarray()), adj_matrix)
+
+
+def test_unknown_output_format(tmp_path):
+    rgae = RGAE(*create_rgae_files(tmp_path))
+    with pytest.raises(ValueError):
+        rgae.decode(torch.zeros(1, 16), output_format="coo")
@@ -0,0 +1,53 @@
+import pytest
+
+import torch
+from rga.util.adjmatrix.diagonal_block_representation import (
+    diagonal_block_to_adj_matrix_representation,
+)
+from rga.util.adjmatrix.edge_list_diagonal_blocks import EdgeListDiagonalBlocks
+from tests.helpers import create_banded_batch, create_batch, create_model
+
+
+def edge_list(diagonal_repr_graph, num_nodes):
+    adj_matrix = diagonal_block_to_adj_matrix_representation(
+        diagonal_repr_graph.clamp(min=0), num_nodes
+    )
+    return torch.nonzero(adj_matrix[:, :, 0]).numpy()
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 3])
+def test_streaming_encoder_matches_forward(block_size):
+    torch.manual_seed(0)
+    model = create_model(block_size=block_size)
+    graph_sizes = [5, 9, 12, 2, 7]
+    batch = create_batch(graph_sizes, block_size)
+    with torch.no_grad():
+        embeddings = model.encoder(batch)
+        for i, num_nodes in enumerate(graph_sizes):
+            diagonals = EdgeListDiagonalBlocks(
+                edge_list(batch[0][i], num_nodes), num_nodes, block_size
+            )
+            embedding = model.encoder.forward_streaming(diagonals, num_nodes)
+            assert torch.allclose(embedding, embeddings[i], atol=1e-6)
+
+
+@pytest.mark.parametrize("max_bandwidth", [1, 2, 3])
+def test_banded_streaming_encoder_matches_forward(max_bandwidth):
+    torch.manual_seed(0)
+    block_size = 2
+    model = create_model(block_size=block_size, max_bandwidth=max_bandwidth)
+    graph_sizes = [5, 19, 12, 3, 27]
+    batch = create_banded_batch(graph_sizes, block_size, max_bandwidth)
+    full_batch = create_banded_batch(graph_sizes, block_size, None)
+    with torch.no_grad():
+        embeddings = model.encoder(batch)
+        for i, num_nodes in enumerate(graph_sizes):
+            diagonals = EdgeListDiagonalBlocks(
+                edge_list(full_batch[0][i], num_nodes), num_nodes, block_size
+            )
+            num_diagonals = min(diagonals.bandwidth, max_bandwidth)
+            assert num_diagonals == batch[3][i]
+            embedding = model.encoder.forward_streaming(
+                diagonals, num_nodes, num_diagonals=num_diagonals
+            )
+            assert torch.allclose(embedding, embeddings[i], atol=1e-6)
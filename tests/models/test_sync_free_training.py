@@ -0,0 +1,72 @@
+import pytest
+
+import torch
+from rga.metrics.losses import MeanReconstructionLoss
+from rga.util.host_sync import HostSyncCounter
+from tests.helpers import create_batch, create_model
+
+
+def test_host_sync_counter():
+    t = torch.tensor([1.0, 2.0, 3.0])
+    with HostSyncCounter(include_cpu=True) as counter:
+        t.sum().item()
+        bool(t[0] > 1)
+        t[t > 1]
+        t[1:]
+    assert counter.count == 3
+
+    with HostSyncCounter() as counter:
+        t.sum().item()
+    assert counter.count == 0
+
+
+def test_mean_loss_metric_does_not_sync():
+    metric = MeanReconstructionLoss()
+    with HostSyncCounter(include_cpu=True) as counter:
+        metric.update(loss_reconstruction=torch.tensor([1.0]))
+        metric.update(loss_reconstruction=torch.tensor([2.0]))
+    assert counter.count == 0
+    assert metric.compute().item() == pytest.approx(1.5)
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 3])
+def test_sync_free_training_matches_eager(block_size):
+    torch.manual_seed(0)
+    model = create_model(block_size=block_size)
+    sync_free_model = create_model(block_size=block_size, sync_free_training=True)
+    sync_free_model.load_state_dict(model.state_dict())
+    batch = create_batch([5, 9, 12, 3, 7], block_size)
+
+    embeddings = model.encoder(batch)
+    (edges, masks), norm = model.decoder(embeddings, max(batch[2]))
+    (sync_free_edges, sync_free_masks), sync_free_norm = sync_free_model.decoder(
+        embeddings, max(batch[2])
+    )
+    num_decoded_blocks = edges.shape[1]
+    assert torch.equal(edges, sync_free_edges[:, :num_decoded_blocks])
+    assert torch.equal(masks, sync_free_masks[:, :num_decoded_blocks])
+    assert torch.isinf(sync_free_edges[:, num_decoded_blocks:]).all()
+    assert torch.allclose(norm, sync_free_norm)
+
+    assert torch.allclose(model.step(batch), sync_free_model.step(batch))
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 3])
+def test_sync_free_step_host_syncs(block_size):
+    torch.manual_seed(0)
+    model = create_model(block_size=block_size)
+    sync_free_model = create_model(block_size=block_size, sync_free_training=True)
+    batch = create_batch([5, 9, 12, 3, 7], block_size)
+    num_nodes = batch[2]
+
+    with HostSyncCounter(include_cpu=True) as encoder_counter:
+        sync_free_model.encoder(batch)
+    with HostSyncCounter(include_cpu=True) as counter:
+        sync_free_model.step(batch)
+    with HostSyncCounter(include_cpu=True) as eager_counter:
+        model.step(batch)
+
+    # Beyond the encoder, only the numbers of nodes, which are kept on the host, are read: by `max` in
+    # `forward` and for the number of decoding steps. Neither depends on the sizes of the decoded graphs.
+    assert counter.count == encoder_counter.count + len(num_nodes) - 1 + 1
+    assert eager_counter.count > counter.count
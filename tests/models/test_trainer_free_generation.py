@@ -0,0 +1,66 @@
+import os
+import pickle
+
+import pytest
+import torch
+
+from rga.metrics.adjency_matrices_metrics import calculate_metrics
+from rga.util import adjmatrix
+from rga.util.chunked_pickle import ChunkedPickleReader
+from scripts.generate_graphs import (
+    GENERATED_GRAPH_RECORDS_FORMAT,
+    GraphGenerator,
+    evaluate_generated_graphs,
+)
+from tests.helpers import create_rgae_files, random_adj_matrices
+
+
+@pytest.fixture
+def generation_files(tmp_path):
+    torch.manual_seed(0)
+    path_hparams, path_ckpt = create_rgae_files(tmp_path)
+    # the hyperparameters file named after the checkpoint, as expected by `GraphGenerator`
+    os.rename(path_hparams, tmp_path / "model_hparams.yaml")
+    adj_matrices = random_adj_matrices([5, 9, 12, 7, 4, 10, 6])
+    test_graphs = [(m + m.T).numpy() for m in adj_matrices]
+    dataset_path = tmp_path / "dataset.pkl"
+    with open(dataset_path, "wb") as f:
+        pickle.dump(([], [], [test_graphs], None, None, None), f)
+    return path_ckpt, str(dataset_path), test_graphs
+
+
+def test_generated_graphs_are_streamed(generation_files, tmp_path):
+    path_ckpt, dataset_path, test_graphs = generation_files
+    output_path = str(tmp_path / "graphs.pkl")
+
+    metrics = GraphGenerator().run(path_ckpt, dataset_path, output_path, batch_size=3)
+
+    with ChunkedPickleReader(output_path, GENERATED_GRAPH_RECORDS_FORMAT) as reader:
+        records = sorted(record for chunk in reader for record in chunk)
+    assert [index for index, _, _ in records] == list(range(len(test_graphs)))
+    for index, prediction, target in records:
+        num_nodes = test_graphs[index].shape[0]
+        assert torch.equal(
+            target,
+            adjmatrix.adj_matrix_to_diagonal_representation(
+                torch.tensor(test_graphs[index]).tril(-1)[..., None].int(), num_nodes
+            )[..., 0],
+        )
+    assert metrics == calculate_metrics(
+        [target for _, _, target in records],
+        [prediction for _, prediction, _ in records],
+    )
+    assert evaluate_generated_graphs(output_path) == pytest.approx(metrics)
+
+
+def test_sparse_output_metrics(generation_files, tmp_path):
+    path_ckpt, dataset_path, _ = generation_files
+    output_path = str(tmp_path / "graphs.pkl")
+
+    metrics = GraphGenerator().run(path_ckpt, dataset_path, batch_size=3)
+    sparse_metrics = GraphGenerator().run(
+        path_ckpt, dataset_path, output_path, batch_size=3, sparse_output=True
+    )
+
+    assert sparse_metrics == pytest.approx(metrics)
+    assert evaluate_generated_graphs(output_path) == pytest.approx(metrics)
@@ -0,0 +1,95 @@
+import argparse
+
+import pytest
+import torch
+
+from rga.models.vae import RecursiveGraphVAE
+from rga.util.generate_graphs import remove_block_padding
+
+
+def create_vae(**kwargs):
+    parser = RecursiveGraphVAE.add_model_specific_args(argparse.ArgumentParser())
+    args = vars(parser.parse_args([]))
+    args.update(
+        loss_function="BCEWithLogits",
+        mask_loss_function="BCEWithLogits",
+        embedding_size=16,
+        encoder_hidden_layer_sizes=[32],
+        decoder_hidden_layer_sizes=[32],
+        metrics=[],
+        block_size=3,
+    )
+    args.update(kwargs)
+    torch.manual_seed(0)
+    return RecursiveGraphVAE(**args).eval()
+
+
+def test_decode_stream_matches_forward():
+    model = create_vae()
+    latents = torch.randn((12, 16), generator=torch.Generator().manual_seed(1))
+    max_num_nodes = 45
+
+    with torch.no_grad():
+        (graphs, masks), _ = model.decoder(
+            latents, max_number_of_nodes=torch.tensor(max_num_nodes)
+        )
+        streamed = list(
+            model.decoder.decode_stream(
+                latents, torch.full((12,), max_num_nodes // model.decoder.block_size)
+            )
+        )
+
+    block_counts = [diagonals.shape[1] for _, diagonals, _ in streamed]
+    # the graphs are yielded as they finish, from the shortest
+    assert block_counts == sorted(block_counts) and len(streamed) > 1
+    streamed_indices = torch.cat([indices for indices, _, _ in streamed])
+    assert sorted(streamed_indices.tolist()) == list(range(12))
+    for indices, diagonals, streamed_masks in streamed:
+        for i, graph, mask in zip(indices, diagonals, streamed_masks):
+            assert torch.allclose(graph, remove_block_padding(graphs[i]))
+            assert torch.allclose(mask, remove_block_padding(masks[i]))
+
+
+def test_step_budget():
+    model = create_vae(block_size=1)
+    latents = torch.randn((4, 16), generator=torch.Generator().manual_seed(1))
+    budgets = torch.tensor([5, 2, 30, 3])
+
+    with torch.no_grad():
+        streamed = list(model.decoder.decode_stream(latents, budgets))
+
+    num_diagonals = {}
+    for indices, diagonals, _ in streamed:
+        for i in indices.tolist():
+            num_diagonals[i] = int(((8 * diagonals.shape[1] + 1) ** 0.5 - 1) / 2)
+    # the first graph ends by itself, the others would go on and are retired at their budgets
+    assert num_diagonals == {0: 1, 1: 2, 2: 30, 3: 3}
+
+
+@pytest.mark.parametrize("output_format", ["edge_list", "scipy"])
+def test_sample(output_format):
+    model = create_vae()
+
+    dense = list(
+        model.sample(10, batch_size=4, generator=torch.Generator().manual_seed(0))
+    )
+    sparse = dict(
+        model.sample(
+            10,
+            batch_size=4,
+            output_format=output_format,
+            generator=torch.Generator().manual_seed(0),
+        )
+    )
+
+    assert sorted(i for i, _ in dense) == list(range(10))
+    for i, adj_matrix in dense:
+        assert torch.equal(adj_matrix, adj_matrix.T)
+        if output_format == "edge_list":
+            edges, num_nodes = sparse[i]
+            assert num_nodes == adj_matrix.shape[0]
+            assert sorted(map(tuple, edges.tolist())) == sorted(
+                map(tuple, torch.tril(adj_matrix, -1).nonzero().tolist())
+            )
+        else:
+            assert (sparse[i].toarray() == adj_matrix.numpy()).all()
@@ -0,0 +1,85 @@
+import pytest
+
+import torch
+from rga.util.adjmatrix.diagonal_block_representation import (
+    adj_matrix_to_diagonal_block_representation,
+)
+from tests.helpers import create_model
+
+
+def create_sparse_batch(graph_sizes, block_size):
+    """
+    Random forests with nodes attached only to the recent ones, so that the edges are close to the diagonal
+    with gaps between the trees, and many cones are zero.
+    """
+    generator = torch.Generator().manual_seed(0)
+    graphs, masks = [], []
+    for num_nodes in graph_sizes:
+        adj_matrix = torch.zeros((num_nodes, num_nodes, 1))
+        for node in range(1, num_nodes):
+            if torch.rand((1,), generator=generator) < 0.3:
+                continue
+            parent = node - 1 - torch.randint(min(node, 3), (1,), generator=generator)
+            adj_matrix[node, parent] = 1.0
+        graphs.append(
+            adj_matrix_to_diagonal_block_representation(
+                adj_matrix, num_nodes, block_size, pad_value=-1
+            )
+        )
+        mask = torch.tril(torch.ones((num_nodes, num_nodes)), diagonal=-1)[:, :, None]
+        masks.append(
+            adj_matrix_to_diagonal_block_representation(mask, num_nodes, block_size)
+        )
+    return (
+        torch.nn.utils.rnn.pad_sequence(graphs, batch_first=True),
+        torch.nn.utils.rnn.pad_sequence(masks, batch_first=True),
+        torch.tensor(graph_sizes),
+    )
+
+
+def embeddings_and_gradients(model, batch):
+    model.zero_grad()
+    embeddings = model.encoder(batch)
+    embeddings.sum().backward()
+    return embeddings, {
+        name: p.grad
+        for name, p in model.encoder.named_parameters()
+        if p.grad is not None
+    }
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 3, 4])
+@pytest.mark.parametrize("checkpoint_every", [0, 2])
+def test_zero_cone_memoization_matches_plain(block_size, checkpoint_every):
+    torch.manual_seed(0)
+    model = create_model(
+        block_size=block_size, recursion_checkpoint_every=checkpoint_every
+    )
+    memoized_model = create_model(
+        block_size=block_size,
+        recursion_checkpoint_every=checkpoint_every,
+        zero_cone_memoization=True,
+    )
+    memoized_model.load_state_dict(model.state_dict())
+    batch = create_sparse_batch([17, 9, 24, 3, 12], block_size)
+
+    encoder = memoized_model.encoder
+    planned_steps = []
+
+    def plan_zero_cones(*args):
+        steps, paddings, num_levels = type(encoder).plan_zero_cones(encoder, *args)
+        planned_steps.extend(steps)
+        return steps, paddings, num_levels
+
+    encoder.plan_zero_cones = plan_zero_cones
+
+    embeddings, gradients = embeddings_and_gradients(model, batch)
+    memoized_embeddings, memoized_gradients = embeddings_and_gradients(
+        memoized_model, batch
+    )
+    assert any(zero_cones is not None for *_, zero_cones in planned_steps)
+
+    assert torch.allclose(embeddings, memoized_embeddings, atol=1e-6)
+    assert gradients.keys() == memoized_gradients.keys()
+    for name, gradient in gradients.items():
+        assert torch.allclose(gradient, memoized_gradients[name], atol=1e-6), name
@@ -0,0 +1,72 @@
+import lzma
+import os
+import pickle
+
+import numpy as np
+import pytest
+import torch
+
+from rga.metrics.adjency_matrices_metrics import calculate_metrics
+from rga.util.chunked_pickle import ChunkedPickleWriter
+from scripts.evaluate_matrices_on_datasets import (
+    PREDICTION_MATRICES_FORMAT,
+    evaluate_single_dataset,
+    to_diagonal_representation_pair,
+)
+from scripts.generate_graphs import GraphGenerator
+from tests.helpers import create_rgae_files
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    rng = np.random.default_rng(0)
+    targets, predictions = [], []
+    for num_nodes in [5, 9, 3, 12, 7, 4, 10]:
+        target = np.tril(rng.random((num_nodes, num_nodes)) < 0.3, -1).astype(float)
+        targets.append(target + target.T)
+        # logits of a few more nodes than the targets, cropped in the evaluation
+        predictions.append(torch.randn((num_nodes + 2, num_nodes + 2)))
+    dataset_path = tmp_path / "dataset.pkl"
+    with open(dataset_path, "wb") as f:
+        pickle.dump(([], [], [targets], None, None, None), f)
+    return str(dataset_path), targets, predictions
+
+
+def test_chunked_and_legacy_evaluation_match_calculate_metrics(dataset, tmp_path):
+    dataset_path, targets, predictions = dataset
+    chunked_path, legacy_path = tmp_path / "chunked.pkl", tmp_path / "legacy.pkl"
+    with ChunkedPickleWriter(
+        str(chunked_path), PREDICTION_MATRICES_FORMAT, chunk_size=3
+    ) as writer:
+        writer.write_all(predictions)
+    with lzma.open(legacy_path, "wb") as f:
+        pickle.dump(predictions, f)
+
+    chunked_metrics = evaluate_single_dataset(
+        dataset_path, str(chunked_path), num_workers=2, chunk_size=3
+    )
+    legacy_metrics = evaluate_single_dataset(
+        dataset_path, str(legacy_path), num_workers=2, chunk_size=2
+    )
+
+    expected = calculate_metrics(
+        *zip(*map(to_diagonal_representation_pair, targets, predictions))
+    )
+    assert chunked_metrics == pytest.approx(expected, nan_ok=True)
+    assert legacy_metrics == pytest.approx(expected, nan_ok=True)
+
+
+def test_rejects_generated_graph_records(dataset, tmp_path):
+    dataset_path, _, _ = dataset
+    path_hparams, path_ckpt = create_rgae_files(tmp_path)
+    # the hyperparameters file named after the checkpoint, as expected by `GraphGenerator`
+    os.rename(path_hparams, tmp_path / "model_hparams.yaml")
+    records_path = str(tmp_path / "graphs.pkl")
+    GraphGenerator().run(
+        path_ckpt, dataset_path, records_path, evaluate=False, batch_size=3
+    )
+
+    with pytest.raises(
+        ValueError, match="'generated_graph_records', not 'prediction_matrices'"
+    ):
+        evaluate_single_dataset(dataset_path, records_path, num_workers=1, chunk_size=3)
@@ -3,7 +3,12 @@ import pytest
 import torch
 from rga.util.adjmatrix.diagonal_block_representation import (
     adj_matrix_to_diagonal_block_representation,
+    block_count_to_num_block_diagonals,
+    calculate_bandwidth_in_blocks,
+    calculate_num_blocks,
+    calculate_num_omitted_blocks,
     diagonal_block_to_adj_matrix_representation,
+    diagonal_block_to_edge_list,
 )
 
 
@@ -321,3 +326,76 @@ def test_to_diagonal_block_to_adj_matrix_representation(
     expected = expected[:, :, None]
     output = diagonal_block_to_adj_matrix_representation(input_diagonal, num_nodes)
     assert torch.equal(output, expected)
+
+
+@pytest.mark.parametrize("num_nodes", [2, 7, 12, 25])
+@pytest.mark.parametrize("block_size", [1, 2, 3, 4])
+def test_diagonal_block_representation_truncated_to_bandwidth(num_nodes, block_size):
+    generator = torch.Generator().manual_seed(num_nodes)
+    adj_matrix = torch.zeros((num_nodes, num_nodes, 1))
+    for node in range(1, num_nodes):
+        parent = node - 1 - torch.randint(min(node, 4), (1,), generator=generator)
+        adj_matrix[node, parent] = 1.0
+    bandwidth = calculate_bandwidth_in_blocks(adj_matrix, num_nodes, block_size)
+    num_blocks = calculate_num_blocks(torch.tensor(num_nodes), block_size)
+    full = adj_matrix_to_diagonal_block_representation(
+        adj_matrix.clone(), num_nodes, block_size, pad_value=-1
+    )
+
+    for num_diagonals in [bandwidth, bandwidth + 1, int(num_blocks)]:
+        truncated = adj_matrix_to_diagonal_block_representation(
+            adj_matrix.clone(),
+            num_nodes,
+            block_size,
+            pad_value=-1,
+            num_diagonals=num_diagonals,
+        )
+        num_omitted_blocks = calculate_num_omitted_blocks(num_blocks, num_diagonals)
+        assert torch.equal(truncated, full[num_omitted_blocks:])
+        assert (
+            block_count_to_num_block_diagonals(truncated.shape[0], num_diagonals)
+            == num_blocks
+        )
+        output = diagonal_block_to_adj_matrix_representation(
+            truncated.clamp(min=0), num_nodes, num_diagonals
+        )
+        assert torch.equal(output, adj_matrix)
+
+    if bandwidth > 1:
+        truncated = adj_matrix_to_diagonal_block_representation(
+            adj_matrix.clone(),
+            num_nodes,
+            block_size,
+            pad_value=-1,
+            num_diagonals=bandwidth - 1,
+        )
+        output = diagonal_block_to_adj_matrix_representation(
+            truncated.clamp(min=0), num_nodes, bandwidth - 1
+        )
+        assert not torch.equal(output, adj_matrix)
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 3])
+@pytest.mark.parametrize("num_nodes", [2, 5, 12])
+@pytest.mark.parametrize("num_diagonals", [None, 1, 2])
+def test_diagonal_block_to_edge_list(block_size, num_nodes, num_diagonals):
+    torch.manual_seed(num_nodes)
+    num_blocks = int(calculate_num_blocks(torch.tensor(num_nodes), block_size))
+    num_representation_blocks = num_blocks * (num_blocks + 1) // 2
+    if num_diagonals is not None:
+        num_representation_blocks -= int(
+            calculate_num_omitted_blocks(torch.tensor(num_blocks), num_diagonals)
+        )
+    logits = torch.randn(num_representation_blocks, block_size, block_size, 2)
+
+    edges, features = diagonal_block_to_edge_list(logits, num_nodes, num_diagonals)
+
+    adj_matrix = diagonal_block_to_adj_matrix_representation(
+        (logits > 0).float(), num_nodes, num_diagonals
+    )
+    expected = torch.tril(adj_matrix[:, :, 0], -1)
+    output = torch.zeros(num_nodes, num_nodes)
+    output[edges[:, 0], edges[:, 1]] = 1
+    assert torch.equal(output, expected)
+    assert (edges[:, 0] > edges[:, 1]).all()
+    assert features.shape == (len(edges), 2) and (features[:, 0] > 0).all()
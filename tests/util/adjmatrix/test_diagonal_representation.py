@@ -3,6 +3,7 @@ import pytest
 import torch
 from rga.util.adjmatrix.diagonal_representation import (
     adj_matrix_to_diagonal_representation,
+    edge_list_to_diagonal_representation,
 )
 
 
@@ -32,3 +33,11 @@ def test_adj_matrix_to_diagonal_representation(
         input_matrix, num_nodes, max_num_nodes_padding, -1.0
     )
     assert torch.equal(output, expected)
+
+
+def test_edge_list_to_diagonal_representation():
+    torch.manual_seed(0)
+    adj_matrix = torch.tril((torch.rand(7, 7) > 0.5).int(), -1)
+    expected = adj_matrix_to_diagonal_representation(adj_matrix[:, :, None], 7)
+    output = edge_list_to_diagonal_representation(adj_matrix.nonzero(), 7)
+    assert torch.equal(output, expected[:, 0])
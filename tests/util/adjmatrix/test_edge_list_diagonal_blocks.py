@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+import torch
+
+from rga.util.adjmatrix.diagonal_block_representation import (
+    adj_matrix_to_diagonal_block_representation,
+    calculate_bandwidth_in_blocks,
+)
+from rga.util.adjmatrix.edge_list_diagonal_blocks import (
+    EdgeListDiagonalBlocks,
+    edge_list_to_block_diagonals,
+)
+
+
+@pytest.mark.parametrize("num_nodes", [1, 2, 7, 12, 25])
+@pytest.mark.parametrize("block_size", [1, 2, 3, 4])
+def test_diagonals_match_diagonal_block_representation(num_nodes, block_size):
+    rng = np.random.default_rng(num_nodes)
+    edges = rng.integers(num_nodes, size=(num_nodes * 2, 2))
+    edge_features = rng.random((len(edges), 2)).astype(np.float32)
+    # no duplicates, which would leave the order of writing their features undefined
+    _, unique_indices = np.unique(np.sort(edges, axis=1), axis=0, return_index=True)
+    edges, edge_features = edges[unique_indices], edge_features[unique_indices]
+
+    adj_matrix = torch.zeros((num_nodes, num_nodes, 2))
+    adj_matrix[edges[:, 0], edges[:, 1]] = torch.from_numpy(edge_features)
+    adj_matrix[edges[:, 1], edges[:, 0]] = torch.from_numpy(edge_features)
+    diagonals = list(
+        EdgeListDiagonalBlocks(edges, num_nodes, block_size, edge_features)
+    )
+    assert [len(diagonal) for diagonal in diagonals] == list(
+        range(len(diagonals), 0, -1)
+    )
+    if num_nodes > 1:
+        expected = adj_matrix_to_diagonal_block_representation(
+            adj_matrix, num_nodes, block_size, pad_value=-1
+        )
+        assert torch.equal(torch.cat(diagonals[::-1]), expected)
+
+
+@pytest.mark.parametrize("num_nodes", [1, 2, 7, 12, 25])
+@pytest.mark.parametrize("block_size", [1, 2, 3])
+@pytest.mark.parametrize("max_distance", [1, 3, 8])
+def test_bandwidth_matches_adj_matrix_bandwidth(num_nodes, block_size, max_distance):
+    rng = np.random.default_rng(num_nodes)
+    children = np.arange(1, num_nodes)
+    parents = children - 1 - rng.integers(np.minimum(children, max_distance))
+    edges = np.stack([children, parents], axis=1)
+
+    adj_matrix = torch.zeros((num_nodes, num_nodes, 1))
+    adj_matrix[edges[:, 0], edges[:, 1]] = 1.0
+    assert EdgeListDiagonalBlocks(
+        edges, num_nodes, block_size
+    ).bandwidth == calculate_bandwidth_in_blocks(adj_matrix, num_nodes, block_size)
+
+
+def test_diagonals_from_memory_mapped_edges(tmp_path):
+    num_nodes, block_size = 30, 4
+    edges = np.stack([np.arange(1, num_nodes), np.arange(num_nodes - 1)], axis=1)
+    np.save(tmp_path / "edges.npy", edges)
+    mapped_edges = np.load(tmp_path / "edges.npy", mmap_mode="r")
+
+    diagonals = list(
+        edge_list_to_block_diagonals(
+            mapped_edges, num_nodes, block_size, num_diagonals=2
+        )
+    )
+    assert len(diagonals) == 2
+    assert (diagonals[0] == 1).sum() + (diagonals[1] == 1).sum() == num_nodes - 1
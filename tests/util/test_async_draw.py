@@ -0,0 +1,85 @@
+import multiprocessing
+
+import networkx as nx
+import torch
+
+from rga.util import async_draw, draw
+from rga.util.adjmatrix.diagonal_block_representation import (
+    adj_matrix_to_diagonal_block_representation,
+)
+
+
+def diag_block_graph(num_nodes, block_size=2):
+    adj_matrix = torch.ones((num_nodes, num_nodes)).tril(-1)[..., None]
+    return adj_matrix_to_diagonal_block_representation(
+        adj_matrix, num_nodes, block_size
+    )
+
+
+def test_frames_are_dropped_when_the_queue_is_full(monkeypatch):
+    rendering_finished = multiprocessing.get_context("fork").Event()
+    # the forked process blocks on its first frame
+    monkeypatch.setattr(
+        async_draw,
+        "draw_diag_repr_graph",
+        lambda *args, **kwargs: rendering_finished.wait(10),
+    )
+    renderer = async_draw.AsyncGraphRenderer(max_queue_size=1)
+
+    queued = [renderer.submit([(diag_block_graph(5), 5, "graph")]) for _ in range(5)]
+
+    # one frame may be taken by the process, one more fits into the queue
+    assert renderer.num_submitted_frames == 5
+    assert queued[0] and 3 <= renderer.num_dropped_frames == queued.count(False)
+    rendering_finished.set()
+    renderer.close(timeout=10)
+    assert renderer._process is None
+
+
+def test_close_terminates_a_stuck_renderer(monkeypatch):
+    monkeypatch.setattr(
+        async_draw,
+        "draw_diag_repr_graph",
+        lambda *args, **kwargs: multiprocessing.Event().wait(),
+    )
+    renderer = async_draw.AsyncGraphRenderer(max_queue_size=1)
+    renderer.submit([(diag_block_graph(5), 5, "graph")])
+    process = renderer._process
+
+    renderer.close(timeout=0.5)
+
+    assert not process.is_alive() and renderer._process is None
+    # closing again does nothing
+    renderer.close(timeout=0.5)
+
+
+def test_rendering_settings_are_passed_to_the_process(monkeypatch):
+    drawn = multiprocessing.get_context("fork").Queue()
+    monkeypatch.setattr(
+        async_draw,
+        "draw_diag_repr_graph",
+        lambda g, num_nodes, name, **kwargs: drawn.put((name, kwargs)),
+    )
+    renderer = async_draw.AsyncGraphRenderer(max_num_nodes=4, layout="circular")
+
+    renderer.submit(
+        [(diag_block_graph(10), 10, "pred"), (diag_block_graph(10), 10, "target")]
+    )
+    renderer.close(timeout=10)
+
+    expected_kwargs = dict(max_num_nodes=4, layout="circular")
+    assert [drawn.get(timeout=10) for _ in range(2)] == [
+        ("pred", expected_kwargs),
+        ("target", expected_kwargs),
+    ]
+
+
+def test_rendered_nodes_are_capped(monkeypatch):
+    drawn_graphs = []
+    monkeypatch.setattr(draw, "draw_graph", lambda g, *args: drawn_graphs.append(g))
+
+    draw.draw_diag_repr_graph(diag_block_graph(10), 10, "graph", max_num_nodes=4)
+    draw.draw_diag_repr_graph(diag_block_graph(10), 10, "graph")
+
+    assert [g.number_of_nodes() for g in drawn_graphs] == [4, 10]
+    assert nx.is_isomorphic(drawn_graphs[0], nx.complete_graph(4))
@@ -0,0 +1,25 @@
+from types import SimpleNamespace
+
+import torch
+
+from rga.util.callbacks import HostSyncMonitor
+from rga.util.host_sync import HostSyncCounter
+
+
+def test_host_sync_monitor_restores_tensor_methods_on_exception():
+    original_getitem = torch.Tensor.__getitem__
+    trainer = SimpleNamespace(logger=None, global_step=0)
+    monitor = HostSyncMonitor(include_cpu=True)
+
+    monitor.on_train_batch_start(trainer)
+    torch.tensor([1.0]).item()
+    monitor.on_train_batch_end(trainer)
+    assert monitor.last_step_count == 1
+
+    monitor.on_train_batch_start(trainer)
+    assert torch.Tensor.__getitem__ is not original_getitem
+    monitor.on_exception(trainer, None, RuntimeError())
+    monitor.teardown(trainer, None)
+
+    assert torch.Tensor.__getitem__ is original_getitem
+    assert not HostSyncCounter.is_active
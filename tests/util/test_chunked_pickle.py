@@ -0,0 +1,39 @@
+import pytest
+
+from rga.util.chunked_pickle import (
+    ChunkedPickleReader,
+    ChunkedPickleWriter,
+    is_chunked_pickle,
+)
+
+
+def test_chunked_pickle_roundtrip(tmp_path):
+    path = tmp_path / "items.pkl"
+    items = [list(range(i)) for i in range(10)]
+    with ChunkedPickleWriter(path, "lists", chunk_size=4) as writer:
+        writer.write_all(items)
+
+    assert is_chunked_pickle(path)
+    with ChunkedPickleReader(path, "lists") as reader:
+        assert reader.item_format == "lists"
+        assert len(reader) == 10
+        assert reader.num_chunks == 3
+        assert reader.chunk_bounds(2) == range(8, 10)
+        assert reader.read_chunk(1) == items[4:8]
+        assert [item for chunk in reader for item in chunk] == items
+
+
+def test_chunked_pickle_reader_rejects_other_files(tmp_path):
+    path = tmp_path / "other.pkl"
+    path.write_bytes(b"not a chunked pickle")
+    assert not is_chunked_pickle(path)
+    with pytest.raises(ValueError):
+        ChunkedPickleReader(path)
+
+
+def test_chunked_pickle_reader_rejects_other_item_formats(tmp_path):
+    path = tmp_path / "items.pkl"
+    with ChunkedPickleWriter(path, "lists") as writer:
+        writer.write([1])
+    with pytest.raises(ValueError, match="'lists', not 'records'"):
+        ChunkedPickleReader(path, "records")
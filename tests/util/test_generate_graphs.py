@@ -0,0 +1,121 @@
+from collections import OrderedDict
+
+import pytest
+import torch
+
+from rga.util import adjmatrix, generate_graphs
+from rga.util.generate_graphs import (
+    convert_model_output_to_diag_block,
+    diag_block_graphs_to_tril_adj_matrices,
+    get_num_nodes,
+    get_num_nodes_from_diagonal_blocks,
+    remove_batch_block_padding,
+    remove_block_padding,
+)
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 3])
+@pytest.mark.parametrize("num_blocks", [3, 10, 28, 30])
+def test_get_num_nodes_from_diagonal_blocks(block_size, num_blocks):
+    torch.manual_seed(num_blocks)
+    for num_missing_blocks in [0, 0, 2, num_blocks // 2]:
+        # a mask of a graph smaller than the upper limit
+        mask = torch.rand(num_blocks - num_missing_blocks, block_size, block_size, 1)
+        mask[: num_blocks // 3] *= 0.8
+        num_nodes_upper_limit = (
+            adjmatrix.block_count_to_num_block_diagonals(num_blocks) * block_size
+        )
+        if num_nodes_upper_limit < 2:
+            continue
+        adj_matrix_mask = adjmatrix.diagonal_block_to_adj_matrix_representation(
+            mask, num_nodes_upper_limit
+        )
+        assert get_num_nodes_from_diagonal_blocks(
+            mask, num_nodes_upper_limit
+        ) == get_num_nodes(adj_matrix_mask)
+
+
+def create_padded_model_output(batch_size, num_blocks, block_size, seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    shape = (batch_size, num_blocks, block_size, block_size, 1)
+    graphs = torch.randn(shape, generator=generator)
+    masks = torch.randn(shape, generator=generator) + 0.5
+    for i in range(batch_size):
+        num_graph_blocks = int(
+            torch.randint(1, num_blocks + 1, (1,), generator=generator)
+        )
+        graphs[i, num_graph_blocks:] = float("-inf")
+        masks[i, num_graph_blocks:] = float("-inf")
+    return graphs, masks
+
+
+def test_remove_batch_block_padding():
+    graphs, _ = create_padded_model_output(5, 12, 2)
+    graphs_without_padding, block_counts = remove_batch_block_padding(graphs)
+    for graph, graph_without_padding, block_count in zip(
+        graphs, graphs_without_padding, block_counts
+    ):
+        assert torch.equal(
+            graph_without_padding[:block_count], remove_block_padding(graph)
+        )
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 3])
+def test_convert_model_output_to_diag_block(block_size):
+    model_output = [
+        (create_padded_model_output(4, num_blocks, block_size, seed), None)
+        for seed, num_blocks in enumerate([3, 15, 28])
+    ]
+
+    diag_block_graphs = convert_model_output_to_diag_block(model_output)
+    adj_matrices = diag_block_graphs_to_tril_adj_matrices(diag_block_graphs)
+
+    expected_graphs = [
+        (graph, mask)
+        for (graphs, masks), _ in model_output
+        for graph, mask in zip(graphs, masks)
+    ]
+    assert len(diag_block_graphs) == len(adj_matrices) == len(expected_graphs)
+    for (graph, mask), (output_graph, output_mask, num_nodes), adj_matrix in zip(
+        expected_graphs, diag_block_graphs, adj_matrices
+    ):
+        # the reference per graph processing, building the dense matrices
+        expected_graph = torch.sigmoid(remove_block_padding(graph)).round().int()
+        expected_mask = torch.sigmoid(remove_block_padding(mask))
+        num_nodes_upper_limit = (
+            adjmatrix.block_count_to_num_block_diagonals(mask.shape[0]) * block_size
+        )
+        expected_num_nodes = get_num_nodes(
+            adjmatrix.diagonal_block_to_adj_matrix_representation(
+                expected_mask, num_nodes_upper_limit
+            )
+        )
+        expected_adj_matrix = torch.tril(
+            adjmatrix.diagonal_block_to_adj_matrix_representation(
+                expected_graph, expected_num_nodes
+            )[:, :, 0],
+            -1,
+        ).int()
+
+        assert torch.equal(output_graph, expected_graph)
+        assert torch.allclose(output_mask, expected_mask)
+        assert num_nodes == expected_num_nodes
+        assert torch.equal(adj_matrix, expected_adj_matrix)
+
+
+def test_index_table_cache_is_bounded_by_size(monkeypatch):
+    monkeypatch.setattr(generate_graphs, "index_tables", OrderedDict())
+    table_size = generate_graphs.index_table_size(
+        generate_graphs.lower_triangle_index_table(30, 2)
+    )
+    monkeypatch.setattr(generate_graphs, "INDEX_TABLES_MAX_BYTES", 2 * table_size)
+
+    tables = generate_graphs.lower_triangle_index_table(30, 2)
+    assert generate_graphs.lower_triangle_index_table(30, 2) is tables
+    generate_graphs.lower_triangle_index_table(30, 3)
+    generate_graphs.lower_triangle_index_table(30, 2)
+    generate_graphs.lower_triangle_index_table(29, 2)
+    # the least recently used table is evicted, the ones over the limit aren't cached at all
+    assert list(generate_graphs.index_tables) == [(30, 2), (29, 2)]
+    generate_graphs.lower_triangle_index_table(100, 2)
+    assert list(generate_graphs.index_tables) == [(30, 2), (29, 2)]